@@ -19,11 +19,14 @@ bl_info = {
 
 import bpy
 
-import hashlib, random, mathutils, time, datetime, subprocess, shutil, sys, os, json, math, re, sqlite3, threading
+import hashlib, random, mathutils, time, datetime, sys, os, math, re, sqlite3, threading
 
 from bpy_extras.object_utils import AddObjectHelper, object_data_add
 
 from pathlib import Path
+from contextlib import nullcontext
+
+import numpy as np
 
 from bpy.props import (StringProperty,
 					   BoolProperty,
@@ -40,14 +43,20 @@ from bpy.types import (Panel,
 					   )
 
 addon_root_dir = Path(__file__).parent
-vtfcmd_exe = addon_root_dir / 'bins' / 'vtfcmd' / 'VTFCmd.exe'
-vtfcmd_exe_old = addon_root_dir / 'bins' / 'vtfcmd_old' / 'VTFCmd.exe'
-magix_exe = addon_root_dir / 'bins' / 'imgmagick' / 'magick.exe'
 tmp_folder = addon_root_dir / 'tmps'
+probe_cache_db = tmp_folder / 'blvtf_probe_cache.sqlite'
 
 
 from .blvtf_skyboxer import *
 
+from .blvtf_core.bins import blvtf_addon_bins
+from .blvtf_core.probe_cache import blvtf_probe_cache
+from .blvtf_core.batch import blvtf_batch_tasks, blvtf_run_batch
+from .blvtf_core.convert import blvtf_export_img_to_vtf, blvtf_power_of_two
+from .blvtf_core.jobspec import blvtf_job, blvtf_save_job, blvtf_run_job
+from .blvtf_core.trace import blvtf_trace
+from .blvtf_core.progress import blvtf_progress_channel, blvtf_format_eta
+
 
 
 
@@ -200,28 +209,6 @@ blvtf_vtf_flags = (
 	('BORDER', 'Clamp All', 'Clamp to border colour on all texture coordinates'),
 )
 
-blvtf_vtf_flags_s = (
-	'POINTSAMPLE',
-	'TRILINEAR',
-	'CLAMPS',
-	'CLAMPT',
-	'ANISOTROPIC',
-	'HINT_DXT5',
-	'NORMAL',
-	'NOMIP',
-	'NOLOD',
-	'MINMIP',
-	'PROCEDURAL',
-	'RENDERTARGET',
-	'DEPTHRENDERTARGET',
-	'NODEBUGOVERRIDE',
-	'SINGLECOPY',
-	'NODEPTHBUFFER',
-	'CLAMPU',
-	'VERTEXTEXTURE',
-	'SSBUMP',
-	'BORDER',
-)
 
 blvtf_resize_methods = (
 	('NEAREST', 'Nearest Power Of 2', '1023 -> 1024, 570 -> 512'),
@@ -229,34 +216,16 @@ blvtf_resize_methods = (
 	('SMALLEST', 'Smallest Power of 2', '1023 -> 512, 570 -> 512'),
 )
 
-# file extensions supported by VTFCmd. Everything else has to be converted with imagemagick beforehand
-blvtf_vtfcmd_supported = (
-	'.tga',
-	'.jpeg',
-	'.jpg',
-	'.png',
-	'.bmp',
-	'.dds',
-	'.gif',
+# Which channel of an image gets packed into the VTF, see blvtf_core/pack.py
+blvtf_pack_source_channels = (
+	('AUTO', 'Auto', 'Alpha channel if the image has one, luminance otherwise'),
+	('L', 'Luminance', 'Greyscale of the image'),
+	('R', 'Red', 'Red channel'),
+	('G', 'Green', 'Green channel'),
+	('B', 'Blue', 'Blue channel'),
+	('A', 'Alpha', 'Alpha channel'),
 )
 
-blvtf_power_of_two = (
-	32_768,
-	16_384,
-	8192,
-	4096,
-	2048,
-	1024,
-	512,
-	256,
-	128,
-	64,
-	32,
-	16,
-	8,
-	4,
-	2,
-)
 
 
 blvtf_img_formats_lone = (
@@ -293,6 +262,10 @@ blvtf_img_formats_lone = (
 
 display_warnings = []
 
+# Dimensions/alpha of already seen images.
+# Persists across runs and Blender sessions
+blvtf_img_probe_cache = blvtf_probe_cache(probe_cache_db)
+
 
 
 
@@ -309,32 +282,79 @@ display_warnings = []
 # =========================================================
 
 
-class BLVTF_ExecutionProgress:
+# The Execute panel is redrawn at most this many times a second while something runs
+blvtf_progress_redraw_rate = 4
+
+class BLVTF_ExecutionProgress(blvtf_progress_channel):
+	"""Progress of a running export, shown in the Execute panel.
+	Workers only push events, a timer applies them to the panel on the main thread"""
+	# Has to be created on the main thread, right before the worker thread starts.
+	# total = None means the total is not known yet
+	# and is being discovered while the execution is already running
 	def __init__(self, context, total):
-		self.ctx = context
-		self.total = total or 1
+		super().__init__(total)
 		self.exec_data = context.scene.blvtf_execution_prog_data
+		self.cache_hits = blvtf_img_probe_cache.hits
 
-		self.real_prog = 0
-
-	def __enter__(self):
 		self.exec_data.exec_active = True
+		self.exec_data.exec_scanning = total == None
 		self.exec_data.exec_prog = 0
-		self.exec_data.exec_total = self.total
-
-		return self.update
-
-	def __exit__(self, exc_type, exc_val, exc_tb):
-		self.exec_data.exec_active = False
-		self.exec_data.exec_prog = 0
-		self.exec_data.exec_total = 0
+		self.exec_data.exec_total = total or 0
 		self.exec_data.exec_factor = 0.0
+		self.exec_data.exec_skipped = 0
+		self.exec_data.exec_cached = 0
+		self.exec_data.exec_failed = 0
+		self.exec_data.exec_rate = ''
+		self.exec_data.exec_slowest = ''
 
+		bpy.app.timers.register(self.redraw, first_interval=1 / blvtf_progress_redraw_rate)
 
-	def update(self, amt=1):
-		self.real_prog += amt
-		self.exec_data.exec_factor = float(self.real_prog / self.total)
-		self.exec_data.exec_prog = self.real_prog
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.finish()
+
+	# bpy.app.timers callback
+	def redraw(self):
+		try:
+			progress = self.drain()
+			exec_data = self.exec_data
+
+			exec_data.exec_scanning = progress['scanning']
+			exec_data.exec_prog = progress['done']
+			exec_data.exec_total = progress['total']
+			exec_data.exec_factor = float(progress['done'] / (progress['total'] or 1))
+			exec_data.exec_skipped = progress['skipped']
+			exec_data.exec_cached = blvtf_img_probe_cache.hits - self.cache_hits
+			exec_data.exec_failed = progress['failed']
+			exec_data.exec_rate = f'{progress["tasks_per_sec"]:.1f} tasks/s, {progress["mb_per_sec"]:.1f} MB/s, ETA {blvtf_format_eta(progress["eta"])}'
+			exec_data.exec_slowest = f'{progress["slowest"][0]} ({progress["slowest"][1]:.0f}s)' if progress['slowest'] else ''
+
+			if progress['finished']:
+				if progress['failed']:
+					exec_data.post_exec_msg = f'Last execution had {progress["failed"]} failed images'
+				else:
+					exec_data.post_exec_msg = 'Last execution had no errors'
+				exec_data.exec_active = False
+				exec_data.exec_scanning = False
+				exec_data.exec_prog = 0
+				exec_data.exec_total = 0
+				exec_data.exec_factor = 0.0
+		except ReferenceError:
+			# The scene is gone (another file was opened)
+			return None
+
+		# Without this the panel only updates once the mouse moves over it
+		for window in bpy.context.window_manager.windows:
+			for area in window.screen.areas:
+				if area.type == 'IMAGE_EDITOR':
+					area.tag_redraw()
+
+		if progress['finished']:
+			return None
+
+		return 1 / blvtf_progress_redraw_rate
 
 
 
@@ -343,171 +363,41 @@ def blvtf_marked_img_quickswitch(self, context):
 	if hasattr(context.space_data, 'image'):
 		context.space_data.image = bpy.data.images[context.scene.blvtf_quickswitch_idx]
 
-def blvtf_ensure_addon_setup():
-	if not vtfcmd_exe.is_file():
-		# unpack VTF Edit cmd
-		unpk_prms = [
-			str(addon_root_dir / 'bins' / '7z' / '7z.exe'),
-			'x',
-			'-o' + str(addon_root_dir / 'bins' / 'vtfcmd'),
-			str(addon_root_dir / 'bins' / 'vtfcmd.orgn'),
-			'-aoa'
-		]
-
-		# exec vtfcmd unpacking
-		subprocess.run(unpk_prms, stdout=subprocess.DEVNULL)
-
-	if not vtfcmd_exe_old.is_file():
-		# unpack VTF Edit cmd Old version with image sharpening
-		unpk_prms = [
-			str(addon_root_dir / 'bins' / '7z' / '7z.exe'),
-			'x',
-			'-o' + str(addon_root_dir / 'bins' / 'vtfcmd_old'),
-			str(addon_root_dir / 'bins' / 'vtfcmd_old.orgn'),
-			'-aoa'
-		]
-
-		# exec vtfcmd unpacking
-		subprocess.run(unpk_prms, stdout=subprocess.DEVNULL)
-
-	if not magix_exe.is_file():
-		# unpack imgmagick exe
-		unpk_prms = [
-			str(addon_root_dir / 'bins' / '7z' / '7z.exe'),
-			'x',
-			'-o' + str(addon_root_dir / 'bins'),
-			str(addon_root_dir / 'bins' / 'imgmagick.orgn'),
-			'-aoa'
-		]
-
-		# exec magix unpacking
-		subprocess.run(unpk_prms, stdout=subprocess.DEVNULL)
-
-
-blvtf_ensure_addon_setup()
-
-# get image XY dimensions in pixels
-# returns XY tuple
-def blvtf_get_img_dims(imgpath):
-	magix_prms = [
-		str(magix_exe),
-		'convert',
-		str(imgpath),
-		'json:'
-	]
-
-	json_echo = None
-	with subprocess.Popen(magix_prms, stdout=subprocess.PIPE, bufsize=10**8) as img_pipe:
-		# fuck = img_pipe.stdout.read()
-		# print('got json echo', fuck)
-		json_echo = json.loads(img_pipe.stdout.read())
-
-	geometry = json_echo[0]['image']['geometry']
-
-	return (geometry['width'], geometry['height'])
-
-def blvtf_resize_img_to_xy(imgpath, dims):
-	src_path = Path(imgpath)
-	tgt_path = tmp_folder / f'{src_path.stem}.tga'
-	magix_prms = [
-		str(magix_exe),
-		str(imgpath),
-		'-resize', f'{dims[0]}x{dims[1]}!',
-		str(tgt_path)
-	]
-
-	if src_path.suffix.lower().strip('.') in ('exr', 'hdr', 'tiff',):
-		magix_prms.insert(2, '-auto-gamma')
-
-	resize_echo = None
-	with subprocess.Popen(magix_prms, stdout=subprocess.PIPE, bufsize=10**8) as img_pipe:
-		resize_echo = img_pipe.stdout.read()
-
-	if not tgt_path.is_file():
-		return False
-
-	return tgt_path
-
-# convert an image to tga using imagemagick
-def blvtf_img_to_tga(imgpath):
-	src_path = Path(imgpath)
-	tgt_path = tmp_folder / f'{src_path.stem}.tga'
-	tgt_path.unlink(missing_ok=True)
-	magix_prms = [
-		str(magix_exe),
-		f'{imgpath}[0]',
-		# str(tgt_path)
-	]
-	if src_path.suffix.lower().strip('.') in ('exr', 'hdr', 'tiff',):
-		magix_prms.append('-auto-gamma')
-		# magix_prms.append('-set')
-		# magix_prms.append('colorspace RGB')
-		# magix_prms.append('')
-		# magix_prms.append('-colorspace')
-		# magix_prms.append('sRGB')
-		# magix_prms.append('-colorspace')
-		# magix_prms.append('RGB')
-
-	magix_prms.append(str(tgt_path))
-
-	print('Converting', imgpath, 'Because its not supported by vtfcmd. Magix params:', magix_prms)
-	tga_echo = None
-	with subprocess.Popen(magix_prms, stdout=subprocess.PIPE, bufsize=10**8) as img_pipe:
-		tga_echo = img_pipe.stdout.read()
-
-	print('CONVERTING UNSUPPORTED TO TGA ECHO', tga_echo.decode())
-
-	if not tgt_path.is_file():
-		return False
-
-	return tgt_path
-
-# embed an image into the alpha channel of another one
-def blvtf_emb_alpha(rgb, alpha):
-	rgb = Path(rgb)
-	alpha = Path(alpha)
-
-	# if alpha is not of the same size as rgb - rescale it to fit
-	rgb_dims = blvtf_get_img_dims(rgb)
-	alpha_dims = blvtf_get_img_dims(alpha)
-
-	resized_alpha = None
-	if rgb_dims != alpha_dims:
-		resized_alpha = blvtf_resize_img_to_xy(alpha, rgb_dims)
-
-
-	tgt_path = tmp_folder / f'{rgb.stem}.wa.tga'
-	tgt_path.unlink(missing_ok=True)
-	magix_prms = [
-		str(magix_exe),
-		# rgb
-		f'{rgb}[0]',
-		# alpha
-		str(resized_alpha or alpha),
-		'-alpha', 'off',
-		'-compose', 'CopyOpacity',
-		'-composite', str(tgt_path)
-	]
-
-	alpha_echo = None
-	with subprocess.Popen(magix_prms, stdout=subprocess.PIPE, bufsize=10**8) as img_pipe:
-		alpha_echo = img_pipe.stdout.read()
-
-	# since resized alpha is a separate image - delete it, because only resulting composite is needed
-	# (which is present already)
-	if resized_alpha != None:
-		resized_alpha.unlink(missing_ok=True)
-
-	if not tgt_path.is_file():
-		return False
-
-	return tgt_path
 
 # this simply first applies bpy.path.abspath and then Path()
 def aPath(pth):
 	# todo: this str conversion is some rubbish
 	return Path(bpy.path.abspath(str(pth)))
 
+# Shared params, which affect the resulting VTFs, as a plain dict.
+# Used by the build manifest
+def blvtf_manifest_shared_params(shared_params):
+	return {
+		'vtf_version': shared_params.vtf_version,
+		'vtfcmd_ver': shared_params.vtfcmd_ver,
+		'vtf_dxt_quality': shared_params.vtf_dxt_quality,
+		'vtf_generate_thumb': shared_params.vtf_generate_thumb,
+		'blvtf_version': bl_info['version'],
+	}
+
+# Shared export params as the plain dict blvtf_core/convert.py takes
+def blvtf_export_shared_params(shared_params):
+	return {
+		'vtfcmd_ver': shared_params.vtfcmd_ver,
+		'vtf_version': shared_params.vtf_version,
+		'vtf_dxt_quality': shared_params.vtf_dxt_quality,
+		'vtf_generate_thumb': shared_params.vtf_generate_thumb,
+		'vtf_scratch_folder': str(aPath(shared_params.vtf_scratch_folder)) if shared_params.vtf_scratch_folder else None,
+		'tmp_folder': str(tmp_folder),
+	}
+
+# Timing trace of an export, if there's a trace file set (see blvtf_core/trace.py)
+def blvtf_export_tracer(shared_params):
+	if not shared_params.vtf_trace_path:
+		return None
+
+	return blvtf_trace(aPath(shared_params.vtf_trace_path))
+
 # hash string with sha256
 def strhash(s):
 	try:
@@ -544,149 +434,42 @@ def blvtf_insert_flags_at_cursor(self, context):
 
 # self.report({'WARNING'}, str(e))
 
-# Convert image from path to vtf
-# takes a dict of params
-"""
-{
-	'enc': ('(no alpha) DXT1', '(w alpha) DXT5'),
-	'mips': False or ('resize_filter', 'sharpen_filter'),
-	'comp_refl': True,
-	'srgb': True,
-	'src': 'W:/vid_dl/sex.tga',
-	'dest': 'W:/vid_dl/bdsm/pootis.vtf',
-	'emb_alpha': 'W:/vid_dl/specular.tga',
-	'resize': False or ('resizing_rule', 'resize_filter', 'sharpen_filter'),
-	'clamp_dims': False or (512, 512),
-	'flags': ('NORMAL', 'NOMIP', 'MINMIP'),
-}
-"""
-def blvtf_export_img_to_vtf(img_info, reporter=None):
-	img_src = Path(img_info['src'])
-	vtf_dest = Path(img_info['dest'])
-	emb_alpha = Path(str(img_info['emb_alpha']))
-
-	# check whether the destination folder exists
-	if not vtf_dest.parent.is_dir():
-		if reporter:
-			reporter.blvtf_report({'WARNING'}, f'The destination folder >{vtf_dest.parent}< For the image >{img_src.name}< does not exist, skipping')
-		return
-
-	# check whether the image is of applicable size
-	img_dims = blvtf_get_img_dims(img_src)
-	if (not img_dims[0] in blvtf_power_of_two or not img_dims[1] in blvtf_power_of_two) and not img_info['resize']:
-		if reporter:
-			reporter.blvtf_report({'WARNING'}, f"""Skipping image {img_src.name}, because it's of unapplicable size! {img_dims}, please enable resizing""")
-		return
-
-	shared_params = bpy.context.scene.blvtf_exp_params
-
-	# embed alpha, if any
-	img_src_w_alpha = None
-	if emb_alpha.is_file():
-		print('BLVTF: Trying to add alpha...')
-		img_src_w_alpha = blvtf_emb_alpha(img_src, emb_alpha)
-
-	# convert to applicable format, if needed
-	img_src_converted = None
-	if not img_src.suffix in blvtf_vtfcmd_supported and img_src_w_alpha == None:
-		img_src_converted = blvtf_img_to_tga(img_src)
-
-	input_filepath = img_src_w_alpha or img_src_converted or img_src
-
-	vtfcmd_args = [
-		str(vtfcmd_exe if shared_params.vtfcmd_ver == 'new' else vtfcmd_exe_old),
-		'-file',
-		str(input_filepath),
-	]
-
-	# resize to power of 2
-	if img_info['resize']:
-		vtfcmd_args.extend([
-			'-resize',
-			'-rmethod', img_info['resize'][0],
-			'-rfilter', img_info['resize'][1],
-		])
-		if shared_params.vtfcmd_ver == 'old':
-			vtfcmd_args.extend([
-				'-rsharpen', img_info['resize'][2]
-			])
-
-	# clamp image XY
-	if img_info['resize'] and img_info['clamp_dims']:
-		vtfcmd_args.extend([
-			'-rclampwidth', img_info['clamp_dims'][0],
-			'-rclampheight', img_info['clamp_dims'][1],
-		])
-
-	# Specify vtf format
-	vtfcmd_args.extend([
-		'-format', img_info['enc'][0],
-		'-alphaformat', img_info['enc'][1],
-	])
 
-	# Mipmaps generation
-	if img_info['mips']:
-		vtfcmd_args.extend([
-			'-mfilter', img_info['mips'][0],
-		])
-		if shared_params.vtfcmd_ver == 'old':
-			vtfcmd_args.extend([
-				'-msharpen', img_info['mips'][1],
-			])
-	else:
-		vtfcmd_args.append('-nomipmaps')
+# Read the pixels of an image datablock the way Blender has them decoded (or painted over).
+# Works the same for packed, generated and unsaved images.
+# returns a top-down (height, width, 4) array: linear float32 for float images, uint8 otherwise
+def blvtf_read_img_pixels(img):
+	width, height = img.size
+	channels = img.channels
+	if not width or not height or not channels:
+		return None
 
-	# Specify vtf version
-	vtfcmd_args.extend(['-version', shared_params.vtf_version])
+	# Straight into a preallocated buffer, no python floats involved
+	pixel_buf = np.empty(width * height * channels, dtype=np.float32)
+	img.pixels.foreach_get(pixel_buf)
+	# Blender images are bottom-up
+	pixel_buf = pixel_buf.reshape(height, width, channels)[::-1]
 
-	# compute reflectivity
-	if img_info['comp_refl'] != True:
-		vtfcmd_args.append('-noreflectivity')
+	rgba = np.empty((height, width, 4), dtype=np.float32)
+	rgba[:, :, :3] = pixel_buf[:, :, :3] if channels >= 3 else pixel_buf[:, :, :1]
+	rgba[:, :, 3] = pixel_buf[:, :, -1] if channels in (2, 4) and img.alpha_mode != 'NONE' else 1.0
 
-	# sRGB shit
-	if img_info['srgb'] == True:
-		vtfcmd_args.append('-srgb')
+	if not img.is_float:
+		return (np.clip(rgba, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
 
-	# Generate Thumbnail
-	if shared_params.vtf_generate_thumb != True:
-		vtfcmd_args.append('-nothumbnail')
+	# Float buffers are premultiplied, unless the alpha is channel packed
+	if img.alpha_mode != 'CHANNEL_PACKED':
+		alpha = rgba[:, :, 3:]
+		np.divide(rgba[:, :, :3], alpha, out=rgba[:, :, :3], where=alpha > 0)
 
-	# Add flags
-	for addflg in img_info['flags']:
-		vtfcmd_args.extend(['-flag', addflg])
+	return rgba
 
-	# Specify output folder
-	vtfcmd_args.extend([
-		'-output', str(vtf_dest.parent),
-	])
 
-	# execute conversion
-	print('Executing VTF conversion', str(input_filepath), vtfcmd_args)
-	vtf_echo = None
-	# todo: use lambda filter or whatever is better
-	vtfcmd_args = [str(c_arg) for c_arg in vtfcmd_args]
-	with subprocess.Popen(vtfcmd_args, stdout=subprocess.PIPE, bufsize=10**8) as vtf_pipe:
-		vtf_echo = vtf_pipe.stdout.read()
 
-	print('echo:', vtf_echo.decode())
 
-	# rename
-	# important todo: IS THIS EVEN LEGAL ?!
-	shutil.move(str(vtf_dest.parent / f'{input_filepath.stem}.vtf'), str(vtf_dest.with_suffix('.vtf')))
 
-	# Delete leftovers
-	if img_src_w_alpha:
-		img_src_w_alpha.unlink(missing_ok=True)
 
-	if img_src_converted:
-		img_src_converted.unlink(missing_ok=True)
 
-	# 
-	# Write VMT, if any
-	# 
-	vmt_preset_name = img_info.get('vmt_preset')
-	if vmt_preset_name:
-		pass
 
 
 
@@ -700,39 +483,70 @@ def blvtf_export_img_to_vtf(img_info, reporter=None):
 
 
 
+# Whether to take the pixels of an image datablock from Blender instead of the file on disk.
+# Packed, generated and edited images only have the right pixels in Blender's memory,
+# the rest do if the option is on and Blender has loaded them already anyway.
+# loaded_pixels: whether clean images loaded from disk may come from Blender at all.
+# Off for exports of many images, where copying all of them up front would cost more memory than decoding saves
+def blvtf_img_from_pixels(img, shared_params, loaded_pixels=True):
+	if img.source == 'GENERATED' or img.packed_file or img.is_dirty:
+		return True
 
+	return loaded_pixels and img.source == 'FILE' and shared_params.vtf_export_from_pixels and img.has_data
 
+# Source of an image datablock for packing: pixels from Blender, or the file on disk
+def blvtf_img_datablock_src(img, shared_params, loaded_pixels=True):
+	if blvtf_img_from_pixels(img, shared_params, loaded_pixels):
+		return blvtf_read_img_pixels(img)
 
+	return aPath(img.filepath)
 
-
-
-
-def blvtf_export_img_datablock(self, context, img):
+# Resolve everything about an image datablock into a task dict (see blvtf_export_img_to_vtf).
+# Has to run on the main thread, the result doesn't refer to Blender anymore.
+# loaded_pixels: see blvtf_img_from_pixels
+# returns None if the image can't be exported
+def blvtf_img_datablock_task(self, img, shared_params, loaded_pixels=True):
 	img_data = img
 	img_vtf_prms = img_data.blvtf_img_params
-	shared_params = bpy.context.scene.blvtf_exp_params
 
-	# todo: Packed images are not supported yet
-	if img_data.is_embedded_data:
-		# todo: this reports with the datablock name, while other reporters use actual filename. This might be confusing at times
-		self.blvtf_report({'WARNING'}, f'Image {img_data.name} is packed, but packed images are not supported yet. Skipping...')
-		return
+	# Packed, generated and edited images are read from Blender's memory
+	src_pixels = None
+	if blvtf_img_from_pixels(img_data, shared_params, loaded_pixels):
+		src_pixels = blvtf_read_img_pixels(img_data)
+		if src_pixels is None:
+			# todo: this reports with the datablock name, while other reporters use actual filename. This might be confusing at times
+			self.blvtf_report({'WARNING'}, f'The Image {img_data.name} has no pixels, skipping')
+			return None
 
 	# Check whether the source image exists
 	# Because why not...
-	if not aPath(img_data.filepath).is_file():
+	elif not aPath(img_data.filepath).is_file():
 		self.blvtf_report({'WARNING'}, f'The Image {img_data.name} is missing from disk, skipping')
-		return
+		return None
 
 	add_alpha = False
 	if img_vtf_prms.embed_to_alpha:
 		if not img_vtf_prms.image_to_embed:
 			self.blvtf_report({'WARNING'}, f'The Image {img_data.name} has "Embed Alpha" enabled, but the target image is missing. No alpha would be embedded')
 		else:
-			add_alpha = aPath(img_vtf_prms.image_to_embed.filepath)
-		
+			add_alpha = blvtf_img_datablock_src(img_vtf_prms.image_to_embed, shared_params, loaded_pixels)
+
+	# Pack other images into the colour channels
+	pack_channels = {}
+	if img_vtf_prms.channel_pack_enable:
+		for target in ('R', 'G', 'B'):
+			pack_img = getattr(img_vtf_prms, f'channel_pack_img_{target.lower()}')
+			if pack_img:
+				pack_channels[target] = (blvtf_img_datablock_src(pack_img, shared_params, loaded_pixels), getattr(img_vtf_prms, f'channel_pack_src_{target.lower()}'))
 
-	src_file = aPath(img_data.filepath)
+	# The image to embed could come from any of its channels too
+	if add_alpha is not False:
+		pack_channels['A'] = (add_alpha, img_vtf_prms.embed_channel)
+		add_alpha = False
+
+
+	# Generated images have no file, they're named after the datablock
+	src_file = aPath(img_data.filepath) if img_data.filepath else Path(bpy.path.clean_name(img_data.name))
 	# export_filename = aPath(img_vtf_prms.vtf_export_path) / image.name_full
 	# by default the export destination is target path + source file name with suffix changed to .vtf
 	export_filename = aPath(img_vtf_prms.vtf_export_path) / f'{src_file.stem}.vtf'
@@ -742,20 +556,57 @@ def blvtf_export_img_datablock(self, context, img):
 
 	resulting_flags = blvtf_get_active_flags(img_vtf_prms)
 
-	blvtf_export_img_to_vtf({
+	return {
 		'enc': (img_vtf_prms.vtf_format, img_vtf_prms.vtf_format_w_alph),
 		'srgb': img_vtf_prms.vtf_srgb_format,
 		'mips': (shared_params.vtf_mipmap_filter, shared_params.vtf_mipmap_sharpen_filter) if img_vtf_prms.vtf_mipmaps_enable else False,
 		'comp_refl': img_vtf_prms.vtf_compute_refl,
-		'src': aPath(img_data.filepath),
+		'src': src_file,
 		'dest': export_filename,
+		'src_pixels': src_pixels,
 		'emb_alpha': add_alpha,
+		'channels': pack_channels or False,
 		'resize': (img_vtf_prms.vtf_resize_method, shared_params.vtf_resize_filter, shared_params.vtf_resize_sharpen_filter) if img_vtf_prms.vtf_enable_resize else False,
 		'clamp_dims': (img_vtf_prms.vtf_resize_clamp_maxwidth, img_vtf_prms.vtf_resize_clamp_maxheight) if img_vtf_prms.vtf_resize_clamp else False,
 		# todo: oh fuck
 		'flags': tuple(resulting_flags),
 		'vmt_preset': None,
-	}, self)
+	}
+
+# One line about all the tasks which failed during a run, the reasons were reported as they happened
+def blvtf_report_failures(self, run_stats, max_listed=5):
+	failures = run_stats['failures']
+	if not failures:
+		return
+
+	listed = ', '.join(Path(src).name for src in failures[:max_listed])
+	if len(failures) > max_listed:
+		listed += f' and {len(failures) - max_listed} more'
+
+	self.blvtf_report({'WARNING'}, f'{len(failures)} images failed to convert: {listed}')
+
+def blvtf_export_img_datablock(self, context, img):
+	shared_params = context.scene.blvtf_exp_params
+
+	img_task = blvtf_img_datablock_task(self, img, shared_params)
+	if img_task:
+		with blvtf_export_tracer(shared_params) or nullcontext() as tracer:
+			blvtf_export_img_to_vtf(img_task, blvtf_export_shared_params(shared_params), self, blvtf_img_probe_cache, tracer)
+
+# Every marked image of the blend file, frozen into a job (see blvtf_core/jobspec.py).
+# Only packed, generated and edited images are snapshotted, clean ones are read from disk by the workers:
+# the snapshots are taken on the main thread before anything converts, and all of them stay in memory for the whole run
+def blvtf_marked_imgs_job(self, context):
+	shared_params = context.scene.blvtf_exp_params
+
+	img_tasks = []
+	for img in bpy.data.images:
+		if img.blvtf_img_params.do_export == True:
+			img_task = blvtf_img_datablock_task(self, img, shared_params, loaded_pixels=False)
+			if img_task:
+				img_tasks.append(img_task)
+
+	return blvtf_job(img_tasks, blvtf_export_shared_params(shared_params), context.scene.blvtf_batch_params.batch_vtfcmd_group_size)
 
 
 
@@ -811,26 +662,61 @@ class OBJECT_OT_blvtf_export_marked_imgs(Operator, AddObjectHelper):
 
 		display_warnings.clear()
 
+		# Everything is read from Blender right here, on the main thread.
+		# The worker threads only ever see the frozen job
+		marked_job = blvtf_marked_imgs_job(self, context)
+
 		threading.Thread(
 			target=self.thread_tgt,
-			args=(context,),
+			args=(
+				context,
+				marked_job,
+				context.scene.blvtf_batch_params.batch_worker_count,
+				blvtf_export_tracer(context.scene.blvtf_exp_params),
+				BLVTF_ExecutionProgress(context, len(marked_job['tasks'])),
+			),
 			daemon=True,
 		).start()
 
 		return {'FINISHED'}
 
 
-	def thread_tgt(self, context):
-		tgt_imgs = [i for i in bpy.data.images if i.blvtf_img_params.do_export == True]
+	def thread_tgt(self, context, marked_job, worker_count, tracer, exec_prog):
+		with exec_prog, tracer or nullcontext():
+			run_stats = blvtf_run_job(marked_job, self, exec_prog, blvtf_img_probe_cache, worker_count, tracer)
+			# The panel's post execution message is set from this by the timer
+			exec_prog.finish(run_stats['failed'])
 
-		with BLVTF_ExecutionProgress(context, len(tgt_imgs)) as upd:
-			for eimg in tgt_imgs:
-				# time.sleep(1)
-				blvtf_export_img_datablock(self, context, eimg)
-				upd(1)
+		blvtf_report_failures(self, run_stats)
 
-		# context.scene.blvtf_execution_prog_data.post_exec_msg = 'No Errors occured during last execution'
-		context.scene.blvtf_execution_prog_data.post_exec_msg = 'Last execution had no errors'
+
+class OBJECT_OT_blvtf_save_marked_job(Operator, AddObjectHelper):
+	bl_idname = 'mesh.blvtf_save_marked_job'
+	bl_label = 'Save Export Job'
+	bl_options = {'REGISTER'}
+	bl_description = 'Save the export of all the marked images as a job file, which could be run later without Blender (python -m blvtf_core --job)'
+
+	def blvtf_report(self, rtype, rmsg):
+		display_warnings.append(f'{rtype}: {rmsg}')
+		self.report(rtype, rmsg)
+
+	def execute(self, context):
+		display_warnings.clear()
+
+		shared_params = context.scene.blvtf_exp_params
+		if not shared_params.vtf_job_path:
+			self.blvtf_report({'WARNING'}, 'No job file specified. Aborting')
+			return {'FINISHED'}
+
+		job_path = aPath(shared_params.vtf_job_path)
+		if job_path.suffix.lower() != '.json':
+			job_path = job_path.with_suffix('.json')
+
+		marked_job = blvtf_marked_imgs_job(self, context)
+		blvtf_save_job(marked_job, job_path)
+		self.blvtf_report({'INFO'}, f'Saved {len(marked_job["tasks"])} tasks to {job_path}')
+
+		return {'FINISHED'}
 
 
 class OBJECT_OT_blvtf_folder_convert(Operator, AddObjectHelper):
@@ -844,13 +730,23 @@ class OBJECT_OT_blvtf_folder_convert(Operator, AddObjectHelper):
 		self.report(rtype, rmsg)
 
 
-	def thread_tgt(self, context, output_folder, tasks):
-		with BLVTF_ExecutionProgress(context, len(tasks)) as upd:
-			for process_task in tasks:
-				if tasks[process_task]['dest'].parent != output_folder:
-					tasks[process_task]['dest'].parent.mkdir(parents=True, exist_ok=True)
-				blvtf_export_img_to_vtf(tasks[process_task], self)
-				upd(1)
+	def thread_tgt(self, context, task_iter, output_folder, shared, worker_count, group_size, manifest_shared, tracer, exec_prog):
+		with exec_prog, tracer or nullcontext():
+			run_stats = blvtf_run_batch(
+				task_iter,
+				output_folder,
+				shared,
+				worker_count,
+				group_size,
+				manifest_shared,
+				self,
+				exec_prog,
+				blvtf_img_probe_cache,
+				tracer,
+			)
+			exec_prog.finish(run_stats['failed'])
+
+		blvtf_report_failures(self, run_stats)
 
 	def execute(self, context):
 
@@ -872,139 +768,51 @@ class OBJECT_OT_blvtf_folder_convert(Operator, AddObjectHelper):
 			self.blvtf_report({'WARNING'}, 'The destination folder does not exist. Aborting')
 			return {'FINISHED'}
 
-		# Glob or Rglob
-		if batch_params.batch_recursive:
-			traverse_src = input_folder.rglob
-		else:
-			traverse_src = input_folder.glob
-
 		# collect flags right away
 		batch_vtf_flags = blvtf_get_active_flags(batch_params)
 
 		print('Batch Flags', batch_vtf_flags)
 
-		# important todo: proper wildcard detection
-		wcard_symbols = (
-			'!',
-			'?',
-			'*',
-			'/',
-			'\\',
-			'<',
-			'>',
-			'|',
+		# Everything the tasks need is resolved right here, on the main thread.
+		# The folder walk itself happens in the background, along with the conversion.
+		# See blvtf_core/batch.py
+		batch_settings = {
+			'vtf_format': batch_params.vtf_format,
+			'vtf_format_w_alph': batch_params.vtf_format_w_alph,
+			'vtf_mipmaps_enable': batch_params.vtf_mipmaps_enable,
+			'vtf_mipmap_filter': shared_params.vtf_mipmap_filter,
+			'vtf_mipmap_sharpen_filter': shared_params.vtf_mipmap_sharpen_filter,
+			'vtf_compute_refl': batch_params.vtf_compute_refl,
+			'vtf_enable_resize': batch_params.vtf_enable_resize,
+			'vtf_resize_method': batch_params.vtf_resize_method,
+			'vtf_resize_filter': shared_params.vtf_resize_filter,
+			'vtf_resize_sharpen_filter': shared_params.vtf_resize_sharpen_filter,
+			'vtf_resize_clamp': batch_params.vtf_resize_clamp,
+			'vtf_resize_clamp_maxwidth': batch_params.vtf_resize_clamp_maxwidth,
+			'vtf_resize_clamp_maxheight': batch_params.vtf_resize_clamp_maxheight,
+			'flags': tuple(batch_vtf_flags),
+			'batch_recursive': batch_params.batch_recursive,
+			'txtmax_use_fallback': batch_params.txtmax_use_fallback,
+		}
+
+		task_iter = blvtf_batch_tasks(
+			input_folder,
+			output_folder,
+			batch_settings,
+			batch_params.txtmax_file.as_string() if batch_params.txtmax_enabled else None,
+			lambda vmt_preset: bpy.data.texts.get(vmt_preset) != None,
 		)
-		glob_pattern = '*.*'
-		if len(set(wcard_symbols) & set(input_folder.name)) != 0:
-			glob_pattern = input_folder.name
-			input_folder = input_folder.parent
-
-
-		# collect tasks
-		# (image files to process, including all the info n shit)
-		tasks = {}
-
-		# Collect tasks from TxtMax, if any
-		if batch_params.txtmax_enabled:
-			patterns = {}
-
-			# collect patterns
-			for ln in batch_params.txtmax_file.lines:
-				ln = ln.body.strip()
-				if ln.startswith('#') or ln == '':
-					continue
-				raw_rule = list(filter(None, ln.replace('\t', ' ').split(' ')))
-				rname = raw_rule[0]
-
-				patterns[rname] = {
-					'format': batch_params.vtf_format if raw_rule[1] == '*' else raw_rule[1],
-					'sclamp': False,
-					'flags': [],
-					'vmt_preset': None,
-					'srgb': False,
-				}
-
-				# Flag array
-				if raw_rule[-1].startswith('-'):
-					if raw_rule[-1] == '-*':
-						patterns[rname]['flags'] = tuple(batch_vtf_flags)
-					else:
-						patterns[rname]['flags'] = tuple(set(filter(None, raw_rule[-1].replace('-', '').upper().split(','))) & set(blvtf_vtf_flags_s))
-
-					for srgb_check in raw_rule[-1].replace('-', '').lower().split(','):
-						if srgb_check.strip() == 'srgb':
-							patterns[rname]['srgb'] = True
-
-					del raw_rule[-1]
-
-
-				# Size Clamp
-				if len(raw_rule) > 2:
-					sclamp = raw_rule[2].lower()
-					if 'x' in sclamp:
-						try:
-							sclamp = sclamp.split('x')
-							patterns[rname]['sclamp'] = (
-								str(batch_params.vtf_resize_clamp_maxwidth) if sclamp[0] == '*' else int(sclamp[0]),
-								str(batch_params.vtf_resize_clamp_maxheight) if sclamp[1] == '*' else int(sclamp[1]),
-							)
-							del raw_rule[-1]
-						except:
-							pass
-
-				# VMT preset
-				if len(raw_rule) > 2:
-					if raw_rule[-1].startswith('@'):
-						vmtpreset = raw_rule[-1].strip('@')
-						if bpy.data.texts.get(vmtpreset) != None:
-							patterns[rname]['vmt_preset'] = vmtpreset
-
-
-
-			# Go through each pattern and get file paths from them
-			for pat in patterns:
-				for imgf in traverse_src(pat):
-					tasks[strhash(imgf)] = {
-						'enc': (patterns[pat]['format'], patterns[pat]['format']),
-						'mips': (shared_params.vtf_mipmap_filter, shared_params.vtf_mipmap_sharpen_filter) if batch_params.vtf_mipmaps_enable else False,
-						'comp_refl': batch_params.vtf_compute_refl,
-						'srgb': patterns[pat]['srgb'],
-						'src': imgf,
-						'dest': output_folder / imgf.relative_to(input_folder).with_suffix('.vtf'),
-						'emb_alpha': False,
-						# Aligning to the nearest power of 2 is always on for txtmax
-						'resize': (batch_params.vtf_resize_method, shared_params.vtf_resize_filter, shared_params.vtf_resize_sharpen_filter),
-						'clamp_dims': (patterns[pat]['sclamp'][0], patterns[pat]['sclamp'][1]) if patterns[pat]['sclamp'] else False,
-						# todo: oh fuck
-						'flags': patterns[pat]['flags'],
-						'vmt_preset': patterns[pat]['vmt_preset']
-					}
-
-
-		# Collect tasks from main batch
-		if not batch_params.txtmax_enabled or (batch_params.txtmax_enabled and batch_params.txtmax_use_fallback):
-			for tsk_file in traverse_src(glob_pattern):
-				tsk_hash = strhash(tsk_file)
-				if not tsk_hash in tasks:
-					tasks[tsk_hash] = {
-						'enc': (batch_params.vtf_format, batch_params.vtf_format_w_alph),
-						'mips': (shared_params.vtf_mipmap_filter, shared_params.vtf_mipmap_sharpen_filter) if batch_params.vtf_mipmaps_enable else False,
-						'srgb': False,
-						'comp_refl': batch_params.vtf_compute_refl,
-						'src': tsk_file,
-						'dest': output_folder / tsk_file.relative_to(input_folder).with_suffix('.vtf'),
-						'emb_alpha': False,
-						'resize': (batch_params.vtf_resize_method, shared_params.vtf_resize_filter, shared_params.vtf_resize_sharpen_filter) if batch_params.vtf_enable_resize else False,
-						'clamp_dims': (batch_params.vtf_resize_clamp_maxwidth, batch_params.vtf_resize_clamp_maxheight) if batch_params.vtf_resize_clamp else False,
-						# todo: oh fuck
-						'flags': tuple(batch_vtf_flags),
-					}
 
+		# Shared params which affect the resulting VTFs.
+		# Snapshotted here, because the manifest has to compare them against the last run
+		manifest_shared = None
+		if batch_params.batch_skip_unchanged:
+			manifest_shared = blvtf_manifest_shared_params(shared_params)
 
 		# Process all tasks
 		threading.Thread(
 			target=self.thread_tgt,
-			args=(context, output_folder, tasks,),
+			args=(context, task_iter, output_folder, blvtf_export_shared_params(shared_params), batch_params.batch_worker_count, batch_params.batch_vtfcmd_group_size, manifest_shared, blvtf_export_tracer(shared_params), BLVTF_ExecutionProgress(context, None),),
 			daemon=True,
 		).start()
 
@@ -1258,6 +1066,49 @@ class blvtf_individual_image_props_declaration(PropertyGroup):
 		name='Image to Embed',
 		type=bpy.types.Image
 	)
+	embed_channel: EnumProperty(
+		items=blvtf_pack_source_channels,
+		name='Channel',
+		description='Which channel of the selected image goes into the alpha channel',
+		default='L'
+	)
+
+	# Pack other images into the colour channels of the resulting VTF
+	channel_pack_enable: BoolProperty(
+		name='Pack channels',
+		description='Replace the RGB channels of the resulting VTF with channels of other images, such as AO/Roughness/Metal (Selected images are rescaled to the dimensions of the target image if needed)',
+		default=False
+	)
+	channel_pack_img_r : PointerProperty(
+		name='R',
+		type=bpy.types.Image
+	)
+	channel_pack_src_r: EnumProperty(
+		items=blvtf_pack_source_channels,
+		name='Channel',
+		description='Which channel of the selected image goes into the red channel',
+		default='L'
+	)
+	channel_pack_img_g : PointerProperty(
+		name='G',
+		type=bpy.types.Image
+	)
+	channel_pack_src_g: EnumProperty(
+		items=blvtf_pack_source_channels,
+		name='Channel',
+		description='Which channel of the selected image goes into the green channel',
+		default='L'
+	)
+	channel_pack_img_b : PointerProperty(
+		name='B',
+		type=bpy.types.Image
+	)
+	channel_pack_src_b: EnumProperty(
+		items=blvtf_pack_source_channels,
+		name='Channel',
+		description='Which channel of the selected image goes into the blue channel',
+		default='L'
+	)
 
 
 
@@ -1451,8 +1302,10 @@ class blvtf_shared_image_props_declaration(PropertyGroup):
 
 	vtfcmd_ver : EnumProperty(
 		items=(
-			('new', 'Reloaded', 'Modern converter'),
+			('new', 'Reloaded', 'Modern converter. It has no sharpen filters, images with one go through the built-in encoder'),
 			('old', 'OG (shit)', 'Original converter'),
+			('native', 'Native', 'Built-in encoder, no VTFCmd involved. Whatever it cannot handle falls back to Reloaded'),
+			('auto', 'Fastest', 'Whichever encoder is the fastest one to handle the image. VTFCmd only where the built-in encoder cannot'),
 		),
 		name='Encoder Version',
 		description='Which VTF encoder version to use. Reloaded (new) is supposedly better in everything',
@@ -1460,6 +1313,17 @@ class blvtf_shared_image_props_declaration(PropertyGroup):
 	)
 
 
+	vtf_dxt_quality : EnumProperty(
+		items=(
+			('FAST', 'Fast', 'Range fit. Quick and decent'),
+			('QUALITY', 'Quality', 'Cluster fit. Noticeably better gradients, several times slower'),
+		),
+		name='DXT Quality',
+		description='How hard the Native encoder tries when compressing DXT formats',
+		default='FAST'
+	)
+
+
 	vtf_version : EnumProperty(
 		items=blvtf_vtf_versions,
 		name='VTF Version',
@@ -1511,6 +1375,22 @@ class blvtf_shared_image_props_declaration(PropertyGroup):
 	# Other
 	#
 
+	# Where intermediate files go
+	vtf_scratch_folder : StringProperty(
+		name='Scratch Folder',
+		description='Where to put intermediate files while converting. Point this to a RAM drive to keep them off the disk. Empty = /dev/shm if available, else the addon\'s tmps folder',
+		default='',
+		subtype='DIR_PATH'
+	)
+
+	# Where the timing trace goes
+	vtf_trace_path : StringProperty(
+		name='Timing Trace',
+		description='Append how long every stage of every conversion took to this file (.jsonl). Summarize with python -m blvtf_core.trace. Empty = no trace',
+		default='',
+		subtype='FILE_PATH'
+	)
+
 	# Generate thumbnails
 	vtf_generate_thumb : BoolProperty(
 		name='Generate Thumbnail',
@@ -1518,6 +1398,21 @@ class blvtf_shared_image_props_declaration(PropertyGroup):
 		default=True
 	)
 
+	# Read marked images from Blender's memory
+	vtf_export_from_pixels : BoolProperty(
+		name='Use Loaded Pixels',
+		description='Export Active Image takes the pixels Blender has loaded already, instead of decoding the file again. Marked images are read from disk. Packed, generated and edited images are always exported from Blender\'s memory',
+		default=True
+	)
+
+	# Where Save Export Job puts the job
+	vtf_job_path : StringProperty(
+		name='Job File',
+		description='Where to save the export job of the marked images (.json, pixels taken from Blender go next to it)',
+		default='',
+		subtype='FILE_PATH'
+	)
+
 
 
 
@@ -1529,6 +1424,12 @@ class blvtf_execution_progress_data(PropertyGroup):
 		default=False
 	)
 
+	exec_scanning : BoolProperty(
+		name='Still looking for more tasks',
+		description='The total is not final yet',
+		default=False
+	)
+
 	exec_prog : IntProperty(
 		name='Execution Progress',
 		default=0,
@@ -1544,6 +1445,33 @@ class blvtf_execution_progress_data(PropertyGroup):
 		default=0.0
 	)
 
+	exec_skipped : IntProperty(
+		name='Skipped, because unchanged',
+		default=0,
+	)
+
+	exec_cached : IntProperty(
+		name='Probe cache hits',
+		default=0,
+	)
+
+	exec_failed : IntProperty(
+		name='Failed',
+		default=0,
+	)
+
+	# tasks/s, MB/s and ETA, formatted
+	exec_rate : StringProperty(
+		name='Rate',
+		default=''
+	)
+
+	# In-flight file which has been converting the longest
+	exec_slowest : StringProperty(
+		name='Slowest',
+		default=''
+	)
+
 	post_exec_msg : StringProperty(
 		name='Message',
 		default=''
@@ -1579,6 +1507,31 @@ class blvtf_batch_convert_property_declaration(PropertyGroup):
 		default=False
 	)
 
+	# Concurrency
+	batch_worker_count : IntProperty(
+		name='Workers',
+		description='How many images to convert at the same time. Each worker runs its own magick/VTFCmd processes',
+		default=max(1, (os.cpu_count() or 2) // 2),
+		min=1,
+		soft_max=64,
+	)
+
+	# VTFCmd startup is expensive, especially under Wine
+	batch_vtfcmd_group_size : IntProperty(
+		name='Images per VTFCmd',
+		description='How many images with the same settings to convert with a single VTFCmd run. VTFCmd startup is then paid once per group rather than once per image. 1 = one VTFCmd run per image',
+		default=16,
+		min=1,
+		soft_max=256,
+	)
+
+	# Incremental
+	batch_skip_unchanged : BoolProperty(
+		name='Skip Unchanged',
+		description='Keep a manifest in the destination folder and skip images whose source, settings and resulting VTF did not change since the last batch. This also lets an interrupted batch continue where it stopped',
+		default=True
+	)
+
 
 	# -------
 	# Format
@@ -1902,8 +1855,18 @@ class IMAGE_EDITOR_PT_blvtf_individual_img_params_panel(bpy.types.Panel):
 		col.prop(img_vtf_prms, 'embed_to_alpha')
 		emb_to_alpha = col.row()
 		emb_to_alpha.prop_search(img_vtf_prms, 'image_to_embed', bpy.data, 'images')
+		emb_to_alpha.prop(img_vtf_prms, 'embed_channel', text='')
 		emb_to_alpha.enabled = img_vtf_prms.embed_to_alpha
 
+		# Channel packing
+		col = layout.column(align=True)
+		col.prop(img_vtf_prms, 'channel_pack_enable')
+		for target in ('r', 'g', 'b'):
+			pack_row = col.row()
+			pack_row.prop_search(img_vtf_prms, f'channel_pack_img_{target}', bpy.data, 'images')
+			pack_row.prop(img_vtf_prms, f'channel_pack_src_{target}', text='')
+			pack_row.enabled = img_vtf_prms.channel_pack_enable
+
 
 
 		#
@@ -1985,20 +1948,23 @@ class IMAGE_EDITOR_PT_blvtf_shared_img_params_panel(bpy.types.Panel):
 
 		convertor_ver = layout.row()
 		convertor_ver.prop(shared_vtf_prms, 'vtfcmd_ver', expand=True)
+		if shared_vtf_prms.vtfcmd_ver in ('native', 'auto'):
+			layout.prop(shared_vtf_prms, 'vtf_dxt_quality')
 
 		layout.prop(shared_vtf_prms, 'vtf_version')
 
 		col = layout.column(align=True)
 		col.prop(shared_vtf_prms, 'vtf_resize_filter')
-		if shared_vtf_prms.vtfcmd_ver == 'old':
-			col.prop(shared_vtf_prms, 'vtf_resize_sharpen_filter')
+		col.prop(shared_vtf_prms, 'vtf_resize_sharpen_filter')
 
 		col = layout.column(align=True)
 		col.prop(shared_vtf_prms, 'vtf_mipmap_filter')
-		if shared_vtf_prms.vtfcmd_ver == 'old':
-			col.prop(shared_vtf_prms, 'vtf_mipmap_sharpen_filter')
+		col.prop(shared_vtf_prms, 'vtf_mipmap_sharpen_filter')
 
 		layout.prop(shared_vtf_prms, 'vtf_generate_thumb')
+		layout.prop(shared_vtf_prms, 'vtf_export_from_pixels')
+		layout.prop(shared_vtf_prms, 'vtf_scratch_folder')
+		layout.prop(shared_vtf_prms, 'vtf_trace_path')
 
 #
 # Batch Export
@@ -2021,7 +1987,12 @@ class IMAGE_EDITOR_PT_blvtf_batch_export_prms_panel(bpy.types.Panel):
 		# Shared Scene params
 		batch_vtf_prms = context.scene.blvtf_batch_params
 
-		layout.row().prop(batch_vtf_prms, 'batch_recursive')
+		row = layout.row()
+		row.prop(batch_vtf_prms, 'batch_recursive')
+		row.prop(batch_vtf_prms, 'batch_skip_unchanged')
+		row = layout.row()
+		row.prop(batch_vtf_prms, 'batch_worker_count')
+		row.prop(batch_vtf_prms, 'batch_vtfcmd_group_size')
 
 		# Input / Output
 		col = layout.column(align=True)
@@ -2126,14 +2097,24 @@ class IMAGE_EDITOR_PT_blvtf_execute_actions(bpy.types.Panel):
 		)
 		layout.operator('mesh.blvtf_folder_export')
 
+		shared_vtf_prms = context.scene.blvtf_exp_params
+		row = layout.row(align=True)
+		row.prop(shared_vtf_prms, 'vtf_job_path', text='')
+		row.operator('mesh.blvtf_save_marked_job')
+
 		exec_data = context.scene.blvtf_execution_prog_data
 
 		if exec_data.exec_active:
 			layout.progress(
-				text=f'{exec_data.exec_prog} / {exec_data.exec_total}',
+				text=f'{exec_data.exec_prog} done / {exec_data.exec_total} found' + (' (scanning...)' if exec_data.exec_scanning else ''),
 				factor=float(exec_data.exec_prog / (exec_data.exec_total or 1)),
 				type='BAR'
 			)
+			col = layout.column(align=True)
+			col.label(text=exec_data.exec_rate)
+			col.label(text=f'{exec_data.exec_skipped} unchanged, {exec_data.exec_cached} cached probes, {exec_data.exec_failed} failed')
+			if exec_data.exec_slowest:
+				col.label(text=f'Slowest: {exec_data.exec_slowest}')
 
 		# layout.label(text=exec_data.post_exec_msg)
 
@@ -2158,6 +2139,7 @@ rclasses = (
 	IMAGE_EDITOR_PT_blvtf_execute_actions,
 	OBJECT_OT_blvtf_export_active_img,
 	OBJECT_OT_blvtf_export_marked_imgs,
+	OBJECT_OT_blvtf_save_marked_job,
 	OBJECT_OT_blvtf_folder_convert,
 	OBJECT_OT_blvtf_append_flags_to_txtmax_definition,
 	OBJECT_OT_blvtf_full_skybox_compile,
@@ -2171,6 +2153,11 @@ register_, unregister_ = bpy.utils.register_classes_factory(rclasses)
 def register():
 	register_()
 
+	# Get the bundled binaries ready in the background, so that the first conversion doesn't wait.
+	# Headless instances (render farms) extract them only if they ever convert anything
+	if not bpy.app.background:
+		blvtf_addon_bins.prefetch()
+
 	bpy.types.Image.blvtf_img_params = PointerProperty(type=blvtf_individual_image_props_declaration)
 	bpy.types.Scene.blvtf_exp_params = PointerProperty(type=blvtf_shared_image_props_declaration)
 	bpy.types.Scene.blvtf_batch_params = PointerProperty(type=blvtf_batch_convert_property_declaration)
@@ -2182,6 +2169,7 @@ def register():
 
 def unregister():
 	unregister_()
+	blvtf_img_probe_cache.close()
 	# del bpy.types.Image.hobo_image_params
 
 
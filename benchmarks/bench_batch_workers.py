@@ -0,0 +1,76 @@
+# Batch throughput scaling: 1 -> N workers.
+#
+# Every task is a stand-in for a single blvtf_export_img_to_vtf pipeline:
+# it spawns --procs external processes per image (probe/magick/VTFCmd), each of which
+# burns --proc-ms milliseconds. This keeps the benchmark runnable without Blender,
+# Wine or the actual binaries, while still measuring exactly what the executor does:
+# keeping N process chains in flight at once.
+#
+# Usage:
+#   python benchmarks/bench_batch_workers.py --tasks 64 --max-workers 32
+
+import argparse, os, subprocess, sys, time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from blvtf_core.executor import blvtf_run_tasks
+
+
+def stand_in_pipeline(task):
+	for proc_idx in range(task['procs']):
+		subprocess.run(
+			[
+				sys.executable, '-c',
+				f'import time; t = time.perf_counter() + {task["proc_ms"] / 1000}\nwhile time.perf_counter() < t: pass',
+			],
+			check=True,
+		)
+	return True
+
+
+def main():
+	parser = argparse.ArgumentParser(description='blvtf batch worker scaling benchmark')
+	parser.add_argument('--tasks', type=int, default=64, help='Images in the batch')
+	parser.add_argument('--procs', type=int, default=2, help='External processes per image')
+	parser.add_argument('--proc-ms', type=float, default=50.0, help='CPU time burnt by every process')
+	parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 4)
+	args = parser.parse_args()
+
+	tasks = [
+		{
+			'src': f'stand_in_{task_idx}.png',
+			'procs': args.procs,
+			'proc_ms': args.proc_ms,
+		}
+		for task_idx in range(args.tasks)
+	]
+
+	worker_counts = []
+	worker_count = 1
+	while worker_count < args.max_workers:
+		worker_counts.append(worker_count)
+		worker_count *= 2
+	worker_counts.append(args.max_workers)
+
+	print(f'{args.tasks} tasks, {args.procs} procs x {args.proc_ms}ms per task, {os.cpu_count()} CPUs')
+	print(f'{"workers":>8} {"seconds":>9} {"tasks/s":>9} {"speedup":>8} {"efficiency":>11}')
+
+	baseline = None
+	for worker_count in worker_counts:
+		done = []
+		started = time.perf_counter()
+		blvtf_run_tasks(tasks, stand_in_pipeline, worker_count, lambda task, result, error: done.append(result))
+		elapsed = time.perf_counter() - started
+
+		assert len(done) == len(tasks)
+
+		throughput = len(tasks) / elapsed
+		baseline = baseline or throughput
+		speedup = throughput / baseline
+		print(f'{worker_count:>8} {elapsed:>9.2f} {throughput:>9.2f} {speedup:>7.2f}x {speedup / worker_count:>10.0%}')
+
+
+if __name__ == '__main__':
+	main()
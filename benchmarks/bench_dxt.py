@@ -0,0 +1,171 @@
+# DXT encoder throughput and quality: native (FAST / QUALITY) vs VTFCmd.
+#
+# Every image of the corpus is encoded with every requested format and tier,
+# then decoded back with blvtf_dxt_decode to measure the error against the source.
+#
+# The corpus is either synthetic (default: smooth noise, gradients, a fake normal map)
+# or a folder of images, decoded with ImageMagick (--corpus + --magick).
+#
+# With --vtfcmd the same images are also written as TGA and converted by VTFCmd.
+# VTFCmd timings include its process startup, which is exactly what a batch pays per image.
+#
+# Usage:
+#   python benchmarks/bench_dxt.py --size 1024
+#   python benchmarks/bench_dxt.py --corpus W:/textures --magick magick --vtfcmd bins/vtfcmd/VTFCmd.exe --vtfcmd-prefix wine
+
+import argparse, shlex, struct, subprocess, sys, tempfile, time
+
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from blvtf_core.dxt import blvtf_dxt_compress, blvtf_dxt_decode, blvtf_dxt_error, blvtf_dxt_formats, blvtf_dxt_qualities
+from blvtf_core.magick import blvtf_magick_decode, blvtf_magick_identify, blvtf_magick_error
+
+
+# Smooth value noise: random grid upscaled with bilinear interpolation
+def smooth_noise(rng, size, cells):
+	grid = rng.random((cells + 1, cells + 1))
+	coords = np.linspace(0, cells, size, endpoint=False)
+	base = coords.astype(int)
+	frac = coords - base
+	rows = grid[base] * (1 - frac)[:, None] + grid[base + 1] * frac[:, None]
+	return rows[:, base] * (1 - frac)[None, :] + rows[:, base + 1] * frac[None, :]
+
+
+def synthetic_corpus(size):
+	rng = np.random.default_rng(1337)
+	corpus = {}
+
+	# "photo": a few octaves of noise per channel
+	photo = np.stack([
+		sum(smooth_noise(rng, size, cells) / octave for octave, cells in enumerate((4, 16, 64, 256), start=1))
+		for channel in range(4)
+	], axis=2)
+	photo -= photo.min(axis=(0, 1))
+	photo /= photo.max(axis=(0, 1))
+	corpus['photo'] = (photo * 255).astype(np.uint8)
+
+	# smooth gradients with a hard alpha cutout
+	yy, xx = np.mgrid[0:size, 0:size] / size
+	gradient = np.stack((xx, yy, 1 - xx * yy, (np.hypot(xx - 0.5, yy - 0.5) < 0.4).astype(float)), axis=2)
+	corpus['gradient'] = (gradient * 255).astype(np.uint8)
+
+	# normal map from a height field
+	height = smooth_noise(rng, size, 32) * 8
+	dy, dx = np.gradient(height)
+	normal = np.stack((-dx, -dy, np.ones_like(dx)), axis=2)
+	normal /= np.linalg.norm(normal, axis=2, keepdims=True)
+	corpus['normal'] = np.concatenate(((normal * 0.5 + 0.5) * 255, np.full((size, size, 1), 255)), axis=2).astype(np.uint8)
+
+	return corpus
+
+
+def folder_corpus(folder, magick):
+	corpus = {}
+	for imgpath in sorted(Path(folder).iterdir()):
+		if not imgpath.is_file():
+			continue
+		try:
+			width, height = map(int, blvtf_magick_identify(magick, imgpath, '%w %h')[:2])
+		except blvtf_magick_error:
+			continue
+		corpus[imgpath.name] = blvtf_magick_decode(magick, imgpath, (width, height))
+
+	return corpus
+
+
+def write_tga(path, rgba):
+	height, width = rgba.shape[:2]
+	header = struct.pack('<BBBHHBHHHHBB', 0, 0, 2, 0, 0, 0, 0, 0, width, height, 32, 0x28)
+	with open(path, 'wb') as f:
+		f.write(header)
+		f.write(np.ascontiguousarray(rgba[:, :, (2, 1, 0, 3)]).tobytes())
+
+
+# Convert with VTFCmd into a bare 7.2 VTF (no thumbnail, no mips),
+# so that the DXT data starts right after the header
+def vtfcmd_encode(vtfcmd, tmp_dir, name, rgba, dxt_format):
+	tga_path = Path(tmp_dir) / f'{name}.tga'
+	write_tga(tga_path, rgba)
+
+	started = time.perf_counter()
+	subprocess.run(
+		vtfcmd + [
+			'-file', str(tga_path),
+			'-output', str(tmp_dir),
+			'-format', dxt_format,
+			'-alphaformat', dxt_format,
+			'-nomipmaps', '-nothumbnail', '-noreflectivity',
+			'-version', '7.2',
+		],
+		capture_output=True,
+	)
+	elapsed = time.perf_counter() - started
+
+	vtf_data = tga_path.with_suffix('.vtf').read_bytes()
+	header_size = struct.unpack_from('<I', vtf_data, 12)[0]
+
+	return vtf_data[header_size:], elapsed
+
+
+def main():
+	parser = argparse.ArgumentParser(description='blvtf DXT encoder benchmark')
+	parser.add_argument('--size', type=int, default=512, help='Size of the synthetic images')
+	parser.add_argument('--corpus', help='Folder of images to use instead of the synthetic ones (needs --magick)')
+	parser.add_argument('--magick', default='magick', help='ImageMagick executable')
+	parser.add_argument('--formats', default='DXT1,DXT5', help=f'Comma separated, any of {",".join(blvtf_dxt_formats)}')
+	parser.add_argument('--qualities', default=','.join(blvtf_dxt_qualities))
+	parser.add_argument('--vtfcmd', help='VTFCmd executable to compare against')
+	parser.add_argument('--vtfcmd-prefix', default='', help='Command to run VTFCmd with, such as wine')
+	args = parser.parse_args()
+
+	corpus = folder_corpus(args.corpus, args.magick) if args.corpus else synthetic_corpus(args.size)
+	formats = args.formats.split(',')
+	qualities = args.qualities.split(',')
+	vtfcmd = shlex.split(args.vtfcmd_prefix) + [args.vtfcmd] if args.vtfcmd else None
+
+	print(f'{"image":<20} {"format":<17} {"encoder":<8} {"MP/s":>8} {"RMSE":>7} {"PSNR":>7} {"A PSNR":>7}')
+
+	# (format, encoder) -> [megapixels, seconds, squared error sum, pixels]
+	totals = {}
+
+	def report(name, dxt_format, encoder, rgba, blocks, elapsed):
+		height, width = rgba.shape[:2]
+		metrics = blvtf_dxt_error(rgba, blvtf_dxt_decode(blocks, width, height, dxt_format), dxt_format)
+		megapixels = width * height / 1e6
+		alpha_psnr = metrics.get('alpha_psnr')
+
+		print(
+			f'{name[:20]:<20} {dxt_format:<17} {encoder:<8} {megapixels / elapsed:>8.2f} '
+			f'{metrics["rmse"]:>7.2f} {metrics["psnr"]:>7.2f} {"" if alpha_psnr == None else f"{alpha_psnr:.2f}":>7}'
+		)
+
+		total = totals.setdefault((dxt_format, encoder), [0.0, 0.0, 0.0, 0])
+		total[0] += megapixels
+		total[1] += elapsed
+		total[2] += metrics['rmse'] ** 2 * width * height
+		total[3] += width * height
+
+	with tempfile.TemporaryDirectory(prefix='blvtf_bench_dxt_') as tmp_dir:
+		for name, rgba in corpus.items():
+			for dxt_format in formats:
+				for quality in qualities:
+					started = time.perf_counter()
+					blocks = blvtf_dxt_compress(rgba, dxt_format, quality)
+					report(name, dxt_format, quality, rgba, blocks, time.perf_counter() - started)
+
+				if vtfcmd:
+					blocks, elapsed = vtfcmd_encode(vtfcmd, tmp_dir, name.replace('.', '_'), rgba, dxt_format)
+					report(name, dxt_format, 'VTFCmd', rgba, blocks, elapsed)
+
+	print()
+	print(f'{"format":<17} {"encoder":<8} {"MP/s":>8} {"RMSE":>7}')
+	for (dxt_format, encoder), (megapixels, elapsed, sq_err, pixels) in totals.items():
+		print(f'{dxt_format:<17} {encoder:<8} {megapixels / elapsed:>8.2f} {(sq_err / pixels) ** 0.5:>7.2f}')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,558 @@
+# The whole batch pipeline on a synthetic corpus: task collection, TxtMax matching,
+# probes and the conversion itself, with VTFCmd and with the built-in encoder.
+#
+# The corpus is generated from a seed, so every run (and every machine) gets the same files:
+# mixed sizes, odd dimensions, alpha and non-alpha, TGA, PNG, PSD and EXR, deep folders.
+# It's only generated once per set of params, in benchmarks/corpus/.
+#
+# VTFCmd and magick are stand-in scripts, which take exactly as long as they're told to
+# (--vtfcmd-ms, --magick-ms, ...) and write files of the right shape. This way the numbers
+# measure blvtf itself (process management, grouping, probing, the built-in encoder)
+# and not the tools, and the benchmark runs without Wine or the actual binaries.
+#
+# Every run is appended to benchmarks/results/bench_pipeline.jsonl and compared against
+# the last run with the same corpus, stand-in timings and machine.
+# Metrics which got slower by more than --threshold are flagged.
+#
+# Usage:
+#   python benchmarks/bench_pipeline.py --label before
+#   python benchmarks/bench_pipeline.py --label after --baseline before --strict
+
+import argparse, contextlib, datetime, hashlib, io, json, os, platform, shutil, statistics, struct, subprocess, sys, tempfile, time, zlib
+
+from pathlib import Path
+
+import numpy as np
+
+addon_dir = Path(__file__).parent.parent
+
+sys.path.insert(0, str(addon_dir))
+
+from blvtf_core.bins import blvtf_addon_bins
+from blvtf_core.batch import blvtf_batch_tasks, blvtf_run_batch
+from blvtf_core.convert import blvtf_get_img_info
+from blvtf_core.pack import blvtf_write_tga
+from blvtf_core.probe_cache import blvtf_probe_cache
+from blvtf_core.scan import blvtf_walk_files
+
+
+bench_corpus_dir = Path(__file__).parent / 'corpus'
+bench_results_path = Path(__file__).parent / 'results' / 'bench_pipeline.jsonl'
+
+bench_kinds = ('diffuse', 'normal', 'mask', 'rough')
+bench_pow2_sizes = (64, 128, 256, 512, 1024)
+
+bench_txtmax = """
+# Same kind of rules a real project would have
+**/*_normal.* BGR888 -NORMAL
+**/*_mask.* DXT5
+*_rough.tga I8 -NOMIP
+"""
+
+
+
+
+# =========================================================
+#                    Synthetic corpus
+# =========================================================
+
+def write_png(path, rgba):
+	height, width, channels = rgba.shape
+	def chunk(tag, data):
+		return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+	rows = np.concatenate([np.zeros((height, 1), np.uint8), rgba.reshape(height, -1)], axis=1)
+	path.write_bytes(
+		b'\x89PNG\r\n\x1a\n'
+		+ chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6 if channels == 4 else 2, 0, 0, 0))
+		+ chunk(b'IDAT', zlib.compress(rows.tobytes(), 1))
+		+ chunk(b'IEND', b'')
+	)
+
+
+# Flat, uncompressed RGB(A) PSD
+def write_psd(path, rgba):
+	height, width, channels = rgba.shape
+	with open(path, 'wb') as psd_file:
+		psd_file.write(b'8BPS' + struct.pack('>H6xHIIHH', 1, channels, height, width, 8, 3))
+		# colour mode data, image resources, layers
+		psd_file.write(struct.pack('>III', 0, 0, 0))
+		# raw, planar
+		psd_file.write(struct.pack('>H', 0))
+		psd_file.write(np.ascontiguousarray(rgba.transpose(2, 0, 1)).tobytes())
+
+
+# Uncompressed scanline EXR, half floats
+def write_exr(path, rgba):
+	height, width, channels = rgba.shape
+	# Channels are stored in alphabetical order
+	channel_names = 'ABGR' if channels == 4 else 'BGR'
+	planes = {name: (rgba[:, :, 'RGBA'.index(name)].astype(np.float32) / 255.0) ** 2.2 for name in channel_names}
+
+	def attr(name, attr_type, data):
+		return name + b'\x00' + attr_type + b'\x00' + struct.pack('<i', len(data)) + data
+
+	chlist = b''.join(name.encode() + b'\x00' + struct.pack('<iB3xii', 1, 0, 1, 1) for name in channel_names) + b'\x00'
+	header = (
+		b'\x76\x2f\x31\x01' + struct.pack('<I', 2)
+		+ attr(b'channels', b'chlist', chlist)
+		+ attr(b'compression', b'compression', b'\x00')
+		+ attr(b'dataWindow', b'box2i', struct.pack('<iiii', 0, 0, width - 1, height - 1))
+		+ attr(b'displayWindow', b'box2i', struct.pack('<iiii', 0, 0, width - 1, height - 1))
+		+ attr(b'lineOrder', b'lineOrder', b'\x00')
+		+ attr(b'pixelAspectRatio', b'float', struct.pack('<f', 1.0))
+		+ attr(b'screenWindowCenter', b'v2f', struct.pack('<ff', 0.0, 0.0))
+		+ attr(b'screenWindowWidth', b'float', struct.pack('<f', 1.0))
+		+ b'\x00'
+	)
+
+	line_size = width * 2 * len(channel_names)
+	first_line = len(header) + height * 8
+	offsets = struct.pack(f'<{height}Q', *[first_line + y * (8 + line_size) for y in range(height)])
+
+	with open(path, 'wb') as exr_file:
+		exr_file.write(header + offsets)
+		for y in range(height):
+			exr_file.write(struct.pack('<ii', y, line_size))
+			for name in channel_names:
+				exr_file.write(planes[name][y].astype('<f2').tobytes())
+
+
+# 32 bit through blvtf_write_tga, 24 bit without alpha
+def write_tga(path, rgba):
+	height, width, channels = rgba.shape
+	if channels == 4:
+		return blvtf_write_tga(path, rgba)
+
+	with open(path, 'wb') as tga_file:
+		tga_file.write(struct.pack('<BBBHHBHHHHBB', 0, 0, 2, 0, 0, 0, 0, 0, width, height, 24, 0x20))
+		tga_file.write(np.ascontiguousarray(rgba[:, :, (2, 1, 0)]).tobytes())
+
+
+bench_writers = {
+	'tga': write_tga,
+	'png': write_png,
+	'psd': write_psd,
+	'exr': write_exr,
+}
+
+
+def corpus_params(args):
+	return {
+		'seed': args.seed,
+		'images': args.images,
+		'depth': args.depth,
+		'odd_share': args.odd_share,
+		'alpha_share': args.alpha_share,
+		'max_size': args.max_size,
+		# bumped whenever the generator changes
+		'generator': 2,
+	}
+
+
+def corpus_key(params):
+	return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+
+# Generate the corpus, unless it's already there
+def make_corpus(params, corpus_root):
+	stamp_path = corpus_root / 'corpus.json'
+	if stamp_path.is_file():
+		return json.loads(stamp_path.read_text())
+
+	shutil.rmtree(corpus_root, ignore_errors=True)
+	src_root = corpus_root / 'src'
+	src_root.mkdir(parents=True)
+
+	rng = np.random.default_rng(params['seed'])
+	pow2_sizes = [size for size in bench_pow2_sizes if size <= params['max_size']]
+	# Most of the textures are small, like in an actual project
+	size_weights = np.array([1 / (idx + 1) for idx in range(len(pow2_sizes))])
+	size_weights /= size_weights.sum()
+
+	files = []
+	for img_idx in range(params['images']):
+		depth = int(rng.integers(0, params['depth'] + 1))
+		folder = src_root.joinpath(*[f'd{depth_idx}_{int(rng.integers(0, 3))}' for depth_idx in range(depth)])
+		folder.mkdir(parents=True, exist_ok=True)
+
+		if rng.random() < params['odd_share']:
+			width, height = (int(dim) for dim in rng.integers(33, params['max_size'], 2))
+		else:
+			width = int(rng.choice(pow2_sizes, p=size_weights))
+			height = int(rng.choice((width, width // 2 or width, width * 2 if width < params['max_size'] else width)))
+
+		channels = 4 if rng.random() < params['alpha_share'] else 3
+		suffix = str(rng.choice(tuple(bench_writers), p=(0.4, 0.25, 0.2, 0.15)))
+		kind = str(rng.choice(bench_kinds))
+
+		# Gradient + noise: not flat (DXT would have nothing to do), not pure noise either
+		gradient = np.add.outer(np.arange(height), np.arange(width)) * (255 / max(1, width + height))
+		rgba = (gradient[:, :, None] + rng.integers(0, 48, (height, width, channels))).clip(0, 255).astype(np.uint8)
+
+		img_path = folder / f'tex{img_idx:04d}_{kind}.{suffix}'
+		bench_writers[suffix](img_path, rgba)
+		files.append(str(img_path.relative_to(src_root)))
+
+	corpus = {
+		'params': params,
+		'files': len(files),
+		'bytes': sum(os.path.getsize(src_root / rel_path) for rel_path in files),
+	}
+	stamp_path.write_text(json.dumps(corpus, indent='\t'))
+	return corpus
+
+
+
+
+# =========================================================
+#                      Stand-in tools
+# =========================================================
+
+# VTFCmd: -file ... -output folder. Takes startup + per file time, writes a tiny VTF per input
+fake_vtfcmd = """
+import sys, time
+from pathlib import Path
+args = sys.argv[1:]
+inputs = [args[idx + 1] for idx, arg in enumerate(args) if arg == '-file']
+output = Path(args[args.index('-output') + 1])
+time.sleep(({startup_ms} + {file_ms} * len(inputs)) / 1000)
+for input_path in inputs:
+	(output / (Path(input_path).stem + '.vtf')).write_bytes(b'VTF\\x00' + bytes(60))
+print('Converted', len(inputs), 'files')
+"""
+
+# magick: identify, decode to raw RGBA and convert to TGA, the way blvtf_core/magick.py calls it.
+# Takes startup + per megapixel time
+fake_magick = """
+import sys, time, struct
+sys.path.insert(0, {addon_dir!r})
+from blvtf_core.probe import blvtf_probe_img
+args = sys.argv[1:]
+
+def src_info():
+	src = next(arg for arg in args if arg.endswith('[0]'))[:-3]
+	return blvtf_probe_img(src) or {{'width': 64, 'height': 64, 'alpha': False}}
+
+def spend(info):
+	time.sleep(({startup_ms} + {mpx_ms} * info['width'] * info['height'] / 1e6) / 1000)
+
+info = src_info()
+spend(info)
+out = sys.stdout.buffer
+if args[0] == 'identify':
+	out.write(f"{{info['width']}} {{info['height']}} {{info['alpha']}} sRGB".encode())
+elif args[-1] == 'RGBA:-':
+	pixel_size = 16 if '32' in args else 4
+	out.write(bytes(info['width'] * info['height'] * pixel_size))
+else:
+	out.write(struct.pack('<BBBHHBHHHHBB', 0, 0, 2, 0, 0, 0, 0, 0, info['width'], info['height'], 32, 0x28))
+	out.write(bytes(info['width'] * info['height'] * 4))
+"""
+
+
+# Executable stand-in script.
+# Windows can't run a .py directly, a .cmd wrapper can be
+def write_stand_in(tools_dir, name, source):
+	script_path = tools_dir / f'{name}.py'
+	script_path.write_text(source)
+
+	if sys.platform == 'win32':
+		wrapper_path = tools_dir / f'{name}.cmd'
+		wrapper_path.write_text(f'@"{sys.executable}" "{script_path}" %*\n')
+		return wrapper_path
+
+	script_path.write_text(f'#!{sys.executable}\n' + source)
+	script_path.chmod(0o755)
+	return script_path
+
+
+
+
+# =========================================================
+#                        Measuring
+# =========================================================
+
+def batch_settings(args):
+	return {
+		'vtf_format': 'DXT1',
+		'vtf_format_w_alph': 'DXT5',
+		'vtf_mipmaps_enable': True,
+		'vtf_mipmap_filter': 'BOX',
+		'vtf_mipmap_sharpen_filter': 'NONE',
+		'vtf_compute_refl': True,
+		# The odd sizes have to be resized
+		'vtf_enable_resize': True,
+		'vtf_resize_method': 'NEAREST',
+		'vtf_resize_filter': 'CUBIC',
+		'vtf_resize_sharpen_filter': 'NONE',
+		'vtf_resize_clamp': True,
+		'vtf_resize_clamp_maxwidth': args.max_size,
+		'vtf_resize_clamp_maxheight': args.max_size,
+		'flags': (),
+		'batch_recursive': True,
+		'txtmax_use_fallback': True,
+	}
+
+
+def shared_params(encoder, scratch_dir):
+	return {
+		'vtfcmd_ver': encoder,
+		'vtf_version': '7.4',
+		'vtf_dxt_quality': 'FAST',
+		'vtf_generate_thumb': True,
+		'vtf_scratch_folder': str(scratch_dir),
+		'tmp_folder': str(scratch_dir),
+	}
+
+
+# Median seconds of repeat runs. prepare() runs before every run, untimed
+def measure(fn, repeat, prepare=None):
+	timings = []
+	for run_idx in range(repeat):
+		if prepare:
+			prepare()
+		# The pipeline is chatty, the benchmark output shouldn't be
+		with contextlib.redirect_stdout(io.StringIO()):
+			started = time.perf_counter()
+			fn()
+			timings.append(time.perf_counter() - started)
+
+	return statistics.median(timings)
+
+
+def run_benchmarks(args, src_root, work_dir):
+	settings = batch_settings(args)
+	metrics = {}
+
+	def metric(name, seconds):
+		metrics[name] = round(seconds, 6)
+		print(f'{name:<28} {seconds:>9.3f}s', flush=True)
+
+	img_paths = [Path(img_path) for img_parts, img_path in blvtf_walk_files(src_root)]
+
+	# Task collection: the walk + the task dicts
+	out_root = work_dir / 'out'
+	out_root.mkdir()
+	metric('collect', measure(lambda: list(blvtf_batch_tasks(src_root, out_root, settings)), args.repeat))
+	metric('collect_txtmax', measure(lambda: list(blvtf_batch_tasks(src_root, out_root, settings, bench_txtmax)), args.repeat))
+
+	# Probes: header probes only (every corpus format has one), then the same through a warm probe cache
+	metric('probe_cold', measure(lambda: [blvtf_get_img_info(img_path) for img_path in img_paths], args.repeat))
+	probe_cache = blvtf_probe_cache(work_dir / 'probe_cache.sqlite')
+	[blvtf_get_img_info(img_path, probe_cache) for img_path in img_paths]
+	metric('probe_warm', measure(lambda: [blvtf_get_img_info(img_path, probe_cache) for img_path in img_paths], args.repeat))
+	probe_cache.close()
+
+	scratch_dir = work_dir / 'scratch'
+	scratch_dir.mkdir()
+
+	def fresh_output():
+		shutil.rmtree(out_root, ignore_errors=True)
+		out_root.mkdir()
+
+	# The conversion, with TxtMax, like a real project batch would be
+	scenarios = [
+		('vtfcmd_w1_g1', 'new', 1, 1),
+		(f'vtfcmd_w{args.workers}_g1', 'new', args.workers, 1),
+		(f'vtfcmd_w{args.workers}_g{args.group_size}', 'new', args.workers, args.group_size),
+		(f'native_w{args.workers}', 'native', args.workers, 1),
+	]
+	# --workers 1 or --group-size 1 make some of them the same scenario, measured once
+	measured = set()
+	for scenario_name, encoder, worker_count, group_size in scenarios:
+		if scenario_name in measured:
+			continue
+		measured.add(scenario_name)
+		if args.only and not any(only in scenario_name for only in args.only):
+			continue
+
+		stats = {}
+		def convert(manifest_shared=None):
+			stats.update(blvtf_run_batch(
+				blvtf_batch_tasks(src_root, out_root, settings, bench_txtmax),
+				out_root,
+				shared_params(encoder, scratch_dir),
+				worker_count,
+				group_size,
+				manifest_shared,
+			))
+
+		metric(f'convert_{scenario_name}', measure(convert, args.repeat, fresh_output))
+		if stats['failed']:
+			print(f'BLVTF: {stats["failed"]} images failed in {scenario_name}, the numbers are off', file=sys.stderr)
+
+	# Everything unchanged: the build manifest decides, nothing gets converted
+	manifest_shared = {'bench': True}
+	fresh_output()
+	with contextlib.redirect_stdout(io.StringIO()):
+		blvtf_run_batch(blvtf_batch_tasks(src_root, out_root, settings), out_root, shared_params('new', scratch_dir), args.workers, args.group_size, manifest_shared)
+	metric('rebuild_unchanged', measure(
+		lambda: blvtf_run_batch(blvtf_batch_tasks(src_root, out_root, settings), out_root, shared_params('new', scratch_dir), args.workers, args.group_size, manifest_shared),
+		args.repeat
+	))
+
+	return metrics
+
+
+
+
+# =========================================================
+#                   Results and comparing
+# =========================================================
+
+def git_commit():
+	try:
+		return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=addon_dir, capture_output=True, text=True, timeout=10).stdout.strip() or None
+	except (OSError, subprocess.SubprocessError):
+		return None
+
+
+def load_results(results_path):
+	if not results_path.is_file():
+		return []
+
+	results = []
+	for line in results_path.read_text(encoding='utf-8').splitlines():
+		try:
+			results.append(json.loads(line))
+		except ValueError:
+			continue
+
+	return results
+
+
+# Runs are only comparable with the same corpus, stand-ins and machine
+def comparable(result, run):
+	return all(result.get(key) == run[key] for key in ('corpus', 'stand_ins', 'machine', 'workers', 'group_size'))
+
+
+def pick_baseline(results, run, baseline_label=None):
+	for result in reversed(results):
+		if baseline_label and result.get('label') != baseline_label:
+			continue
+		if comparable(result, run):
+			return result
+
+	return None
+
+
+# Metrics which got slower by more than threshold (and more than min_delta seconds, to ignore noise)
+def compare(baseline, run, threshold, min_delta):
+	regressions = []
+	print()
+	print(f'Compared to {baseline.get("label") or baseline["time"]} ({baseline.get("git") or "?"})')
+	print(f'{"metric":<28} {"before":>9} {"after":>9} {"change":>8}')
+	for name, seconds in run['metrics'].items():
+		before = baseline['metrics'].get(name)
+		if before == None:
+			print(f'{name:<28} {"-":>9} {seconds:>9.3f} {"new":>8}')
+			continue
+
+		change = (seconds - before) / before if before else 0.0
+		regressed = change > threshold and seconds - before > min_delta
+		if regressed:
+			regressions.append(name)
+		print(f'{name:<28} {before:>9.3f} {seconds:>9.3f} {change:>+7.1%}' + ('  REGRESSION' if regressed else ''))
+
+	return regressions
+
+
+def main():
+	parser = argparse.ArgumentParser(description='blvtf batch pipeline benchmark')
+
+	corpus_group = parser.add_argument_group('Corpus')
+	corpus_group.add_argument('--seed', type=int, default=1337)
+	corpus_group.add_argument('--images', type=int, default=150)
+	corpus_group.add_argument('--depth', type=int, default=5, help='Deepest folder nesting')
+	corpus_group.add_argument('--odd-share', type=float, default=0.25, help='Share of non power of 2 images')
+	corpus_group.add_argument('--alpha-share', type=float, default=0.4, help='Share of images with alpha')
+	corpus_group.add_argument('--max-size', type=int, default=1024)
+
+	stand_in_group = parser.add_argument_group('Stand-in tools')
+	stand_in_group.add_argument('--vtfcmd-ms', type=float, default=40.0, help='VTFCmd startup')
+	stand_in_group.add_argument('--vtfcmd-file-ms', type=float, default=5.0, help='VTFCmd time per image')
+	stand_in_group.add_argument('--magick-ms', type=float, default=30.0, help='magick startup')
+	stand_in_group.add_argument('--magick-mpx-ms', type=float, default=20.0, help='magick time per megapixel')
+
+	run_group = parser.add_argument_group('Run')
+	run_group.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+	run_group.add_argument('--group-size', type=int, default=16)
+	run_group.add_argument('--repeat', type=int, default=3, help='Every metric is the median of this many runs')
+	run_group.add_argument('--only', action='append', default=[], help='Only run conversion scenarios containing this, such as native')
+
+	results_group = parser.add_argument_group('Results')
+	results_group.add_argument('--label', default=None, help='Name of this run, to compare against later')
+	results_group.add_argument('--results', default=str(bench_results_path), help='JSONL file the runs are stored in')
+	results_group.add_argument('--baseline', default=None, help='Label of the run to compare against. The last comparable run by default')
+	results_group.add_argument('--threshold', type=float, default=0.10, help='Slowdown flagged as a regression')
+	results_group.add_argument('--min-delta', type=float, default=0.02, help='Seconds a slowdown has to be over to count')
+	results_group.add_argument('--no-save', action='store_true', help="Don't store this run")
+	results_group.add_argument('--strict', action='store_true', help='Exit with 1 if anything regressed')
+	args = parser.parse_args()
+
+	params = corpus_params(args)
+	corpus_root = bench_corpus_dir / corpus_key(params)
+	started = time.perf_counter()
+	corpus = make_corpus(params, corpus_root)
+	print(f'Corpus {corpus_key(params)}: {corpus["files"]} images, {corpus["bytes"] / 1024 / 1024:.1f} MB ({time.perf_counter() - started:.1f}s)')
+
+	stand_ins = {
+		'vtfcmd_ms': args.vtfcmd_ms,
+		'vtfcmd_file_ms': args.vtfcmd_file_ms,
+		'magick_ms': args.magick_ms,
+		'magick_mpx_ms': args.magick_mpx_ms,
+	}
+
+	with tempfile.TemporaryDirectory(prefix='blvtf_bench_') as work_dir:
+		work_dir = Path(work_dir)
+		tools_dir = work_dir / 'tools'
+		tools_dir.mkdir()
+
+		blvtf_addon_bins.override('vtfcmd', write_stand_in(tools_dir, 'vtfcmd', fake_vtfcmd.format(startup_ms=args.vtfcmd_ms, file_ms=args.vtfcmd_file_ms)))
+		blvtf_addon_bins.override('magick', write_stand_in(tools_dir, 'magick', fake_magick.format(addon_dir=str(addon_dir), startup_ms=args.magick_ms, mpx_ms=args.magick_mpx_ms)))
+
+		print(f'{args.workers} workers, group size {args.group_size}, median of {args.repeat}')
+		metrics = run_benchmarks(args, corpus_root / 'src', work_dir)
+
+	run = {
+		'time': datetime.datetime.now().isoformat(timespec='seconds'),
+		'label': args.label,
+		'git': git_commit(),
+		'machine': {
+			'platform': platform.platform(),
+			'python': platform.python_version(),
+			'cpus': os.cpu_count(),
+		},
+		'corpus': corpus_key(params),
+		'stand_ins': stand_ins,
+		'workers': args.workers,
+		'group_size': args.group_size,
+		'repeat': args.repeat,
+		'metrics': metrics,
+	}
+
+	results_path = Path(args.results)
+	baseline = pick_baseline(load_results(results_path), run, args.baseline)
+
+	regressions = []
+	if baseline:
+		regressions = compare(baseline, run, args.threshold, args.min_delta)
+	elif args.baseline:
+		print(f'\nNo comparable run labeled {args.baseline} in {results_path}')
+
+	if not args.no_save:
+		results_path.parent.mkdir(parents=True, exist_ok=True)
+		with open(results_path, 'a', encoding='utf-8') as results_file:
+			results_file.write(json.dumps(run) + '\n')
+
+	if regressions:
+		print(f'\n{len(regressions)} regressions: {", ".join(regressions)}')
+		if args.strict:
+			return 1
+
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
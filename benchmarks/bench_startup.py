@@ -0,0 +1,110 @@
+# Addon startup cost: import, register and the bundled binaries check.
+#
+# Inside Blender the whole addon is imported and registered, every run in a fresh process
+# (a module can only be imported for the first time once per process).
+# With plain python only the bpy-free parts are measured: blvtf_core imports
+# (what python -m blvtf_core pays before converting anything) and the binaries check.
+#
+# The binaries check is what the first conversion pays (see blvtf_core/bins.py):
+# a stat per file when the stamp is current, hashing (or extraction) otherwise.
+# The benchmark never extracts anything.
+#
+# Usage:
+#   python benchmarks/bench_startup.py --repeat 10
+#   blender -b --factory-startup --python benchmarks/bench_startup.py -- --repeat 10
+
+import argparse, statistics, subprocess, sys, time
+
+from pathlib import Path
+
+addon_dir = Path(__file__).parent.parent
+
+sys.path.insert(0, str(addon_dir))
+
+
+# Runs in a fresh process, prints the timings as "name seconds" lines
+core_probe = """
+import sys, time
+sys.path.insert(0, {addon_dir!r})
+started = time.perf_counter()
+import blvtf_core.probe, blvtf_core.executor, blvtf_core.scan, blvtf_core.txtmax, blvtf_core.manifest, blvtf_core.magick, blvtf_core.bins
+print('core_import', time.perf_counter() - started)
+started = time.perf_counter()
+import blvtf_core.vtf, blvtf_core.dxt, blvtf_core.resample, blvtf_core.filters, blvtf_core.pack
+print('native_import', time.perf_counter() - started)
+started = time.perf_counter()
+import blvtf_core.cli
+print('cli_import', time.perf_counter() - started)
+"""
+
+addon_probe = """
+import sys, time, importlib
+sys.path.insert(0, {addon_parent!r})
+started = time.perf_counter()
+addon = importlib.import_module({addon_name!r})
+print('addon_import', time.perf_counter() - started)
+started = time.perf_counter()
+addon.register()
+print('addon_register', time.perf_counter() - started)
+started = time.perf_counter()
+addon.unregister()
+print('addon_unregister', time.perf_counter() - started)
+"""
+
+
+def run_probe(cmd):
+	echo = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+	timings = {}
+	for line in echo.splitlines():
+		parts = line.split()
+		if len(parts) == 2 and parts[0].startswith(('core_', 'native_', 'cli_', 'addon_')):
+			timings[parts[0]] = float(parts[1])
+	return timings
+
+
+def report(name, samples):
+	print(f'{name:<32} {statistics.median(samples) * 1000:>9.2f} ms median {min(samples) * 1000:>9.2f} ms min')
+
+
+def main():
+	argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+	parser = argparse.ArgumentParser(description='blvtf startup benchmark')
+	parser.add_argument('--repeat', type=int, default=5)
+	args = parser.parse_args(argv)
+
+	in_blender = 'bpy' in sys.modules or Path(sys.executable).stem.lower().startswith('blender')
+
+	samples = {}
+	for run_idx in range(args.repeat):
+		if in_blender:
+			import bpy
+			cmd = [
+				bpy.app.binary_path, '-b', '--factory-startup', '--python-expr',
+				addon_probe.format(addon_parent=str(addon_dir.parent), addon_name=addon_dir.name),
+			]
+		else:
+			cmd = [sys.executable, '-c', core_probe.format(addon_dir=str(addon_dir))]
+
+		for name, elapsed in run_probe(cmd).items():
+			samples.setdefault(name, []).append(elapsed)
+
+	# The binaries check, the way the first conversion does it
+	from blvtf_core.bins import blvtf_addon_bins, blvtf_bundled_bins
+
+	for name in blvtf_bundled_bins:
+		check_samples = []
+		current = False
+		for run_idx in range(args.repeat):
+			# A fresh instance every time, same as a fresh Blender session
+			blvtf_addon_bins.stamp = None
+			started = time.perf_counter()
+			current = blvtf_addon_bins.verify(name)
+			check_samples.append(time.perf_counter() - started)
+		samples[f'bins_check_{name}' + ('' if current else ' (stale)')] = check_samples
+
+	for name, name_samples in samples.items():
+		report(name, name_samples)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,8 @@
+# =========================================================
+# ---------------------------------------------------------
+#                        blvtf core
+# ---------------------------------------------------------
+# =========================================================
+
+# Everything in here has to work without Blender.
+# Do NOT import bpy anywhere inside this package.
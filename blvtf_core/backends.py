@@ -0,0 +1,293 @@
+import sys, time
+
+from pathlib import Path
+
+import numpy as np
+
+from .bins import blvtf_addon_bins, blvtf_bin
+from .magick import blvtf_magick_decode
+from .pack import blvtf_tga_header, blvtf_read_tga
+from .vtf import blvtf_write_vtf, blvtf_vtf_image_formats, blvtf_vtf_flag_bits, blvtf_vtf_native_formats
+from .resample import blvtf_resample_kernels
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                        Backends
+# ---------------------------------------------------------
+# =========================================================
+
+# Whatever turns a task into a VTF (VTFCmd, the built-in encoder, ...) is a backend.
+# Every backend declares what it can do:
+#  - reads: source file extensions it takes straight from disk, None for anything
+#  - takes_pixels: it encodes decoded pixels, so every source has to be decoded for it
+#  - writes: VTF formats it can write. Empty for decoders (magick), which only feed the others
+#  - filters: resize / mipmap filters
+#  - sharpen_filters: sharpen filters, None if it simply ignores them (VTFCmd Reloaded has no such option)
+#  - flags: VTF flags
+#  - decodes: it decodes sources for the backends which can't read them (blvtf_backend_decoder)
+# and how it runs:
+#  - batches: several tasks go through a single run (one VTFCmd process for the whole group)
+#  - speed: lower is faster. A rough rank, see benchmarks/bench_pipeline.py
+
+# Every task goes to the first backend (in the order given by blvtf_backend_order)
+# which is available on this machine and can serve it.
+# Sources (and packed layers) the backend can't read are decoded by a decoder backend first.
+
+# The order comes from shared['vtfcmd_ver']:
+#  - 'new' / 'old': that VTFCmd, the built-in encoder only if VTFCmd can't run here
+#  - 'native': the built-in encoder, VTFCmd for whatever it can't do
+#  - 'auto': the fastest backend that can serve the task
+# Either way, backends which would drop the task's sharpen filters go last
+# (so 'new' sends a task with a sharpen filter to the built-in encoder).
+# Or the order comes from shared['backends'], a list of backend names, if there's one. That one is taken as is.
+
+# Backends which write VTFs implement convert(), decoders implement decode().
+# The VTFCmd and built-in encoder backends live in blvtf_core/convert.py, next to the pipeline they wrap.
+
+
+class blvtf_backend:
+	"""Base of all backends, declares nothing"""
+	name = None
+
+	reads = ()
+	takes_pixels = False
+	writes = ()
+	filters = ()
+	sharpen_filters = ()
+	flags = ()
+
+	decodes = False
+	batches = False
+	speed = 0
+	# Only used when asked for by name in shared['backends']
+	explicit = False
+
+	# Whether it can run on this machine at all
+	def available(self):
+		return True
+
+	# Why this backend can't write a task as any of vtf_formats, None if it can.
+	# Sources are not checked here, see blvtf_route_task
+	def unfit(self, img_info, vtf_formats):
+		for vtf_format in vtf_formats:
+			if not vtf_format in self.writes:
+				return f'cannot write {vtf_format}'
+
+		for filter_name in (img_info['resize'][1] if img_info['resize'] else None, img_info['mips'][0] if img_info['mips'] else None):
+			if filter_name and not filter_name in self.filters:
+				return f'has no {filter_name} filter'
+
+		for flag in img_info['flags']:
+			if not flag in self.flags:
+				return f'cannot set the {flag} flag'
+
+		return None
+
+	# Whether the task's sharpen filters would be ignored
+	def drops_sharpen(self, img_info):
+		if self.sharpen_filters is None:
+			return any(
+				sharpen_filter and sharpen_filter != 'NONE'
+				for sharpen_filter in (img_info['resize'][2] if img_info['resize'] else None, img_info['mips'][1] if img_info['mips'] else None)
+			)
+
+		return False
+
+	# Whether it reads the file as is
+	def reads_file(self, filepath):
+		return self.reads is None or Path(str(filepath)).suffix.lower() in self.reads
+
+	# Backends which write VTFs also have:
+	#
+	# Convert the tasks routed to this backend.
+	# jobs: [{'idx', 'img_info', 'img_dims', 'pack_layers', 'vtf_format', 'vtf_result'}],
+	# vtf_format is None if the result's alpha wasn't needed to pick the backend.
+	# group_tmp: scratch folder of the group, deleted afterwards
+	# returns {job idx: resulting VTF path} for the jobs which made it
+	# def convert(self, jobs, group_tmp, shared, reporter=None, group_size=None, probe_cache=None, tracer=None)
+	#
+	# And decoders:
+	#
+	# Decode an image into a (height, width, 4) RGBA array, uint8 or float32 (hdr)
+	# def decode(self, imgpath, img_dims, hdr=False)
+
+
+class blvtf_backend_tga(blvtf_backend):
+	"""Built-in reader of uncompressed TGAs (blvtf_core/pack.py), writes no VTF"""
+	name = 'tga'
+	reads = ('.tga',)
+	decodes = True
+
+	# RLE and colour-mapped TGAs are left to magick
+	def reads_file(self, filepath):
+		return super().reads_file(filepath) and blvtf_tga_header(filepath) != None
+
+	def decode(self, imgpath, img_dims, hdr=False):
+		rgba = blvtf_read_tga(imgpath)
+		if hdr:
+			return rgba.astype(np.float32) * (1.0 / 255.0)
+
+		return rgba
+
+
+class blvtf_backend_magick(blvtf_backend):
+	"""ImageMagick: decodes anything for the other backends, writes no VTF"""
+	name = 'magick'
+	reads = None
+	decodes = True
+
+	# Off Windows, a system-wide ImageMagick is picked up when the bins are set up (blvtf_core/bins.py)
+	def available(self):
+		return blvtf_tool_runs_here('magick')
+
+	def decode(self, imgpath, img_dims, hdr=False):
+		return blvtf_magick_decode(blvtf_bin('magick'), imgpath, img_dims, hdr)
+
+
+class blvtf_backend_standin(blvtf_backend):
+	"""Writes a blank 4x4 VTF per task after a fixed delay, without reading anything.
+	Takes every format, filter and flag, to test routing and the pipeline around it"""
+	name = 'standin'
+	reads = None
+	writes = tuple(blvtf_vtf_image_formats)
+	filters = tuple(blvtf_resample_kernels)
+	sharpen_filters = None
+	flags = tuple(blvtf_vtf_flag_bits)
+	batches = True
+	speed = -1
+	explicit = True
+
+	def __init__(self, task_ms=0.0):
+		self.task_ms = task_ms
+
+	def convert(self, jobs, group_tmp, shared, reporter=None, group_size=None, probe_cache=None, tracer=None):
+		results = {}
+		for job in jobs:
+			time.sleep(self.task_ms / 1000.0)
+			vtf_format = job['vtf_format'] or job['img_info']['enc'][0]
+			blvtf_write_vtf(
+				job['vtf_result'],
+				np.zeros((4, 4, 4), dtype=np.uint8),
+				vtf_format if vtf_format in blvtf_vtf_native_formats else 'RGBA8888',
+				version=shared['vtf_version'],
+				mips=False,
+				thumbnail=False,
+			)
+			results[job['idx']] = job['vtf_result']
+
+		return results
+
+
+
+
+# =========================================================
+#                        Registry
+# =========================================================
+
+# name -> backend
+blvtf_backends = {}
+
+def blvtf_register_backend(backend):
+	if backend.writes and not callable(getattr(backend, 'convert', None)):
+		raise TypeError(f'Backend {backend.name} writes VTFs, but has no convert()')
+	if backend.decodes and not callable(getattr(backend, 'decode', None)):
+		raise TypeError(f'Backend {backend.name} decodes, but has no decode()')
+
+	blvtf_backends[backend.name] = backend
+	return backend
+
+# Decoders are tried in this order
+blvtf_register_backend(blvtf_backend_tga())
+blvtf_register_backend(blvtf_backend_magick())
+
+
+# The bundled binaries are Windows executables.
+# Anywhere else a tool only runs if it was pointed to something that does (blvtf_addon_bins.override).
+# Bundled binaries extracted anyway (the prefetch) don't count
+def blvtf_tool_runs_here(name):
+	return sys.platform == 'win32' or name in blvtf_addon_bins.overridden
+
+
+# Backends to try, in order. Decoders and unavailable backends are left out
+def blvtf_backend_order(shared):
+	names = shared.get('backends')
+	if not names:
+		names = {
+			'new': ('vtfcmd', 'native'),
+			'old': ('vtfcmd_old', 'native'),
+			'native': ('native', 'vtfcmd'),
+		}.get(shared['vtfcmd_ver'])
+
+	if names:
+		order = [blvtf_backends[name] for name in names if name in blvtf_backends]
+	else:
+		order = sorted((backend for backend in blvtf_backends.values() if not backend.explicit), key=lambda backend: backend.speed)
+
+	return [backend for backend in order if backend.writes and backend.available()]
+
+
+# Decoder which could read the file, or None
+def blvtf_decoder_for(filepath):
+	for backend in blvtf_backends.values():
+		if backend.decodes and backend.reads_file(filepath) and backend.available():
+			return backend
+
+	return None
+
+
+# Group size to batch tasks with: only backends which batch need groups,
+# tasks of the others are better spread over the workers one by one
+def blvtf_backend_group_size(shared, group_size):
+	order = blvtf_backend_order(shared)
+	if order and not order[0].batches:
+		return 1
+
+	return group_size
+
+
+# Pick the backend for a task.
+# task_alpha: function telling whether the result has alpha. Only called if the backend
+# can't write both formats of the task, so that VTFCmd-only runs don't probe alpha at all
+# returns (backend, vtf_format or None), or (None, reason) if nothing can serve the task
+def blvtf_route_task(img_info, shared, pack_layers, task_alpha):
+	order = blvtf_backend_order(shared)
+	if not order:
+		return None, 'no backend runs on this machine (VTFCmd and ImageMagick have to be pointed to something that runs here)'
+
+	# The first one which doesn't ignore the sharpen filters, if there's any
+	if not shared.get('backends'):
+		order.sort(key=lambda backend: backend.drops_sharpen(img_info))
+
+	src = img_info['src']
+	from_pixels = img_info.get('src_pixels') is not None
+	# Packed layers are always decoded
+	layer_files = [layer_src for layer_src, layer_channel in pack_layers.values() if not isinstance(layer_src, np.ndarray)]
+
+	vtf_format = None
+	reasons = []
+	for backend in order:
+		# Without the alpha, the backend has to be able to write either format
+		reason = backend.unfit(img_info, (vtf_format,) if vtf_format else img_info['enc'])
+		if reason and not vtf_format:
+			vtf_format = img_info['enc'][1] if task_alpha() else img_info['enc'][0]
+			reason = backend.unfit(img_info, (vtf_format,))
+		if reason:
+			reasons.append(f'{backend.name} {reason}')
+			continue
+
+		# Whatever the backend can't read has to be decoded for it.
+		# Packing happens on decoded pixels, unless the backend takes anything as is
+		undecoded = []
+		if backend.takes_pixels or backend.reads is not None:
+			undecoded.extend(layer_files)
+		if not from_pixels and (backend.takes_pixels or (pack_layers and backend.reads is not None) or not backend.reads_file(src)):
+			undecoded.append(src)
+		missing_decoder = [filepath for filepath in undecoded if not blvtf_decoder_for(filepath)]
+		if missing_decoder:
+			reasons.append(f'{backend.name} needs {Path(str(missing_decoder[0])).name} decoded, and ImageMagick does not run here (only uncompressed TGAs are read without it)')
+			continue
+
+		return backend, vtf_format
+
+	return None, ', '.join(reasons)
@@ -0,0 +1,322 @@
+from pathlib import Path
+
+from .scan import blvtf_walk_files, blvtf_glob_matcher, blvtf_walk_depth
+from .manifest import blvtf_manifest_name, blvtf_build_manifest, blvtf_task_params_hash
+from .txtmax import blvtf_compile_txtmax
+from .executor import blvtf_run_tasks, blvtf_group_tasks
+from .trace import blvtf_trace_stage
+from .progress import blvtf_task_bytes
+from .convert import blvtf_export_imgs_to_vtf, blvtf_vtfcmd_group_key, blvtf_task_lane, blvtf_vtf_flags_s
+from .backends import blvtf_backend_group_size
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                    Batch task discovery
+# ---------------------------------------------------------
+# =========================================================
+
+# Walks the source folder and yields conversion tasks as soon as the files are found,
+# so that the conversion can start long before the walk is over.
+
+# Task templates are regular task dicts (see blvtf_export_img_to_vtf), minus 'src' and 'dest'.
+# They are fully resolved from the batch settings beforehand (blvtf_batch_templates),
+# the walk itself knows nothing about them.
+
+
+# input_folder: folder to walk
+# output_folder: where the resulting VTFs go, mirroring the structure of input_folder
+# recursive: glob or rglob semantics
+# batch_pattern: wildcard of the main batch or None if the main batch is disabled
+# batch_template: task template for files matched by batch_pattern
+# txtmax: compiled TxtMax (blvtf_core.txtmax.blvtf_txtmax) or None
+# txtmax_templates: dict of TxtMax rule pattern -> task template
+def blvtf_iter_batch_tasks(input_folder, output_folder, recursive, batch_pattern=None, batch_template=None, txtmax=None, txtmax_templates=None):
+	input_folder = Path(input_folder)
+	output_folder = Path(output_folder)
+
+	batch_matcher = blvtf_glob_matcher([batch_pattern] if batch_pattern else [], recursive)
+
+	# Non-recursive walk still has to go deeper if any pattern has a folder in it
+	walk_depth = None
+	if not recursive:
+		walk_depth = blvtf_walk_depth(batch_matcher, *((txtmax.matcher,) if txtmax else ()))
+
+	for rel_parts, imgf in blvtf_walk_files(input_folder, walk_depth):
+		# Tasks from TxtMax. If multiple rules match - the last one wins
+		txtmax_rule = txtmax.match(rel_parts) if txtmax else None
+		if txtmax_rule:
+			template = txtmax_templates[txtmax_rule['pattern']]
+
+		# Tasks from the main batch
+		# (only files which weren't already taken by TxtMax)
+		elif batch_matcher.match(rel_parts) != None:
+			# the build manifest is not an image
+			if rel_parts[-1] == blvtf_manifest_name:
+				continue
+			template = batch_template
+
+		else:
+			continue
+
+		yield dict(
+			template,
+			src=Path(imgf),
+			dest=output_folder.joinpath(*rel_parts).with_suffix('.vtf'),
+		)
+
+
+
+
+# =========================================================
+#                      Batch settings
+# =========================================================
+
+# Batch settings come in as a plain dict, named after the addon's batch properties
+# (blvtf_batch_params + the filters of blvtf_exp_params).
+# The addon snapshots its properties into one, the command line converter builds it from the flags
+"""
+{
+	'vtf_format': 'DXT1',
+	'vtf_format_w_alph': 'DXT5',
+	'vtf_mipmaps_enable': True,
+	'vtf_mipmap_filter': 'CUBIC',
+	'vtf_mipmap_sharpen_filter': 'SHARPENSOFT',
+	'vtf_compute_refl': True,
+	'vtf_enable_resize': False,
+	'vtf_resize_method': 'NEAREST',
+	'vtf_resize_filter': 'CUBIC',
+	'vtf_resize_sharpen_filter': 'SHARPENMEDIUM',
+	'vtf_resize_clamp': False,
+	'vtf_resize_clamp_maxwidth': 4096,
+	'vtf_resize_clamp_maxheight': 4096,
+	'flags': ('NORMAL', 'NOMIP'),
+	'batch_recursive': False,
+	'txtmax_use_fallback': False,
+}
+"""
+
+# Characters which make the last part of the input path a wildcard
+blvtf_batch_wildcard_symbols = (
+	'!',
+	'?',
+	'*',
+	'/',
+	'\\',
+	'<',
+	'>',
+	'|',
+)
+
+
+# Input path of a batch -> (folder to walk, wildcard of the main batch).
+# 'W:/materialsrc/*.psd' -> ('W:/materialsrc', '*.psd'), a plain folder takes everything
+def blvtf_split_batch_input(input_path):
+	input_path = Path(input_path)
+
+	# important todo: proper wildcard detection
+	if len(set(blvtf_batch_wildcard_symbols) & set(input_path.name)) != 0:
+		return input_path.parent, input_path.name
+
+	return input_path, '*.*'
+
+
+# Resolve the batch settings into task templates (see blvtf_iter_batch_tasks).
+# txtmax: compiled TxtMax or None
+# vmt_preset_exists: function(preset name) -> bool, presets which don't exist are dropped.
+# None = no presets at all
+# returns (main batch template or None, {TxtMax rule pattern: template})
+def blvtf_batch_templates(settings, txtmax=None, vmt_preset_exists=None):
+	mips_params = (settings['vtf_mipmap_filter'], settings['vtf_mipmap_sharpen_filter']) if settings['vtf_mipmaps_enable'] else False
+
+	# Resolve '*' (use base batch config) once per rule, instead of once per file
+	txtmax_templates = {}
+	for rule in (txtmax.rules if txtmax else ()):
+		vmt_preset = rule['vmt_preset']
+		if vmt_preset and not (vmt_preset_exists and vmt_preset_exists(vmt_preset)):
+			vmt_preset = None
+
+		sclamp = False
+		if rule['sclamp']:
+			sclamp = (
+				str(settings['vtf_resize_clamp_maxwidth']) if rule['sclamp'][0] == None else rule['sclamp'][0],
+				str(settings['vtf_resize_clamp_maxheight']) if rule['sclamp'][1] == None else rule['sclamp'][1],
+			)
+
+		rule_format = settings['vtf_format'] if rule['format'] == None else rule['format']
+
+		txtmax_templates[rule['pattern']] = {
+			'enc': (rule_format, rule_format),
+			'mips': mips_params,
+			'comp_refl': settings['vtf_compute_refl'],
+			'srgb': rule['srgb'],
+			'emb_alpha': False,
+			'channels': False,
+			# Aligning to the nearest power of 2 is always on for txtmax
+			'resize': (settings['vtf_resize_method'], settings['vtf_resize_filter'], settings['vtf_resize_sharpen_filter']),
+			'clamp_dims': sclamp,
+			# todo: oh fuck
+			'flags': tuple(settings['flags']) if rule['flags'] == None else rule['flags'],
+			'vmt_preset': vmt_preset,
+		}
+
+	# Main batch, unless TxtMax is enabled without fallback
+	batch_template = None
+	if not txtmax or settings['txtmax_use_fallback']:
+		batch_template = {
+			'enc': (settings['vtf_format'], settings['vtf_format_w_alph']),
+			'mips': mips_params,
+			'srgb': False,
+			'comp_refl': settings['vtf_compute_refl'],
+			'emb_alpha': False,
+			'channels': False,
+			'resize': (settings['vtf_resize_method'], settings['vtf_resize_filter'], settings['vtf_resize_sharpen_filter']) if settings['vtf_enable_resize'] else False,
+			'clamp_dims': (settings['vtf_resize_clamp_maxwidth'], settings['vtf_resize_clamp_maxheight']) if settings['vtf_resize_clamp'] else False,
+			# todo: oh fuck
+			'flags': tuple(settings['flags']),
+		}
+
+	return batch_template, txtmax_templates
+
+
+# All the tasks of a batch, as an iterator (see blvtf_iter_batch_tasks).
+# The settings and TxtMax are resolved right away, the folder walk only starts once the tasks are pulled.
+# input_path: source folder, optionally ending with a wildcard
+# txtmax_text: TxtMax as a string or None if TxtMax is disabled
+def blvtf_batch_tasks(input_path, output_folder, settings, txtmax_text=None, vmt_preset_exists=None):
+	input_folder, glob_pattern = blvtf_split_batch_input(input_path)
+
+	# Compiled TxtMax rules, if any
+	# (cached by content, so unchanged TxtMax is not parsed again)
+	txtmax = None
+	if txtmax_text != None:
+		txtmax = blvtf_compile_txtmax(txtmax_text, blvtf_vtf_flags_s, settings['batch_recursive'])
+
+	batch_template, txtmax_templates = blvtf_batch_templates(settings, txtmax, vmt_preset_exists)
+
+	# Walks the source folder once, matching every file against all the TxtMax rules
+	# and the regular batch wildcard at the same time.
+	# Yields tasks as soon as they are found
+	return blvtf_iter_batch_tasks(
+		input_folder,
+		output_folder,
+		settings['batch_recursive'],
+		glob_pattern if batch_template else None,
+		batch_template,
+		txtmax,
+		txtmax_templates,
+	)
+
+
+
+
+# =========================================================
+#                        Batch run
+# =========================================================
+
+# Convert the tasks of a batch, while they are still being discovered.
+# shared: shared export params, see blvtf_core/convert.py
+# manifest_shared: shared params for the build manifest. None = convert everything, even if unchanged
+# progress: blvtf_core.progress.blvtf_progress_channel (or anything with the same methods), or None
+# reporter: object with blvtf_report(type, message), or None
+# tracer: blvtf_core.trace.blvtf_trace, or None
+# returns {'converted': int, 'skipped': int, 'failed': int, 'failures': [src]}.
+# A failed task never stops the batch, it's only counted
+def blvtf_run_batch(task_iter, output_folder, shared, worker_count=1, group_size=1, manifest_shared=None, reporter=None, progress=None, probe_cache=None, tracer=None):
+	output_folder = Path(output_folder)
+
+	# Manifest of what was already built into the output folder
+	manifest = blvtf_build_manifest(output_folder) if manifest_shared else None
+
+	# Executed in the worker threads.
+	# Tasks come in groups sharing the same VTFCmd params, converted by a single VTFCmd invocation
+	def convert_group(task_group):
+		if progress:
+			progress.begin(task_group)
+
+		results = ['skipped'] * len(task_group)
+
+		# Skip tasks whose source, params and output are exactly the same as last time.
+		# The source is hashed before converting, that's what gets recorded
+		params_hashes = {}
+		src_states = {}
+		to_convert = []
+		for task_idx, task_info in enumerate(task_group):
+			if manifest:
+				with blvtf_trace_stage(tracer, 'manifest', task_info['src']):
+					params_hashes[task_idx] = blvtf_task_params_hash(task_info, manifest_shared)
+					src_states[task_idx] = manifest.src_state(task_info)
+					up_to_date = manifest.is_up_to_date(task_info, params_hashes[task_idx], src_states[task_idx])
+				if up_to_date:
+					continue
+
+			if task_info['dest'].parent != output_folder:
+				task_info['dest'].parent.mkdir(parents=True, exist_ok=True)
+
+			to_convert.append(task_idx)
+
+		vtf_results = blvtf_export_imgs_to_vtf([task_group[task_idx] for task_idx in to_convert], shared, reporter, group_size, probe_cache, tracer)
+
+		for task_idx, vtf_result in zip(to_convert, vtf_results):
+			results[task_idx] = vtf_result
+			if manifest and vtf_result and src_states[task_idx]:
+				manifest.record(task_group[task_idx], params_hashes[task_idx], src_states[task_idx])
+
+		return results
+
+	# The source folder is still being walked while the first tasks are converted
+	def discover_tasks():
+		for task_info in task_iter:
+			if progress:
+				progress.discover(1)
+			yield task_info
+		if progress:
+			progress.discovery_done()
+
+	stats = {
+		'converted': 0,
+		'skipped': 0,
+		'failed': 0,
+		# sources of the failed tasks
+		'failures': [],
+	}
+
+	# Called as soon as any group finishes
+	def group_done(task_group, results, error):
+		group_stats = {'skipped': 0, 'failed': 0, 'nbytes': 0}
+		for task_info, result in zip(task_group, results or [None] * len(task_group)):
+			if result == 'skipped':
+				group_stats['skipped'] += 1
+			elif result:
+				stats['converted'] += 1
+				if progress:
+					group_stats['nbytes'] += blvtf_task_bytes(task_info)
+			else:
+				group_stats['failed'] += 1
+				stats['failures'].append(str(task_info['src']))
+		stats['skipped'] += group_stats['skipped']
+		stats['failed'] += group_stats['failed']
+		if progress:
+			progress.update(len(task_group), task_group, **group_stats)
+
+	# Tasks of backends which don't batch (the built-in encoder is CPU bound) are spread over the workers one by one
+	group_size = blvtf_backend_group_size(shared, group_size)
+
+	blvtf_run_tasks(
+		blvtf_group_tasks(discover_tasks(), blvtf_vtfcmd_group_key, group_size),
+		convert_group,
+		worker_count,
+		group_done,
+		lambda task_group: [blvtf_task_lane(task_info) for task_info in task_group],
+	)
+
+	if manifest:
+		manifest.compact()
+
+	if stats['skipped']:
+		print('BLVTF: Skipped', stats['skipped'], 'unchanged images')
+
+	if probe_cache:
+		probe_cache.flush()
+
+	return stats
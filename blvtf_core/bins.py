@@ -0,0 +1,214 @@
+import hashlib, json, os, shutil, sys, threading
+
+from pathlib import Path
+
+from .runner import blvtf_run, blvtf_run_error
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                      Bundled binaries
+# ---------------------------------------------------------
+# =========================================================
+
+# VTFCmd (new and old) and ImageMagick ship as 7z archives (.orgn) in bins/.
+# They are extracted the first time they are actually needed, not at import:
+# Blender instances which never convert anything (render farm workers)
+# never pay for it.
+
+# What was extracted from what is recorded in a stamp file, with the size, mtime and sha256
+# of both the archive and the binary. As long as the sizes and mtimes match the stamp,
+# checking a binary is a single stat per file. If they don't, the hashes decide whether
+# the binary is still good or has to be extracted again (an addon update shipping new archives,
+# a binary damaged by an antivirus, etc.).
+
+
+blvtf_bins_stamp_name = 'blvtf_bins.stamp.json'
+
+# name -> (archive, folder to extract into, binary), relative to the bins folder
+blvtf_bundled_bins = {
+	'vtfcmd': ('vtfcmd.orgn', 'vtfcmd', 'vtfcmd/VTFCmd.exe'),
+	'vtfcmd_old': ('vtfcmd_old.orgn', 'vtfcmd_old', 'vtfcmd_old/VTFCmd.exe'),
+	'magick': ('imgmagick.orgn', '.', 'imgmagick/magick.exe'),
+}
+
+
+class blvtf_bins_error(RuntimeError):
+	pass
+
+
+def blvtf_file_sha256(filepath):
+	file_hash = hashlib.sha256()
+	with open(filepath, 'rb') as f:
+		while True:
+			chunk = f.read(1 << 20)
+			if not chunk:
+				break
+			file_hash.update(chunk)
+
+	return file_hash.hexdigest()
+
+
+# (size, mtime) of a file, None if it doesn't exist
+def blvtf_file_sig(filepath):
+	try:
+		file_stat = os.stat(filepath)
+	except OSError:
+		return None
+
+	return [file_stat.st_size, file_stat.st_mtime_ns]
+
+
+class blvtf_bins:
+	"""Bundled binaries, extracted and verified on first use"""
+	def __init__(self, bins_dir, seven_zip=None):
+		self.bins_dir = Path(bins_dir)
+		self.seven_zip = Path(seven_zip) if seven_zip else self.bins_dir / '7z' / '7z.exe'
+		self.stamp_path = self.bins_dir / blvtf_bins_stamp_name
+
+		# Extraction happens once, no matter how many threads ask for a binary at the same time
+		self.lock = threading.Lock()
+		# name -> binary path, for binaries checked during this session
+		self.ready = {}
+		# Names pointed to something else than the bundled binary (see override)
+		self.overridden = set()
+		self.stamp = None
+
+	def load_stamp(self):
+		if self.stamp != None:
+			return self.stamp
+
+		try:
+			self.stamp = json.loads(self.stamp_path.read_text())
+		except (OSError, ValueError):
+			self.stamp = {}
+
+		return self.stamp
+
+	def save_stamp(self):
+		stamp_tmp = self.stamp_path.with_suffix('.tmp')
+		try:
+			stamp_tmp.write_text(json.dumps(self.stamp, indent='\t'))
+			os.replace(stamp_tmp, self.stamp_path)
+		except OSError as e:
+			# Read-only install, the binaries are then simply verified again next time
+			print('BLVTF: Could not write', self.stamp_path, e)
+
+	# Whether the binary is there and was extracted from the current archive
+	def verify(self, name):
+		archive, extract_dir, binary = blvtf_bundled_bins[name]
+		archive_path = self.bins_dir / archive
+		binary_path = self.bins_dir / binary
+
+		bin_stamp = self.load_stamp().get(name)
+		binary_sig = blvtf_file_sig(binary_path)
+		archive_sig = blvtf_file_sig(archive_path)
+		if not binary_sig:
+			return False
+
+		# Extracted by something else (an older version of the addon, or by hand).
+		# Without the archive there's nothing to compare against
+		if not bin_stamp:
+			return not archive_sig
+
+		# The usual case: nothing changed since the stamp was written
+		if binary_sig == bin_stamp['binary'][:2] and archive_sig in (None, bin_stamp['archive'][:2]):
+			return True
+
+		# Files were touched, but could still be the same
+		if archive_sig and archive_sig != bin_stamp['archive'][:2]:
+			if blvtf_file_sha256(archive_path) != bin_stamp['archive'][2]:
+				return False
+			bin_stamp['archive'] = archive_sig + [bin_stamp['archive'][2]]
+
+		if binary_sig != bin_stamp['binary'][:2]:
+			if blvtf_file_sha256(binary_path) != bin_stamp['binary'][2]:
+				return False
+			bin_stamp['binary'] = binary_sig + [bin_stamp['binary'][2]]
+
+		self.save_stamp()
+		return True
+
+	def extract(self, name):
+		archive, extract_dir, binary = blvtf_bundled_bins[name]
+		archive_path = self.bins_dir / archive
+		binary_path = self.bins_dir / binary
+
+		if not archive_path.is_file():
+			raise blvtf_bins_error(f'{binary_path.name} is missing, and so is the archive it comes in ({archive_path})')
+
+		print('BLVTF: Extracting', archive_path)
+		unpk_prms = [
+			str(self.seven_zip),
+			'x',
+			'-o' + str(self.bins_dir / extract_dir),
+			str(archive_path),
+			'-aoa'
+		]
+		try:
+			blvtf_run(unpk_prms, '7z')
+		except blvtf_run_error as e:
+			raise blvtf_bins_error(f'Could not extract {archive_path}: {e}') from e
+
+		if not binary_path.is_file():
+			raise blvtf_bins_error(f'Could not extract {binary_path.name} from {archive_path}')
+
+		self.load_stamp()[name] = {
+			'archive': blvtf_file_sig(archive_path) + [blvtf_file_sha256(archive_path)],
+			'binary': blvtf_file_sig(binary_path) + [blvtf_file_sha256(binary_path)],
+		}
+		self.save_stamp()
+
+	# Path of a bundled binary, extracting it first if needed
+	def get(self, name):
+		binary_path = self.ready.get(name)
+		if binary_path:
+			return binary_path
+
+		with self.lock:
+			if not name in self.ready:
+				if not self.verify(name):
+					self.extract(name)
+				self.ready[name] = self.bins_dir / blvtf_bundled_bins[name][2]
+
+		return self.ready[name]
+
+	# Use a binary from somewhere else instead of the bundled one
+	# (a system-wide ImageMagick, VTFCmd behind a Wine wrapper, etc.).
+	# binary_path could also be a bare name to be looked up in PATH
+	def override(self, name, binary_path):
+		with self.lock:
+			self.ready[name] = Path(binary_path)
+			self.overridden.add(name)
+
+	# Point the binaries to tools of the same name in PATH, where there are any
+	def use_system(self, names):
+		for name in names:
+			system_bin = shutil.which(name)
+			if system_bin:
+				self.override(name, system_bin)
+
+	# Get the binaries ready in a background thread, so that the first conversion doesn't wait
+	def prefetch(self, names=None):
+		def prefetch_bins():
+			for name in names or blvtf_bundled_bins:
+				try:
+					self.get(name)
+				except blvtf_bins_error as e:
+					print('BLVTF:', e)
+
+		prefetch_thread = threading.Thread(target=prefetch_bins, name='blvtf_bins_prefetch', daemon=True)
+		prefetch_thread.start()
+		return prefetch_thread
+
+
+# The addon's own bins folder
+blvtf_addon_bins = blvtf_bins(Path(__file__).parent.parent / 'bins')
+
+# The bundled binaries are Windows executables.
+# Anywhere else a system-wide ImageMagick does just as well
+if sys.platform != 'win32':
+	blvtf_addon_bins.use_system(('magick',))
+
+def blvtf_bin(name):
+	return blvtf_addon_bins.get(name)
@@ -0,0 +1,319 @@
+import argparse, ast, json, os, sys, time
+
+from pathlib import Path
+
+from .bins import blvtf_addon_bins
+from .probe_cache import blvtf_probe_cache
+from .batch import blvtf_batch_tasks, blvtf_run_batch
+from .jobspec import blvtf_load_job, blvtf_run_job
+from .dxt import blvtf_dxt_qualities
+from .runner import blvtf_run_timeouts
+from .trace import blvtf_trace
+from .progress import blvtf_progress_channel, blvtf_format_eta
+from .backends import blvtf_backends
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                  Command line converter
+# ---------------------------------------------------------
+# =========================================================
+
+# The batch converter, without Blender:
+#   cd path/to/blvtf
+#   python -m blvtf_core W:/materialsrc/props W:/materials/props --format DXT1 --flag NORMAL
+#   python -m blvtf_core W:/materialsrc/props/*.psd W:/materials/props --config batch.json --txtmax rules.txt
+#   python -m blvtf_core --job marked_export.json
+
+# Takes the same settings as the Batch panel, as flags or as a JSON config file.
+# Config keys are the flag names (format, alpha_format, mipmaps, flag, txtmax, ...),
+# flags given on the command line override the config.
+
+# --job runs a job saved by the addon (Save Export Job, see blvtf_core/jobspec.py) instead.
+# Everything about the tasks is in the job, only the tools, workers and scratch options apply.
+
+# VMT presets live in Blender's text datablocks, so TxtMax rules with a @preset simply don't write a VMT here.
+
+
+addon_dir = Path(__file__).parent.parent
+
+blvtf_cli_encoders = ('new', 'old', 'native', 'auto')
+blvtf_cli_resize_methods = ('NEAREST', 'BIGGEST', 'SMALLEST')
+blvtf_cli_vtf_versions = ('7.5', '7.4', '7.3', '7.2', '7.1')
+
+
+# Version of the addon, for the build manifest.
+# Read from bl_info without importing the addon (which imports bpy)
+def blvtf_addon_version():
+	addon_src = ast.parse((addon_dir / '__init__.py').read_text(encoding='utf-8'))
+	for node in addon_src.body:
+		if isinstance(node, ast.Assign) and any(isinstance(tgt, ast.Name) and tgt.id == 'bl_info' for tgt in node.targets):
+			return ast.literal_eval(node.value)['version']
+
+	return None
+
+
+class blvtf_cli_reporter:
+	"""Warnings to stderr, same interface as the addon's operators"""
+	def __init__(self):
+		self.warnings = 0
+
+	def blvtf_report(self, rtype, rmsg):
+		self.warnings += 1
+		print(f'{"/".join(sorted(rtype))}: {rmsg}', file=sys.stderr)
+
+
+class blvtf_cli_progress(blvtf_progress_channel):
+	"""Progress channel which prints itself instead of updating the panel"""
+	def __init__(self, quiet=False):
+		super().__init__()
+		self.quiet = quiet
+		self.last_print = 0.0
+
+	# Drained right here, update is never called concurrently (see blvtf_run_tasks)
+	def update(self, amt=1, task_group=None, skipped=0, failed=0, nbytes=0):
+		super().update(amt, task_group, skipped, failed, nbytes)
+		if self.quiet:
+			return
+
+		progress = self.drain()
+		now = time.perf_counter()
+		# At most a couple of lines a second, a big batch would flood the terminal otherwise
+		if now - self.last_print < 0.5 and progress['done'] < progress['total']:
+			return
+		self.last_print = now
+
+		print(
+			f'BLVTF: {progress["done"]} done / {progress["total"]} found' + (' (scanning...)' if progress['scanning'] else ''),
+			f'{progress["elapsed"]:.1f}s',
+			f'{progress["tasks_per_sec"]:.1f} tasks/s',
+			f'{progress["mb_per_sec"]:.1f} MB/s',
+			f'ETA {blvtf_format_eta(progress["eta"])}',
+			file=sys.stderr
+		)
+
+
+def blvtf_cli_parser():
+	parser = argparse.ArgumentParser(
+		prog='python -m blvtf_core',
+		description='Batch convert a folder of images to VTF, without Blender',
+	)
+
+	parser.add_argument('input', nargs='?', help='Source folder, optionally ending with a wildcard (W:/materialsrc/*.psd)')
+	parser.add_argument('output', nargs='?', help='Destination folder, has to exist')
+	parser.add_argument('--config', help='JSON file with any of the settings below, flags override it')
+	parser.add_argument('--job', help='Run a job saved by the addon instead of converting a folder')
+
+	vtf_group = parser.add_argument_group('VTF')
+	vtf_group.add_argument('--format', default='DXT1', type=str.upper, help='Format of images without alpha')
+	vtf_group.add_argument('--alpha-format', default='DXT5', type=str.upper, help='Format of images with alpha')
+	vtf_group.add_argument('--mipmaps', default=True, action=argparse.BooleanOptionalAction, help='Generate mipmaps')
+	vtf_group.add_argument('--mip-filter', default='POINT', type=str.upper, help='Mipmap resize filter')
+	vtf_group.add_argument('--mip-sharpen', default='SHARPENSOFT', type=str.upper, help='Mipmap sharpen filter')
+	vtf_group.add_argument('--reflectivity', default=True, action=argparse.BooleanOptionalAction, help='Compute reflectivity')
+	vtf_group.add_argument('--resize', default=None, type=str.upper, choices=blvtf_cli_resize_methods, help='Resize non power of 2 images with this method')
+	vtf_group.add_argument('--resize-filter', default='CUBIC', type=str.upper, help='Resize filter')
+	vtf_group.add_argument('--resize-sharpen', default='SHARPENMEDIUM', type=str.upper, help='Resize sharpen filter')
+	vtf_group.add_argument('--clamp', default=None, metavar='WIDTHxHEIGHT', help='Clamp the resized image dimensions, such as 2048x2048')
+	vtf_group.add_argument('--flag', default=[], action='append', type=str.upper, help='VTF flag, could be given multiple times')
+	vtf_group.add_argument('--vtf-version', default='7.4', choices=blvtf_cli_vtf_versions)
+	vtf_group.add_argument('--thumbnail', default=True, action=argparse.BooleanOptionalAction, help='Generate the thumbnail')
+
+	batch_group = parser.add_argument_group('Batch')
+	batch_group.add_argument('--recursive', default=False, action=argparse.BooleanOptionalAction, help='Look for images in subfolders too')
+	batch_group.add_argument('--txtmax', default=None, help='TxtMax file')
+	batch_group.add_argument('--txtmax-fallback', default=False, action=argparse.BooleanOptionalAction, help='Convert images no TxtMax rule matched with the main settings')
+	batch_group.add_argument('--workers', default=max(1, (os.cpu_count() or 2) // 2), type=int)
+	batch_group.add_argument('--group-size', default=16, type=int, help='Images with the same params converted by a single VTFCmd run')
+	batch_group.add_argument('--skip-unchanged', default=True, action=argparse.BooleanOptionalAction, help='Skip images which did not change since the last run')
+
+	tools_group = parser.add_argument_group('Tools')
+	tools_group.add_argument('--encoder', default='new', choices=blvtf_cli_encoders, help='VTFCmd version, the built-in encoder, or auto (the fastest one which can do the image). Sharpen filters VTFCmd (new) lacks go through the built-in encoder')
+	tools_group.add_argument('--backend', default=[], action='append', type=str.lower, help='Backend to try (vtfcmd, vtfcmd_old, native), in the order given. Overrides --encoder, could be given multiple times')
+	tools_group.add_argument('--dxt-quality', default='FAST', type=str.upper, choices=blvtf_dxt_qualities, help='DXT quality of the built-in encoder')
+	tools_group.add_argument('--vtfcmd', default=None, help='VTFCmd executable to use instead of the bundled one')
+	tools_group.add_argument('--vtfcmd-old', default=None, help='Old VTFCmd executable to use instead of the bundled one')
+	tools_group.add_argument('--magick', default=None, help='ImageMagick executable to use instead of the bundled one')
+	tools_group.add_argument('--scratch', default=None, help='Folder for intermediate files, preferably a RAM drive')
+	tools_group.add_argument('--probe-cache', default=str(addon_dir / 'tmps' / 'blvtf_probe_cache.sqlite'), help='Image probe cache file, "none" to disable it')
+	tools_group.add_argument('--timeout', default=[], action='append', metavar='STAGE=SECONDS', help=f'Timeout of a stage ({", ".join(blvtf_run_timeouts)}), could be given multiple times')
+	tools_group.add_argument('--trace', default=None, metavar='FILE', help='Append the timings of every stage to a JSONL file, see python -m blvtf_core.trace')
+	tools_group.add_argument('--quiet', default=False, action=argparse.BooleanOptionalAction, help='No progress output')
+
+	return parser
+
+
+# Parse the command line, with the config file (if any) as the defaults
+def blvtf_cli_args(argv):
+	parser = blvtf_cli_parser()
+
+	config_path = parser.parse_known_args(argv)[0].config
+	if config_path:
+		config = json.loads(Path(config_path).read_text(encoding='utf-8'))
+		known = {action.dest for action in parser._actions}
+		unknown = set(config) - known
+		if unknown:
+			parser.error(f'Unknown config keys: {", ".join(sorted(unknown))}')
+		parser.set_defaults(**config)
+
+	args = parser.parse_args(argv)
+	if not args.job and (not args.input or not args.output):
+		parser.error('input and output are required, either as arguments or in the config')
+
+	if args.clamp:
+		try:
+			args.clamp = tuple(int(dim) for dim in args.clamp.lower().split('x'))
+			assert len(args.clamp) == 2
+		except (ValueError, AssertionError):
+			parser.error(f'--clamp has to be WIDTHxHEIGHT, got {args.clamp}')
+
+	for stage_timeout in args.timeout:
+		try:
+			stage, seconds = stage_timeout.split('=')
+			seconds = float(seconds)
+		except ValueError:
+			parser.error(f'--timeout has to be STAGE=SECONDS, got {stage_timeout}')
+		if not stage in blvtf_run_timeouts:
+			parser.error(f'Unknown stage {stage}, has to be one of {", ".join(blvtf_run_timeouts)}')
+		blvtf_run_timeouts[stage] = seconds
+
+	for backend_name in args.backend:
+		if not backend_name in blvtf_backends or not blvtf_backends[backend_name].writes:
+			parser.error(f'Unknown backend {backend_name}, has to be one of {", ".join(name for name, backend in blvtf_backends.items() if backend.writes and not backend.explicit)}')
+
+	return args
+
+
+# Batch settings dict (see blvtf_core/batch.py) out of the parsed args
+def blvtf_cli_settings(args):
+	return {
+		'vtf_format': args.format,
+		'vtf_format_w_alph': args.alpha_format,
+		'vtf_mipmaps_enable': args.mipmaps,
+		'vtf_mipmap_filter': args.mip_filter,
+		'vtf_mipmap_sharpen_filter': args.mip_sharpen,
+		'vtf_compute_refl': args.reflectivity,
+		'vtf_enable_resize': bool(args.resize),
+		'vtf_resize_method': args.resize or 'NEAREST',
+		'vtf_resize_filter': args.resize_filter,
+		'vtf_resize_sharpen_filter': args.resize_sharpen,
+		'vtf_resize_clamp': bool(args.clamp),
+		'vtf_resize_clamp_maxwidth': args.clamp[0] if args.clamp else 4096,
+		'vtf_resize_clamp_maxheight': args.clamp[1] if args.clamp else 4096,
+		'flags': tuple(dict.fromkeys(args.flag)),
+		'batch_recursive': args.recursive,
+		'txtmax_use_fallback': args.txtmax_fallback,
+	}
+
+
+# Shared export params (see blvtf_core/convert.py) out of the parsed args
+def blvtf_cli_shared(args):
+	return {
+		'vtfcmd_ver': args.encoder,
+		'backends': tuple(args.backend) or None,
+		'vtf_version': args.vtf_version,
+		'vtf_dxt_quality': args.dxt_quality,
+		'vtf_generate_thumb': args.thumbnail,
+		'vtf_scratch_folder': args.scratch,
+		'tmp_folder': str(addon_dir / 'tmps'),
+	}
+
+
+# Run a job saved by the addon
+def blvtf_cli_run_job(args, reporter, progress, probe_cache, tracer):
+	job = blvtf_load_job(args.job)
+
+	# The job was frozen on whatever machine saved it, the scratch folders are this machine's
+	job['shared'] = dict(job['shared'], vtf_scratch_folder=args.scratch, tmp_folder=str(addon_dir / 'tmps'))
+	if args.backend:
+		job['shared']['backends'] = tuple(args.backend)
+
+	progress.discover(len(job['tasks']))
+	progress.discovery_done()
+
+	stats = blvtf_run_job(job, reporter, progress, probe_cache, args.workers, tracer)
+	stats['skipped'] = 0
+
+	return stats
+
+
+# Convert a folder
+def blvtf_cli_run_batch(args, reporter, progress, probe_cache, tracer):
+	output_folder = Path(args.output)
+	if not output_folder.is_dir():
+		print('BLVTF: The destination folder does not exist. Aborting', file=sys.stderr)
+		return None
+
+	txtmax_text = None
+	if args.txtmax:
+		txtmax_text = Path(args.txtmax).read_text(encoding='utf-8')
+
+	shared = blvtf_cli_shared(args)
+
+	# Same as the addon's, so that the CLI and Blender skip each other's unchanged results
+	manifest_shared = None
+	if args.skip_unchanged:
+		manifest_shared = {
+			'vtf_version': shared['vtf_version'],
+			'vtfcmd_ver': shared['vtfcmd_ver'],
+			'vtf_dxt_quality': shared['vtf_dxt_quality'],
+			'vtf_generate_thumb': shared['vtf_generate_thumb'],
+			'blvtf_version': blvtf_addon_version(),
+		}
+		# Only when given, so that the addon's results still count as unchanged otherwise
+		if shared['backends']:
+			manifest_shared['backends'] = shared['backends']
+
+	return blvtf_run_batch(
+		blvtf_batch_tasks(args.input, output_folder, blvtf_cli_settings(args), txtmax_text),
+		output_folder,
+		shared,
+		args.workers,
+		args.group_size,
+		manifest_shared,
+		reporter,
+		progress,
+		probe_cache,
+		tracer,
+	)
+
+
+def main(argv=None):
+	args = blvtf_cli_args(sys.argv[1:] if argv is None else argv)
+
+	for bin_name, bin_path in (('vtfcmd', args.vtfcmd), ('vtfcmd_old', args.vtfcmd_old), ('magick', args.magick)):
+		if bin_path:
+			blvtf_addon_bins.override(bin_name, bin_path)
+
+	probe_cache = None
+	if args.probe_cache and args.probe_cache.lower() != 'none':
+		probe_cache = blvtf_probe_cache(args.probe_cache)
+
+	tracer = blvtf_trace(args.trace) if args.trace else None
+
+	reporter = blvtf_cli_reporter()
+	progress = blvtf_cli_progress(args.quiet)
+
+	try:
+		if args.job:
+			stats = blvtf_cli_run_job(args, reporter, progress, probe_cache, tracer)
+		else:
+			stats = blvtf_cli_run_batch(args, reporter, progress, probe_cache, tracer)
+	finally:
+		if probe_cache:
+			probe_cache.close()
+		if tracer:
+			tracer.close()
+
+	if stats == None:
+		return 2
+
+	for failed_src in stats['failures']:
+		print('BLVTF: Failed:', failed_src, file=sys.stderr)
+
+	print(
+		f'BLVTF: {stats["converted"]} converted, {stats["skipped"]} unchanged, {stats["failed"]} failed',
+		file=sys.stderr
+	)
+
+	return 1 if stats['failed'] else 0
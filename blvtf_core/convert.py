@@ -0,0 +1,707 @@
+import json, os, shutil, traceback
+
+from pathlib import Path
+
+import numpy as np
+
+from .bins import blvtf_bin
+from .runner import blvtf_run, blvtf_run_error
+from .trace import blvtf_trace_stage
+from .probe import blvtf_probe_img
+from .scratch import blvtf_scratch_root, blvtf_scratch_dir
+from .vtf import blvtf_write_vtf, blvtf_vtf_native_formats, blvtf_vtf_image_formats, blvtf_vtf_flag_bits
+from .resample import blvtf_mip_chain, blvtf_resize_pow2, blvtf_linear_to_srgb, blvtf_resample_store, blvtf_resample_kernels
+from .filters import blvtf_sharpen, blvtf_sharpen_filter_names
+from .pack import blvtf_pack_channels, blvtf_write_tga
+from .magick import blvtf_magick_decode, blvtf_magick_convert, blvtf_magick_identify, blvtf_magick_error
+from .backends import blvtf_backend, blvtf_register_backend, blvtf_route_task, blvtf_tool_runs_here, blvtf_decoder_for
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                    Image -> VTF pipeline
+# ---------------------------------------------------------
+# =========================================================
+
+# Everything between a task dict (see blvtf_export_img_to_vtf) and the resulting VTF:
+# probing, decoding, packing, magick, VTFCmd and the built-in encoder.
+# Which one converts a task is decided by blvtf_core/backends.py.
+# Used by the addon and by the command line converter (blvtf_core/cli.py) alike.
+
+# Settings which are the same for every task come in as a plain dict:
+"""
+{
+	'vtfcmd_ver': 'new' or 'old' or 'native' or 'auto',
+	'backends': None or ['native', 'vtfcmd'],  # optional, overrides the order vtfcmd_ver gives, see blvtf_core/backends.py
+	'vtf_version': '7.4',
+	'vtf_dxt_quality': 'FAST',
+	'vtf_generate_thumb': True,
+	'vtf_scratch_folder': None or 'R:/blvtf_scratch',
+	'tmp_folder': None or 'C:/addons/blvtf/tmps',
+}
+"""
+
+# probe_cache is a blvtf_core.probe_cache.blvtf_probe_cache or None (probe every time)
+# tracer is a blvtf_core.trace.blvtf_trace or None (no timing trace)
+
+
+# Windows refuses command lines longer than 32767 characters,
+# grouped VTFCmd invocations stay well below that
+blvtf_vtfcmd_max_cmd_len = 24000
+
+# file extensions supported by VTFCmd. Everything else has to be converted with imagemagick beforehand
+blvtf_vtfcmd_supported = (
+	'.tga',
+	'.jpeg',
+	'.jpg',
+	'.png',
+	'.bmp',
+	'.dds',
+	'.gif',
+)
+
+blvtf_power_of_two = (
+	32_768,
+	16_384,
+	8192,
+	4096,
+	2048,
+	1024,
+	512,
+	256,
+	128,
+	64,
+	32,
+	16,
+	8,
+	4,
+	2,
+)
+
+blvtf_vtf_flags_s = (
+	'POINTSAMPLE',
+	'TRILINEAR',
+	'CLAMPS',
+	'CLAMPT',
+	'ANISOTROPIC',
+	'HINT_DXT5',
+	'NORMAL',
+	'NOMIP',
+	'NOLOD',
+	'MINMIP',
+	'PROCEDURAL',
+	'RENDERTARGET',
+	'DEPTHRENDERTARGET',
+	'NODEBUGOVERRIDE',
+	'SINGLECOPY',
+	'NODEPTHBUFFER',
+	'CLAMPU',
+	'VERTEXTEXTURE',
+	'SSBUMP',
+	'BORDER',
+)
+
+
+
+# get image info with imagemagick
+# only used for formats the header probe doesn't understand
+def blvtf_magix_probe_img(imgpath):
+	print('BLVTF: Header probe could not handle', imgpath, 'Falling back to magix')
+	identify_echo = blvtf_magick_identify(blvtf_bin('magick'), imgpath, '%w %h %A %[colorspace]')
+
+	width, height, alpha_mode, colorspace = identify_echo[:4]
+	has_alpha = not alpha_mode.lower() in ('false', 'undefined', 'off')
+	colour_channels = 1 if colorspace.lower() in ('gray', 'lineargray') else 3
+
+	return {
+		'width': int(width),
+		'height': int(height),
+		'channels': colour_channels + (1 if has_alpha else 0),
+		'alpha': has_alpha,
+	}
+
+# get image dimensions, channel count and whether the image has alpha
+# returns a dict, see blvtf_core/probe.py
+def blvtf_get_img_info(imgpath, probe_cache=None):
+	img_stat = os.stat(imgpath)
+
+	img_info = probe_cache.get(imgpath, img_stat) if probe_cache else None
+	if img_info:
+		return img_info
+
+	# Most of the formats can be probed by simply reading the header
+	img_info = blvtf_probe_img(imgpath) or blvtf_magix_probe_img(imgpath)
+
+	if probe_cache:
+		probe_cache.put(imgpath, img_stat, img_info)
+
+	return img_info
+
+# get image XY dimensions in pixels
+# returns XY tuple
+def blvtf_get_img_dims(imgpath, probe_cache=None):
+	img_info = blvtf_get_img_info(imgpath, probe_cache)
+
+	return (img_info['width'], img_info['height'])
+
+# convert an image to tga using imagemagick.
+# The TGA comes through a pipe, the only file written is the one VTFCmd reads
+def blvtf_img_to_tga(imgpath, workdir):
+	src_path = Path(imgpath)
+	tgt_path = Path(workdir) / f'{src_path.stem}.tga'
+
+	magix_prms = []
+	if src_path.suffix.lower().strip('.') in ('exr', 'hdr', 'tiff',):
+		magix_prms.append('-auto-gamma')
+
+	print('Converting', imgpath, 'Because its not supported by vtfcmd. Magix params:', magix_prms)
+	try:
+		tgt_path.write_bytes(blvtf_magick_convert(blvtf_bin('magick'), src_path, 'TGA', magix_prms))
+	except blvtf_magick_error as e:
+		print('BLVTF: Could not convert', imgpath, 'to TGA:', e)
+		return False
+
+	return tgt_path
+
+# Intermediate files are per-task, but tasks could still share the resulting VTF
+# (a.png and a.psd both produce a.vtf).
+# Such tasks are put into the same lane so that they never run at the same time
+def blvtf_task_lane(img_info):
+	return str(Path(img_info['dest']).with_suffix('.vtf')).lower()
+
+# Decode an image into a (height, width, 4) RGBA numpy array with imagemagick
+# hdr: float32 instead of uint8
+def blvtf_magix_decode_rgba(imgpath, img_dims, hdr=False):
+	return blvtf_magick_decode(blvtf_bin('magick'), imgpath, img_dims, hdr)
+
+# Decode an image into a (height, width, 4) RGBA numpy array with the first decoder which reads it:
+# the built-in TGA reader, or imagemagick
+def blvtf_decode_rgba(imgpath, img_dims, hdr=False):
+	decoder = blvtf_decoder_for(imgpath)
+	if not decoder:
+		# Fails with whatever magick has to say about it
+		return blvtf_magix_decode_rgba(imgpath, img_dims, hdr)
+
+	return decoder.decode(imgpath, img_dims, hdr)
+
+# Whether a pixel buffer from blvtf_read_img_pixels has any transparency
+def blvtf_pixels_alpha(rgba):
+	return bool((rgba[:, :, 3] < (255 if rgba.dtype == np.uint8 else 1.0)).any())
+
+# Pixel buffer from blvtf_read_img_pixels -> what blvtf_magix_decode_rgba would give
+def blvtf_pixels_as(rgba, hdr=False):
+	if hdr:
+		return rgba if rgba.dtype == np.float32 else rgba.astype(np.float32) * (1.0 / 255.0)
+
+	if rgba.dtype == np.uint8:
+		return rgba
+
+	# Float images are linear, same gamma correction as -auto-gamma does for exr
+	encoded = rgba.copy()
+	encoded[:, :, :3] = blvtf_linear_to_srgb(encoded[:, :, :3])
+	return blvtf_resample_store(encoded, np.uint8, False)
+
+# Whether the source of a task has alpha
+def blvtf_task_src_alpha(img_info, probe_cache=None):
+	if img_info.get('src_pixels') is not None:
+		return blvtf_pixels_alpha(img_info['src_pixels'])
+
+	return blvtf_get_img_info(img_info['src'], probe_cache)['alpha']
+
+# Images to pack into the channels of the task's image, as {target channel: (path or pixels, source channel)}.
+# Embedded alpha is packing into A, see blvtf_core/pack.py.
+# Sources missing from disk are skipped
+def blvtf_task_pack_layers(img_info):
+	pack_layers = {}
+	for target, (layer_src, layer_channel) in (img_info.get('channels') or {}).items():
+		if isinstance(layer_src, np.ndarray):
+			pack_layers[target] = (layer_src, layer_channel)
+		elif layer_src and Path(str(layer_src)).is_file():
+			pack_layers[target] = (Path(layer_src), layer_channel)
+
+	emb_alpha = img_info['emb_alpha']
+	if emb_alpha and Path(str(emb_alpha)).is_file():
+		pack_layers['A'] = (Path(emb_alpha), 'L')
+
+	return pack_layers
+
+# Decode an image and pack the pack_layers (see blvtf_task_pack_layers) into it.
+# Every image is decoded exactly once, mismatched sizes are resampled in memory.
+# src_pixels: pixels from blvtf_read_img_pixels to use instead of decoding imgpath
+def blvtf_load_img_rgba(imgpath, img_dims, pack_layers=None, hdr=False, filter_name='CUBIC', src_pixels=None, probe_cache=None):
+	if src_pixels is None:
+		rgba = blvtf_decode_rgba(imgpath, img_dims, hdr)
+	else:
+		rgba = blvtf_pixels_as(src_pixels, hdr)
+
+	if not pack_layers:
+		return rgba
+
+	# The same image could go into several channels (one RGB texture split into R/G/B)
+	decoded = {}
+
+	layers = {}
+	for target, (layer_path, layer_channel) in pack_layers.items():
+		if isinstance(layer_path, np.ndarray):
+			print('BLVTF: Packing Blender pixels', f'({layer_channel})', 'into', target)
+			layers[target] = (blvtf_pixels_as(layer_path, hdr), layer_channel, blvtf_pixels_alpha(layer_path))
+			continue
+
+		print('BLVTF: Packing', str(layer_path), f'({layer_channel})', 'into', target)
+		layer_info = blvtf_get_img_info(layer_path, probe_cache)
+		if not layer_path in decoded:
+			decoded[layer_path] = blvtf_decode_rgba(layer_path, (layer_info['width'], layer_info['height']), hdr)
+		layers[target] = (decoded[layer_path], layer_channel, layer_info['alpha'])
+
+	return blvtf_pack_channels(rgba, layers, filter_name)
+
+# Write the VTF with the built-in encoder (blvtf_core/vtf.py)
+# rgba: the decoded (and packed) image
+def blvtf_export_img_to_vtf_native(img_info, rgba, vtf_format, vtf_result, shared):
+	print('BLVTF: Natively encoding', str(img_info['src']), 'as', vtf_format)
+
+	# Align to a power of 2 and clamp, right in memory.
+	# The sharpen filter only applies if the image was actually resized
+	if img_info['resize']:
+		resized = blvtf_resize_pow2(rgba, img_info['resize'][0], img_info['resize'][1], img_info['clamp_dims'], img_info['srgb'])
+		if resized is not rgba:
+			rgba = blvtf_sharpen(resized, img_info['resize'][2])
+
+	# Gamma-correct mips for sRGB textures.
+	# Every level is sharpened on its own, the next level is still made from the unsharpened one
+	mips = False
+	if img_info['mips']:
+		mips = blvtf_mip_chain(rgba, img_info['mips'][0], img_info['srgb'])
+		mips[1:] = [blvtf_sharpen(mip, img_info['mips'][1]) for mip in mips[1:]]
+
+	blvtf_write_vtf(
+		vtf_result,
+		rgba,
+		vtf_format,
+		version=shared['vtf_version'],
+		flags=img_info['flags'],
+		mips=mips,
+		thumbnail=shared['vtf_generate_thumb'],
+		reflectivity=img_info['comp_refl'],
+		srgb=img_info['srgb'],
+		dxt_quality=shared['vtf_dxt_quality'],
+	)
+
+# Convert image from path to vtf
+# takes a dict of params
+"""
+{
+	'enc': ('(no alpha) DXT1', '(w alpha) DXT5'),
+	'mips': False or ('resize_filter', 'sharpen_filter'),
+	'comp_refl': True,
+	'srgb': True,
+	'src': 'W:/vid_dl/sex.tga',
+	'dest': 'W:/vid_dl/bdsm/pootis.vtf',
+	'src_pixels': None or (height, width, 4) array from blvtf_read_img_pixels, overrides reading src,
+	'emb_alpha': 'W:/vid_dl/specular.tga',
+	'channels': False or {'R': ('W:/vid_dl/ao.png', 'L'), 'G': ('W:/vid_dl/rough.png', 'R')},
+	'resize': False or ('resizing_rule', 'resize_filter', 'sharpen_filter'),
+	'clamp_dims': False or (512, 512),
+	'flags': ('NORMAL', 'NOMIP', 'MINMIP'),
+}
+"""
+def blvtf_export_img_to_vtf(img_info, shared, reporter=None, probe_cache=None, tracer=None):
+	return blvtf_export_imgs_to_vtf([img_info], shared, reporter, probe_cache=probe_cache, tracer=tracer)[0]
+
+# Check whether a task could be converted at all, report why if not
+# returns the image XY dimensions, or None
+def blvtf_check_vtf_task(img_info, reporter=None, probe_cache=None):
+	img_src = Path(img_info['src'])
+	vtf_dest = Path(img_info['dest'])
+	src_pixels = img_info.get('src_pixels')
+
+	# check whether the destination folder exists
+	if not vtf_dest.parent.is_dir():
+		if reporter:
+			reporter.blvtf_report({'WARNING'}, f'The destination folder >{vtf_dest.parent}< For the image >{img_src.name}< does not exist, skipping')
+		return None
+
+	# check whether the image is of applicable size
+	img_dims = blvtf_get_img_dims(img_src, probe_cache) if src_pixels is None else (src_pixels.shape[1], src_pixels.shape[0])
+	if (not img_dims[0] in blvtf_power_of_two or not img_dims[1] in blvtf_power_of_two) and not img_info['resize']:
+		if reporter:
+			reporter.blvtf_report({'WARNING'}, f"""Skipping image {img_src.name}, because it's of unapplicable size! {img_dims}, please enable resizing""")
+		return None
+
+	return img_dims
+
+# VTFCmd params of a task, everything besides the input files and the output folder.
+# Tasks with the same params can go through the same VTFCmd invocation
+# old: params for the old VTFCmd
+def blvtf_vtfcmd_params(img_info, shared, old=False):
+	vtfcmd_args = []
+
+	# resize to power of 2
+	if img_info['resize']:
+		vtfcmd_args.extend([
+			'-resize',
+			'-rmethod', img_info['resize'][0],
+			'-rfilter', img_info['resize'][1],
+		])
+		if old:
+			vtfcmd_args.extend([
+				'-rsharpen', img_info['resize'][2]
+			])
+
+	# clamp image XY
+	if img_info['resize'] and img_info['clamp_dims']:
+		vtfcmd_args.extend([
+			'-rclampwidth', img_info['clamp_dims'][0],
+			'-rclampheight', img_info['clamp_dims'][1],
+		])
+
+	# Specify vtf format
+	vtfcmd_args.extend([
+		'-format', img_info['enc'][0],
+		'-alphaformat', img_info['enc'][1],
+	])
+
+	# Mipmaps generation
+	if img_info['mips']:
+		vtfcmd_args.extend([
+			'-mfilter', img_info['mips'][0],
+		])
+		if old:
+			vtfcmd_args.extend([
+				'-msharpen', img_info['mips'][1],
+			])
+	else:
+		vtfcmd_args.append('-nomipmaps')
+
+	# Specify vtf version
+	vtfcmd_args.extend(['-version', shared['vtf_version']])
+
+	# compute reflectivity
+	if img_info['comp_refl'] != True:
+		vtfcmd_args.append('-noreflectivity')
+
+	# sRGB shit
+	if img_info['srgb'] == True:
+		vtfcmd_args.append('-srgb')
+
+	# Generate Thumbnail
+	if shared['vtf_generate_thumb'] != True:
+		vtfcmd_args.append('-nothumbnail')
+
+	# Add flags
+	for addflg in img_info['flags']:
+		vtfcmd_args.extend(['-flag', addflg])
+
+	return [str(c_arg) for c_arg in vtfcmd_args]
+
+# Group key of a batch task: tasks with equal keys end up with the same VTFCmd params
+def blvtf_vtfcmd_group_key(img_info):
+	return json.dumps([
+		img_info['enc'],
+		img_info['resize'],
+		img_info['clamp_dims'],
+		img_info['mips'],
+		img_info['comp_refl'],
+		img_info['srgb'],
+		sorted(img_info['flags']),
+	], default=str)
+
+# File VTFCmd could read the task's image from:
+# the source itself, a TGA converted by magick, or a TGA written from memory
+def blvtf_vtfcmd_input(img_info, img_dims, pack_layers, task_tmp, probe_cache=None, tracer=None, vtf_format=None):
+	img_src = Path(img_info['src'])
+	src_pixels = img_info.get('src_pixels')
+
+	# Packed channels and Blender pixels are handed to VTFCmd as a single TGA, written straight from memory.
+	# Otherwise convert to applicable format, if needed
+	if pack_layers or src_pixels is not None:
+		with blvtf_trace_stage(tracer, 'pack', img_src, vtf_format) as pack_trace:
+			pack_filter = img_info['resize'][1] if img_info['resize'] else 'CUBIC'
+			tga_path = blvtf_write_tga(
+				task_tmp / f'{img_src.stem}.tga',
+				blvtf_load_img_rgba(img_src, img_dims, pack_layers, False, pack_filter, src_pixels, probe_cache)
+			)
+			pack_trace.read_files(img_src if src_pixels is None else None, *[layer_src for layer_src, layer_channel in pack_layers.values()])
+			pack_trace.wrote_files(tga_path)
+		return tga_path
+
+	if not img_src.suffix in blvtf_vtfcmd_supported:
+		with blvtf_trace_stage(tracer, 'to_tga', img_src, vtf_format) as tga_trace:
+			tga_path = blvtf_img_to_tga(img_src, task_tmp)
+			tga_trace.ok = bool(tga_path)
+			tga_trace.read_files(img_src)
+			tga_trace.wrote_files(tga_path)
+		return tga_path
+
+	return img_src
+
+# Split the inputs of one VTFCmd params group into invocations.
+# VTFCmd names outputs after the inputs, so names have to be unique within an invocation,
+# and the command line has a length limit on Windows
+# inputs: [(task idx, input filepath, vtf result)]
+def blvtf_vtfcmd_invocations(inputs, max_files=None):
+	max_files = max_files or len(inputs)
+	invocations = []
+	for task_input in inputs:
+		input_stem = task_input[1].stem.lower()
+		for invocation in invocations:
+			if len(invocation['inputs']) < max_files and not input_stem in invocation['stems'] and invocation['cmd_len'] + len(str(task_input[1])) < blvtf_vtfcmd_max_cmd_len:
+				break
+		else:
+			invocation = {'inputs': [], 'stems': set(), 'cmd_len': 0}
+			invocations.append(invocation)
+
+		invocation['inputs'].append(task_input)
+		invocation['stems'].add(input_stem)
+		invocation['cmd_len'] += len(str(task_input[1])) + len(' -file ""')
+
+	return [invocation['inputs'] for invocation in invocations]
+
+# Run VTFCmd once for a bunch of input files sharing the same params
+def blvtf_run_vtfcmd(vtfcmd_params, input_files, output_dir, old=False):
+	vtfcmd_args = [str(blvtf_bin('vtfcmd_old' if old else 'vtfcmd'))]
+	for input_filepath in input_files:
+		vtfcmd_args.extend(['-file', str(input_filepath)])
+
+	vtfcmd_args.extend(vtfcmd_params)
+
+	# Specify output folder.
+	# VTFCmd names the output after the input, so it goes into the scratch folder first
+	vtfcmd_args.extend([
+		'-output', str(output_dir),
+	])
+
+	# execute conversion.
+	# VTFCmd fails the exit code if any of the files failed, the rest could still be fine.
+	# Which ones made it is decided by the outputs
+	print('Executing VTF conversion of', len(input_files), 'images', vtfcmd_args)
+	vtf_run = blvtf_run(vtfcmd_args, 'vtfcmd', check=False, timeout_scale=len(input_files))
+
+	print('echo:', vtf_run.echo())
+
+	return vtf_run
+
+# Convert the VTFCmd jobs of a group (see blvtf_backend.convert).
+# Jobs with the same VTFCmd params go through a single VTFCmd invocation,
+# so the VTFCmd startup is paid once per group, not once per image
+def blvtf_vtfcmd_convert(jobs, group_tmp, shared, reporter=None, group_size=None, probe_cache=None, tracer=None, old=False):
+	results = {}
+
+	# VTFCmd params -> [(job idx, input filepath, vtf result)]
+	vtfcmd_groups = {}
+	# job idx -> job
+	job_map = {}
+	for job in jobs:
+		img_info = job['img_info']
+		job_map[job['idx']] = job
+		try:
+			# Inputs of every task get their own folder, so that a.png and a.psd converted to a.tga don't collide
+			task_tmp = group_tmp / f'task_{job["idx"]}'
+			task_tmp.mkdir()
+
+			input_filepath = blvtf_vtfcmd_input(img_info, job['img_dims'], job['pack_layers'], task_tmp, probe_cache, tracer, job['vtf_format'])
+			if not input_filepath:
+				continue
+
+			vtfcmd_groups.setdefault(tuple(blvtf_vtfcmd_params(img_info, shared, old)), []).append(
+				(job['idx'], Path(input_filepath), job['vtf_result'])
+			)
+		except Exception as e:
+			# One broken image should not take the whole group down
+			print('BLVTF: Task failed', img_info.get('src'), e)
+			traceback.print_exc()
+
+	invocation_idx = 0
+	for vtfcmd_params, vtfcmd_inputs in vtfcmd_groups.items():
+		for invocation in blvtf_vtfcmd_invocations(vtfcmd_inputs, group_size):
+			output_dir = group_tmp / f'out_{invocation_idx}'
+			output_dir.mkdir()
+			invocation_idx += 1
+
+			input_files = [input_filepath for job_idx, input_filepath, vtf_result in invocation]
+			invocation_trace = blvtf_trace_stage(
+				tracer,
+				'vtfcmd',
+				[job_map[job_idx]['img_info']['src'] for job_idx, input_filepath, vtf_result in invocation],
+				'/'.join(sorted(set(str(job_map[job_idx]['vtf_format']) for job_idx, input_filepath, vtf_result in invocation))),
+				len(invocation)
+			)
+
+			# A hung or crashed VTFCmd only fails the images of this invocation
+			try:
+				with invocation_trace:
+					invocation_trace.read_files(*input_files)
+					vtf_run = blvtf_run_vtfcmd(vtfcmd_params, input_files, output_dir, old)
+					invocation_trace.wrote_files(*output_dir.iterdir())
+			except blvtf_run_error as e:
+				for job_idx, input_filepath, vtf_result in invocation:
+					if reporter:
+						reporter.blvtf_report({'WARNING'}, f'Could not convert {Path(job_map[job_idx]["img_info"]["src"]).name}: {e}')
+				continue
+
+			# Map the outputs back to their destinations
+			for job_idx, input_filepath, vtf_result in invocation:
+				img_src = job_map[job_idx]['img_info']['src']
+				vtfcmd_output = output_dir / f'{input_filepath.stem}.vtf'
+				if not vtfcmd_output.is_file():
+					if reporter:
+						reporter.blvtf_report({'WARNING'}, f'VTFCmd did not convert {Path(img_src).name} (exit code {vtf_run.returncode})')
+					continue
+
+				try:
+					with blvtf_trace_stage(tracer, 'move', img_src, job_map[job_idx]['vtf_format']) as move_trace:
+						# On the same volume it's a rename, nothing gets copied
+						if tracer and os.stat(vtfcmd_output).st_dev != os.stat(vtf_result.parent).st_dev:
+							move_trace.read_files(vtfcmd_output)
+							move_trace.wrote_files(vtfcmd_output)
+						shutil.move(str(vtfcmd_output), str(vtf_result))
+				except OSError as e:
+					if reporter:
+						reporter.blvtf_report({'WARNING'}, f'Could not move the VTF of {Path(img_src).name} into place: {e}')
+					continue
+				results[job_idx] = vtf_result
+
+	return results
+
+# Convert the jobs of a group with the built-in encoder, one by one
+def blvtf_native_convert(jobs, shared, probe_cache=None, tracer=None):
+	results = {}
+	for job in jobs:
+		img_info = job['img_info']
+		img_src = Path(img_info['src'])
+		pack_layers = job['pack_layers']
+		vtf_format = job['vtf_format']
+		try:
+			with blvtf_trace_stage(tracer, 'decode', img_src, vtf_format) as decode_trace:
+				# Packed layers are resampled to the image size with the resize filter, if there's one
+				pack_filter = img_info['resize'][1] if img_info['resize'] else 'CUBIC'
+				rgba = blvtf_load_img_rgba(img_src, job['img_dims'], pack_layers, vtf_format in ('RGBA16161616F', 'RGBA16161616'), pack_filter, img_info.get('src_pixels'), probe_cache)
+				decode_trace.read_files(img_src if img_info.get('src_pixels') is None else None, *[layer_src for layer_src, layer_channel in pack_layers.values()])
+
+			with blvtf_trace_stage(tracer, 'encode', img_src, vtf_format) as encode_trace:
+				blvtf_export_img_to_vtf_native(img_info, rgba, vtf_format, job['vtf_result'], shared)
+				encode_trace.wrote_files(job['vtf_result'])
+
+			results[job['idx']] = job['vtf_result']
+		except Exception as e:
+			print('BLVTF: Task failed', img_info.get('src'), e)
+			traceback.print_exc()
+
+	return results
+
+
+class blvtf_backend_vtfcmd(blvtf_backend):
+	"""VTFCmd (Reloaded or the old one). Reads a few formats from disk, everything else comes in as a TGA"""
+	reads = blvtf_vtfcmd_supported
+	writes = tuple(blvtf_vtf_image_formats)
+	filters = tuple(blvtf_resample_kernels)
+	flags = blvtf_vtf_flags_s
+	batches = True
+
+	def __init__(self, old=False):
+		self.old = old
+		self.name = 'vtfcmd_old' if old else 'vtfcmd'
+		# Only the old one has -rsharpen / -msharpen
+		self.sharpen_filters = blvtf_sharpen_filter_names if old else None
+		# A process per group (and under Wine, a Wine startup too)
+		self.speed = 3 if old else 2
+
+	def available(self):
+		return blvtf_tool_runs_here(self.name)
+
+	def convert(self, jobs, group_tmp, shared, reporter=None, group_size=None, probe_cache=None, tracer=None):
+		return blvtf_vtfcmd_convert(jobs, group_tmp, shared, reporter, group_size, probe_cache, tracer, self.old)
+
+
+class blvtf_backend_native(blvtf_backend):
+	"""The built-in encoder (blvtf_core/vtf.py), in this very process"""
+	name = 'native'
+	takes_pixels = True
+	writes = blvtf_vtf_native_formats
+	filters = tuple(blvtf_resample_kernels)
+	sharpen_filters = blvtf_sharpen_filter_names
+	flags = tuple(blvtf_vtf_flag_bits)
+	# No process startup and no intermediate files
+	speed = 1
+
+	def convert(self, jobs, group_tmp, shared, reporter=None, group_size=None, probe_cache=None, tracer=None):
+		return blvtf_native_convert(jobs, shared, probe_cache, tracer)
+
+
+blvtf_register_backend(blvtf_backend_vtfcmd())
+blvtf_register_backend(blvtf_backend_vtfcmd(old=True))
+blvtf_register_backend(blvtf_backend_native())
+
+# Convert a bunch of images to VTF.
+# Every task goes to the backend blvtf_core/backends.py picks for it,
+# every backend then converts its share of the group in one go.
+# returns a list with the resulting VTF path (or None, if it failed) for every task
+def blvtf_export_imgs_to_vtf(img_infos, shared, reporter=None, group_size=None, probe_cache=None, tracer=None):
+	results = [None] * len(img_infos)
+
+	# Every intermediate file of this group lives in its own scratch folder,
+	# which is deleted once the group is done, successfully or not
+	scratch_root = blvtf_scratch_root(shared.get('vtf_scratch_folder'), shared.get('tmp_folder'))
+	with blvtf_scratch_dir(scratch_root) as group_tmp:
+		# backend name -> (backend, [jobs])
+		backend_jobs = {}
+
+		for task_idx, img_info in enumerate(img_infos):
+			try:
+				img_src = Path(img_info['src'])
+
+				with blvtf_trace_stage(tracer, 'probe', img_src) as probe_trace:
+					img_dims = blvtf_check_vtf_task(img_info, reporter, probe_cache)
+					if not img_dims:
+						continue
+
+					pack_layers = blvtf_task_pack_layers(img_info)
+
+					# Whether the result has alpha decides the format.
+					# Only probed if the backend (or the trace) has to know it beforehand
+					has_alpha = []
+					def task_alpha():
+						if not has_alpha:
+							has_alpha.append('A' in pack_layers or blvtf_task_src_alpha(img_info, probe_cache))
+						return has_alpha[0]
+
+					backend, vtf_format = blvtf_route_task(img_info, shared, pack_layers, task_alpha)
+					if not backend:
+						if reporter:
+							reporter.blvtf_report({'WARNING'}, f'Nothing can convert {img_src.name}: {vtf_format}')
+						continue
+
+					if not vtf_format and (backend.takes_pixels or tracer):
+						vtf_format = img_info['enc'][1] if task_alpha() else img_info['enc'][0]
+					probe_trace.vtf_format = vtf_format
+
+				backend_jobs.setdefault(backend.name, (backend, []))[1].append({
+					'idx': task_idx,
+					'img_info': img_info,
+					'img_dims': img_dims,
+					'pack_layers': pack_layers,
+					'vtf_format': vtf_format,
+					'vtf_result': Path(img_info['dest']).with_suffix('.vtf'),
+				})
+			except Exception as e:
+				# One broken image should not take the whole group down
+				print('BLVTF: Task failed', img_info.get('src'), e)
+				traceback.print_exc()
+
+		for backend, jobs in backend_jobs.values():
+			try:
+				for task_idx, vtf_result in backend.convert(jobs, group_tmp, shared, reporter, group_size, probe_cache, tracer).items():
+					results[task_idx] = vtf_result
+			except Exception as e:
+				print('BLVTF: Backend', backend.name, 'failed', e)
+				traceback.print_exc()
+
+	# 
+	# Write VMT, if any
+	# 
+	for img_info in img_infos:
+		vmt_preset_name = img_info.get('vmt_preset')
+		if vmt_preset_name:
+			pass
+
+	return results
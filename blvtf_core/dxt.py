@@ -0,0 +1,482 @@
+import math
+
+import numpy as np
+
+from itertools import combinations_with_replacement
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                  DXT (BC1/BC2/BC3) encoder
+# ---------------------------------------------------------
+# =========================================================
+
+# The whole image is cut into 4x4 blocks, which are then processed in big numpy batches.
+# There are no per-block Python loops anywhere in here.
+
+# Two quality tiers:
+#  - FAST: range fit. Endpoints are the two extreme pixels along the principal axis of the block.
+#  - QUALITY: cluster fit. Pixels are sorted along the principal axis and the splits
+#    of that order into 4 (or 3) clusters are solved with least squares.
+#    Whichever is better per block wins, so QUALITY is never worse than FAST.
+#    Flat blocks which FAST already encodes perfectly skip the cluster fit.
+
+# Input is always a (height, width, 4) uint8 RGBA array.
+# Sizes which are not a multiple of 4 are padded by repeating the edge pixels.
+
+
+blvtf_dxt_formats = ('DXT1', 'DXT1_ONEBITALPHA', 'DXT3', 'DXT5')
+blvtf_dxt_qualities = ('FAST', 'QUALITY')
+
+blvtf_dxt_block_bytes = {
+	'DXT1': 8,
+	'DXT1_ONEBITALPHA': 8,
+	'DXT3': 16,
+	'DXT5': 16,
+}
+
+# How many blocks are processed at once.
+# Cluster fit evaluates ~1000 candidate endpoint pairs per block,
+# so it has to go in much smaller batches
+blvtf_dxt_chunk = 32768
+blvtf_dxt_cluster_chunk = 256
+
+# 1 bit alpha threshold
+blvtf_dxt_alpha_cutoff = 128
+
+blvtf_dxt_565_max = np.array((31, 63, 31), dtype=np.float32)
+
+# Every way to cut 16 sorted pixels into consecutive clusters, as the indices where the clusters end.
+# Clusters could be empty
+blvtf_dxt_partitions_4 = np.array(list(combinations_with_replacement(range(17), 3)), dtype=np.intp)
+blvtf_dxt_partitions_3 = np.array(list(combinations_with_replacement(range(17), 2)), dtype=np.intp)
+
+# How far cluster fit looks around the range fit partition
+blvtf_dxt_cluster_window = 1
+blvtf_dxt_window_offsets_4 = np.stack(np.meshgrid(*[np.arange(-blvtf_dxt_cluster_window, blvtf_dxt_cluster_window + 1)] * 3, indexing='ij'), axis=-1).reshape(-1, 3)
+blvtf_dxt_window_offsets_3 = np.stack(np.meshgrid(*[np.arange(-blvtf_dxt_cluster_window, blvtf_dxt_cluster_window + 1)] * 2, indexing='ij'), axis=-1).reshape(-1, 2)
+
+# Weight of the first endpoint in every cluster, in the order of the clusters
+blvtf_dxt_cluster_alphas_4 = (1.0, 2.0 / 3.0, 1.0 / 3.0, 0.0)
+blvtf_dxt_cluster_alphas_3 = (1.0, 0.5, 0.0)
+
+
+
+
+# =========================================================
+#                          Helpers
+# =========================================================
+
+# (height, width, 4) -> (blocks, 16 pixels, 4)
+def blvtf_dxt_split_blocks(rgba):
+	height, width = rgba.shape[:2]
+	rgba = np.pad(rgba, ((0, (-height) % 4), (0, (-width) % 4), (0, 0)), mode='edge')
+
+	bh, bw = rgba.shape[0] // 4, rgba.shape[1] // 4
+	return rgba.reshape(bh, 4, bw, 4, 4).transpose(0, 2, 1, 3, 4).reshape(-1, 16, 4), bh, bw
+
+
+# (blocks, 16 pixels, 4) -> (height, width, 4)
+def blvtf_dxt_join_blocks(blocks, bh, bw, width, height):
+	return blocks.reshape(bh, bw, 4, 4, 4).transpose(0, 2, 1, 3, 4).reshape(bh * 4, bw * 4, 4)[:height, :width]
+
+
+# 0-255 floats -> 565 grid
+def blvtf_dxt_quantize(col):
+	return np.clip(np.rint(col * (blvtf_dxt_565_max / 255.0)), 0, blvtf_dxt_565_max).astype(np.int32)
+
+
+# 565 grid -> 0-255, the way the hardware expands it
+def blvtf_dxt_expand(quant):
+	return np.stack((
+		(quant[..., 0] << 3) | (quant[..., 0] >> 2),
+		(quant[..., 1] << 2) | (quant[..., 1] >> 4),
+		(quant[..., 2] << 3) | (quant[..., 2] >> 2),
+	), axis=-1)
+
+
+def blvtf_dxt_pack565(quant):
+	return (quant[..., 0] << 11) | (quant[..., 1] << 5) | quant[..., 2]
+
+
+def blvtf_dxt_unpack565(packed):
+	packed = packed.astype(np.int32)
+	return np.stack(((packed >> 11) & 31, (packed >> 5) & 63, packed & 31), axis=-1)
+
+
+# Principal axis of every block's colours (weighted),
+# found with a few rounds of power iteration on the covariance matrix
+def blvtf_dxt_principal_axis(pts, weights):
+	wsum = np.maximum(weights.sum(axis=1), 1e-6)
+	mean = np.matmul(weights[:, None, :], pts)[:, 0] / wsum[:, None]
+	delta = pts - mean[:, None, :]
+	cov = np.matmul((delta * weights[:, :, None]).transpose(0, 2, 1), delta)
+
+	# start from the row with the largest variance
+	diag = np.einsum('nii->ni', cov)
+	axis = cov[np.arange(len(cov)), diag.argmax(axis=1)]
+	for iteration in range(8):
+		axis = np.matmul(cov, axis[:, :, None])[:, :, 0]
+		axis /= np.maximum(np.abs(axis).max(axis=1, keepdims=True), 1e-12)
+
+	return axis
+
+
+
+
+# =========================================================
+#                        Colour block
+# =========================================================
+
+# Endpoints are the extreme pixels along the axis
+def blvtf_dxt_range_fit(pts, weights, axis):
+	proj = np.matmul(pts, axis[:, :, None])[:, :, 0]
+	used = weights > 0
+	block_idx = np.arange(len(pts))
+
+	start = pts[block_idx, np.where(used, proj, -np.inf).argmax(axis=1)]
+	end = pts[block_idx, np.where(used, proj, np.inf).argmin(axis=1)]
+
+	return blvtf_dxt_quantize(start), blvtf_dxt_quantize(end)
+
+
+# Least squares endpoints for every candidate partition of the sorted pixels, the best one wins.
+# Candidates are the partitions within blvtf_dxt_cluster_window of the one range fit would produce
+# (None = every possible partition, like squish does. ~20x slower for ~0.05 dB).
+# three_color: same for every block passed in
+def blvtf_dxt_cluster_fit(pts, weights, axis, three_color, window=None):
+	if three_color:
+		alphas = blvtf_dxt_cluster_alphas_3
+	else:
+		alphas = blvtf_dxt_cluster_alphas_4
+	cluster_count = len(alphas)
+
+	# Transparent pixels (weight 0) go to the end, they don't affect anything
+	proj = np.matmul(pts, axis[:, :, None])[:, :, 0]
+	used = weights > 0
+	proj = np.where(used, proj, np.inf)
+	order = proj.argsort(axis=1)
+	proj = np.take_along_axis(proj, order, axis=1)
+	pts = np.take_along_axis(pts, order[:, :, None], axis=1)
+	weights = np.take_along_axis(weights, order, axis=1)
+	used = np.take_along_axis(used, order, axis=1)
+
+	blk_count = len(pts)
+
+	# Candidate partitions as (blocks, candidates) arrays of cluster ends
+	if window == None:
+		partitions = blvtf_dxt_partitions_3 if three_color else blvtf_dxt_partitions_4
+		partitions = np.broadcast_to(partitions, (blk_count,) + partitions.shape)
+	else:
+		# The partition range fit would make: pixels go to the closest of the evenly spaced palette entries
+		proj_min = proj[:, :1]
+		proj_max = np.where(used, proj, -np.inf).max(axis=1, keepdims=True)
+		proj_range = np.maximum(proj_max - proj_min, 1e-6)
+		nearest = np.rint((np.where(used, proj, proj_max) - proj_min) / proj_range * (cluster_count - 1))
+		natural = np.stack([
+			((nearest <= cluster_idx) & used).sum(axis=1)
+			for cluster_idx in range(cluster_count - 1)
+		], axis=1)
+
+		offsets = blvtf_dxt_window_offsets_3 if three_color else blvtf_dxt_window_offsets_4
+		partitions = np.sort(np.clip(natural[:, None, :] + offsets[None], 0, 16), axis=2)
+
+	cand_count = partitions.shape[1]
+	bounds = [np.zeros((blk_count, cand_count), dtype=np.intp)] + [partitions[:, :, col] for col in range(cluster_count - 1)] + [np.full((blk_count, cand_count), 16, dtype=np.intp)]
+
+	# Prefix sums, so that the sums over any cluster are a single subtraction
+	sum_w = np.zeros((blk_count, 17), dtype=np.float32)
+	sum_w[:, 1:] = np.cumsum(weights, axis=1)
+	sum_wx = np.zeros((blk_count, 17, 3), dtype=np.float32)
+	sum_wx[:, 1:] = np.cumsum(pts * weights[:, :, None], axis=1)
+
+	alpha_x = 0.0
+	alpha2 = 0.0
+	beta2 = 0.0
+	alpha_beta = 0.0
+	for cluster_idx, alpha in enumerate(alphas):
+		cluster_w = np.take_along_axis(sum_w, bounds[cluster_idx + 1], axis=1) - np.take_along_axis(sum_w, bounds[cluster_idx], axis=1)
+		if alpha:
+			cluster_wx = (
+				np.take_along_axis(sum_wx, bounds[cluster_idx + 1][:, :, None], axis=1)
+				- np.take_along_axis(sum_wx, bounds[cluster_idx][:, :, None], axis=1)
+			)
+			alpha_x = alpha_x + alpha * cluster_wx
+		alpha2 = alpha2 + (alpha * alpha) * cluster_w
+		beta2 = beta2 + ((1.0 - alpha) ** 2) * cluster_w
+		alpha_beta = alpha_beta + (alpha * (1.0 - alpha)) * cluster_w
+
+	# alpha + beta = 1 for every pixel
+	beta_x = sum_wx[:, 16][:, None, :] - alpha_x
+
+	det = alpha2 * beta2 - alpha_beta * alpha_beta
+	solvable = det > 1e-6
+	inv_det = np.where(solvable, 1.0 / np.where(solvable, det, 1.0), 0.0)[:, :, None]
+
+	col_a = (alpha_x * beta2[:, :, None] - beta_x * alpha_beta[:, :, None]) * inv_det
+	col_b = (beta_x * alpha2[:, :, None] - alpha_x * alpha_beta[:, :, None]) * inv_det
+
+	# Everything in a single cluster: both endpoints are the mean
+	mean = (sum_wx[:, 16] / np.maximum(sum_w[:, 16], 1e-6)[:, None])[:, None, :]
+	col_a = np.where(solvable[:, :, None], col_a, mean)
+	col_b = np.where(solvable[:, :, None], col_b, mean)
+
+	quant_a = blvtf_dxt_quantize(col_a)
+	quant_b = blvtf_dxt_quantize(col_b)
+	exp_a = blvtf_dxt_expand(quant_a).astype(np.float32)
+	exp_b = blvtf_dxt_expand(quant_b).astype(np.float32)
+
+	# Squared error of the partition with the quantized endpoints (minus the constant sum of x^2)
+	err = (
+		exp_a * exp_a * alpha2[:, :, None]
+		+ exp_b * exp_b * beta2[:, :, None]
+		+ 2.0 * (exp_a * exp_b * alpha_beta[:, :, None] - exp_a * alpha_x - exp_b * beta_x)
+	).sum(axis=2)
+
+	best = err.argmin(axis=1)
+	block_idx = np.arange(blk_count)
+
+	return quant_a[block_idx, best], quant_b[block_idx, best]
+
+
+# Final colour block from the endpoints: orders the endpoints for the block mode
+# and picks the closest palette entry for every pixel.
+# three_color: (blocks,) bool, blocks which use the 3 colour + transparent mode
+# returns (c0, c1, indices, squared error)
+def blvtf_dxt_color_indices(pts, weights, three_color, quant0, quant1):
+	packed0 = blvtf_dxt_pack565(quant0)
+	packed1 = blvtf_dxt_pack565(quant1)
+
+	# c0 > c1 means 4 colours, c0 <= c1 means 3 colours + transparent
+	swap = np.where(three_color, packed0 > packed1, packed0 < packed1)
+	packed0, packed1 = np.where(swap, packed1, packed0), np.where(swap, packed0, packed1)
+	quant0, quant1 = np.where(swap[:, None], quant1, quant0), np.where(swap[:, None], quant0, quant1)
+
+	exp0 = blvtf_dxt_expand(quant0).astype(np.float32)
+	exp1 = blvtf_dxt_expand(quant1).astype(np.float32)
+
+	palette4 = np.stack((exp0, exp1, (2.0 * exp0 + exp1) / 3.0, (exp0 + 2.0 * exp1) / 3.0), axis=1)
+	palette3 = np.stack((exp0, exp1, (exp0 + exp1) * 0.5, np.zeros_like(exp0)), axis=1)
+	palette = np.where(three_color[:, None, None], palette3, palette4)
+
+	dist = (
+		(pts * pts).sum(axis=2)[:, :, None]
+		- 2.0 * np.matmul(pts, palette.transpose(0, 2, 1))
+		+ (palette * palette).sum(axis=2)[:, None, :]
+	)
+	# index 3 is reserved for transparency
+	dist[three_color, :, 3] = np.inf
+	# c0 == c1 in the 4 colour mode would flip the block into the 3 colour mode
+	dist[(~three_color) & (packed0 == packed1), :, 1:] = np.inf
+
+	indices = dist.argmin(axis=2)
+	err = (np.maximum(np.take_along_axis(dist, indices[:, :, None], axis=2)[:, :, 0], 0.0) * weights).sum(axis=1)
+
+	indices[three_color[:, None] & (weights == 0)] = 3
+
+	return packed0, packed1, indices, err
+
+
+def blvtf_dxt_fit_colors(pts, weights, three_color, quality):
+	axis = blvtf_dxt_principal_axis(pts, weights)
+	packed0, packed1, indices, err = blvtf_dxt_color_indices(pts, weights, three_color, *blvtf_dxt_range_fit(pts, weights, axis))
+
+	if quality != 'QUALITY':
+		return packed0, packed1, indices
+
+	# Only bother with the blocks range fit didn't nail
+	for mode in (False, True):
+		todo = np.flatnonzero((err > 0) & (three_color == mode))
+		for chunk_start in range(0, len(todo), blvtf_dxt_cluster_chunk):
+			sel = todo[chunk_start:chunk_start + blvtf_dxt_cluster_chunk]
+			quant0, quant1 = blvtf_dxt_cluster_fit(pts[sel], weights[sel], axis[sel], mode, blvtf_dxt_cluster_window)
+			c_packed0, c_packed1, c_indices, c_err = blvtf_dxt_color_indices(pts[sel], weights[sel], three_color[sel], quant0, quant1)
+
+			better = c_err < err[sel]
+			sel = sel[better]
+			packed0[sel] = c_packed0[better]
+			packed1[sel] = c_packed1[better]
+			indices[sel] = c_indices[better]
+
+	return packed0, packed1, indices
+
+
+
+
+# =========================================================
+#                        Alpha block
+# =========================================================
+
+# Interpolated alpha palettes of DXT5:
+# a0 > a1: a0, a1 and 6 values in between
+# a0 <= a1: a0, a1, 4 values in between, 0, 255
+def blvtf_dxt5_alpha_palette(alpha0, alpha1):
+	alpha0 = alpha0.astype(np.int32)[:, None]
+	alpha1 = alpha1.astype(np.int32)[:, None]
+
+	steps8 = np.arange(1, 7, dtype=np.int32)[None, :]
+	palette8 = np.concatenate((alpha0, alpha1, ((7 - steps8) * alpha0 + steps8 * alpha1 + 3) // 7), axis=1)
+
+	steps6 = np.arange(1, 5, dtype=np.int32)[None, :]
+	extremes = np.broadcast_to(np.array((0, 255), dtype=np.int32), (len(alpha0), 2))
+	palette6 = np.concatenate((alpha0, alpha1, ((5 - steps6) * alpha0 + steps6 * alpha1 + 2) // 5, extremes), axis=1)
+
+	return np.where(alpha0 > alpha1, palette8, palette6)
+
+
+def blvtf_dxt5_alpha_indices(alpha, alpha0, alpha1):
+	palette = blvtf_dxt5_alpha_palette(alpha0, alpha1)
+	dist = (alpha[:, :, None] - palette[:, None, :]) ** 2
+	indices = dist.argmin(axis=2)
+	return indices, np.take_along_axis(dist, indices[:, :, None], axis=2)[:, :, 0].sum(axis=1)
+
+
+# returns the 64 bit alpha blocks
+def blvtf_dxt5_alpha(alpha, quality):
+	alpha = alpha.astype(np.int32)
+
+	# 8 value mode over the full range
+	alpha0 = alpha.max(axis=1)
+	alpha1 = alpha.min(axis=1)
+	indices, err = blvtf_dxt5_alpha_indices(alpha, alpha0, alpha1)
+
+	if quality == 'QUALITY':
+		# 6 value mode over everything but 0 and 255, which are available for free
+		middle = (alpha > 0) & (alpha < 255)
+		low = np.where(middle, alpha, 255).min(axis=1)
+		high = np.where(middle, alpha, 0).max(axis=1)
+		no_middle = low > high
+		low[no_middle] = 0
+		high[no_middle] = 0
+
+		indices6, err6 = blvtf_dxt5_alpha_indices(alpha, low, high)
+		better = err6 < err
+		alpha0 = np.where(better, low, alpha0)
+		alpha1 = np.where(better, high, alpha1)
+		indices = np.where(better[:, None], indices6, indices)
+
+	bits = (indices.astype(np.uint64) << (np.arange(16, dtype=np.uint64) * np.uint64(3))).sum(axis=1, dtype=np.uint64)
+
+	return alpha0.astype(np.uint64) | (alpha1.astype(np.uint64) << np.uint64(8)) | (bits << np.uint64(16))
+
+
+# 4 bit explicit alpha
+def blvtf_dxt3_alpha(alpha):
+	alpha4 = ((alpha.astype(np.uint32) * 15 + 127) // 255).astype(np.uint64)
+	return (alpha4 << (np.arange(16, dtype=np.uint64) * np.uint64(4))).sum(axis=1, dtype=np.uint64)
+
+
+
+
+# =========================================================
+#                         Encoder
+# =========================================================
+
+# rgba: (height, width, 4) uint8
+# returns the raw blocks, ready to be written into a VTF/DDS
+def blvtf_dxt_compress(rgba, dxt_format='DXT1', quality='FAST'):
+	if not dxt_format in blvtf_dxt_formats:
+		raise ValueError(f'Not a DXT format: {dxt_format}')
+
+	blocks, bh, bw = blvtf_dxt_split_blocks(rgba)
+	blk_count = len(blocks)
+
+	# as uint32 words: [alpha block lo, alpha block hi,] colours, indices
+	words = 4 if dxt_format in ('DXT3', 'DXT5') else 2
+	out = np.empty((blk_count, words), dtype='<u4')
+
+	pixel_shift = np.arange(16, dtype=np.uint32) * 2
+
+	for chunk_start in range(0, blk_count, blvtf_dxt_chunk):
+		chunk = blocks[chunk_start:chunk_start + blvtf_dxt_chunk]
+		out_chunk = out[chunk_start:chunk_start + blvtf_dxt_chunk]
+
+		pts = chunk[:, :, :3].astype(np.float32)
+		alpha = chunk[:, :, 3]
+
+		if dxt_format == 'DXT1_ONEBITALPHA':
+			weights = (alpha >= blvtf_dxt_alpha_cutoff).astype(np.float32)
+			three_color = weights.min(axis=1) == 0
+		else:
+			weights = np.ones(alpha.shape, dtype=np.float32)
+			three_color = np.zeros(len(chunk), dtype=bool)
+
+		packed0, packed1, indices = blvtf_dxt_fit_colors(pts, weights, three_color, quality)
+
+		out_chunk[:, -2] = packed0.astype(np.uint32) | (packed1.astype(np.uint32) << 16)
+		out_chunk[:, -1] = (indices.astype(np.uint32) << pixel_shift).sum(axis=1, dtype=np.uint32)
+
+		if words == 4:
+			alpha_blocks = blvtf_dxt5_alpha(alpha, quality) if dxt_format == 'DXT5' else blvtf_dxt3_alpha(alpha)
+			out_chunk[:, 0] = (alpha_blocks & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+			out_chunk[:, 1] = (alpha_blocks >> np.uint64(32)).astype(np.uint32)
+
+	return out.tobytes()
+
+
+
+
+# =========================================================
+#                    Decoder / Metrics
+# =========================================================
+
+# Decode raw DXT blocks back to a (height, width, 4) uint8 array.
+# Used for error metrics and previews
+def blvtf_dxt_decode(data, width, height, dxt_format='DXT1'):
+	bw = max(1, (width + 3) // 4)
+	bh = max(1, (height + 3) // 4)
+	words = 4 if dxt_format in ('DXT3', 'DXT5') else 2
+
+	raw = np.frombuffer(data, dtype='<u4', count=bw * bh * words).reshape(-1, words)
+
+	packed0 = raw[:, -2] & 0xFFFF
+	packed1 = raw[:, -2] >> 16
+	exp0 = blvtf_dxt_expand(blvtf_dxt_unpack565(packed0))
+	exp1 = blvtf_dxt_expand(blvtf_dxt_unpack565(packed1))
+
+	opaque = np.full(exp0.shape[:1] + (1,), 255, dtype=np.int32)
+	palette4 = np.stack((exp0, exp1, (2 * exp0 + exp1 + 1) // 3, (exp0 + 2 * exp1 + 1) // 3), axis=1)
+	palette3 = np.stack((exp0, exp1, (exp0 + exp1) // 2, np.zeros_like(exp0)), axis=1)
+	palette4 = np.concatenate((palette4, np.broadcast_to(opaque[:, None], (len(raw), 4, 1))), axis=2)
+	palette3 = np.concatenate((palette3, np.stack((opaque, opaque, opaque, opaque * 0), axis=1)), axis=2)
+
+	# Colour blocks of DXT3/5 are always 4 colour
+	four_color = (packed0 > packed1) | (words == 4)
+	palette = np.where(four_color[:, None, None], palette4, palette3)
+
+	indices = (raw[:, -1][:, None] >> (np.arange(16, dtype=np.uint32) * 2)) & 3
+	pixels = np.take_along_axis(palette, indices[:, :, None].astype(np.intp), axis=1)
+
+	if words == 4:
+		alpha_blocks = raw[:, 0].astype(np.uint64) | (raw[:, 1].astype(np.uint64) << np.uint64(32))
+		if dxt_format == 'DXT3':
+			pixels[:, :, 3] = ((alpha_blocks[:, None] >> (np.arange(16, dtype=np.uint64) * np.uint64(4))) & np.uint64(15)).astype(np.int32) * 17
+		else:
+			alpha_palette = blvtf_dxt5_alpha_palette(alpha_blocks & np.uint64(0xFF), (alpha_blocks >> np.uint64(8)) & np.uint64(0xFF))
+			alpha_indices = ((alpha_blocks[:, None] >> (np.uint64(16) + np.arange(16, dtype=np.uint64) * np.uint64(3))) & np.uint64(7)).astype(np.intp)
+			pixels[:, :, 3] = np.take_along_axis(alpha_palette, alpha_indices, axis=1)
+
+	return blvtf_dxt_join_blocks(pixels.astype(np.uint8), bh, bw, width, height)
+
+
+# RMSE and PSNR between the source and the decoded image.
+# Alpha is only compared for the formats which have it.
+# With 1 bit alpha the colour of transparent pixels doesn't matter
+def blvtf_dxt_error(source, decoded, dxt_format='DXT1'):
+	diff = source.astype(np.float64) - decoded.astype(np.float64)
+	if dxt_format == 'DXT1_ONEBITALPHA':
+		diff = diff[source[:, :, 3] >= blvtf_dxt_alpha_cutoff][None]
+
+	def metrics(channel_diff):
+		mse = float(np.mean(channel_diff ** 2))
+		return math.sqrt(mse), (10.0 * math.log10(255.0 ** 2 / mse) if mse else math.inf)
+
+	rmse, psnr = metrics(diff[:, :, :3])
+	result = {
+		'rmse': rmse,
+		'psnr': psnr,
+	}
+	if dxt_format != 'DXT1':
+		result['alpha_rmse'], result['alpha_psnr'] = metrics(diff[:, :, 3])
+
+	return result
@@ -0,0 +1,137 @@
+import threading, traceback, queue
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                  Concurrent task execution
+# ---------------------------------------------------------
+# =========================================================
+
+# Every conversion is a chain of external processes (magick, VTFCmd),
+# so plain threads are more than enough: the GIL is released while waiting on them.
+
+# Tasks are streamed: the producer (usually the folder walk) feeds a bounded queue,
+# while the workers are already converting whatever was found so far.
+# The queue being bounded means the walk never runs miles ahead of the conversion.
+
+# Tasks which would step on each other's toes (same resulting file)
+# share a lane key. Tasks with the same lane key never run at the same time.
+
+# Tasks could also be bundled into groups (see blvtf_group_tasks), which then go
+# through the executor as a single task holding the lanes of all its members.
+
+
+class blvtf_lane_locks:
+	"""One lock per lane key, dropped once nobody uses it anymore"""
+	def __init__(self):
+		self.lock = threading.Lock()
+		# key -> [lock, amount of users]
+		self.lanes = {}
+
+	def acquire(self, key):
+		with self.lock:
+			lane = self.lanes.setdefault(key, [threading.Lock(), 0])
+			lane[1] += 1
+		lane[0].acquire()
+
+	def release(self, key):
+		with self.lock:
+			lane = self.lanes[key]
+			lane[0].release()
+			lane[1] -= 1
+			if lane[1] == 0:
+				del self.lanes[key]
+
+	# Several lanes at once. Always taken in the same order, so that two groups
+	# sharing some lanes can't end up waiting on each other
+	def acquire_all(self, keys):
+		for key in keys:
+			self.acquire(key)
+
+	def release_all(self, keys):
+		for key in reversed(keys):
+			self.release(key)
+
+
+# Bundle tasks with the same group key into lists of up to group_size tasks.
+# Streams just like the tasks do: a group is yielded as soon as it's full,
+# whatever is left once the tasks run out.
+# group_key: function(task) -> hashable, None = never grouped with anything
+def blvtf_group_tasks(tasks, group_key, group_size):
+	pending = {}
+	for task in tasks:
+		key = group_key(task) if group_size > 1 else None
+		if key == None:
+			yield [task]
+			continue
+
+		group = pending.setdefault(key, [])
+		group.append(task)
+		if len(group) >= group_size:
+			yield pending.pop(key)
+
+	yield from pending.values()
+
+
+# tasks: iterable of task dicts, could be a generator
+# task_fn: function(task) -> result, executed in the worker threads
+# on_done: function(task, result, error), called once per task, never concurrently
+# lane_key: function(task) -> hashable or a list of them, tasks sharing a key never run at the same time
+# on_discovered: function(task), called by the producer for every task pulled from tasks
+# queue_size: how many discovered tasks could wait for a worker. Default is 4 per worker
+def blvtf_run_tasks(tasks, task_fn, worker_count=1, on_done=None, lane_key=None, on_discovered=None, queue_size=None):
+	worker_count = max(1, int(worker_count))
+
+	task_queue = queue.Queue(maxsize=queue_size or worker_count * 4)
+	lane_locks = blvtf_lane_locks()
+	done_lock = threading.Lock()
+
+	# Marks the end of the task stream. One per worker
+	stream_end = object()
+
+	def worker():
+		while True:
+			task = task_queue.get()
+			if task is stream_end:
+				return
+
+			result = None
+			error = None
+
+			keys = []
+			if lane_key:
+				keys = lane_key(task)
+				keys = sorted(set(keys)) if isinstance(keys, list) else [keys]
+				lane_locks.acquire_all(keys)
+			try:
+				result = task_fn(task)
+			except Exception as e:
+				# One broken task should not take the whole batch down
+				print('BLVTF: Task failed', task.get('src') if isinstance(task, dict) else [group_task.get('src') for group_task in task], e)
+				traceback.print_exc()
+				error = e
+			finally:
+				lane_locks.release_all(keys)
+
+			if on_done:
+				with done_lock:
+					on_done(task, result, error)
+
+	workers = [
+		threading.Thread(target=worker, name=f'blvtf_worker_{worker_idx}', daemon=True)
+		for worker_idx in range(worker_count)
+	]
+	for worker_thread in workers:
+		worker_thread.start()
+
+	# Producer runs in the calling thread
+	try:
+		for task in tasks:
+			if on_discovered:
+				on_discovered(task)
+			task_queue.put(task)
+	finally:
+		for worker_thread in workers:
+			task_queue.put(stream_end)
+		for worker_thread in workers:
+			worker_thread.join()
@@ -0,0 +1,257 @@
+import numpy as np
+
+from .resample import blvtf_resample_load, blvtf_resample_store
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                      Sharpen filters
+# ---------------------------------------------------------
+# =========================================================
+
+# Native versions of blvtf_sharpen_filters, which VTFCmd only offers with the old encoder
+# (-rsharpen / -msharpen).
+
+# Filters work on the colour channels, alpha is left as is.
+# Like the resampler, the image goes through in strips of rows (plus a few rows of context
+# on each side), so a single strip of float data exists at a time.
+# Edges are clamped.
+
+
+blvtf_filter_strip = 256
+
+
+# 3x3 kernels
+blvtf_filter_kernels = {
+	'SMOOTHEN': np.array((
+		(1, 2, 1),
+		(2, 4, 2),
+		(1, 2, 1),
+	)) / 16.0,
+	'SHARPENSOFT': np.array((
+		(0, -0.25, 0),
+		(-0.25, 2, -0.25),
+		(0, -0.25, 0),
+	)),
+	'SHARPENMEDIUM': np.array((
+		(0, -0.5, 0),
+		(-0.5, 3, -0.5),
+		(0, -0.5, 0),
+	)),
+	'SHARPENSTRONG': np.array((
+		(0, -1, 0),
+		(-1, 5, -1),
+		(0, -1, 0),
+	)),
+	'MEANREMOVAL': np.array((
+		(-1, -1, -1),
+		(-1, 9, -1),
+		(-1, -1, -1),
+	)),
+	'FINDEDGES': np.array((
+		(-1, -1, -1),
+		(-1, 8, -1),
+		(-1, -1, -1),
+	)),
+	'EDGEDETECT': np.array((
+		(-1, 0, -1),
+		(0, 4, 0),
+		(-1, 0, -1),
+	)),
+	'EDGEDETECTSOFT': np.array((
+		(-1, 0, -1),
+		(0, 4, 0),
+		(-1, 0, -1),
+	)) / 2.0,
+	'EMBOSS': np.array((
+		(-2, -1, 0),
+		(-1, 1, 1),
+		(0, 1, 2),
+	)),
+}
+
+# Added on top of the convolution result, so that flat areas come out grey instead of black
+blvtf_filter_bias = {
+	'EDGEDETECT': 0.5,
+	'EDGEDETECTSOFT': 0.5,
+}
+
+# Per-pixel filters
+blvtf_filter_point = {
+	'NEGATIVE': lambda col: 1.0 - col,
+	'LIGHTER': lambda col: col * 1.15,
+	'DARKER': lambda col: col * 0.85,
+	'CONTRASTMORE': lambda col: (col - 0.5) * 1.25 + 0.5,
+	'CONTRASTLESS': lambda col: (col - 0.5) * 0.8 + 0.5,
+}
+
+# XSharpen: pixels close to the local minimum/maximum are pulled towards it
+blvtf_xsharpen_strength = 0.5
+blvtf_xsharpen_threshold = 8.0 / 255.0
+
+# Unsharp mask
+blvtf_unsharp_amount = 0.6
+
+# Warp sharp: how far pixels get pulled towards edges, in pixels (at most),
+# and how strongly the edge map gradient translates into that
+blvtf_warpsharp_depth = 1.5
+blvtf_warpsharp_gain = 4.0
+
+# 5 tap binomial, ~gaussian with sigma 1
+blvtf_filter_blur5 = np.array((1, 4, 6, 4, 1), dtype=np.float32) / 16.0
+
+
+
+
+# =========================================================
+#                        Primitives
+# =========================================================
+
+# All of these take (rows, cols, channels) float32 and return the same shape,
+# treating everything outside as a copy of the edge pixels
+
+def blvtf_filter_conv3(data, kernel):
+	padded = np.pad(data, ((1, 1), (1, 1), (0, 0)), mode='edge')
+	height, width = data.shape[:2]
+
+	out = np.zeros(data.shape, dtype=np.float32)
+	for row in range(3):
+		for col in range(3):
+			if kernel[row, col]:
+				out += np.float32(kernel[row, col]) * padded[row:row + height, col:col + width]
+	return out
+
+
+def blvtf_filter_sep(data, taps):
+	radius = len(taps) // 2
+	height, width = data.shape[:2]
+
+	padded = np.pad(data, ((radius, radius), (0, 0), (0, 0)), mode='edge')
+	vert = sum(np.float32(tap) * padded[tap_idx:tap_idx + height] for tap_idx, tap in enumerate(taps))
+
+	padded = np.pad(vert, ((0, 0), (radius, radius), (0, 0)), mode='edge')
+	return sum(np.float32(tap) * padded[:, tap_idx:tap_idx + width] for tap_idx, tap in enumerate(taps))
+
+
+# 3x3 minimum and maximum
+def blvtf_filter_minmax3(data):
+	padded = np.pad(data, ((1, 1), (1, 1), (0, 0)), mode='edge')
+	height, width = data.shape[:2]
+
+	low = data.copy()
+	high = data.copy()
+	for row in range(3):
+		for col in range(3):
+			np.minimum(low, padded[row:row + height, col:col + width], out=low)
+			np.maximum(high, padded[row:row + height, col:col + width], out=high)
+	return low, high
+
+
+def blvtf_filter_xsharpen(data):
+	low, high = blvtf_filter_minmax3(data)
+	to_low = data - low
+	to_high = high - data
+
+	nearest = np.where(to_low < to_high, low, high)
+	close = np.minimum(to_low, to_high) < blvtf_xsharpen_threshold
+
+	return np.where(close, data + blvtf_xsharpen_strength * (nearest - data), data)
+
+
+def blvtf_filter_unsharp(data):
+	return data + blvtf_unsharp_amount * (data - blvtf_filter_sep(data, blvtf_filter_blur5))
+
+
+# Pixels are displaced along the gradient of a blurred edge map,
+# which pulls the colours on both sides of an edge towards it
+def blvtf_filter_warpsharp(data):
+	height, width = data.shape[:2]
+
+	luma = (data[:, :, :3] @ np.array((0.299, 0.587, 0.114), dtype=np.float32))[:, :, None]
+	sobel_x = blvtf_filter_conv3(luma, np.array(((-1, 0, 1), (-2, 0, 2), (-1, 0, 1))))
+	sobel_y = blvtf_filter_conv3(luma, np.array(((-1, -2, -1), (0, 0, 0), (1, 2, 1))))
+	edges = np.hypot(sobel_x, sobel_y)
+	edges = blvtf_filter_sep(blvtf_filter_sep(edges, blvtf_filter_blur5), blvtf_filter_blur5)[:, :, 0]
+
+	grad_y, grad_x = np.gradient(edges) if min(height, width) > 1 else (np.zeros_like(edges), np.zeros_like(edges))
+	shift_y = np.clip(grad_y * blvtf_warpsharp_gain, -blvtf_warpsharp_depth, blvtf_warpsharp_depth)
+	shift_x = np.clip(grad_x * blvtf_warpsharp_gain, -blvtf_warpsharp_depth, blvtf_warpsharp_depth)
+
+	src_y = np.clip(np.arange(height, dtype=np.float32)[:, None] + shift_y, 0, height - 1)
+	src_x = np.clip(np.arange(width, dtype=np.float32)[None, :] + shift_x, 0, width - 1)
+
+	# bilinear sampling
+	y0 = np.minimum(src_y.astype(np.intp), height - 2) if height > 1 else np.zeros(src_y.shape, dtype=np.intp)
+	x0 = np.minimum(src_x.astype(np.intp), width - 2) if width > 1 else np.zeros(src_x.shape, dtype=np.intp)
+	fy = (src_y - y0)[:, :, None]
+	fx = (src_x - x0)[:, :, None]
+	y1 = np.minimum(y0 + 1, height - 1)
+	x1 = np.minimum(x0 + 1, width - 1)
+
+	return (
+		data[y0, x0] * (1 - fy) * (1 - fx)
+		+ data[y0, x1] * (1 - fy) * fx
+		+ data[y1, x0] * fy * (1 - fx)
+		+ data[y1, x1] * fy * fx
+	)
+
+
+# filter name -> (function(data) -> data, rows of context needed on each side of a strip)
+def blvtf_filter_fn(filter_name):
+	if filter_name in blvtf_filter_point:
+		return blvtf_filter_point[filter_name], 0
+
+	if filter_name in blvtf_filter_kernels:
+		kernel = blvtf_filter_kernels[filter_name]
+		bias = np.float32(blvtf_filter_bias.get(filter_name, 0.0))
+		return (lambda data: blvtf_filter_conv3(data, kernel) + bias), 1
+
+	if filter_name == 'CONTOUR':
+		return (lambda data: 1.0 - blvtf_filter_conv3(data, blvtf_filter_kernels['FINDEDGES'])), 1
+
+	if filter_name == 'XSHARPEN':
+		return blvtf_filter_xsharpen, 1
+
+	if filter_name == 'UNSHARP':
+		return blvtf_filter_unsharp, 2
+
+	if filter_name == 'WARPSHARP':
+		# sobel + 2 blurs + gradient + displacement
+		return blvtf_filter_warpsharp, 8
+
+	raise ValueError(f'Unknown sharpen filter {filter_name}')
+
+# Every filter blvtf_sharpen knows, NONE included
+blvtf_sharpen_filter_names = ('NONE',) + tuple(blvtf_filter_point) + tuple(blvtf_filter_kernels) + ('CONTOUR', 'XSHARPEN', 'UNSHARP', 'WARPSHARP')
+
+
+
+
+# =========================================================
+#                          Entry
+# =========================================================
+
+# Apply one of blvtf_sharpen_filters to a (height, width, 4) image.
+# Returns a new image of the same dtype, NONE returns the image itself
+def blvtf_sharpen(img, filter_name):
+	if not filter_name or filter_name == 'NONE':
+		return img
+
+	filter_fn, halo = blvtf_filter_fn(filter_name)
+	height = img.shape[0]
+
+	out = np.empty_like(img)
+
+	for strip_start in range(0, height, blvtf_filter_strip):
+		strip_end = min(strip_start + blvtf_filter_strip, height)
+
+		# Strip plus the context rows, clamped at the image edges
+		rows = np.clip(np.arange(strip_start - halo, strip_end + halo), 0, height - 1)
+		src = blvtf_resample_load(img[rows], False)
+
+		filtered = src.copy()
+		filtered[:, :, :3] = filter_fn(src[:, :, :3])
+
+		out[strip_start:strip_end] = blvtf_resample_store(filtered[halo:halo + strip_end - strip_start], img.dtype, False)
+
+	return out
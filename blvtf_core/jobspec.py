@@ -0,0 +1,181 @@
+import json, os
+
+from pathlib import Path
+
+import numpy as np
+
+from .executor import blvtf_run_tasks, blvtf_group_tasks
+from .progress import blvtf_task_bytes
+from .convert import blvtf_export_imgs_to_vtf, blvtf_vtfcmd_group_key, blvtf_task_lane
+from .backends import blvtf_backend_group_size
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                        Job specs
+# ---------------------------------------------------------
+# =========================================================
+
+# Everything an export needs, frozen into plain data:
+"""
+{
+	'blvtf_job': 1,
+	'shared': {shared export params, see blvtf_core/convert.py},
+	'group_size': 16,
+	'tasks': [task dicts, see blvtf_export_img_to_vtf],
+}
+"""
+
+# Nothing in a job refers to Blender: paths are strings, pixels of packed/generated/edited
+# images are numpy arrays read on the main thread beforehand.
+# So a job can be pickled over to another process as is, and run by anything
+# (the addon's worker threads, python -m blvtf_core --job).
+
+# Saved to disk, a job is a JSON file. Pixel arrays go next to it as .npy files
+# ({'npy': 'name.npy'} in the JSON), in a folder named after the job file.
+
+blvtf_job_version = 1
+
+
+# Paths -> strings, all the way down. Arrays stay arrays
+def blvtf_job_value(value):
+	if isinstance(value, Path):
+		return str(value)
+	if isinstance(value, dict):
+		return {key: blvtf_job_value(val) for key, val in value.items()}
+	if isinstance(value, (list, tuple)):
+		return tuple(blvtf_job_value(val) for val in value)
+
+	return value
+
+
+# Freeze tasks and shared export params into a job
+def blvtf_job(tasks, shared, group_size=1):
+	return {
+		'blvtf_job': blvtf_job_version,
+		'shared': blvtf_job_value(shared),
+		'group_size': group_size,
+		'tasks': [blvtf_job_value(task) for task in tasks],
+	}
+
+
+
+
+# =========================================================
+#                         On disk
+# =========================================================
+
+def blvtf_job_pixels_dir(job_path):
+	job_path = Path(job_path)
+	return job_path.parent / f'{job_path.stem}.pixels'
+
+
+def blvtf_save_job(job, job_path):
+	job_path = Path(job_path)
+	pixels_dir = blvtf_job_pixels_dir(job_path)
+
+	# The same image could be used by several tasks (embedded into every texture of a material)
+	saved_arrays = {}
+
+	def to_json(value):
+		if isinstance(value, np.ndarray):
+			if not id(value) in saved_arrays:
+				pixels_dir.mkdir(parents=True, exist_ok=True)
+				npy_name = f'pixels_{len(saved_arrays)}.npy'
+				np.save(pixels_dir / npy_name, value)
+				saved_arrays[id(value)] = npy_name
+			return {'npy': saved_arrays[id(value)]}
+		if isinstance(value, dict):
+			return {key: to_json(val) for key, val in value.items()}
+		if isinstance(value, (list, tuple)):
+			return [to_json(val) for val in value]
+
+		return value
+
+	job_tmp = job_path.with_suffix('.tmp')
+	job_tmp.write_text(json.dumps(to_json(job), indent='\t'), encoding='utf-8')
+	os.replace(job_tmp, job_path)
+
+	return job_path
+
+
+def blvtf_load_job(job_path):
+	job_path = Path(job_path)
+	pixels_dir = blvtf_job_pixels_dir(job_path)
+
+	def from_json(value):
+		if isinstance(value, dict):
+			if set(value) == {'npy'}:
+				# Memory mapped, pages are only read once the task gets to them
+				return np.load(pixels_dir / value['npy'], mmap_mode='r')
+			return {key: from_json(val) for key, val in value.items()}
+		if isinstance(value, list):
+			return tuple(from_json(val) for val in value)
+
+		return value
+
+	job = json.loads(job_path.read_text(encoding='utf-8'))
+	if job.get('blvtf_job') != blvtf_job_version:
+		raise ValueError(f'{job_path} is not a blvtf job (or was saved by a different version)')
+
+	job = from_json(job)
+	job['tasks'] = list(job['tasks'])
+
+	return job
+
+
+
+
+# =========================================================
+#                           Run
+# =========================================================
+
+# Convert every task of a job.
+# reporter: object with blvtf_report(type, message), or None
+# progress: blvtf_core.progress.blvtf_progress_channel (or anything with the same methods), or None
+# tracer: blvtf_core.trace.blvtf_trace, or None
+# returns {'converted': int, 'failed': int, 'failures': [src]}
+def blvtf_run_job(job, reporter=None, progress=None, probe_cache=None, worker_count=1, tracer=None):
+	shared = job['shared']
+
+	# Tasks of backends which don't batch (the built-in encoder is CPU bound) are spread over the workers one by one
+	group_size = blvtf_backend_group_size(shared, max(1, job['group_size']))
+
+	stats = {
+		'converted': 0,
+		'failed': 0,
+		# sources of the failed tasks
+		'failures': [],
+	}
+
+	def convert_group(task_group):
+		if progress:
+			progress.begin(task_group)
+		return blvtf_export_imgs_to_vtf(task_group, shared, reporter, group_size, probe_cache, tracer)
+
+	def group_done(task_group, results, error):
+		group_stats = {'failed': 0, 'nbytes': 0}
+		for task_info, result in zip(task_group, results or [None] * len(task_group)):
+			if result:
+				stats['converted'] += 1
+				if progress:
+					group_stats['nbytes'] += blvtf_task_bytes(task_info)
+			else:
+				group_stats['failed'] += 1
+				stats['failures'].append(str(task_info['src']))
+		stats['failed'] += group_stats['failed']
+		if progress:
+			progress.update(len(task_group), task_group, **group_stats)
+
+	blvtf_run_tasks(
+		blvtf_group_tasks(job['tasks'], blvtf_vtfcmd_group_key, group_size),
+		convert_group,
+		worker_count,
+		group_done,
+		lambda task_group: [blvtf_task_lane(task_info) for task_info in task_group],
+	)
+
+	if probe_cache:
+		probe_cache.flush()
+
+	return stats
@@ -0,0 +1,129 @@
+from pathlib import Path
+
+import numpy as np
+
+from .runner import blvtf_run, blvtf_run_error
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                   ImageMagick over pipes
+# ---------------------------------------------------------
+# =========================================================
+
+# ImageMagick, with images going in through stdin and out through stdout.
+# Nothing gets written to disk (where tmps/ and the addon usually live on a slow drive),
+# every conversion is a memory to memory hop.
+
+# Pipes are handled by blvtf_core/runner.py.
+# When the size of the output is known upfront (raw pixels), it's read straight
+# into a preallocated buffer.
+
+
+blvtf_magick_chunk = 1 << 20
+
+# Formats magick decodes linear data from, which need a gamma correction for 8 bit output
+blvtf_magick_linear_suffixes = ('exr', 'hdr', 'tiff',)
+
+
+class blvtf_magick_error(RuntimeError):
+	pass
+
+
+# Read exactly out_size bytes (or less, if the output ends before that)
+def blvtf_magick_read_exact(pipe, out_size):
+	out = bytearray(out_size)
+	out_view = memoryview(out)
+	received = 0
+	while received < out_size:
+		chunk_size = pipe.readinto(out_view[received:received + blvtf_magick_chunk])
+		if not chunk_size:
+			break
+		received += chunk_size
+	del out_view
+	if received < out_size:
+		del out[received:]
+
+	return out
+
+
+# Run magick with args.
+# stdin_data: bytes (or anything exposing the buffer protocol, like a numpy array) to feed through stdin
+# out_size: the exact size of the output, if known
+# returns stdout as bytes (bytearray if out_size is given)
+def blvtf_magick_run(magick_exe, args, stdin_data=None, out_size=None):
+	if out_size:
+		read_stdout = lambda pipe: blvtf_magick_read_exact(pipe, out_size)
+	else:
+		read_stdout = lambda pipe: pipe.read()
+
+	try:
+		return blvtf_run([magick_exe, *args], 'magick', stdin_data, read_stdout).out
+	except blvtf_run_error as e:
+		raise blvtf_magick_error(str(e)) from e
+
+
+# Input spec for magick: the first frame of a file, or stdin.
+# src_format is needed for stdin data magick can't recognize by itself (raw pixels)
+def blvtf_magick_input(src, src_format=None):
+	if isinstance(src, (str, Path)):
+		return f'{src}[0]', None
+
+	return f'{src_format}:-[0]' if src_format else '-[0]', src
+
+
+# Decode an image into a (height, width, 4) RGBA numpy array.
+# src: path or the encoded file as bytes (a packed image, for example)
+# dims: (width, height)
+# hdr: float32 instead of uint8
+# auto_gamma: None = decide by the file extension
+def blvtf_magick_decode(magick_exe, src, dims, hdr=False, auto_gamma=None, src_format=None):
+	src_arg, stdin_data = blvtf_magick_input(src, src_format)
+	magick_args = [src_arg]
+
+	if hdr:
+		magick_args.extend(['-define', 'quantum:format=floating-point', '-depth', '32'])
+	else:
+		if auto_gamma == None:
+			auto_gamma = isinstance(src, (str, Path)) and Path(src).suffix.lower().strip('.') in blvtf_magick_linear_suffixes
+		if auto_gamma:
+			magick_args.append('-auto-gamma')
+		magick_args.extend(['-depth', '8'])
+
+	magick_args.extend(['-endian', 'LSB', 'RGBA:-'])
+
+	dtype = np.dtype('<f4') if hdr else np.dtype(np.uint8)
+	out_size = dims[0] * dims[1] * 4 * dtype.itemsize
+
+	raw_pixels = blvtf_magick_run(magick_exe, magick_args, stdin_data, out_size)
+	if len(raw_pixels) != out_size:
+		raise blvtf_magick_error(f'magick returned {len(raw_pixels)} bytes of pixels, expected {out_size}')
+
+	return np.frombuffer(raw_pixels, dtype=dtype).reshape(dims[1], dims[0], 4)
+
+
+# Convert an image into another format, such as TGA or PFM.
+# src: path or the encoded file as bytes
+# args: anything to put between the input and the output
+# returns the encoded file as bytes
+def blvtf_magick_convert(magick_exe, src, out_format, args=(), src_format=None):
+	src_arg, stdin_data = blvtf_magick_input(src, src_format)
+	return blvtf_magick_run(magick_exe, [src_arg, *args, f'{out_format}:-'], stdin_data)
+
+
+# Encode a (height, width, 4) uint8 RGBA array into out_format.
+# returns the encoded file as bytes
+def blvtf_magick_encode(magick_exe, rgba, out_format, args=()):
+	height, width = rgba.shape[:2]
+	return blvtf_magick_run(
+		magick_exe,
+		['-size', f'{width}x{height}', '-depth', '8', 'RGBA:-', *args, f'{out_format}:-'],
+		np.ascontiguousarray(rgba, dtype=np.uint8)
+	)
+
+
+# identify -format, without decoding the pixels
+# returns the echo split by whitespace
+def blvtf_magick_identify(magick_exe, src, identify_format):
+	src_arg, stdin_data = blvtf_magick_input(src)
+	return blvtf_magick_run(magick_exe, ['identify', '-ping', '-format', identify_format, src_arg], stdin_data).decode().split()
@@ -0,0 +1,216 @@
+import hashlib, json, threading, os
+
+from pathlib import Path
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                     Build manifest
+# ---------------------------------------------------------
+# =========================================================
+
+# The manifest lives in the root of the output folder and remembers
+# what every VTF in that folder was built from:
+"""
+{
+	'dest': 'props/rock.vtf',
+	'src': 'W:/materialsrc/props/rock.psd',
+	'src_hash': 'sha256 of the source file',
+	'src_mtime_ns': 1700000000000000000,
+	'src_size': 12345,
+	'params_hash': 'sha256 of the resolved task params',
+	'out_hash': 'sha256 of the resulting vtf',
+	'out_mtime_ns': 1700000000000000000,
+	'out_size': 4567,
+}
+"""
+
+# The file is a journal: one JSON entry per line, appended as soon as a task is done.
+# This way an interrupted batch loses nothing and simply continues where it stopped.
+# Later lines override earlier ones, the journal gets compacted once the batch is done.
+
+blvtf_manifest_name = '.blvtf_manifest.jsonl'
+
+
+# sha256 of a file, read in chunks
+def blvtf_file_hash(filepath, chunk_size=1024*1024):
+	file_hash = hashlib.sha256()
+	with open(filepath, 'rb') as f:
+		while True:
+			chunk = f.read(chunk_size)
+			if not chunk:
+				break
+			file_hash.update(chunk)
+
+	return file_hash.hexdigest()
+
+
+# Hash of everything that affects the resulting VTF, besides the source pixels themselves.
+# img_info is the task dict as passed to blvtf_export_img_to_vtf,
+# shared is a plain dict of the shared export params (vtf version, encoder version, etc.)
+def blvtf_task_params_hash(img_info, shared):
+	hash_src = {}
+	for prm_name, prm_val in img_info.items():
+		# source and destination are what the manifest is keyed by
+		if prm_name in ('src', 'dest'):
+			continue
+
+		# order of the flags doesn't matter
+		if prm_name == 'flags':
+			prm_val = sorted(prm_val)
+
+		hash_src[prm_name] = prm_val
+
+	# Embedded alpha is a separate file, which could change on its own
+	emb_alpha = img_info.get('emb_alpha')
+	if emb_alpha and Path(str(emb_alpha)).is_file():
+		alpha_stat = os.stat(emb_alpha)
+		hash_src['emb_alpha_stat'] = (alpha_stat.st_mtime_ns, alpha_stat.st_size)
+
+	# Same goes for the images packed into the channels
+	for target, (layer_path, layer_channel) in sorted((img_info.get('channels') or {}).items()):
+		if layer_path and Path(str(layer_path)).is_file():
+			layer_stat = os.stat(layer_path)
+			hash_src[f'channel_{target}_stat'] = (layer_stat.st_mtime_ns, layer_stat.st_size)
+
+	hash_src['shared'] = shared
+
+	return hashlib.sha256(
+		json.dumps(hash_src, sort_keys=True, default=str).encode()
+	).hexdigest()
+
+
+class blvtf_build_manifest:
+	def __init__(self, output_folder):
+		self.output_folder = Path(output_folder)
+		self.manifest_path = self.output_folder / blvtf_manifest_name
+
+		self.lock = threading.Lock()
+		self.entries = {}
+		self.journal_lines = 0
+
+		self.load()
+
+	def load(self):
+		if not self.manifest_path.is_file():
+			return
+
+		with open(self.manifest_path, 'r', encoding='utf-8') as f:
+			for ln in f:
+				self.journal_lines += 1
+				try:
+					entry = json.loads(ln)
+				except ValueError:
+					# the very last line could be cut off if the batch was killed mid-write
+					continue
+				self.entries[entry['dest']] = entry
+
+	# Key the entries by destination relative to the output folder,
+	# so that the whole output tree could be moved around
+	def entry_key(self, vtf_dest):
+		vtf_dest = Path(vtf_dest).with_suffix('.vtf')
+		try:
+			return vtf_dest.relative_to(self.output_folder).as_posix()
+		except ValueError:
+			return vtf_dest.as_posix()
+
+	# Hash of a file, but only if its stat differs from what was recorded.
+	# Unchanged mtime + size means unchanged content
+	def stat_hash(self, filepath, known_hash, known_mtime_ns, known_size):
+		file_stat = os.stat(filepath)
+		if known_hash and file_stat.st_mtime_ns == known_mtime_ns and file_stat.st_size == known_size:
+			return known_hash, file_stat
+
+		return blvtf_file_hash(filepath), file_stat
+
+	# Hash and stats of the task's source as it is right now ({'src_hash', 'src_mtime_ns', 'src_size'}, like the entry),
+	# None if it can't be read.
+	# Taken before the conversion: a source edited while it's being converted
+	# must not be recorded as what the VTF was built from
+	def src_state(self, img_info):
+		entry = self.entries.get(self.entry_key(img_info['dest'])) or {}
+		try:
+			src_hash, src_stat = self.stat_hash(
+				img_info['src'], entry.get('src_hash'), entry.get('src_mtime_ns'), entry.get('src_size')
+			)
+		except OSError:
+			return None
+
+		return {
+			'src_hash': src_hash,
+			'src_mtime_ns': src_stat.st_mtime_ns,
+			'src_size': src_stat.st_size,
+		}
+
+	# Whether the task's source (src_state), params and output all match the manifest
+	def is_up_to_date(self, img_info, params_hash, src_state):
+		entry = self.entries.get(self.entry_key(img_info['dest']))
+		if not entry or not src_state:
+			return False
+
+		if entry['params_hash'] != params_hash:
+			return False
+
+		if src_state['src_hash'] != entry['src_hash']:
+			return False
+
+		vtf_dest = Path(img_info['dest']).with_suffix('.vtf')
+		if not vtf_dest.is_file():
+			return False
+
+		try:
+			out_hash, out_stat = self.stat_hash(
+				vtf_dest, entry['out_hash'], entry['out_mtime_ns'], entry['out_size']
+			)
+			if out_hash != entry['out_hash']:
+				return False
+		except OSError:
+			return False
+
+		# Content is the same, but the files were touched.
+		# Remember the new stats so that the next run doesn't have to rehash
+		if (src_state['src_mtime_ns'], out_stat.st_mtime_ns) != (entry['src_mtime_ns'], entry['out_mtime_ns']):
+			self.write_entry(dict(
+				entry,
+				src_mtime_ns=src_state['src_mtime_ns'],
+				out_mtime_ns=out_stat.st_mtime_ns,
+			))
+
+		return True
+
+	# Record a successfully converted task.
+	# src_state is what the source was before the conversion started (see src_state)
+	def record(self, img_info, params_hash, src_state):
+		vtf_dest = Path(img_info['dest']).with_suffix('.vtf')
+		out_stat = os.stat(vtf_dest)
+
+		self.write_entry({
+			'dest': self.entry_key(vtf_dest),
+			'src': str(img_info['src']),
+			**src_state,
+			'params_hash': params_hash,
+			'out_hash': blvtf_file_hash(vtf_dest),
+			'out_mtime_ns': out_stat.st_mtime_ns,
+			'out_size': out_stat.st_size,
+		})
+
+	def write_entry(self, entry):
+		with self.lock:
+			self.entries[entry['dest']] = entry
+			with open(self.manifest_path, 'a', encoding='utf-8') as f:
+				f.write(json.dumps(entry) + '\n')
+			self.journal_lines += 1
+
+	# Rewrite the journal with one line per entry
+	def compact(self):
+		with self.lock:
+			if self.journal_lines <= len(self.entries):
+				return
+
+			tmp_path = self.manifest_path.with_suffix('.jsonl.tmp')
+			with open(tmp_path, 'w', encoding='utf-8') as f:
+				for entry in self.entries.values():
+					f.write(json.dumps(entry) + '\n')
+
+			os.replace(tmp_path, self.manifest_path)
+			self.journal_lines = len(self.entries)
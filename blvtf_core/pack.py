@@ -0,0 +1,159 @@
+import struct
+
+import numpy as np
+
+from .resample import blvtf_resample, blvtf_resample_load, blvtf_resample_store
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                      Channel packing
+# ---------------------------------------------------------
+# =========================================================
+
+# Builds the RGBA of a texture out of several decoded images, right in memory.
+# Such as AO in R, roughness in G, metal in B and a spec mask in A.
+
+# Embedding an image into the alpha channel is simply packing into A
+# with the L source channel, which is what magick -alpha off -compose CopyOpacity did:
+# luminance of the mask, whatever alpha it has of its own.
+
+
+blvtf_pack_targets = {
+	'R': 0,
+	'G': 1,
+	'B': 2,
+	'A': 3,
+}
+
+# Rec.601, same as blvtf_luma_u8
+blvtf_pack_luma = np.array((0.299, 0.587, 0.114), dtype=np.float32)
+
+
+# One channel of a decoded (height, width, 4) image as a (height, width) float32 plane.
+# src_channel: R, G, B, A, L (luminance) or AUTO
+def blvtf_pack_plane(src, src_channel, has_alpha=True):
+	if src_channel == 'AUTO':
+		src_channel = 'A' if has_alpha else 'L'
+
+	if src_channel == 'L':
+		return blvtf_resample_load(src[:, :, :3], False) @ blvtf_pack_luma
+
+	if not src_channel in blvtf_pack_targets:
+		raise ValueError(f'Unknown source channel {src_channel}')
+
+	# Only the channel needed goes to float
+	return blvtf_resample_load(src[:, :, blvtf_pack_targets[src_channel]], False)
+
+
+# Pack channels of other images into base.
+# base: (height, width, 4), decides the size and dtype of the result
+# layers: {target channel: (decoded (h, w, 4) image, source channel, whether that image has alpha)}
+# Layers of a different size are resampled with filter_name to fit base.
+# Returns a new array, base is left intact
+def blvtf_pack_channels(base, layers, filter_name='CUBIC'):
+	height, width = base.shape[:2]
+	out = base.copy()
+
+	for target, (src, src_channel, has_alpha) in layers.items():
+		if not target in blvtf_pack_targets:
+			raise ValueError(f'Unknown target channel {target}')
+
+		# Masks and such are data, no gamma involved
+		src = blvtf_resample(src, width, height, filter_name, False)
+
+		plane = blvtf_pack_plane(src, src_channel, has_alpha)
+		out[:, :, blvtf_pack_targets[target]] = blvtf_resample_store(plane, base.dtype, False)
+
+	return out
+
+
+
+
+# =========================================================
+#                         TGA out
+# =========================================================
+
+# VTFCmd can only take files, so whatever it gets packed is handed over as a TGA.
+# Uncompressed 32 bit, top-left origin: just a header and the pixels
+def blvtf_write_tga(path, rgba):
+	height, width = rgba.shape[:2]
+
+	if rgba.dtype != np.uint8:
+		rgba = blvtf_resample_store(blvtf_resample_load(rgba, False), np.uint8, False)
+
+	with open(path, 'wb') as tga_file:
+		tga_file.write(struct.pack('<BBBHHBHHHHBB', 0, 0, 2, 0, 0, 0, 0, 0, width, height, 32, 0x28))
+		# BGRA
+		tga_file.write(np.ascontiguousarray(rgba[:, :, (2, 1, 0, 3)]).tobytes())
+
+	return path
+
+
+
+
+# =========================================================
+#                         TGA in
+# =========================================================
+
+# Uncompressed TGAs (what blvtf_write_tga writes, and what most tools export by default)
+# are read right here, so that the built-in encoder works without magick.
+# RLE, colour-mapped and 15/16 bit TGAs are left to magick.
+
+# (image type, bits per pixel) blvtf_read_tga reads
+blvtf_tga_readable = (
+	(2, 24),
+	(2, 32),
+	(3, 8),
+)
+
+
+# (width, height, bits per pixel, descriptor, offset of the pixels)
+# of a TGA blvtf_read_tga could read, None otherwise
+def blvtf_tga_header(path):
+	try:
+		with open(path, 'rb') as tga_file:
+			head = tga_file.read(18)
+	except OSError:
+		return None
+
+	if len(head) < 18:
+		return None
+
+	id_len, cmap_type, img_type, cmap_first, cmap_len, cmap_entry_size, x_origin, y_origin, width, height, pixel_depth, descriptor = struct.unpack('<BBBHHBHHHHBB', head)
+	if cmap_type != 0 or not (img_type, pixel_depth) in blvtf_tga_readable or not width or not height:
+		return None
+
+	return width, height, pixel_depth, descriptor, 18 + id_len
+
+
+# Read an uncompressed TGA into a (height, width, 4) uint8 RGBA array, None if it's not one
+def blvtf_read_tga(path):
+	header = blvtf_tga_header(path)
+	if not header:
+		return None
+
+	width, height, pixel_depth, descriptor, offset = header
+	channels = pixel_depth // 8
+
+	pixels = np.fromfile(path, dtype=np.uint8, count=width * height * channels, offset=offset)
+	if pixels.size < width * height * channels:
+		raise ValueError(f'{path} is truncated')
+	pixels = pixels.reshape(height, width, channels)
+
+	rgba = np.empty((height, width, 4), dtype=np.uint8)
+	if channels == 1:
+		rgba[:, :, :3] = pixels
+		rgba[:, :, 3] = 255
+	else:
+		# BGR(A)
+		rgba[:, :, :3] = pixels[:, :, 2::-1]
+		rgba[:, :, 3] = pixels[:, :, 3] if channels == 4 else 255
+
+	# Bottom-left origin unless bit 5 says top, right-to-left if bit 4 is set
+	if not descriptor & 0x20:
+		rgba = rgba[::-1]
+	if descriptor & 0x10:
+		rgba = rgba[:, ::-1]
+
+	return np.ascontiguousarray(rgba)
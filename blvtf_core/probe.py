@@ -0,0 +1,545 @@
+import struct
+
+from pathlib import Path
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                  Header-only image probing
+# ---------------------------------------------------------
+# =========================================================
+
+# Every probe only reads the bytes it needs from the file header
+# (plus chunk/segment headers for the formats which hide the dimensions
+# somewhere after a bunch of metadata).
+# Nothing is ever decoded.
+
+# Each probe takes an open binary file and returns a dict:
+"""
+{
+	'width': 1024,
+	'height': 512,
+	'channels': 4,
+	'alpha': True,
+}
+"""
+# or None if the file doesn't look like what the probe expects.
+
+
+def mk_info(width, height, channels, alpha):
+	if width <= 0 or height <= 0:
+		return None
+
+	return {
+		'width': int(width),
+		'height': int(height),
+		'channels': int(channels),
+		'alpha': bool(alpha),
+	}
+
+
+def probe_png(f):
+	head = f.read(33)
+	if len(head) < 33 or head[:8] != b'\x89PNG\r\n\x1a\n' or head[12:16] != b'IHDR':
+		return None
+
+	width, height, bit_depth, color_type = struct.unpack('>IIBB', head[16:26])
+
+	channels = {
+		0: 1,
+		2: 3,
+		3: 3,
+		4: 2,
+		6: 4,
+	}.get(color_type)
+
+	if channels == None:
+		return None
+
+	alpha = color_type in (4, 6)
+
+	# Palette/gray/rgb images can still have transparency through the tRNS chunk,
+	# which always comes before the first IDAT.
+	# Only chunk headers are read, the data is skipped
+	if not alpha:
+		f.seek(33)
+		while True:
+			chunk_head = f.read(8)
+			if len(chunk_head) < 8:
+				break
+			chunk_len, chunk_type = struct.unpack('>I4s', chunk_head)
+			if chunk_type in (b'IDAT', b'IEND'):
+				break
+			if chunk_type == b'tRNS':
+				alpha = True
+				break
+			# data + crc
+			f.seek(chunk_len + 4, 1)
+
+	if alpha and channels in (1, 3):
+		channels += 1
+
+	return mk_info(width, height, channels, alpha)
+
+
+def probe_jpeg(f):
+	if f.read(2) != b'\xff\xd8':
+		return None
+
+	while True:
+		# markers may be padded with any amount of 0xFF
+		byte = f.read(1)
+		if not byte:
+			return None
+		if byte != b'\xff':
+			continue
+
+		marker = f.read(1)
+		while marker == b'\xff':
+			marker = f.read(1)
+		if not marker:
+			return None
+
+		marker = marker[0]
+
+		# standalone markers without a length
+		if marker in (0x01, 0xd8) or 0xd0 <= marker <= 0xd7:
+			continue
+
+		# start of scan or end of image before any SOF - broken file
+		if marker in (0xda, 0xd9):
+			return None
+
+		seg_len = f.read(2)
+		if len(seg_len) < 2:
+			return None
+		seg_len = struct.unpack('>H', seg_len)[0]
+
+		# SOF0..SOF15, except DHT, JPG and DAC
+		if 0xc0 <= marker <= 0xcf and not marker in (0xc4, 0xc8, 0xcc):
+			sof = f.read(6)
+			if len(sof) < 6:
+				return None
+			precision, height, width, components = struct.unpack('>BHHB', sof)
+			return mk_info(width, height, components, False)
+
+		f.seek(seg_len - 2, 1)
+
+
+def probe_bmp(f):
+	head = f.read(14 + 4)
+	if len(head) < 18 or head[:2] != b'BM':
+		return None
+
+	dib_size = struct.unpack('<I', head[14:18])[0]
+
+	# OS/2 BITMAPCOREHEADER
+	if dib_size == 12:
+		dib = f.read(8)
+		if len(dib) < 8:
+			return None
+		width, height, planes, bpp = struct.unpack('<HHHH', dib)
+		return mk_info(width, height, 3, False)
+
+	dib = f.read(min(dib_size, 124) - 4)
+	if len(dib) < 16:
+		return None
+
+	width, height, planes, bpp, compression = struct.unpack('<iiHHI', dib[:16])
+
+	# BI_ALPHABITFIELDS or a V3+ header with a non-zero alpha mask
+	alpha = False
+	if bpp in (16, 32):
+		if compression == 6:
+			alpha = True
+		elif dib_size >= 56 and len(dib) >= 52:
+			alpha = struct.unpack('<I', dib[48:52])[0] != 0
+
+	if bpp <= 8:
+		channels = 3
+	else:
+		channels = 4 if alpha else 3
+
+	# negative height means top-down bitmap
+	return mk_info(width, abs(height), channels, alpha)
+
+
+def probe_gif(f):
+	head = f.read(13)
+	if len(head) < 13 or not head[:6] in (b'GIF87a', b'GIF89a'):
+		return None
+
+	width, height, packed = struct.unpack('<HHB', head[6:11])
+
+	# skip global colour table
+	if packed & 0x80:
+		f.seek(3 * (2 << (packed & 0x07)), 1)
+
+	# Look for the transparency flag of the first frame.
+	# Only the extension blocks preceding the first image descriptor matter,
+	# because everything else in blvtf only ever uses the frame [0]
+	alpha = False
+	while True:
+		block = f.read(1)
+		if not block or block in (b'\x2c', b'\x3b'):
+			break
+
+		if block != b'\x21':
+			break
+
+		label = f.read(1)
+		if label == b'\xf9':
+			gce = f.read(6)
+			if len(gce) == 6 and gce[1] & 0x01:
+				alpha = True
+			# block terminator already consumed as part of the 6 bytes
+			continue
+
+		# skip sub-blocks of any other extension
+		while True:
+			sub_len = f.read(1)
+			if not sub_len or sub_len == b'\x00':
+				break
+			f.seek(sub_len[0], 1)
+
+	return mk_info(width, height, 4 if alpha else 3, alpha)
+
+
+# DXGI formats which carry an alpha channel.
+# Only the ones which could realistically be found in a texture pile
+dds_dxgi_alpha = (
+	2, 10, 11, 24, 27, 28, 29,
+	71, 73, 74, 75, 76, 77, 78,
+	87, 88, 90, 91,
+	97, 98, 99,
+)
+
+def probe_dds(f):
+	head = f.read(128)
+	if len(head) < 128 or head[:4] != b'DDS ':
+		return None
+
+	height, width = struct.unpack('<II', head[12:20])
+
+	pf_flags, fourcc, bitcount = struct.unpack('<I4sI', head[80:92])
+	a_mask = struct.unpack('<I', head[104:108])[0]
+
+	# DDPF_FOURCC
+	if pf_flags & 0x4:
+		if fourcc == b'DX10':
+			dx10 = f.read(4)
+			if len(dx10) < 4:
+				return None
+			alpha = struct.unpack('<I', dx10)[0] in dds_dxgi_alpha
+		else:
+			alpha = fourcc in (b'DXT2', b'DXT3', b'DXT4', b'DXT5')
+		return mk_info(width, height, 4 if alpha else 3, alpha)
+
+	# DDPF_ALPHAPIXELS, DDPF_ALPHA
+	alpha = bool(pf_flags & 0x3) and a_mask != 0
+
+	# DDPF_LUMINANCE
+	if pf_flags & 0x20000:
+		return mk_info(width, height, 2 if alpha else 1, alpha)
+
+	# alpha-only
+	if pf_flags & 0x2 and not pf_flags & 0x40:
+		return mk_info(width, height, 1, True)
+
+	return mk_info(width, height, 4 if alpha else 3, alpha)
+
+
+def probe_psd(f):
+	head = f.read(26)
+	if len(head) < 26 or head[:4] != b'8BPS':
+		return None
+
+	version, = struct.unpack('>H', head[4:6])
+	# 1 = PSD, 2 = PSB
+	if not version in (1, 2):
+		return None
+
+	channels, height, width, depth, mode = struct.unpack('>HIIHH', head[12:26])
+
+	# amount of channels the colour mode needs without any extra (alpha) channels
+	base_channels = {
+		0: 1,
+		1: 1,
+		2: 1,
+		3: 3,
+		4: 4,
+		7: channels,
+		8: 1,
+		9: 3,
+	}.get(mode, 3)
+
+	alpha = channels > base_channels
+
+	# CMYK and Lab get flattened to RGB
+	colour_channels = 1 if base_channels == 1 else 3
+
+	return mk_info(width, height, colour_channels + (1 if alpha else 0), alpha)
+
+
+def probe_tiff(f):
+	head = f.read(8)
+	if len(head) < 8:
+		return None
+
+	if head[:2] == b'II':
+		bo = '<'
+	elif head[:2] == b'MM':
+		bo = '>'
+	else:
+		return None
+
+	magic, = struct.unpack(bo + 'H', head[2:4])
+
+	if magic == 42:
+		ifd_offset, = struct.unpack(bo + 'I', head[4:8])
+		count_fmt, entry_fmt, entry_size, val_size = 'H', 'HHI', 12, 4
+	elif magic == 43:
+		# BigTIFF
+		rest = f.read(8)
+		if len(rest) < 8:
+			return None
+		ifd_offset, = struct.unpack(bo + 'Q', rest)
+		count_fmt, entry_fmt, entry_size, val_size = 'Q', 'HHQ', 20, 8
+	else:
+		return None
+
+	f.seek(ifd_offset)
+	entry_count = f.read(struct.calcsize(count_fmt))
+	if len(entry_count) < struct.calcsize(count_fmt):
+		return None
+	entry_count, = struct.unpack(bo + count_fmt, entry_count)
+
+	tags = {}
+	entries = f.read(entry_count * entry_size)
+	for idx in range(len(entries) // entry_size):
+		entry = entries[idx * entry_size:(idx + 1) * entry_size]
+		tag, tag_type, tag_count = struct.unpack(bo + entry_fmt, entry[:entry_size - val_size])
+		value = entry[entry_size - val_size:]
+
+		if not tag in (256, 257, 262, 277, 338):
+			continue
+
+		# SHORT
+		if tag_type == 3:
+			tags[tag] = (struct.unpack(bo + 'H', value[:2])[0], tag_count)
+		# LONG
+		elif tag_type == 4:
+			tags[tag] = (struct.unpack(bo + 'I', value[:4])[0], tag_count)
+		# LONG8
+		elif tag_type == 16:
+			tags[tag] = (struct.unpack(bo + 'Q', value[:8])[0], tag_count)
+		else:
+			tags[tag] = (None, tag_count)
+
+	if not 256 in tags or not 257 in tags:
+		return None
+
+	width = tags[256][0]
+	height = tags[257][0]
+	samples = tags.get(277, (1, 1))[0] or 1
+	# ExtraSamples is only ever there when the extra sample is some kind of alpha
+	alpha = 338 in tags and tags[338][1] > 0
+
+	# Photometric: 0/1 = grayscale, 3 = palette
+	photometric = tags.get(262, (2, 1))[0]
+	if photometric == 3:
+		return mk_info(width, height, 3, False)
+
+	return mk_info(width, height, samples, alpha)
+
+
+def probe_exr(f):
+	head = f.read(8)
+	if len(head) < 8 or head[:4] != b'\x76\x2f\x31\x01':
+		return None
+
+	# Read null-terminated string
+	def read_cstr():
+		chars = bytearray()
+		while True:
+			c = f.read(1)
+			if not c:
+				return None
+			if c == b'\x00':
+				return bytes(chars)
+			chars += c
+			# attribute names are 31 chars max (255 with long names)
+			if len(chars) > 255:
+				return None
+
+	data_window = None
+	channel_names = []
+
+	while True:
+		attr_name = read_cstr()
+		if attr_name == None:
+			return None
+		# end of header
+		if attr_name == b'':
+			break
+
+		attr_type = read_cstr()
+		attr_size = f.read(4)
+		if attr_type == None or len(attr_size) < 4:
+			return None
+		attr_size, = struct.unpack('<i', attr_size)
+
+		if attr_name == b'dataWindow' and attr_type == b'box2i':
+			data_window = struct.unpack('<iiii', f.read(16))
+		elif attr_name == b'channels' and attr_type == b'chlist':
+			chlist = f.read(attr_size)
+			pos = 0
+			while pos < len(chlist) and chlist[pos] != 0:
+				name_end = chlist.index(b'\x00', pos)
+				channel_names.append(chlist[pos:name_end].decode(errors='replace'))
+				# name terminator + pixel type, pLinear, reserved, xSampling, ySampling
+				pos = name_end + 1 + 16
+		else:
+			f.seek(attr_size, 1)
+
+		if data_window and channel_names:
+			break
+
+	if not data_window:
+		return None
+
+	xmin, ymin, xmax, ymax = data_window
+
+	# Multi-layer EXRs have stuff like "diffuse.R", only the last bit matters
+	layer_channels = set(ch.split('.')[-1].upper() for ch in channel_names)
+	alpha = 'A' in layer_channels
+	colour_channels = len(layer_channels & set(('R', 'G', 'B', 'Y')))
+	if colour_channels == 0:
+		colour_channels = min(len(layer_channels), 4) or 3
+	elif colour_channels == 2:
+		colour_channels = 3
+
+	channels = min(colour_channels + (1 if alpha else 0), 4)
+
+	return mk_info(xmax - xmin + 1, ymax - ymin + 1, channels, alpha)
+
+
+def probe_hdr(f):
+	first_line = f.readline(128)
+	if not first_line.startswith((b'#?RADIANCE', b'#?RGBE')):
+		return None
+
+	# header lines are terminated by an empty line
+	for line_idx in range(1024):
+		line = f.readline(1024)
+		if not line:
+			return None
+		if line.strip() == b'':
+			break
+
+	# Resolution string, such as "-Y 512 +X 1024"
+	res = f.readline(128).split()
+	if len(res) != 4:
+		return None
+
+	dims = {}
+	for axis, amount in ((res[0], res[1]), (res[2], res[3])):
+		dims[axis[-1:].upper()] = int(amount)
+
+	if not b'X' in dims or not b'Y' in dims:
+		return None
+
+	return mk_info(dims[b'X'], dims[b'Y'], 3, False)
+
+
+def probe_tga(f):
+	head = f.read(18)
+	if len(head) < 18:
+		return None
+
+	(
+		id_len, cmap_type, img_type,
+		cmap_first, cmap_len, cmap_entry_size,
+		x_origin, y_origin, width, height,
+		pixel_depth, descriptor
+	) = struct.unpack('<BBBHHBHHHHBB', head)
+
+	# TGA has no magic number, so be paranoid about the header
+	if not img_type in (1, 2, 3, 9, 10, 11) or not cmap_type in (0, 1):
+		return None
+
+	if not pixel_depth in (8, 15, 16, 24, 32):
+		return None
+
+	alpha_bits = descriptor & 0x0F
+
+	# grayscale
+	if img_type in (3, 11):
+		alpha = pixel_depth == 16 or alpha_bits > 0
+		return mk_info(width, height, 2 if alpha else 1, alpha)
+
+	# colour-mapped
+	if img_type in (1, 9):
+		alpha = cmap_entry_size == 32
+		return mk_info(width, height, 4 if alpha else 3, alpha)
+
+	alpha = pixel_depth == 32 or alpha_bits > 0
+	return mk_info(width, height, 4 if alpha else 3, alpha)
+
+
+
+
+# magic prefix -> probe
+blvtf_probe_magic = (
+	(b'\x89PNG', probe_png),
+	(b'\xff\xd8', probe_jpeg),
+	(b'BM', probe_bmp),
+	(b'GIF8', probe_gif),
+	(b'DDS ', probe_dds),
+	(b'8BPS', probe_psd),
+	(b'II*\x00', probe_tiff),
+	(b'MM\x00*', probe_tiff),
+	(b'II+\x00', probe_tiff),
+	(b'MM\x00+', probe_tiff),
+	(b'\x76\x2f\x31\x01', probe_exr),
+	(b'#?', probe_hdr),
+)
+
+# Formats which can only be recognized by the file extension
+blvtf_probe_ext = {
+	'.tga': probe_tga,
+	'.tpic': probe_tga,
+	'.vda': probe_tga,
+	'.icb': probe_tga,
+	'.vst': probe_tga,
+}
+
+
+# Probe image dimensions, channel count and alpha presence by reading the header only.
+# Returns None if the format is unknown or the header is broken,
+# in which case the caller has to fall back to something heavier (imagemagick)
+def blvtf_probe_img(imgpath):
+	imgpath = Path(imgpath)
+
+	try:
+		with open(imgpath, 'rb') as f:
+			magic = f.read(4)
+
+			probe = None
+			for prefix, magic_probe in blvtf_probe_magic:
+				if magic.startswith(prefix):
+					probe = magic_probe
+					break
+
+			if not probe:
+				probe = blvtf_probe_ext.get(imgpath.suffix.lower())
+
+			if not probe:
+				return None
+
+			f.seek(0)
+			return probe(f)
+
+	except (OSError, struct.error, ValueError, IndexError) as e:
+		print('BLVTF: Header probe failed for', imgpath, e)
+		return None
@@ -0,0 +1,167 @@
+import sqlite3, threading, time, os
+
+from pathlib import Path
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                  Persistent probe cache
+# ---------------------------------------------------------
+# =========================================================
+
+# Stores whatever blvtf_get_img_info returned for a file,
+# keyed by the absolute path + mtime + size of that file.
+# If either mtime or size changes - the entry is considered stale.
+
+# Least recently used entries get evicted once the cache grows past max_entries.
+# last_used is only bumped once per touch_interval seconds,
+# so that a warm batch doesn't turn every cache hit into a write.
+
+class blvtf_probe_cache:
+	def __init__(self, db_path, max_entries=250_000, touch_interval=3600, flush_every=64):
+		self.db_path = Path(db_path)
+		self.max_entries = max_entries
+		self.touch_interval = touch_interval
+		self.flush_every = flush_every
+
+		self.lock = threading.Lock()
+		self.conn = None
+
+		# rows waiting to be written
+		self.pending_puts = {}
+		self.pending_touches = {}
+
+		# Lookups since the cache was created, for the progress panel
+		self.hits = 0
+		self.misses = 0
+
+	# Connection is only opened once something actually needs the cache
+	def db(self):
+		if self.conn:
+			return self.conn
+
+		try:
+			self.db_path.parent.mkdir(parents=True, exist_ok=True)
+			self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+			self.conn.execute('PRAGMA journal_mode=WAL')
+			self.conn.execute('PRAGMA synchronous=NORMAL')
+		except sqlite3.Error as e:
+			# A broken/locked cache should never break the conversion itself
+			print('BLVTF: Unable to open the probe cache at', self.db_path, e, 'Using in-memory cache instead')
+			self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+
+		self.conn.execute("""
+			CREATE TABLE IF NOT EXISTS probes (
+				path TEXT PRIMARY KEY,
+				mtime_ns INTEGER NOT NULL,
+				size INTEGER NOT NULL,
+				width INTEGER NOT NULL,
+				height INTEGER NOT NULL,
+				channels INTEGER NOT NULL,
+				alpha INTEGER NOT NULL,
+				last_used REAL NOT NULL
+			)
+		""")
+		self.conn.execute('CREATE INDEX IF NOT EXISTS probes_last_used ON probes (last_used)')
+		self.conn.commit()
+
+		return self.conn
+
+	# Returns the cached info dict or None if there's no entry or it's stale.
+	# stat is the os.stat() result of imgpath taken BEFORE probing
+	def get(self, imgpath, stat):
+		key = os.path.abspath(imgpath)
+
+		with self.lock:
+			pending = self.pending_puts.get(key)
+			if pending:
+				row = pending[1:-1]
+			else:
+				row = self.db().execute(
+					'SELECT mtime_ns, size, width, height, channels, alpha, last_used FROM probes WHERE path = ?',
+					(key,)
+				).fetchone()
+
+			if not row:
+				self.misses += 1
+				return None
+
+			mtime_ns, size, width, height, channels, alpha = row[:6]
+			if mtime_ns != stat.st_mtime_ns or size != stat.st_size:
+				self.misses += 1
+				return None
+
+			self.hits += 1
+			now = time.time()
+			if not pending and now - row[6] > self.touch_interval:
+				self.pending_touches[key] = now
+
+		return {
+			'width': width,
+			'height': height,
+			'channels': channels,
+			'alpha': bool(alpha),
+		}
+
+	def put(self, imgpath, stat, img_info):
+		key = os.path.abspath(imgpath)
+
+		with self.lock:
+			self.pending_puts[key] = (
+				key,
+				stat.st_mtime_ns,
+				stat.st_size,
+				img_info['width'],
+				img_info['height'],
+				img_info['channels'],
+				int(img_info['alpha']),
+				time.time(),
+			)
+			self.pending_touches.pop(key, None)
+
+			if len(self.pending_puts) >= self.flush_every:
+				self.flush_locked()
+
+	def flush(self):
+		with self.lock:
+			self.flush_locked()
+
+	def flush_locked(self):
+		if not self.pending_puts and not self.pending_touches:
+			return
+
+		conn = self.db()
+		try:
+			with conn:
+				conn.executemany(
+					'INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+					self.pending_puts.values()
+				)
+				conn.executemany(
+					'UPDATE probes SET last_used = ? WHERE path = ?',
+					((last_used, key) for key, last_used in self.pending_touches.items())
+				)
+				self.evict_locked(conn)
+		except sqlite3.Error as e:
+			print('BLVTF: Unable to write the probe cache', e)
+
+		self.pending_puts.clear()
+		self.pending_touches.clear()
+
+	# Drop least recently used entries past max_entries
+	def evict_locked(self, conn):
+		total = conn.execute('SELECT COUNT(*) FROM probes').fetchone()[0]
+		if total <= self.max_entries:
+			return
+
+		conn.execute(
+			'DELETE FROM probes WHERE path IN (SELECT path FROM probes ORDER BY last_used ASC LIMIT ?)',
+			(total - self.max_entries,)
+		)
+
+	def close(self):
+		with self.lock:
+			self.flush_locked()
+			if self.conn:
+				self.conn.close()
+				self.conn = None
@@ -0,0 +1,171 @@
+import collections, os, queue, time
+
+from pathlib import Path
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                    Progress channel
+# ---------------------------------------------------------
+# =========================================================
+
+# Workers never touch the UI (or each other): they push events into a queue,
+# whoever shows the progress drains it whenever it wants to redraw
+# (the addon from a bpy.app.timers callback on the main thread, the CLI when it prints).
+# Draining folds the events into a snapshot:
+"""
+{
+	'total': 120,
+	'done': 40,  # converted + skipped + failed
+	'skipped': 12,
+	'failed': 1,
+	'scanning': False,  # whether more tasks could still be discovered
+	'finished': False,  # the run is over
+	'elapsed': 12.5,
+	'tasks_per_sec': 3.2,  # moving average over the last blvtf_progress_window seconds
+	'mb_per_sec': 14.1,  # source megabytes converted per second, same average
+	'eta': 25.0 or None,  # seconds, None while it can't be told
+	'slowest': ('rock.psd +3', 7.5) or None,  # in-flight group running the longest, seconds
+}
+"""
+
+# blvtf_run_batch / blvtf_run_job take anything with discover, discovery_done, begin and update as progress.
+
+# Seconds the rates are averaged over
+blvtf_progress_window = 10.0
+
+
+# Size of a task's source, for the MB/s
+def blvtf_task_bytes(task_info):
+	src_pixels = task_info.get('src_pixels')
+	if src_pixels is not None:
+		return src_pixels.nbytes
+
+	try:
+		return os.stat(task_info['src']).st_size
+	except (OSError, KeyError, TypeError):
+		return 0
+
+
+class blvtf_progress_channel:
+	"""Progress events from any thread, folded into a snapshot by drain()"""
+	def __init__(self, total=None, window=blvtf_progress_window):
+		self.events = queue.SimpleQueue()
+		self.window = window
+
+		# Only ever touched by the draining thread
+		self.snapshot = {
+			'total': total or 0,
+			'done': 0,
+			'skipped': 0,
+			'failed': 0,
+			'scanning': total == None,
+			'finished': False,
+			'elapsed': 0.0,
+			'tasks_per_sec': 0.0,
+			'mb_per_sec': 0.0,
+			'eta': None,
+			'slowest': None,
+		}
+		self.started = time.perf_counter()
+		# (time, done, bytes) after every finished group, for the moving average
+		self.samples = collections.deque([(self.started, 0, 0)])
+		self.bytes_done = 0
+		# id of the group -> (started, label)
+		self.in_flight = {}
+
+	# --------------------------
+	#   Any thread
+	# --------------------------
+
+	# more tasks were found
+	def discover(self, amt=1):
+		self.events.put(('discover', amt))
+
+	# no more tasks would be found
+	def discovery_done(self):
+		self.events.put(('discovery_done',))
+
+	# A worker started on a group of tasks
+	def begin(self, task_group):
+		label = Path(str(task_group[0]['src'])).name
+		if len(task_group) > 1:
+			label += f' +{len(task_group) - 1}'
+		self.events.put(('begin', id(task_group), time.perf_counter(), label))
+
+	# amt tasks are done. skipped and failed are part of amt,
+	# nbytes is the size of the sources which were actually converted
+	def update(self, amt=1, task_group=None, skipped=0, failed=0, nbytes=0):
+		self.events.put(('update', id(task_group) if task_group else None, time.perf_counter(), amt, skipped, failed, nbytes))
+
+	# The run is over. failed: the final count of failed tasks, if the caller knows better
+	def finish(self, failed=None):
+		self.events.put(('finish', failed))
+
+	# --------------------------
+	#   Draining thread
+	# --------------------------
+
+	def drain(self):
+		snapshot = self.snapshot
+		while True:
+			try:
+				event = self.events.get_nowait()
+			except queue.Empty:
+				break
+
+			if event[0] == 'discover':
+				snapshot['total'] += event[1]
+			elif event[0] == 'discovery_done':
+				snapshot['scanning'] = False
+			elif event[0] == 'begin':
+				self.in_flight[event[1]] = (event[2], event[3])
+			elif event[0] == 'update':
+				group_key, done_at, amt, skipped, failed, nbytes = event[1:]
+				self.in_flight.pop(group_key, None)
+				snapshot['done'] += amt
+				snapshot['skipped'] += skipped
+				snapshot['failed'] += failed
+				self.bytes_done += nbytes
+				self.samples.append((done_at, snapshot['done'], self.bytes_done))
+			elif event[0] == 'finish':
+				snapshot['finished'] = True
+				if event[1] != None:
+					snapshot['failed'] = event[1]
+				self.in_flight.clear()
+
+		now = time.perf_counter()
+		snapshot['elapsed'] = now - self.started
+
+		# Moving average: whatever got done since the last sample older than the window
+		while len(self.samples) > 1 and now - self.samples[1][0] >= self.window:
+			self.samples.popleft()
+
+		since, done_then, bytes_then = self.samples[0]
+		span = max(now - since, 1e-6)
+		snapshot['tasks_per_sec'] = (snapshot['done'] - done_then) / span
+		snapshot['mb_per_sec'] = (self.bytes_done - bytes_then) / span / (1024 * 1024)
+
+		snapshot['eta'] = None
+		if snapshot['tasks_per_sec'] > 0 and not snapshot['scanning']:
+			snapshot['eta'] = max(0, snapshot['total'] - snapshot['done']) / snapshot['tasks_per_sec']
+
+		snapshot['slowest'] = None
+		if self.in_flight:
+			started, label = min(self.in_flight.values())
+			snapshot['slowest'] = (label, now - started)
+
+		return snapshot
+
+
+# 12.5 -> '13s', 125 -> '2m 05s'
+def blvtf_format_eta(seconds):
+	if seconds == None:
+		return '?'
+	seconds = int(round(seconds))
+	if seconds < 60:
+		return f'{seconds}s'
+	if seconds < 3600:
+		return f'{seconds // 60}m {seconds % 60:02d}s'
+
+	return f'{seconds // 3600}h {seconds % 3600 // 60:02d}m'
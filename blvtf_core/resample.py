@@ -0,0 +1,283 @@
+import math
+
+import numpy as np
+
+from functools import lru_cache
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                        Resampling
+# ---------------------------------------------------------
+# =========================================================
+
+# Separable resampling with the filters listed in blvtf_interp_filters.
+# Used for the mip chains and for resizing images to a power of 2.
+
+# Per axis, every output pixel is a weighted sum of a few neighbouring input pixels.
+# The indices and weights are precomputed once per (input size, output size, filter)
+# and cached, so a batch of same-sized textures pays for them only once.
+
+# The image is processed in strips of output rows: only a strip worth of float data
+# exists at any time, no matter how big the image is.
+
+# Edges are clamped.
+
+
+# How many output rows are processed at once
+blvtf_resample_strip = 128
+
+
+# Bessel function of the first kind, order 1 (numpy doesn't have it).
+# Rational approximation from Numerical Recipes, plenty for filter kernels
+def blvtf_bessel_j1(x):
+	x = np.asarray(x, dtype=np.float64)
+	ax = np.abs(x)
+
+	y = x * x
+	small = x * (72362614232.0 + y * (-7895059235.0 + y * (242396853.1 + y * (-2972611.439 + y * (15704.48260 + y * (-30.16036606))))))
+	small /= 144725228442.0 + y * (2300535178.0 + y * (18583304.74 + y * (99447.43394 + y * (376.9991397 + y))))
+
+	z = 8.0 / np.maximum(ax, 1e-12)
+	y = z * z
+	xx = ax - 2.356194491
+	big1 = 1.0 + y * (0.183105e-2 + y * (-0.3516396496e-4 + y * (0.2457520174e-5 + y * (-0.240337019e-6))))
+	big2 = 0.04687499995 + y * (-0.2002690873e-3 + y * (0.8449199096e-5 + y * (-0.88228987e-6 + y * 0.105787412e-6)))
+	big = np.sqrt(0.636619772 / np.maximum(ax, 1e-12)) * (np.cos(xx) * big1 - z * np.sin(xx) * big2)
+	big = np.where(x < 0, -big, big)
+
+	return np.where(ax < 8.0, small, big)
+
+
+def blvtf_sinc(x):
+	return np.sinc(x)
+
+
+# Mitchell-Netravali family of cubics
+def blvtf_bc_cubic(b, c):
+	def kernel(x):
+		x = np.abs(x)
+		near = ((12 - 9 * b - 6 * c) * x**3 + (-18 + 12 * b + 6 * c) * x**2 + (6 - 2 * b)) / 6
+		far = ((-b - 6 * c) * x**3 + (6 * b + 30 * c) * x**2 + (-12 * b - 48 * c) * x + (8 * b + 24 * c)) / 6
+		return np.where(x < 1, near, np.where(x < 2, far, 0.0))
+	return kernel
+
+
+# Sinc, windowed over the support
+def blvtf_windowed_sinc(window, support):
+	def kernel(x):
+		return np.where(np.abs(x) < support, blvtf_sinc(x) * window(x / support), 0.0)
+	return kernel
+
+
+blvtf_kaiser_alpha = 6.5
+blvtf_bessel_support = 3.2383
+
+# filter name -> (kernel function, support radius in pixels)
+blvtf_resample_kernels = {
+	'POINT': (None, 0.5),
+	'BOX': (lambda x: ((x >= -0.5) & (x < 0.5)).astype(np.float64), 0.5),
+	'TRIANGLE': (lambda x: np.maximum(1.0 - np.abs(x), 0.0), 1.0),
+	'QUADRATIC': (
+		lambda x: np.where(np.abs(x) < 0.5, 0.75 - x**2, np.where(np.abs(x) < 1.5, 0.5 * (np.abs(x) - 1.5) ** 2, 0.0)),
+		1.5
+	),
+	'CUBIC': (blvtf_bc_cubic(1.0, 0.0), 2.0),
+	'CATROM': (blvtf_bc_cubic(0.0, 0.5), 2.0),
+	'MITCHELL': (blvtf_bc_cubic(1.0 / 3.0, 1.0 / 3.0), 2.0),
+	'GAUSSIAN': (lambda x: np.exp(-2.0 * x * x), 2.0),
+	'SINC': (lambda x: np.where(np.abs(x) < 4.0, blvtf_sinc(x), 0.0), 4.0),
+	'BESSEL': (
+		lambda x: np.where(np.abs(x) < 1e-9, 1.0, 2.0 * blvtf_bessel_j1(np.pi * x) / (np.pi * np.where(np.abs(x) < 1e-9, 1.0, x))),
+		blvtf_bessel_support
+	),
+	'HANNING': (blvtf_windowed_sinc(lambda t: 0.5 + 0.5 * np.cos(np.pi * t), 3.0), 3.0),
+	'HAMMING': (blvtf_windowed_sinc(lambda t: 0.54 + 0.46 * np.cos(np.pi * t), 3.0), 3.0),
+	'BLACKMAN': (blvtf_windowed_sinc(lambda t: 0.42 + 0.5 * np.cos(np.pi * t) + 0.08 * np.cos(2 * np.pi * t), 3.0), 3.0),
+	'KAISER': (
+		blvtf_windowed_sinc(lambda t: np.i0(blvtf_kaiser_alpha * np.sqrt(np.clip(1.0 - t * t, 0.0, 1.0))) / np.i0(blvtf_kaiser_alpha), 3.0),
+		3.0
+	),
+}
+
+
+# Indices and weights of the input pixels contributing to every output pixel along one axis.
+# returns (indices (out_size, taps), weights (out_size, taps))
+@lru_cache(maxsize=64)
+def blvtf_resample_weights(in_size, out_size, filter_name):
+	kernel, support = blvtf_resample_kernels[filter_name]
+
+	scale = in_size / out_size
+	# Downscaling stretches the kernel over more input pixels
+	kernel_scale = max(scale, 1.0)
+
+	# Pixel centers of the output, in input coordinates
+	centers = (np.arange(out_size) + 0.5) * scale
+
+	if kernel == None:
+		indices = np.minimum(np.floor(centers), in_size - 1).astype(np.intp)[:, None]
+		return indices, np.ones(indices.shape, dtype=np.float32)
+
+	radius = support * kernel_scale
+	taps = int(math.ceil(radius * 2)) + 1
+	first = np.floor(centers - radius).astype(np.intp)
+	indices = first[:, None] + np.arange(taps)[None, :]
+
+	weights = kernel((indices + 0.5 - centers[:, None]) / kernel_scale)
+	weight_sums = weights.sum(axis=1, keepdims=True)
+	weights /= np.where(np.abs(weight_sums) < 1e-12, 1.0, weight_sums)
+
+	# Drop taps which are 0 everywhere
+	used = np.abs(weights).max(axis=0) > 0
+	indices = indices[:, used]
+	weights = weights[:, used]
+
+	return np.clip(indices, 0, in_size - 1), weights.astype(np.float32)
+
+
+
+
+# =========================================================
+#                          Gamma
+# =========================================================
+
+# sRGB 8 bit -> linear float
+blvtf_srgb_to_linear_lut = np.where(
+	np.arange(256) / 255.0 <= 0.04045,
+	np.arange(256) / 255.0 / 12.92,
+	((np.arange(256) / 255.0 + 0.055) / 1.055) ** 2.4
+).astype(np.float32)
+
+
+def blvtf_linear_to_srgb(lin):
+	lin = np.clip(lin, 0.0, 1.0)
+	return np.where(lin <= 0.0031308, lin * 12.92, 1.055 * np.power(lin, 1.0 / 2.4) - 0.055)
+
+
+# Image rows -> float32 working data.
+# srgb: colour channels are decoded to linear light, so that the filtering is gamma-correct
+def blvtf_resample_load(rows, srgb):
+	if rows.dtype == np.uint8:
+		if srgb:
+			out = blvtf_srgb_to_linear_lut[rows]
+			out[..., 3] = rows[..., 3] * (1.0 / 255.0)
+			return out
+		return rows.astype(np.float32) * (1.0 / 255.0)
+
+	if rows.dtype == np.uint16:
+		return rows.astype(np.float32) * (1.0 / 65535.0)
+
+	# Float images are linear already
+	return rows.astype(np.float32)
+
+
+# float32 working data -> the original dtype
+def blvtf_resample_store(data, dtype, srgb):
+	if dtype == np.uint8:
+		if srgb:
+			data[..., :3] = blvtf_linear_to_srgb(data[..., :3])
+		return (np.clip(data, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+	if dtype == np.uint16:
+		return (np.clip(data, 0.0, 1.0) * 65535.0 + 0.5).astype(np.uint16)
+
+	return data.astype(dtype)
+
+
+
+
+# =========================================================
+#                         Resampler
+# =========================================================
+
+# Resize a (height, width, 4) image to out_w x out_h.
+# The result has the same dtype as the input
+def blvtf_resample(img, out_w, out_h, filter_name='CUBIC', srgb=False):
+	in_h, in_w = img.shape[:2]
+
+	if (in_w, in_h) == (out_w, out_h):
+		return img
+
+	col_idx, col_w = blvtf_resample_weights(in_w, out_w, filter_name)
+	row_idx, row_w = blvtf_resample_weights(in_h, out_h, filter_name)
+
+	out = np.empty((out_h, out_w) + img.shape[2:], dtype=img.dtype)
+
+	for strip_start in range(0, out_h, blvtf_resample_strip):
+		strip_end = min(strip_start + blvtf_resample_strip, out_h)
+		strip_rows = row_idx[strip_start:strip_end]
+		strip_row_w = row_w[strip_start:strip_end]
+
+		# Only the input rows this strip needs
+		first_row = int(strip_rows.min())
+		src = blvtf_resample_load(img[first_row:int(strip_rows.max()) + 1], srgb)
+
+		# Vertical pass
+		vert = np.zeros((strip_end - strip_start, in_w) + img.shape[2:], dtype=np.float32)
+		for tap in range(strip_rows.shape[1]):
+			vert += strip_row_w[:, tap, None, None] * src[strip_rows[:, tap] - first_row]
+
+		# Horizontal pass
+		horz = np.zeros((strip_end - strip_start, out_w) + img.shape[2:], dtype=np.float32)
+		for tap in range(col_idx.shape[1]):
+			horz += col_w[None, :, tap, None] * vert[:, col_idx[:, tap]]
+
+		out[strip_start:strip_end] = blvtf_resample_store(horz, img.dtype, srgb)
+
+	return out
+
+
+# Mip chain, largest first, down to 1x1.
+# Every level is made from the previous one, so the whole chain takes ~1.33x the memory of the top level
+def blvtf_mip_chain(img, filter_name='BOX', srgb=False):
+	mips = [img]
+	while mips[-1].shape[0] > 1 or mips[-1].shape[1] > 1:
+		prev_h, prev_w = mips[-1].shape[:2]
+		mips.append(blvtf_resample(mips[-1], max(1, prev_w // 2), max(1, prev_h // 2), filter_name, srgb))
+
+	return mips
+
+
+
+
+# =========================================================
+#                      Power of 2 resize
+# =========================================================
+
+# See blvtf_resize_methods
+def blvtf_pow2(size, method='NEAREST'):
+	lower = 1 << (max(1, int(size)).bit_length() - 1)
+	if lower == size:
+		return lower
+	upper = lower * 2
+
+	if method == 'BIGGEST':
+		return upper
+	if method == 'SMALLEST':
+		return lower
+
+	# NEAREST, ties go up
+	return lower if size - lower < upper - size else upper
+
+
+# Target dimensions of the power of 2 resize.
+# clamp_dims: False or (max width, max height). Dimensions are halved until they fit,
+# same as VTFLib does, so that they stay a power of 2
+def blvtf_pow2_dims(width, height, method='NEAREST', clamp_dims=False):
+	width = blvtf_pow2(width, method)
+	height = blvtf_pow2(height, method)
+
+	if clamp_dims:
+		while width > 1 and width > int(clamp_dims[0]):
+			width //= 2
+		while height > 1 and height > int(clamp_dims[1]):
+			height //= 2
+
+	return width, height
+
+
+# Resize an image to the power of 2 dimensions given by the method and clamps.
+# Nothing happens if the image is already there
+def blvtf_resize_pow2(img, method='NEAREST', filter_name='CUBIC', clamp_dims=False, srgb=False):
+	out_w, out_h = blvtf_pow2_dims(img.shape[1], img.shape[0], method, clamp_dims)
+	return blvtf_resample(img, out_w, out_h, filter_name, srgb)
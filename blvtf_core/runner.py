@@ -0,0 +1,316 @@
+import os, signal, subprocess, sys, threading, time
+
+from pathlib import Path
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                   External process runner
+# ---------------------------------------------------------
+# =========================================================
+
+# Every external tool (magick, VTFCmd, vtex, 7z) is started through blvtf_run:
+#  - Every stage has a timeout, a hung process is killed instead of stalling the batch forever.
+#    Along with everything it started: under Wine, VTFCmd and magick are grandchildren of the process
+#    started here, and would keep running (and keep the pipes open) otherwise.
+#  - Whatever the process prints is kept in a ring buffer of blvtf_run_ring_size bytes per stream:
+#    the tail is all that's needed to tell what went wrong, and a chatty tool can't eat the RAM.
+#  - Exit codes are checked, failures raise blvtf_run_error with the tail of the output.
+#  - Transient failures (timeouts, a process which couldn't be started) are retried.
+#  - CPU time and peak memory of every process are added up per calling thread
+#    (see blvtf_run_usage), for the timing trace (blvtf_core/trace.py).
+
+# Pipes are read and written in chunks of blvtf_run_chunk,
+# stdin is fed and stderr is drained on separate threads, so no pipe ever fills up.
+
+
+blvtf_run_chunk = 1 << 20
+blvtf_run_ring_size = 64 * 1024
+
+# Seconds a single run of a stage may take.
+# scaled by timeout_scale (VTFCmd converting a group of 16 images gets 16 times as much)
+blvtf_run_timeouts = {
+	'magick': 300,
+	'vtfcmd': 300,
+	'vtex': 600,
+	'7z': 600,
+}
+blvtf_run_default_timeout = 600
+
+# How many times a transient failure is retried
+blvtf_run_retries = {
+	'magick': 1,
+	'vtfcmd': 1,
+	'vtex': 1,
+	'7z': 0,
+}
+
+
+# CPU seconds and peak RSS bytes of the processes started by the current thread.
+# cpu only grows, peak_rss is the biggest process so far (a trace stage resets it, see blvtf_core/trace.py)
+blvtf_run_usage = threading.local()
+
+def blvtf_run_thread_usage():
+	if not hasattr(blvtf_run_usage, 'cpu'):
+		blvtf_run_usage.cpu = 0.0
+		blvtf_run_usage.peak_rss = 0
+
+	return blvtf_run_usage
+
+
+# Wait for a process to exit.
+# returns (CPU seconds, peak RSS bytes) it used, None where the OS won't tell
+def blvtf_run_wait(proc):
+	if sys.platform == 'win32':
+		proc.wait()
+		return blvtf_win_process_usage(int(proc._handle))
+
+	try:
+		pid, status, rusage = os.wait4(proc.pid, 0)
+	except ChildProcessError:
+		# Already reaped by the kill on timeout
+		proc.wait()
+		return (None, None)
+
+	proc.returncode = os.waitstatus_to_exitcode(status)
+	peak_rss = rusage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+	return (rusage.ru_utime + rusage.ru_stime, peak_rss)
+
+
+# GetProcessTimes + GetProcessMemoryInfo of a process handle
+def blvtf_win_process_usage(proc_handle):
+	import ctypes
+	from ctypes import wintypes
+
+	class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+		_fields_ = [
+			('cb', wintypes.DWORD),
+			('PageFaultCount', wintypes.DWORD),
+			('PeakWorkingSetSize', ctypes.c_size_t),
+			('WorkingSetSize', ctypes.c_size_t),
+			('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+			('QuotaPagedPoolUsage', ctypes.c_size_t),
+			('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+			('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+			('PagefileUsage', ctypes.c_size_t),
+			('PeakPagefileUsage', ctypes.c_size_t),
+		]
+
+	cpu = None
+	peak_rss = None
+	proc_handle = wintypes.HANDLE(proc_handle)
+	try:
+		# creation, exit, kernel, user. In 100ns ticks
+		times = [wintypes.FILETIME() for i in range(4)]
+		if ctypes.windll.kernel32.GetProcessTimes(proc_handle, *[ctypes.byref(t) for t in times]):
+			cpu = sum((t.dwHighDateTime << 32 | t.dwLowDateTime) for t in times[2:]) / 10_000_000
+
+		mem_counters = PROCESS_MEMORY_COUNTERS()
+		mem_counters.cb = ctypes.sizeof(mem_counters)
+		if ctypes.windll.psapi.GetProcessMemoryInfo(proc_handle, ctypes.byref(mem_counters), mem_counters.cb):
+			peak_rss = mem_counters.PeakWorkingSetSize
+	except (AttributeError, OSError):
+		pass
+
+	return (cpu, peak_rss)
+
+
+# Kill a process started by blvtf_run_once and everything it started
+def blvtf_run_kill(proc):
+	if sys.platform == 'win32':
+		# /T takes the whole process tree
+		try:
+			subprocess.run(['taskkill', '/F', '/T', '/PID', str(proc.pid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30)
+		except (OSError, subprocess.SubprocessError):
+			pass
+		proc.kill()
+		return
+
+	# The process leads its own process group (start_new_session), the group goes down with it.
+	# The process isn't reaped before the pipes are closed, so its pid (= the group id) is still its own
+	try:
+		os.killpg(proc.pid, signal.SIGKILL)
+	except (ProcessLookupError, PermissionError):
+		proc.kill()
+
+
+class blvtf_run_error(RuntimeError):
+	"""An external process failed. result is the blvtf_run_result, if it got that far"""
+	def __init__(self, message, result=None, transient=False):
+		super().__init__(message)
+		self.result = result
+		self.transient = transient
+
+
+class blvtf_ring_buffer:
+	"""Keeps the last size bytes written to it"""
+	def __init__(self, size=blvtf_run_ring_size):
+		self.size = size
+		self.buf = bytearray()
+		self.total = 0
+
+	def write(self, data):
+		self.total += len(data)
+		self.buf += data[-self.size:]
+		if len(self.buf) > self.size:
+			del self.buf[:len(self.buf) - self.size]
+
+	# Read a pipe till the end
+	def drain(self, pipe):
+		while True:
+			chunk = pipe.read(blvtf_run_chunk)
+			if not chunk:
+				break
+			self.write(chunk)
+
+	def text(self):
+		text = self.buf.decode(errors='replace')
+		if self.total > len(self.buf):
+			text = f'[{self.total - len(self.buf)} bytes skipped] ...' + text
+		return text
+
+
+class blvtf_run_result:
+	"""What came out of a run"""
+	def __init__(self, args, stage, returncode, out, out_ring, err_ring, elapsed, attempts, cpu=None, peak_rss=None):
+		self.args = args
+		self.stage = stage
+		self.returncode = returncode
+		# whatever read_stdout returned, or None if stdout went into out_ring
+		self.out = out
+		self.out_ring = out_ring
+		self.err_ring = err_ring
+		self.elapsed = elapsed
+		self.attempts = attempts
+		# None if the OS didn't tell
+		self.cpu = cpu
+		self.peak_rss = peak_rss
+
+	# Tail of everything the process printed, for error messages
+	def echo(self):
+		return '\n'.join(filter(None, (
+			self.out_ring.text().strip() if self.out_ring else '',
+			self.err_ring.text().strip(),
+		)))
+
+
+def blvtf_run_feed(pipe, data):
+	data = memoryview(data).cast('B')
+	try:
+		for offset in range(0, len(data), blvtf_run_chunk):
+			pipe.write(data[offset:offset + blvtf_run_chunk])
+	except (BrokenPipeError, OSError):
+		# The process gave up on the input, its exit code tells why
+		pass
+	finally:
+		try:
+			pipe.close()
+		except OSError:
+			pass
+
+
+# A single attempt
+def blvtf_run_once(args, stage, stdin_data, read_stdout, timeout, cwd):
+	started = time.perf_counter()
+
+	try:
+		proc = subprocess.Popen(
+			args,
+			stdin=subprocess.DEVNULL if stdin_data is None else subprocess.PIPE,
+			stdout=subprocess.PIPE,
+			stderr=subprocess.PIPE,
+			cwd=cwd,
+			# Its own process group, to kill the whole group on timeout
+			start_new_session=sys.platform != 'win32',
+		)
+	except (FileNotFoundError, PermissionError) as e:
+		raise blvtf_run_error(f'{stage}: could not start {args[0]}: {e}')
+	except OSError as e:
+		# Out of handles, executable being replaced, etc.
+		raise blvtf_run_error(f'{stage}: could not start {args[0]}: {e}', transient=True)
+
+	with proc:
+		# Kill the process (and whatever it started) once the time is up.
+		# That closes its pipes, which gets everything below unstuck
+		timed_out = threading.Event()
+		def kill():
+			timed_out.set()
+			blvtf_run_kill(proc)
+		killer = threading.Timer(timeout, kill)
+		killer.daemon = True
+		killer.start()
+
+		workers = []
+		if stdin_data is not None:
+			workers.append(threading.Thread(target=blvtf_run_feed, args=(proc.stdin, stdin_data), daemon=True))
+
+		err_ring = blvtf_ring_buffer()
+		workers.append(threading.Thread(target=err_ring.drain, args=(proc.stderr,), daemon=True))
+
+		for worker in workers:
+			worker.start()
+
+		try:
+			out = None
+			out_ring = None
+			if read_stdout:
+				out = read_stdout(proc.stdout)
+				# Whatever comes after is not needed, but has to be read for the process to exit
+				while proc.stdout.read(blvtf_run_chunk):
+					pass
+			else:
+				out_ring = blvtf_ring_buffer()
+				out_ring.drain(proc.stdout)
+
+			for worker in workers:
+				worker.join()
+			cpu, peak_rss = blvtf_run_wait(proc)
+		finally:
+			killer.cancel()
+
+	usage = blvtf_run_thread_usage()
+	usage.cpu += cpu or 0.0
+	usage.peak_rss = max(usage.peak_rss, peak_rss or 0)
+
+	result = blvtf_run_result(args, stage, proc.returncode, out, out_ring, err_ring, time.perf_counter() - started, 1, cpu, peak_rss)
+
+	if timed_out.is_set():
+		raise blvtf_run_error(f'{stage}: {Path(args[0]).name} did not finish in {timeout:g}s, killed', result, transient=True)
+
+	return result
+
+
+# Run an external process.
+# stage: magick, vtfcmd, vtex, 7z. Decides the timeout and how many retries there are
+# stdin_data: bytes (or anything exposing the buffer protocol) to feed through stdin
+# read_stdout: function(stdout pipe) -> anything, reads stdout in the calling thread.
+# None = stdout goes into a ring buffer, same as stderr
+# check: raise blvtf_run_error if the exit code is not 0
+# timeout_scale: multiplies the timeout of the stage
+# returns blvtf_run_result
+def blvtf_run(args, stage, stdin_data=None, read_stdout=None, check=True, timeout_scale=1, retries=None, cwd=None):
+	args = [str(arg) for arg in args]
+	timeout = blvtf_run_timeouts.get(stage, blvtf_run_default_timeout) * max(1, timeout_scale)
+	if retries == None:
+		retries = blvtf_run_retries.get(stage, 0)
+
+	attempt = 0
+	while True:
+		attempt += 1
+		try:
+			result = blvtf_run_once(args, stage, stdin_data, read_stdout, timeout, cwd)
+		except blvtf_run_error as e:
+			if not e.transient or attempt > retries:
+				raise
+			print('BLVTF:', e, f'retrying ({attempt}/{retries})')
+			continue
+
+		result.attempts = attempt
+		if check and result.returncode:
+			raise blvtf_run_error(
+				f'{stage}: {Path(args[0]).name} exited with {result.returncode}: {result.echo()}',
+				result
+			)
+
+		return result
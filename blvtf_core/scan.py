@@ -0,0 +1,205 @@
+import os, re
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                  Source folder indexing
+# ---------------------------------------------------------
+# =========================================================
+
+# The source folder is walked exactly once.
+# Every TxtMax rule and the fallback wildcard are then matched against that single walk,
+# instead of doing one glob/rglob walk per rule.
+
+
+# Walk the folder with os.scandir and yield every file as
+# (relative path parts, absolute path string)
+# max_depth = None means unlimited, 0 means only the files in the root folder.
+# Symlinked folders are not followed, to avoid infinite loops
+def blvtf_walk_files(root, max_depth=None):
+	root = str(root)
+
+	# (folder path, relative parts of that folder)
+	stack = [(root, ())]
+	while stack:
+		folder, folder_parts = stack.pop()
+		try:
+			with os.scandir(folder) as folder_iter:
+				entries = list(folder_iter)
+		except OSError as e:
+			print('BLVTF: Unable to scan', folder, e)
+			continue
+
+		subfolders = []
+		for entry in entries:
+			try:
+				if entry.is_dir(follow_symlinks=False):
+					if max_depth == None or len(folder_parts) < max_depth:
+						subfolders.append((entry.path, folder_parts + (entry.name,)))
+				elif entry.is_file():
+					yield folder_parts + (entry.name,), entry.path
+			except OSError:
+				continue
+
+		# reversed, so that subfolders are visited in the listed order
+		stack.extend(reversed(subfolders))
+
+
+# glob patterns are case-insensitive on Windows
+blvtf_glob_re_flags = re.IGNORECASE if os.name == 'nt' else 0
+
+
+# Translate a single path segment of a glob pattern to regex.
+# Unlike fnmatch.translate, wildcards never match across folders
+def blvtf_glob_segment_to_re(segment):
+	rx = ''
+	idx = 0
+	while idx < len(segment):
+		char = segment[idx]
+		idx += 1
+		if char == '*':
+			rx += '[^/]*'
+		elif char == '?':
+			rx += '[^/]'
+		elif char == '[':
+			end = idx
+			if end < len(segment) and segment[end] == '!':
+				end += 1
+			if end < len(segment) and segment[end] == ']':
+				end += 1
+			end = segment.find(']', end)
+			# unclosed bracket is just a bracket
+			if end == -1:
+				rx += '\\['
+				continue
+			char_set = segment[idx:end].replace('\\', '\\\\')
+			idx = end + 1
+			if char_set.startswith('!'):
+				rx += '[^/' + char_set[1:] + ']'
+			elif char_set.startswith('^'):
+				# literal ^, glob negation is !
+				rx += '[\\' + char_set + ']'
+			else:
+				rx += '[' + char_set + ']'
+		else:
+			rx += re.escape(char)
+
+	return rx
+
+
+# Translate a glob pattern to a regex, which matches the full relative path of a file (a/b/c.png).
+#  - Patterns without '**' follow Path.glob (recursive=False) and Path.rglob (recursive=True):
+#    'lizard*.png' matches by file name, either in the root folder only or in any subfolder,
+#    'sub/lizard*.png' matches relative to the root folder, or, when recursive, inside any subfolder.
+#  - Patterns with '**' are always matched against the full relative path,
+#    '**' matches any amount of folders (including none): 'props/**/*_normal.psd'
+def blvtf_glob_to_re(pattern, recursive):
+	segments = pattern.replace('\\', '/').strip('/').split('/')
+
+	if not '**' in segments:
+		rx = '/'.join(blvtf_glob_segment_to_re(seg) for seg in segments)
+		if recursive:
+			rx = '(?:.*/)?' + rx
+		return rx
+
+	rx = ''
+	for seg_idx, seg in enumerate(segments):
+		last = seg_idx == len(segments) - 1
+		if seg == '**':
+			# trailing ** matches everything below
+			rx += '.*' if last else '(?:[^/]*/)*'
+		else:
+			rx += blvtf_glob_segment_to_re(seg) + ('' if last else '/')
+
+	return rx
+
+
+# Extension every file matching the pattern is guaranteed to have, if any.
+# 'rock_*.psd' -> 'psd', '*.*' -> None, 'rock*' -> None
+def blvtf_glob_literal_ext(pattern):
+	last_seg = pattern.replace('\\', '/').rstrip('/').split('/')[-1]
+	if not '.' in last_seg or last_seg == '**':
+		return None
+
+	ext = last_seg.rsplit('.', 1)[1]
+	if ext == '' or set('*?[]') & set(ext):
+		return None
+
+	return ext.lower()
+
+
+# Turn a list of glob patterns into a matcher,
+# which tells which pattern matched a file (the last one wins, if multiple match).
+# See blvtf_glob_to_re for the pattern semantics.
+
+# Patterns are bucketed by file extension: a file is only tested against the patterns
+# which could possibly match its extension, plus the ones which can match any extension.
+# Each bucket is a single combined regex, going from the last rule to the first one,
+# so that the first matching alternative is the winning rule
+class blvtf_glob_matcher:
+	def __init__(self, patterns, recursive):
+		self.recursive = recursive
+
+		# ext -> [(rule index, regex)]
+		ext_rules = {}
+		any_ext_rules = []
+
+		# How deep the walk has to go when not recursive. None = unlimited
+		self.depth = 0
+
+		for rule_idx, pattern in enumerate(patterns):
+			rule_rx = (rule_idx, blvtf_glob_to_re(pattern, recursive))
+
+			ext = blvtf_glob_literal_ext(pattern)
+			if ext:
+				ext_rules.setdefault(ext, []).append(rule_rx)
+			else:
+				any_ext_rules.append(rule_rx)
+
+			segments = pattern.replace('\\', '/').strip('/').split('/')
+			if '**' in segments or recursive:
+				self.depth = None
+			elif self.depth != None:
+				self.depth = max(self.depth, len(segments) - 1)
+
+		self.buckets = {}
+		for ext, bucket_rules in ext_rules.items():
+			self.buckets[ext] = self.combine(bucket_rules + any_ext_rules)
+
+		self.any_bucket = self.combine(any_ext_rules)
+
+	def combine(self, rules):
+		if not rules:
+			return None
+
+		rules = sorted(rules, reverse=True)
+
+		return re.compile(
+			'|'.join(f'(?P<r{rule_idx}>{rule_rx})' for rule_idx, rule_rx in rules),
+			blvtf_glob_re_flags
+		)
+
+	# rel_parts: relative path parts of a file
+	# returns the index of the matching pattern or None
+	def match(self, rel_parts):
+		name = rel_parts[-1]
+		ext = name.rsplit('.', 1)[1].lower() if '.' in name else None
+
+		rx = self.buckets.get(ext, self.any_bucket)
+		if not rx:
+			return None
+
+		match = rx.fullmatch('/'.join(rel_parts))
+		if not match:
+			return None
+
+		return int(match.lastgroup[1:])
+
+
+# How deep a non-recursive walk has to go to serve all of the matchers
+def blvtf_walk_depth(*matchers):
+	depths = [matcher.depth for matcher in matchers]
+	if None in depths:
+		return None
+
+	return max(depths, default=0)
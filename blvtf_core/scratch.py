@@ -0,0 +1,54 @@
+import tempfile, shutil, os
+
+from pathlib import Path
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                  Per-task scratch folders
+# ---------------------------------------------------------
+# =========================================================
+
+# Every conversion task gets its own uniquely named folder for intermediate files
+# (converted/resized TGAs, VTFCmd output before it's moved into place).
+# This way two tasks can never overwrite each other's stuff,
+# no matter whether the source files are called the same or not.
+
+# RAM-backed locations, tried in this order when no scratch location was specified
+blvtf_ram_scratch_roots = (
+	'/dev/shm',
+)
+
+
+# Pick the root folder for scratch folders.
+# preferred is whatever the user specified (could be a RAM drive), fallback is the addon's tmps folder
+def blvtf_scratch_root(preferred=None, fallback=None):
+	candidates = []
+	if preferred:
+		candidates.append(preferred)
+	candidates.extend(blvtf_ram_scratch_roots)
+
+	for candidate in candidates:
+		candidate = Path(candidate)
+		if candidate.is_dir() and os.access(candidate, os.W_OK):
+			return candidate
+
+	if fallback:
+		Path(fallback).mkdir(parents=True, exist_ok=True)
+		return Path(fallback)
+
+	return Path(tempfile.gettempdir())
+
+
+class blvtf_scratch_dir:
+	"""Unique temporary folder, which is deleted on exit, no matter what"""
+	def __init__(self, root):
+		self.root = Path(root)
+		self.path = None
+
+	def __enter__(self):
+		self.path = Path(tempfile.mkdtemp(prefix='blvtf_', dir=str(self.root)))
+		return self.path
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		shutil.rmtree(str(self.path), ignore_errors=True)
@@ -0,0 +1,290 @@
+import argparse, json, os, sys, threading, time
+
+from pathlib import Path
+
+import numpy as np
+
+from .runner import blvtf_run_thread_usage
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                      Timing trace
+# ---------------------------------------------------------
+# =========================================================
+
+# Optional: where the time of a conversion actually goes.
+# Every stage of every task (probe, decode, to_tga, pack, vtfcmd, move, ...)
+# appends one line to a JSONL file:
+"""
+{
+	'run': '20240101-120000-1234',
+	'stage': 'vtfcmd',
+	'src': 'W:/materialsrc/rock.psd' or ['a.tga', 'b.tga'] for stages shared by several tasks,
+	'tasks': 1,
+	'format': 'DXT1' or None,
+	't': 1.25,  # seconds since the run started
+	'wall': 0.5,
+	'cpu': 0.01,  # this thread
+	'child_cpu': 0.45,  # external processes the stage started
+	'read': 123456,  # bytes
+	'written': 65536,  # bytes
+	'peak_rss': 123456789,  # the whole process, so far
+	'child_peak_rss': 23456789,  # the biggest external process of the stage
+	'ok': True,
+}
+"""
+
+# Bytes are counted by the stages themselves, as the sizes of the files they read and wrote
+# (the process wide IO counters would mix up the tasks of different workers).
+
+# python -m blvtf_core.trace trace.jsonl prints the percentiles per stage and per format
+
+
+# Peak RSS of this process in bytes, None if unknown
+def blvtf_peak_rss():
+	if sys.platform == 'win32':
+		import ctypes
+		from .runner import blvtf_win_process_usage
+		return blvtf_win_process_usage(ctypes.windll.kernel32.GetCurrentProcess())[1]
+
+	try:
+		import resource
+	except ImportError:
+		return None
+
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+# Total size of the files which exist
+def blvtf_trace_size(*filepaths):
+	total = 0
+	for filepath in filepaths:
+		# Skips pixel arrays and failed results (None, False) as well
+		if not isinstance(filepath, (str, os.PathLike)):
+			continue
+		try:
+			total += os.stat(filepath).st_size
+		except OSError:
+			pass
+
+	return total
+
+
+class blvtf_trace:
+	"""Appends stage records of a run to a JSONL file"""
+	def __init__(self, trace_path):
+		self.trace_path = Path(trace_path)
+		self.run_id = f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}'
+		self.started = time.perf_counter()
+
+		self.lock = threading.Lock()
+		self.trace_file = None
+
+	def write(self, record):
+		line = json.dumps(record, default=str) + '\n'
+		with self.lock:
+			if not self.trace_file:
+				self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+				self.trace_file = open(self.trace_path, 'a', encoding='utf-8')
+			self.trace_file.write(line)
+
+	def stage(self, stage, src=None, vtf_format=None, tasks=1):
+		return blvtf_trace_stage(self, stage, src, vtf_format, tasks)
+
+	def close(self):
+		with self.lock:
+			if self.trace_file:
+				self.trace_file.close()
+				self.trace_file = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+
+class blvtf_trace_stage:
+	"""Measures a stage of a task. tracer could be None, then nothing is written"""
+	def __init__(self, tracer, stage, src=None, vtf_format=None, tasks=1):
+		self.tracer = tracer
+		self.stage = stage
+		self.src = src
+		self.vtf_format = vtf_format
+		self.tasks = tasks
+
+		# filled in by the stage itself
+		self.read = 0
+		self.written = 0
+		# False for stages which failed without raising
+		self.ok = True
+
+	def read_files(self, *filepaths):
+		if self.tracer:
+			self.read += blvtf_trace_size(*filepaths)
+
+	def wrote_files(self, *filepaths):
+		if self.tracer:
+			self.written += blvtf_trace_size(*filepaths)
+
+	def __enter__(self):
+		if not self.tracer:
+			return self
+
+		usage = blvtf_run_thread_usage()
+		self.outer_child_peak = usage.peak_rss
+		usage.peak_rss = 0
+
+		self.child_cpu = usage.cpu
+		self.cpu = time.thread_time()
+		self.wall = time.perf_counter()
+
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		if not self.tracer:
+			return
+
+		wall = time.perf_counter() - self.wall
+		cpu = time.thread_time() - self.cpu
+
+		usage = blvtf_run_thread_usage()
+		child_peak = usage.peak_rss
+		usage.peak_rss = max(self.outer_child_peak, child_peak)
+
+		if isinstance(self.src, (list, tuple)):
+			src = [str(src) for src in self.src]
+		else:
+			src = str(self.src) if self.src != None else None
+
+		self.tracer.write({
+			'run': self.tracer.run_id,
+			'stage': self.stage,
+			'src': src,
+			'tasks': self.tasks,
+			'format': self.vtf_format,
+			't': round(self.wall - self.tracer.started, 6),
+			'wall': round(wall, 6),
+			'cpu': round(cpu, 6),
+			'child_cpu': round(usage.cpu - self.child_cpu, 6),
+			'read': self.read,
+			'written': self.written,
+			'peak_rss': blvtf_peak_rss(),
+			'child_peak_rss': child_peak,
+			'ok': self.ok and exc_type is None,
+		})
+
+
+
+
+# =========================================================
+#                         Summary
+# =========================================================
+
+blvtf_trace_percentiles = (50, 90, 99)
+
+
+def blvtf_load_trace(trace_path, run_id=None):
+	records = []
+	with open(trace_path, encoding='utf-8') as trace_file:
+		for line in trace_file:
+			try:
+				records.append(json.loads(line))
+			except ValueError:
+				# The last line of a run that got killed
+				continue
+
+	if not records:
+		return []
+
+	# The last run, unless asked otherwise
+	if run_id == None:
+		run_id = records[-1]['run']
+	if run_id == 'all':
+		return records
+
+	return [record for record in records if record['run'] == run_id]
+
+
+# {(stage, format or None): {wall percentiles, totals...}}
+def blvtf_trace_summary(records, by_format=False):
+	groups = {}
+	for record in records:
+		groups.setdefault((record['stage'], record['format'] if by_format else None), []).append(record)
+
+	summary = {}
+	for group_key, group in groups.items():
+		wall = np.array([record['wall'] for record in group])
+		# Stages shared by a group of tasks are counted per task
+		per_task = np.array([record['wall'] / max(1, record['tasks']) for record in group])
+		summary[group_key] = {
+			'count': len(group),
+			'tasks': sum(record['tasks'] for record in group),
+			'failed': sum(1 for record in group if not record['ok']),
+			'wall': float(wall.sum()),
+			'cpu': sum(record['cpu'] + record['child_cpu'] for record in group),
+			'read': sum(record['read'] for record in group),
+			'written': sum(record['written'] for record in group),
+			'peak_rss': max((record['peak_rss'] or 0) for record in group),
+			'child_peak_rss': max((record['child_peak_rss'] or 0) for record in group),
+			'percentiles': dict(zip(blvtf_trace_percentiles, np.percentile(per_task, blvtf_trace_percentiles).tolist())),
+			'max': float(per_task.max()),
+		}
+
+	return summary
+
+
+def blvtf_print_trace_summary(summary, out=sys.stdout):
+	mb = 1024 * 1024
+	header = ['stage', 'format', 'tasks', 'failed', 'wall s', 'cpu s'] + [f'p{p} ms' for p in blvtf_trace_percentiles] + ['max ms', 'read MB', 'written MB', 'peak MB', 'child MB']
+	rows = [header]
+	# Slowest stages first
+	for (stage, vtf_format), stats in sorted(summary.items(), key=lambda item: -item[1]['wall']):
+		rows.append([
+			stage,
+			vtf_format or '-',
+			str(stats['tasks']),
+			str(stats['failed']),
+			f'{stats["wall"]:.2f}',
+			f'{stats["cpu"]:.2f}',
+			*[f'{stats["percentiles"][p] * 1000:.1f}' for p in blvtf_trace_percentiles],
+			f'{stats["max"] * 1000:.1f}',
+			f'{stats["read"] / mb:.1f}',
+			f'{stats["written"] / mb:.1f}',
+			f'{stats["peak_rss"] / mb:.0f}',
+			f'{stats["child_peak_rss"] / mb:.0f}',
+		])
+
+	widths = [max(len(row[col]) for row in rows) for col in range(len(header))]
+	for row in rows:
+		print('  '.join(cell.ljust(width) if col < 2 else cell.rjust(width) for col, (cell, width) in enumerate(zip(row, widths))), file=out)
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(
+		prog='python -m blvtf_core.trace',
+		description='Summarize a timing trace: percentiles of every stage, per task',
+	)
+	parser.add_argument('trace', help='JSONL trace file')
+	parser.add_argument('--run', default=None, help='Run id to summarize, or "all". The last run by default')
+	args = parser.parse_args(argv)
+
+	records = blvtf_load_trace(args.trace, args.run)
+	if not records:
+		print('BLVTF: Nothing traced in', args.trace, file=sys.stderr)
+		return 1
+
+	print('Run', records[0]['run'] if args.run != 'all' else 'all', f'{len(records)} records')
+	print()
+	print('Per stage:')
+	blvtf_print_trace_summary(blvtf_trace_summary(records))
+	print()
+	print('Per stage and format:')
+	blvtf_print_trace_summary(blvtf_trace_summary(records, by_format=True))
+
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,139 @@
+import hashlib, threading
+
+from collections import OrderedDict
+
+from .scan import blvtf_glob_matcher
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                         TxtMax
+# ---------------------------------------------------------
+# =========================================================
+
+# Syntax (see README):
+# WILDCARD_PATTERN FORMAT SIZE_PARAMS|NONE @VMT_PRESET|NONE FLAGS|NONE
+
+# Every rule is parsed into a dict.
+# None means "use whatever is set in the base batch config" ('*' in the TxtMax file)
+"""
+{
+	'pattern': '*_diffuse.psd',
+	'format': 'DXT1' or None,
+	'sclamp': False or (1024, None),
+	'flags': ('NOMIP', 'NORMAL') or None,
+	'srgb': False,
+	'vmt_preset': 'preset_name' or None,
+}
+"""
+
+
+# Parse TxtMax text into a list of rules.
+# known_flags is the list of valid VTF flag names
+def blvtf_parse_txtmax(txtmax_text, known_flags):
+	# pattern -> rule
+	# If two identical wildcards were specified - the earliest one gets replaced with the latest one
+	# (while keeping its position)
+	rules = {}
+
+	for ln_idx, ln in enumerate(txtmax_text.splitlines()):
+		ln = ln.strip()
+		if ln.startswith('#') or ln == '':
+			continue
+
+		raw_rule = list(filter(None, ln.replace('\t', ' ').split(' ')))
+		if len(raw_rule) < 2:
+			print(f'BLVTF: TxtMax line {ln_idx + 1} has no format, skipping: {ln}')
+			continue
+
+		rname = raw_rule[0]
+
+		rule = {
+			'pattern': rname,
+			'format': None if raw_rule[1] == '*' else raw_rule[1],
+			'sclamp': False,
+			'flags': (),
+			'srgb': False,
+			'vmt_preset': None,
+		}
+
+		# Flag array.
+		# Taken from 2-token rules too (the second token is still the format), like it always was
+		if raw_rule[-1].startswith('-'):
+			if raw_rule[-1] == '-*':
+				rule['flags'] = None
+			else:
+				rule['flags'] = tuple(sorted(set(filter(None, raw_rule[-1].replace('-', '').upper().split(','))) & set(known_flags)))
+
+			for srgb_check in raw_rule[-1].replace('-', '').lower().split(','):
+				if srgb_check.strip() == 'srgb':
+					rule['srgb'] = True
+
+			del raw_rule[-1]
+
+		# Size Clamp
+		if len(raw_rule) > 2:
+			sclamp = raw_rule[2].lower()
+			if 'x' in sclamp:
+				try:
+					sclamp = sclamp.split('x')
+					rule['sclamp'] = (
+						None if sclamp[0] == '*' else int(sclamp[0]),
+						None if sclamp[1] == '*' else int(sclamp[1]),
+					)
+					del raw_rule[2]
+				except (ValueError, IndexError):
+					pass
+
+		# VMT preset
+		if len(raw_rule) > 2:
+			if raw_rule[-1].startswith('@'):
+				rule['vmt_preset'] = raw_rule[-1].strip('@')
+
+		rules[rname] = rule
+
+	return list(rules.values())
+
+
+class blvtf_txtmax:
+	"""TxtMax rules + the matcher, compiled from the rules' patterns"""
+	def __init__(self, txtmax_text, known_flags, recursive):
+		self.rules = blvtf_parse_txtmax(txtmax_text, known_flags)
+		self.matcher = blvtf_glob_matcher([rule['pattern'] for rule in self.rules], recursive)
+
+	# Returns the rule which applies to the file or None
+	def match(self, rel_parts):
+		rule_idx = self.matcher.match(rel_parts)
+		if rule_idx == None:
+			return None
+
+		return self.rules[rule_idx]
+
+
+# Compiled TxtMax, keyed by the hash of its content.
+# Re-running a batch with the same TxtMax skips parsing and regex compilation
+blvtf_txtmax_cache = OrderedDict()
+blvtf_txtmax_cache_size = 16
+blvtf_txtmax_cache_lock = threading.Lock()
+
+def blvtf_compile_txtmax(txtmax_text, known_flags, recursive):
+	cache_key = (
+		hashlib.sha256(txtmax_text.encode()).hexdigest(),
+		tuple(known_flags),
+		bool(recursive),
+	)
+
+	with blvtf_txtmax_cache_lock:
+		compiled = blvtf_txtmax_cache.get(cache_key)
+		if compiled:
+			blvtf_txtmax_cache.move_to_end(cache_key)
+			return compiled
+
+	compiled = blvtf_txtmax(txtmax_text, known_flags, recursive)
+
+	with blvtf_txtmax_cache_lock:
+		blvtf_txtmax_cache[cache_key] = compiled
+		while len(blvtf_txtmax_cache) > blvtf_txtmax_cache_size:
+			blvtf_txtmax_cache.popitem(last=False)
+
+	return compiled
@@ -0,0 +1,451 @@
+import struct, os, zlib
+
+import numpy as np
+
+from pathlib import Path
+
+from .dxt import blvtf_dxt_compress, blvtf_dxt_formats
+from .resample import blvtf_resample, blvtf_mip_chain, blvtf_resample_load
+
+
+# =========================================================
+# ---------------------------------------------------------
+#                     Native VTF writer
+# ---------------------------------------------------------
+# =========================================================
+
+# Writes VTF 7.1 - 7.5 files straight from numpy arrays, no VTFCmd involved.
+
+# Images are passed around as (height, width, 4) RGBA arrays:
+#  - uint8: 0-255
+#  - float32: 0.0-1.0 (could go past 1.0 for HDR)
+# Grayscale/RGB arrays are expanded to RGBA by blvtf_as_rgba
+
+# Layout of a VTF:
+#   header
+#   (7.3+) resource entries
+#   (7.5 extras) resource data, such as KVD
+#   low-res thumbnail (DXT1)
+#   high-res image data: mips from the smallest to the largest
+
+
+blvtf_vtf_image_formats = {
+	'RGBA8888': 0,
+	'ABGR8888': 1,
+	'RGB888': 2,
+	'BGR888': 3,
+	'RGB565': 4,
+	'I8': 5,
+	'IA88': 6,
+	'P8': 7,
+	'A8': 8,
+	'RGB888_BLUESCREEN': 9,
+	'BGR888_BLUESCREEN': 10,
+	'ARGB8888': 11,
+	'BGRA8888': 12,
+	'DXT1': 13,
+	'DXT3': 14,
+	'DXT5': 15,
+	'BGRX8888': 16,
+	'BGR565': 17,
+	'BGRX5551': 18,
+	'BGRA4444': 19,
+	'DXT1_ONEBITALPHA': 20,
+	'BGRA5551': 21,
+	'UV88': 22,
+	'UVWQ8888': 23,
+	'RGBA16161616F': 24,
+	'RGBA16161616': 25,
+	'UVLX8888': 26,
+}
+
+blvtf_vtf_flag_bits = {
+	'POINTSAMPLE': 0x00000001,
+	'TRILINEAR': 0x00000002,
+	'CLAMPS': 0x00000004,
+	'CLAMPT': 0x00000008,
+	'ANISOTROPIC': 0x00000010,
+	'HINT_DXT5': 0x00000020,
+	'SRGB': 0x00000040,
+	'NORMAL': 0x00000080,
+	'NOMIP': 0x00000100,
+	'NOLOD': 0x00000200,
+	'MINMIP': 0x00000400,
+	'PROCEDURAL': 0x00000800,
+	'ONEBITALPHA': 0x00001000,
+	'EIGHTBITALPHA': 0x00002000,
+	'ENVMAP': 0x00004000,
+	'RENDERTARGET': 0x00008000,
+	'DEPTHRENDERTARGET': 0x00010000,
+	'NODEBUGOVERRIDE': 0x00020000,
+	'SINGLECOPY': 0x00040000,
+	'NODEPTHBUFFER': 0x00800000,
+	'CLAMPU': 0x02000000,
+	'VERTEXTEXTURE': 0x04000000,
+	'SSBUMP': 0x08000000,
+	'BORDER': 0x20000000,
+}
+
+# Formats which automatically get the EIGHTBITALPHA/ONEBITALPHA flags (same as VTFLib)
+blvtf_vtf_eightbit_alpha = ('RGBA8888', 'ABGR8888', 'ARGB8888', 'BGRA8888', 'IA88', 'A8', 'DXT3', 'DXT5', 'BGRA4444', 'RGBA16161616F', 'RGBA16161616')
+blvtf_vtf_onebit_alpha = ('DXT1_ONEBITALPHA', 'BGRA5551')
+
+
+# Resource tags (7.3+)
+blvtf_vtf_rsrc_lowres = b'\x01\x00\x00'
+blvtf_vtf_rsrc_highres = b'\x30\x00\x00'
+blvtf_vtf_rsrc_crc = b'CRC'
+blvtf_vtf_rsrc_lod = b'LOD'
+blvtf_vtf_rsrc_tso = b'TSO'
+blvtf_vtf_rsrc_kvd = b'KVD'
+# resource stores its 4 bytes of data in place of the offset
+blvtf_vtf_rsrc_no_data_chunk = 0x02
+
+
+# Thumbnail is never bigger than this on either axis
+blvtf_vtf_thumb_max = 16
+
+# Reflectivity is averaged over the first mip no bigger than this on either axis
+blvtf_vtf_refl_max = 32
+
+
+
+
+# =========================================================
+#                     Pixel conversion
+# =========================================================
+
+# Bring any image array to (height, width, 4) RGBA, keeping the dtype
+def blvtf_as_rgba(img):
+	img = np.asarray(img)
+
+	if img.ndim == 2:
+		img = img[:, :, None]
+
+	channels = img.shape[2]
+	if channels == 4:
+		return img
+
+	opaque = np.iinfo(img.dtype).max if img.dtype.kind in 'ui' else 1.0
+	alpha = np.full(img.shape[:2] + (1,), opaque, dtype=img.dtype)
+
+	# gray
+	if channels == 1:
+		return np.concatenate((img, img, img, alpha), axis=2)
+	# gray + alpha
+	if channels == 2:
+		return np.concatenate((img[:, :, :1], img[:, :, :1], img[:, :, :1], img[:, :, 1:]), axis=2)
+	# rgb
+	return np.concatenate((img, alpha), axis=2)
+
+
+def blvtf_to_u8(rgba):
+	if rgba.dtype == np.uint8:
+		return rgba
+	if rgba.dtype == np.uint16:
+		return (rgba >> 8).astype(np.uint8)
+	return (np.clip(rgba, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+def blvtf_to_f32(rgba):
+	if rgba.dtype == np.uint8:
+		return rgba.astype(np.float32) * (1.0 / 255.0)
+	if rgba.dtype == np.uint16:
+		return rgba.astype(np.float32) * (1.0 / 65535.0)
+	return rgba.astype(np.float32, copy=False)
+
+
+# Rec. 601 luma, same as Source's own RGB -> I conversion
+def blvtf_luma_u8(rgba_u8):
+	rgb = rgba_u8[:, :, :3].astype(np.uint32)
+	return ((rgb[:, :, 0] * 299 + rgb[:, :, 1] * 587 + rgb[:, :, 2] * 114 + 500) // 1000).astype(np.uint8)
+
+
+# Pack channels into a 16 bit little endian word.
+# bits: ((channel array, bit count), ...) from the most significant to the least significant
+def blvtf_pack16(bits):
+	word = np.zeros(bits[0][0].shape, dtype=np.uint16)
+	for channel, bit_count in bits:
+		word = (word << bit_count) | (channel >> (8 - bit_count)).astype(np.uint16)
+	return word.astype('<u2').tobytes()
+
+
+# Byte order of the channels in memory for the plain 8 bit formats.
+# Source names the formats by the byte order
+blvtf_vtf_byte_orders = {
+	'RGBA8888': (0, 1, 2, 3),
+	'ABGR8888': (3, 2, 1, 0),
+	'RGB888': (0, 1, 2),
+	'BGR888': (2, 1, 0),
+	'RGB888_BLUESCREEN': (0, 1, 2),
+	'BGR888_BLUESCREEN': (2, 1, 0),
+	'ARGB8888': (3, 0, 1, 2),
+	'BGRA8888': (2, 1, 0, 3),
+	'UV88': (0, 1),
+	'UVWQ8888': (0, 1, 2, 3),
+	'UVLX8888': (0, 1, 2, 3),
+}
+
+
+# Encode a single RGBA image into the raw bytes of the given format
+# dxt_quality: see blvtf_core/dxt.py
+def blvtf_encode_pixels(rgba, img_format, dxt_quality='FAST'):
+	if img_format in blvtf_dxt_formats:
+		return blvtf_dxt_compress(blvtf_to_u8(rgba), img_format, dxt_quality)
+
+	if img_format in blvtf_vtf_byte_orders:
+		rgba = blvtf_to_u8(rgba)
+		return np.ascontiguousarray(rgba[:, :, blvtf_vtf_byte_orders[img_format]]).tobytes()
+
+	if img_format == 'BGRX8888':
+		rgba = blvtf_to_u8(rgba)
+		bgrx = rgba[:, :, (2, 1, 0, 3)].copy()
+		bgrx[:, :, 3] = 255
+		return bgrx.tobytes()
+
+	if img_format == 'I8':
+		return blvtf_luma_u8(blvtf_to_u8(rgba)).tobytes()
+
+	if img_format == 'IA88':
+		rgba = blvtf_to_u8(rgba)
+		return np.ascontiguousarray(np.dstack((blvtf_luma_u8(rgba), rgba[:, :, 3]))).tobytes()
+
+	if img_format == 'A8':
+		return np.ascontiguousarray(blvtf_to_u8(rgba)[:, :, 3]).tobytes()
+
+	if img_format == 'RGBA16161616F':
+		return blvtf_to_f32(rgba).astype('<f2').tobytes()
+
+	if img_format == 'RGBA16161616':
+		if rgba.dtype == np.uint16:
+			return rgba.astype('<u2').tobytes()
+		return (np.clip(blvtf_to_f32(rgba), 0.0, 1.0) * 65535.0 + 0.5).astype('<u2').tobytes()
+
+	# 16 bit packed formats, named after D3D formats they map to:
+	# BGR565 = R5G6B5, BGRA4444 = A4R4G4B4, etc.
+	rgba = blvtf_to_u8(rgba)
+	r, g, b, a = (rgba[:, :, ch_idx] for ch_idx in range(4))
+	opaque = np.full(r.shape, 255, dtype=np.uint8)
+
+	if img_format == 'BGR565':
+		return blvtf_pack16(((r, 5), (g, 6), (b, 5)))
+	if img_format == 'RGB565':
+		return blvtf_pack16(((b, 5), (g, 6), (r, 5)))
+	if img_format == 'BGRA4444':
+		return blvtf_pack16(((a, 4), (r, 4), (g, 4), (b, 4)))
+	if img_format == 'BGRX5551':
+		return blvtf_pack16(((opaque, 1), (r, 5), (g, 5), (b, 5)))
+	if img_format == 'BGRA5551':
+		return blvtf_pack16(((a, 1), (r, 5), (g, 5), (b, 5)))
+
+	raise ValueError(f'The native VTF writer does not support {img_format}')
+
+
+# Size of a single image of the given format in bytes
+def blvtf_vtf_image_size(width, height, img_format):
+	if img_format in ('DXT1', 'DXT1_ONEBITALPHA'):
+		return max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * 8
+	if img_format in ('DXT3', 'DXT5'):
+		return max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * 16
+
+	bytes_per_pixel = {
+		'I8': 1, 'A8': 1, 'P8': 1,
+		'IA88': 2, 'UV88': 2,
+		'RGB565': 2, 'BGR565': 2, 'BGRA4444': 2, 'BGRX5551': 2, 'BGRA5551': 2,
+		'RGB888': 3, 'BGR888': 3, 'RGB888_BLUESCREEN': 3, 'BGR888_BLUESCREEN': 3,
+		'RGBA16161616F': 8, 'RGBA16161616': 8,
+	}.get(img_format, 4)
+
+	return width * height * bytes_per_pixel
+
+
+# Formats blvtf_encode_pixels can handle
+blvtf_vtf_native_formats = blvtf_dxt_formats + tuple(blvtf_vtf_byte_orders) + (
+	'BGRX8888',
+	'I8',
+	'IA88',
+	'A8',
+	'RGBA16161616F',
+	'RGBA16161616',
+	'BGR565',
+	'RGB565',
+	'BGRA4444',
+	'BGRX5551',
+	'BGRA5551',
+)
+
+
+
+
+# =========================================================
+#                      Mips / Thumbnail
+# =========================================================
+
+# Thumbnail dimensions: halved until both fit into 16x16, like VTFLib does
+def blvtf_thumb_dims(width, height):
+	while width > blvtf_vtf_thumb_max or height > blvtf_vtf_thumb_max:
+		width = max(1, width // 2)
+		height = max(1, height // 2)
+	return width, height
+
+
+# Average linear colour of the image.
+# srgb: the colours are sRGB encoded and get decoded first, anything else is taken as linear already
+def blvtf_reflectivity(rgba, srgb=False):
+	rgb = blvtf_resample_load(rgba, srgb)[:, :, :3]
+	return tuple(float(ch) for ch in np.clip(rgb, 0.0, None).mean(axis=(0, 1)))
+
+
+
+
+# =========================================================
+#                          Writer
+# =========================================================
+
+"""
+resources (7.3+ only), all optional:
+{
+	'crc': 0x12345678,
+	'lod': (u clamp, v clamp),
+	'tso': extended flags int,
+	'kvd': 'key values text',
+}
+"""
+
+# Build the VTF file contents.
+# rgba: the top level image
+# mips: False (no mips), True (box filtered chain) or a list of images, largest first (see blvtf_core/resample.py)
+# dxt_quality: 'FAST' or 'QUALITY', see blvtf_core/dxt.py
+# encoder: function(rgba, img_format) -> bytes, for formats blvtf_encode_pixels doesn't know
+def blvtf_build_vtf(rgba, img_format, version='7.4', flags=(), mips=True, thumbnail=True, reflectivity=True, srgb=False, resources=None, dxt_quality='FAST', encoder=None):
+	rgba = blvtf_as_rgba(rgba)
+	height, width = rgba.shape[:2]
+
+	if not img_format in blvtf_vtf_image_formats:
+		raise ValueError(f'Unknown VTF format {img_format}')
+
+	minor = int(str(version).split('.')[1])
+	if not 1 <= minor <= 5:
+		raise ValueError(f'Unsupported VTF version {version}')
+
+	encode = encoder or (lambda mip, mip_format: blvtf_encode_pixels(mip, mip_format, dxt_quality))
+
+	# mip chain
+	if mips == True:
+		mips = blvtf_mip_chain(rgba, 'BOX', srgb)
+	elif not mips:
+		mips = [rgba]
+
+	# flags
+	flag_bits = 0
+	for flg in flags:
+		flag_bits |= blvtf_vtf_flag_bits[flg]
+	if srgb:
+		flag_bits |= blvtf_vtf_flag_bits['SRGB']
+	if img_format in blvtf_vtf_eightbit_alpha:
+		flag_bits |= blvtf_vtf_flag_bits['EIGHTBITALPHA']
+	if img_format in blvtf_vtf_onebit_alpha:
+		flag_bits |= blvtf_vtf_flag_bits['ONEBITALPHA']
+
+	# A small mip averages to (almost) the same, at a fraction of the cost
+	refl = (0.0, 0.0, 0.0)
+	if reflectivity:
+		refl_src = next((mip for mip in mips if max(mip.shape[:2]) <= blvtf_vtf_refl_max), mips[-1])
+		refl = blvtf_reflectivity(refl_src, srgb)
+
+	# thumbnail
+	thumb_data = b''
+	thumb_w, thumb_h = 0, 0
+	thumb_format = -1
+	if thumbnail:
+		thumb_w, thumb_h = blvtf_thumb_dims(width, height)
+		thumb_src = next((m for m in mips if m.shape[:2] == (thumb_h, thumb_w)), None)
+		if thumb_src is None:
+			thumb_src = blvtf_resample(rgba, thumb_w, thumb_h, 'BOX', srgb)
+		thumb_data = blvtf_dxt_compress(blvtf_to_u8(thumb_src), 'DXT1')
+		thumb_format = blvtf_vtf_image_formats['DXT1']
+
+	# high-res data, smallest mip first
+	image_data = b''.join(encode(mip, img_format) for mip in reversed(mips))
+
+	base_header = struct.pack(
+		'<4s2II HHI HH 4x 3f 4x f i B i BB',
+		b'VTF\x00', 7, minor,
+		0,
+		width, height,
+		flag_bits,
+		1, 0,
+		*refl,
+		1.0,
+		blvtf_vtf_image_formats[img_format],
+		len(mips),
+		thumb_format,
+		thumb_w, thumb_h,
+	)
+
+	# 7.1 and 7.2 - thumbnail, then image data right after the header
+	if minor < 3:
+		if minor == 2:
+			base_header += struct.pack('<H', 1)
+		header_size = 64 if minor == 1 else 80
+		header = base_header.ljust(header_size, b'\x00')
+		header = header[:12] + struct.pack('<I', header_size) + header[16:]
+		return header + thumb_data + image_data
+
+	# 7.3+ - everything is a resource
+	# (tag, flags, data or None if the data goes inline)
+	rsrc_list = []
+	if thumbnail:
+		rsrc_list.append((blvtf_vtf_rsrc_lowres, 0, thumb_data))
+	rsrc_list.append((blvtf_vtf_rsrc_highres, 0, image_data))
+
+	resources = resources or {}
+	if resources.get('crc') != None:
+		rsrc_list.append((blvtf_vtf_rsrc_crc, blvtf_vtf_rsrc_no_data_chunk, struct.pack('<I', resources['crc'] & 0xFFFFFFFF)))
+	if resources.get('lod'):
+		rsrc_list.append((blvtf_vtf_rsrc_lod, blvtf_vtf_rsrc_no_data_chunk, struct.pack('<BB2x', *resources['lod'])))
+	if resources.get('tso') != None:
+		rsrc_list.append((blvtf_vtf_rsrc_tso, blvtf_vtf_rsrc_no_data_chunk, struct.pack('<I', resources['tso'])))
+	if resources.get('kvd'):
+		kvd = resources['kvd'].encode()
+		rsrc_list.append((blvtf_vtf_rsrc_kvd, 0, struct.pack('<I', len(kvd)) + kvd))
+
+	# Image data goes last, like everybody else does it
+	rsrc_list.sort(key=lambda rsrc: (rsrc[0] in (blvtf_vtf_rsrc_lowres, blvtf_vtf_rsrc_highres), rsrc[0]))
+
+	header_size = 80 + 8 * len(rsrc_list)
+	header = base_header + struct.pack('<H3xI8x', 1, len(rsrc_list))
+	header = header[:12] + struct.pack('<I', header_size) + header[16:]
+
+	entries = b''
+	blobs = b''
+	data_offset = header_size
+	for tag, rsrc_flags, rsrc_data in rsrc_list:
+		if rsrc_flags & blvtf_vtf_rsrc_no_data_chunk:
+			entries += struct.pack('<3sB', tag, rsrc_flags) + rsrc_data
+			continue
+		entries += struct.pack('<3sBI', tag, rsrc_flags, data_offset)
+		blobs += rsrc_data
+		data_offset += len(rsrc_data)
+
+	return header + entries + blobs
+
+
+# Build and write a VTF file.
+# Written to a temporary file first and then moved into place,
+# so that a half-written VTF never ends up at the destination
+def blvtf_write_vtf(vtf_path, rgba, img_format, **build_params):
+	vtf_path = Path(vtf_path)
+	vtf_data = blvtf_build_vtf(rgba, img_format, **build_params)
+
+	tmp_path = vtf_path.with_name(f'.{vtf_path.name}.{os.getpid()}.tmp')
+	with open(tmp_path, 'wb') as f:
+		f.write(vtf_data)
+	os.replace(tmp_path, vtf_path)
+
+	return vtf_path
+
+
+# CRC of the source pixels, for the optional CRC resource
+def blvtf_pixels_crc(rgba):
+	return zlib.crc32(np.ascontiguousarray(rgba).tobytes())
@@ -1,6 +1,8 @@
 import bpy
 
-import subprocess, shutil, math
+import shutil, math
+
+from contextlib import nullcontext
 
 from pathlib import Path
 
@@ -19,6 +21,10 @@ from bpy.types import (
 )
 
 from .simple_vmt import simple_vmt
+from .blvtf_core.magick import blvtf_magick_convert, blvtf_magick_error
+from .blvtf_core.bins import blvtf_bin
+from .blvtf_core.runner import blvtf_run, blvtf_run_error
+from .blvtf_core.trace import blvtf_trace, blvtf_trace_stage
 
 
 addon_root_dir = Path(__file__).parent
@@ -60,6 +66,16 @@ class blvtf_skybox_progress_report:
 
 
 
+# Run vtex. A failed side is reported and skipped, the rest of the skybox still gets compiled
+def blvtf_run_vtex(vtex_args):
+	try:
+		blvtf_run(vtex_args, 'vtex')
+	except blvtf_run_error as e:
+		print('BLVTF: vtex failed:', e)
+		return False
+
+	return True
+
 def blvtf_skybox_maker_cleanup():
 	try:
 		targets = [
@@ -121,6 +137,13 @@ def blvtf_skybox_maker_cleanup():
 
 
 
+# Timing trace of the skybox compile, if there's a trace file set (see blvtf_core/trace.py)
+def blvtf_skybox_tracer(sk_settings):
+	if not sk_settings.trace_path:
+		return nullcontext()
+
+	return blvtf_trace(bpy.path.abspath(sk_settings.trace_path))
+
 def blvtf_skybox_maker(tgt_scene):
 	# exception raiser
 	# todo: get rid of this ?
@@ -136,14 +159,11 @@ def blvtf_skybox_maker(tgt_scene):
 	# Skybox settings
 	sk_settings = tgt_scene.blvtf_skyboxer_params
 
-	with blvtf_skybox_progress_report(prog_max=(24 if sk_settings.hdrldr != 'HDR' else 30)) as prog_report:
+	with blvtf_skybox_progress_report(prog_max=(24 if sk_settings.hdrldr != 'HDR' else 30)) as prog_report, blvtf_skybox_tracer(sk_settings) as sky_tracer:
 
 		# Absolute path to the current blend file
 		this_blend = bpy.path.abspath('//')
 
-		# Path to magick.exe image converter
-		magix = addon_root_dir / 'bins' / 'imgmagick' / 'magick.exe'
-
 
 		# Check if game path exists. If not - stop script execution and throw a warning
 		# but first - check if we use SourceOps Game path and if SourceOps is available at all
@@ -363,7 +383,9 @@ def blvtf_skybox_maker(tgt_scene):
 
 
 			# Do Render
-			bpy.ops.render.render(write_still=1)
+			with blvtf_trace_stage(sky_tracer, 'render', side, sk_settings.hdrldr) as render_trace:
+				bpy.ops.render.render(write_still=1)
+				render_trace.wrote_files(tgt_scene.render.filepath)
 			
 			
 
@@ -385,15 +407,19 @@ def blvtf_skybox_maker(tgt_scene):
 				# set filepath
 				# tgt_scene.render.filepath = str(game_path / 'materialsrc' / 'skybox' / sk_settings.sky_name / (sk_settings.sky_name + '_tga_src') / (sk_settings.sky_name + side + '.tga'))
 
-				# load resulting .exr or
-				apply_filmic = bpy.data.images.load(str(dest_folder / (sk_settings.sky_name + '_exr_src') / (sk_settings.sky_name + side + '.exr')))
-				apply_filmic['_blvtf_cleanup_todelete'] = True
+				with blvtf_trace_stage(sky_tracer, 'ldr_fallback', side, 'LDR') as fallback_trace:
+					# load resulting .exr or
+					apply_filmic = bpy.data.images.load(str(dest_folder / (sk_settings.sky_name + '_exr_src') / (sk_settings.sky_name + side + '.exr')))
+					apply_filmic['_blvtf_cleanup_todelete'] = True
+
+					# export exr with filmic applied
+					apply_filmic.save_render(str(dest_folder / (sk_settings.sky_name + '_tga_src') / (sk_settings.sky_name + side + '.tga')))
 
-				# export exr with filmic applied
-				apply_filmic.save_render(str(dest_folder / (sk_settings.sky_name + '_tga_src') / (sk_settings.sky_name + side + '.tga')))
+					# unlink rubbish
+					bpy.data.images.remove(apply_filmic)
 
-				# unlink rubbish
-				bpy.data.images.remove(apply_filmic)
+					fallback_trace.read_files(dest_folder / (sk_settings.sky_name + '_exr_src') / (sk_settings.sky_name + side + '.exr'))
+					fallback_trace.wrote_files(dest_folder / (sk_settings.sky_name + '_tga_src') / (sk_settings.sky_name + side + '.tga'))
 
 
 
@@ -429,13 +455,20 @@ def blvtf_skybox_maker(tgt_scene):
 
 			# Literally the heart of this exporter: Converting .exr to PROPER .pfms
 			# -endian LSB !!!!!
-			print(magix)
-
 			prog_report(tside_idx + 6)
+			pfm_ok = True
 			if sk_settings.hdrldr == 'HDR':
-				# convert with image magick 
-				magic_args = [str(magix), exrinpath, '-endian', 'LSB', pfmoutpath]
-				subprocess.call(magic_args)
+				# convert with image magick.
+				# The PFM comes back through a pipe and is written straight to where vtex wants it
+				with blvtf_trace_stage(sky_tracer, 'pfm', tside, 'HDR') as pfm_trace:
+					# Same as with vtex: a failed side is reported and skipped (its HDR part), the rest still gets compiled
+					try:
+						pfmoutpath.write_bytes(blvtf_magick_convert(blvtf_bin('magick'), exrinpath, 'PFM', ('-endian', 'LSB')))
+					except (blvtf_run_error, blvtf_magick_error) as e:
+						print('BLVTF: Could not convert the', tside, 'side to PFM:', e)
+						pfm_trace.ok = pfm_ok = False
+					pfm_trace.read_files(exrinpath)
+					pfm_trace.wrote_files(pfmoutpath)
 
 
 			# write text file for vtex
@@ -488,7 +521,7 @@ def blvtf_skybox_maker(tgt_scene):
 			vmtbasepath = Path('skybox') / sk_settings.sky_name / sk_settings.sky_name
 
 			# Additional conversions if there's HDR
-			if sk_settings.hdrldr == 'HDR':
+			if sk_settings.hdrldr == 'HDR' and pfm_ok:
 				txtfile_path = dest_folder / (sk_settings.sky_name + '_generated_pfm') / (sk_settings.sky_name + '_hdr' + tside + '.txt')
 
 				# Write the vtex text file for HDR
@@ -499,7 +532,10 @@ def blvtf_skybox_maker(tgt_scene):
 				# convert HDR .pfm to .vtf
 				vtex_args = [str(vtex_exe), '-nopause', '-outdir', vtex_outdir, txtfile_path]
 				prog_report(tside_idx + 6 + 1)
-				subprocess.call(vtex_args)
+				with blvtf_trace_stage(sky_tracer, 'vtex', tside, 'HDR') as vtex_trace:
+					vtex_trace.ok = blvtf_run_vtex(vtex_args)
+					vtex_trace.read_files(pfmoutpath)
+					vtex_trace.wrote_files(vtex_outdir / (sk_settings.sky_name + '_hdr' + tside + '.vtf'))
 
 				# write VMT
 
@@ -531,7 +567,10 @@ def blvtf_skybox_maker(tgt_scene):
 			# convert Targas tp vtf
 			vtex_args = [str(vtex_exe), '-nopause', '-outdir', vtex_outdir, txtfile_path]
 			prog_report(tside_idx + 6 + (2 if sk_settings.hdrldr == 'HDR' else 1))
-			subprocess.call(vtex_args)
+			with blvtf_trace_stage(sky_tracer, 'vtex', tside, 'LDR') as vtex_trace:
+				vtex_trace.ok = blvtf_run_vtex(vtex_args)
+				vtex_trace.read_files(dest_folder / (sk_settings.sky_name + '_tga_src') / (sk_settings.sky_name + tside + '.tga'))
+				vtex_trace.wrote_files(vtex_outdir / (sk_settings.sky_name + tside + '.vtf'))
 
 
 			# write LDR VMT
@@ -754,6 +793,14 @@ class blvtf_skyboxer_properties_declaration(PropertyGroup):
 	)
 
 
+	trace_path : StringProperty(
+		name='Timing Trace',
+		description='Append how long every step of the compile took to this file (.jsonl). Summarize with python -m blvtf_core.trace. Empty = no trace',
+		default='',
+		subtype='FILE_PATH'
+	)
+
+
 	progress_report : StringProperty(
 		name='Progress Report',
 		description='Progress Report',
@@ -882,6 +929,7 @@ class VIEW3D_PT_blfoil_skyboxer(bpy.types.Panel):
 		overwrite_sh = layout.column(align=False)
 		# overwrite_sh.prop(context.scene.blfoil, 'blfoil_sky_projectonly', text='Project only')
 		overwrite_sh.prop(sk_settings, 'overwrite_shit', text='Overwrite')
+		overwrite_sh.prop(sk_settings, 'trace_path', text='Timing trace')
 
 		mabaker_op = layout.column(align=False)
 		self.layout.operator('mesh.blvtf_exec_compile_skybox',
@@ -0,0 +1,41 @@
+import sys
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+
+# blvtf_core never imports bpy, so it's imported straight from the addon folder.
+# tests/ is deliberately not a package: the addon folder itself is one, and importing it needs Blender
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from blvtf_core.backends import blvtf_backends, blvtf_backend_standin
+from blvtf_core.pack import blvtf_write_tga
+
+
+# Shared params converting everything with the stand-in backend (blvtf_core/backends.py),
+# which writes a blank VTF per task without any external tool
+@pytest.fixture
+def standin_shared(monkeypatch, tmp_path):
+	monkeypatch.setitem(blvtf_backends, 'standin', blvtf_backend_standin())
+	return {
+		'vtfcmd_ver': 'new',
+		'backends': ('standin',),
+		'vtf_version': '7.4',
+		'vtf_dxt_quality': 'FAST',
+		'vtf_generate_thumb': False,
+		'vtf_scratch_folder': str(tmp_path / 'scratch'),
+		'tmp_folder': None,
+	}
+
+
+# function(path, width, height, value) writing a flat uncompressed TGA, returns the path
+@pytest.fixture
+def mk_tga():
+	def write_tga(tga_path, width=4, height=4, value=128):
+		tga_path.parent.mkdir(parents=True, exist_ok=True)
+		blvtf_write_tga(tga_path, np.full((height, width, 4), value, dtype=np.uint8))
+		return tga_path
+
+	return write_tga
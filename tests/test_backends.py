@@ -0,0 +1,219 @@
+import sys
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from blvtf_core import backends
+from blvtf_core.backends import blvtf_backend, blvtf_backends, blvtf_register_backend, blvtf_route_task, blvtf_decoder_for, blvtf_tool_runs_here, blvtf_backend_order, blvtf_backend_group_size
+from blvtf_core.bins import blvtf_bins
+from blvtf_core.convert import blvtf_backend_vtfcmd
+from blvtf_core.pack import blvtf_write_tga
+
+
+def mk_img_info(enc=('DXT1', 'DXT5'), mips=('BOX', 'NONE'), resize=False, flags=()):
+	return {
+		'enc': enc,
+		'mips': mips,
+		'resize': resize,
+		'flags': flags,
+		'src': 'rock.tga',
+		'src_pixels': np.zeros((4, 4, 4), dtype=np.uint8),
+	}
+
+
+def mk_shared(vtfcmd_ver, backends=None):
+	return {
+		'vtfcmd_ver': vtfcmd_ver,
+		'backends': backends,
+	}
+
+
+def route(img_info, shared):
+	backend, vtf_format = blvtf_route_task(img_info, shared, {}, lambda: False)
+	return backend.name if backend else None
+
+
+# VTFCmd runs here, whatever the platform
+@pytest.fixture
+def vtfcmd_runs(monkeypatch):
+	monkeypatch.setattr(blvtf_backend_vtfcmd, 'available', lambda self: True)
+
+
+
+
+# =========================================================
+#                      Sharpen filters
+# =========================================================
+
+# Reloaded has no sharpen filters, so whatever has one goes to the built-in encoder
+@pytest.mark.parametrize('img_info', (
+	mk_img_info(mips=('BOX', 'SHARPENSOFT')),
+	mk_img_info(mips=False, resize=('NEAREST', 'CUBIC', 'UNSHARP')),
+))
+def test_new_sharpen_goes_native(vtfcmd_runs, img_info):
+	assert route(img_info, mk_shared('new')) == 'native'
+
+
+def test_new_without_sharpen_stays(vtfcmd_runs):
+	assert route(mk_img_info(mips=('BOX', 'NONE'), resize=('NEAREST', 'CUBIC', 'NONE')), mk_shared('new')) == 'vtfcmd'
+
+
+# The old VTFCmd does sharpen
+def test_old_sharpen_stays(vtfcmd_runs):
+	assert route(mk_img_info(mips=('BOX', 'SHARPENSOFT')), mk_shared('old')) == 'vtfcmd_old'
+
+
+# Something the built-in encoder can't write still goes to Reloaded, sharpen or not
+def test_new_sharpen_native_unfit(vtfcmd_runs):
+	assert route(mk_img_info(enc=('P8', 'P8'), mips=('BOX', 'SHARPENSOFT')), mk_shared('new')) == 'vtfcmd'
+
+
+@pytest.mark.parametrize('vtfcmd_ver', ('native', 'auto'))
+def test_native_auto_sharpen(vtfcmd_runs, vtfcmd_ver):
+	assert route(mk_img_info(mips=('BOX', 'SHARPENSOFT')), mk_shared(vtfcmd_ver)) == 'native'
+
+
+# An order given by hand is taken as is
+def test_explicit_order_keeps_sharpen_dropping(vtfcmd_runs):
+	assert route(mk_img_info(mips=('BOX', 'SHARPENSOFT')), mk_shared('new', ['vtfcmd', 'native'])) == 'vtfcmd'
+
+
+
+
+# =========================================================
+#                  Tools off Windows, decoders
+# =========================================================
+
+# A fresh bins registry on a machine which can't run the bundled binaries
+@pytest.fixture
+def linux_bins(monkeypatch, tmp_path):
+	monkeypatch.setattr(sys, 'platform', 'linux')
+	bins = blvtf_bins(tmp_path / 'bins')
+	monkeypatch.setattr(backends, 'blvtf_addon_bins', bins)
+	return bins
+
+
+def mk_bundled(bins, name):
+	binary_path = bins.bins_dir / {'vtfcmd': 'vtfcmd/VTFCmd.exe', 'magick': 'imgmagick/magick.exe'}[name]
+	binary_path.parent.mkdir(parents=True, exist_ok=True)
+	binary_path.write_bytes(b'MZ')
+
+
+# Bundled binaries which are merely extracted (the prefetch) still don't run here
+def test_bundled_bins_dont_run(linux_bins):
+	mk_bundled(linux_bins, 'vtfcmd')
+	mk_bundled(linux_bins, 'magick')
+	linux_bins.get('vtfcmd')
+	linux_bins.get('magick')
+
+	assert not blvtf_tool_runs_here('vtfcmd')
+	assert not blvtf_tool_runs_here('magick')
+	assert not blvtf_backends['vtfcmd'].available()
+	assert not blvtf_backends['magick'].available()
+	assert [backend.name for backend in blvtf_backend_order({'vtfcmd_ver': 'new'})] == ['native']
+
+
+def test_override_runs(linux_bins):
+	linux_bins.override('vtfcmd', '/opt/wine/vtfcmd.sh')
+
+	assert blvtf_tool_runs_here('vtfcmd')
+	assert linux_bins.get('vtfcmd') == Path('/opt/wine/vtfcmd.sh')
+	assert [backend.name for backend in blvtf_backend_order({'vtfcmd_ver': 'new'})] == ['vtfcmd', 'native']
+
+
+def test_use_system(linux_bins, monkeypatch, tmp_path):
+	path_dir = tmp_path / 'path'
+	path_dir.mkdir()
+	system_magick = path_dir / 'magick'
+	system_magick.write_text('#!/bin/sh\n')
+	system_magick.chmod(0o755)
+	monkeypatch.setenv('PATH', str(path_dir))
+
+	linux_bins.use_system(('magick', 'vtfcmd'))
+
+	assert linux_bins.overridden == {'magick'}
+	assert linux_bins.get('magick') == system_magick
+	assert blvtf_backends['magick'].available()
+
+
+# Asking whether a backend is available doesn't change anything
+def test_available_is_pure(linux_bins):
+	for backend in blvtf_backends.values():
+		backend.available()
+
+	assert linux_bins.ready == {}
+	assert linux_bins.overridden == set()
+
+
+def test_decoder_order(linux_bins, tmp_path):
+	tga_path = tmp_path / 'rock.tga'
+	blvtf_write_tga(tga_path, np.zeros((2, 2, 4), dtype=np.uint8))
+	# RLE, left to magick
+	rle_path = tmp_path / 'rle.tga'
+	rle_path.write_bytes(bytes((0, 0, 10)) + bytes(9) + bytes((2, 0, 2, 0, 32, 8)) + bytes(16))
+	png_path = tmp_path / 'rock.png'
+	png_path.write_bytes(b'\x89PNG')
+
+	assert blvtf_decoder_for(tga_path).name == 'tga'
+	assert blvtf_decoder_for(rle_path) == None
+	assert blvtf_decoder_for(png_path) == None
+
+	linux_bins.override('magick', '/usr/bin/magick')
+	assert blvtf_decoder_for(tga_path).name == 'tga'
+	assert blvtf_decoder_for(rle_path).name == 'magick'
+	assert blvtf_decoder_for(png_path).name == 'magick'
+
+
+def test_route_needs_decoder(linux_bins, tmp_path):
+	img_info = mk_img_info()
+	img_info['src_pixels'] = None
+
+	img_info['src'] = tmp_path / 'rock.png'
+	img_info['src'].write_bytes(b'\x89PNG')
+	backend, reason = blvtf_route_task(img_info, mk_shared('new'), {}, lambda: False)
+	assert backend == None
+	assert 'rock.png' in reason and 'ImageMagick' in reason
+
+	img_info['src'] = tmp_path / 'rock.tga'
+	blvtf_write_tga(img_info['src'], np.zeros((2, 2, 4), dtype=np.uint8))
+	assert route(img_info, mk_shared('new')) == 'native'
+
+
+# Without the alpha, routing only asks for it if some backend can't write both formats
+def test_route_alpha(vtfcmd_runs):
+	asked = []
+	def task_alpha():
+		asked.append(True)
+		return True
+
+	assert blvtf_route_task(mk_img_info(), mk_shared('new'), {}, task_alpha) == (blvtf_backends['vtfcmd'], None)
+	assert asked == []
+
+	img_info = mk_img_info(enc=('DXT1', 'P8'))
+	assert blvtf_route_task(img_info, mk_shared('native'), {}, task_alpha) == (blvtf_backends['vtfcmd'], 'P8')
+	assert asked == [True]
+
+
+def test_route_nothing_fits(vtfcmd_runs):
+	backend, reason = blvtf_route_task(mk_img_info(enc=('P8', 'P8')), mk_shared('native', ['native']), {}, lambda: False)
+
+	assert backend == None
+	assert reason == 'native cannot write P8'
+
+
+def test_group_size(vtfcmd_runs):
+	assert blvtf_backend_group_size(mk_shared('new'), 16) == 16
+	assert blvtf_backend_group_size(mk_shared('native'), 16) == 1
+
+
+def test_register_incomplete():
+	class blvtf_backend_broken(blvtf_backend):
+		name = 'broken'
+		writes = ('DXT1',)
+
+	with pytest.raises(TypeError):
+		blvtf_register_backend(blvtf_backend_broken())
+
+	assert not 'broken' in blvtf_backends
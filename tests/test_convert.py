@@ -0,0 +1,120 @@
+import struct
+
+import numpy as np
+
+from blvtf_core.convert import blvtf_export_img_to_vtf, blvtf_pixels_as, blvtf_pixels_alpha
+
+
+def mk_shared(tmp_path):
+	return {
+		'vtfcmd_ver': 'native',
+		'vtf_version': '7.4',
+		'vtf_dxt_quality': 'FAST',
+		'vtf_generate_thumb': False,
+		'vtf_scratch_folder': str(tmp_path / 'scratch'),
+		'tmp_folder': None,
+	}
+
+
+def mk_task(tmp_path, src_pixels, enc=('BGR888', 'RGBA8888'), **params):
+	return dict({
+		'enc': enc,
+		'mips': False,
+		'comp_refl': False,
+		'srgb': False,
+		# generated images have no file at all
+		'src': tmp_path / 'Untitled',
+		'dest': tmp_path / 'Untitled.vtf',
+		'src_pixels': src_pixels,
+		'emb_alpha': False,
+		'channels': False,
+		'resize': False,
+		'clamp_dims': False,
+		'flags': (),
+	}, **params)
+
+
+# (format, image data) of a VTF without a thumbnail or mips
+def read_vtf(vtf_path):
+	vtf = vtf_path.read_bytes()
+	header_size, = struct.unpack('<I', vtf[12:16])
+	img_format, = struct.unpack('<i', vtf[52:56])
+	return img_format, vtf[header_size:]
+
+
+def mk_pixels(alpha=255):
+	rgba = np.zeros((4, 8, 4), dtype=np.uint8)
+	rgba[:, :, 0] = np.arange(8) * 30
+	rgba[:, :, 1] = np.arange(4)[:, None] * 60
+	rgba[:, :, 2] = 7
+	rgba[:, :, 3] = alpha
+	return rgba
+
+
+
+
+# =========================================================
+#                  Blender pixel buffers
+# =========================================================
+
+# Pixels from Blender go straight into the VTF, nothing is read from disk
+def test_export_pixels(tmp_path):
+	rgba = mk_pixels(alpha=100)
+	vtf_result = blvtf_export_img_to_vtf(mk_task(tmp_path, rgba), mk_shared(tmp_path))
+
+	assert vtf_result == tmp_path / 'Untitled.vtf'
+	# alpha picks the second format
+	assert read_vtf(vtf_result) == (0, rgba.tobytes())
+
+
+def test_export_pixels_opaque(tmp_path):
+	rgba = mk_pixels()
+	vtf_result = blvtf_export_img_to_vtf(mk_task(tmp_path, rgba), mk_shared(tmp_path))
+
+	# BGR888
+	assert read_vtf(vtf_result) == (3, rgba[:, :, 2::-1].tobytes())
+
+
+# Pixels can go into the channels of another image too
+def test_pack_pixels(tmp_path):
+	rgba = mk_pixels()
+	mask = np.zeros((4, 8, 4), dtype=np.uint8)
+	mask[:, :, :3] = 200
+	mask[:, :, 3] = 255
+
+	task = mk_task(tmp_path, rgba, enc=('RGBA8888', 'RGBA8888'), channels={'A': (mask, 'L'), 'B': (mask, 'R')})
+	img_format, data = read_vtf(blvtf_export_img_to_vtf(task, mk_shared(tmp_path)))
+
+	expected = rgba.copy()
+	expected[:, :, 2] = 200
+	expected[:, :, 3] = 200
+	assert data == expected.tobytes()
+
+
+def test_pixels_wrong_size(tmp_path):
+	# not a power of 2 and resizing is off
+	task = mk_task(tmp_path, np.zeros((3, 5, 4), dtype=np.uint8))
+	assert blvtf_export_img_to_vtf(task, mk_shared(tmp_path)) == None
+
+	task = mk_task(tmp_path, np.zeros((3, 5, 4), dtype=np.uint8), resize=('NEAREST', 'BOX', 'NONE'))
+	vtf_result = blvtf_export_img_to_vtf(task, mk_shared(tmp_path))
+	assert struct.unpack('<HH', vtf_result.read_bytes()[16:20]) == (4, 4)
+
+
+# Float buffers are linear, they get the same gamma as magick gives an EXR
+def test_pixels_as():
+	rgba = np.array([[[0.5, 0.0, 1.0, 0.5]]], dtype=np.float32)
+
+	assert blvtf_pixels_as(rgba).tolist() == [[[188, 0, 255, 128]]]
+	assert blvtf_pixels_as(rgba, hdr=True) is rgba
+
+	rgba_u8 = np.array([[[255, 0, 51, 255]]], dtype=np.uint8)
+	assert blvtf_pixels_as(rgba_u8) is rgba_u8
+	assert np.allclose(blvtf_pixels_as(rgba_u8, hdr=True), ((1.0, 0.0, 0.2, 1.0),))
+
+
+def test_pixels_alpha():
+	assert not blvtf_pixels_alpha(mk_pixels())
+	assert blvtf_pixels_alpha(mk_pixels(alpha=254))
+	assert not blvtf_pixels_alpha(np.ones((2, 2, 4), dtype=np.float32))
+	assert blvtf_pixels_alpha(np.full((2, 2, 4), 0.99, dtype=np.float32))
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from blvtf_core.dxt import blvtf_dxt_compress, blvtf_dxt_decode
+
+
+def mk_rgba(width, height, col=(255, 0, 0, 255)):
+	rgba = np.zeros((height, width, 4), dtype=np.uint8)
+	rgba[...] = col
+	return rgba
+
+
+# Partial blocks at the right and bottom edges still take a whole block
+@pytest.mark.parametrize('width, height', ((1, 1), (2, 2), (3, 5), (5, 3), (7, 9), (13, 4)))
+@pytest.mark.parametrize('dxt_format, block_bytes', (('DXT1', 8), ('DXT1_ONEBITALPHA', 8), ('DXT3', 16), ('DXT5', 16)))
+@pytest.mark.parametrize('quality', ('FAST', 'QUALITY'))
+def test_block_size(width, height, dxt_format, block_bytes, quality):
+	rgba = np.random.default_rng(width * height).integers(0, 256, (height, width, 4), dtype=np.uint8)
+	data = blvtf_dxt_compress(rgba, dxt_format, quality)
+
+	assert len(data) == ((width + 3) // 4) * ((height + 3) // 4) * block_bytes
+	assert blvtf_dxt_decode(data, width, height, dxt_format).shape == (height, width, 4)
+
+
+def test_solid_dxt1():
+	assert blvtf_dxt_compress(mk_rgba(4, 4), 'DXT1') == bytes.fromhex('00f800f800000000')
+
+
+def test_solid_dxt5():
+	data = blvtf_dxt_compress(mk_rgba(4, 4, (255, 0, 0, 128)), 'DXT5')
+	assert data == bytes.fromhex('808000000000000000f800f800000000')
+
+	decoded = blvtf_dxt_decode(data, 4, 4, 'DXT5')
+	assert (decoded == (255, 0, 0, 128)).all()
+
+
+# Solid colours which are exact in 565 survive the round trip on odd dimensions too
+@pytest.mark.parametrize('dxt_format', ('DXT1', 'DXT3', 'DXT5'))
+def test_solid_roundtrip_odd(dxt_format):
+	rgba = mk_rgba(5, 7, (0, 255, 255, 255))
+	decoded = blvtf_dxt_decode(blvtf_dxt_compress(rgba, dxt_format), 5, 7, dxt_format)
+
+	assert (decoded == rgba).all()
+
+
+def test_onebit_alpha():
+	rgba = mk_rgba(4, 4)
+	rgba[:2, :, 3] = 0
+	decoded = blvtf_dxt_decode(blvtf_dxt_compress(rgba, 'DXT1_ONEBITALPHA'), 4, 4, 'DXT1_ONEBITALPHA')
+
+	assert (decoded[:2, :, 3] == 0).all()
+	assert (decoded[2:, :, 3] == 255).all()
+	assert (decoded[2:, :, :3] == (255, 0, 0)).all()
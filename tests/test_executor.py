@@ -0,0 +1,236 @@
+import threading
+
+from pathlib import Path
+
+from blvtf_core.executor import blvtf_run_tasks, blvtf_group_tasks
+from blvtf_core.convert import blvtf_task_lane, blvtf_vtfcmd_group_key, blvtf_vtfcmd_invocations
+from blvtf_core import convert
+
+
+def test_every_task_done_once():
+	done = []
+	results = blvtf_run_tasks(
+		[{'src': task_idx} for task_idx in range(50)],
+		lambda task: task['src'] * 2,
+		worker_count=4,
+		on_done=lambda task, result, error: done.append((task['src'], result, error)),
+	)
+
+	assert results == None
+	assert sorted(done) == [(task_idx, task_idx * 2, None) for task_idx in range(50)]
+
+
+def test_workers_run_at_the_same_time():
+	# Every task waits for all 4 to have started. Would time out with fewer workers
+	barrier = threading.Barrier(4, timeout=5)
+	done = []
+	blvtf_run_tasks(
+		[{'src': task_idx} for task_idx in range(4)],
+		lambda task: barrier.wait(),
+		worker_count=4,
+		on_done=lambda task, result, error: done.append(error),
+	)
+
+	assert done == [None] * 4
+
+
+def test_failed_task_does_not_stop_the_rest():
+	def task_fn(task):
+		if task['src'] == 3:
+			raise ValueError('broken')
+		return task['src']
+
+	done = {}
+	blvtf_run_tasks(
+		[{'src': task_idx} for task_idx in range(8)],
+		task_fn,
+		worker_count=2,
+		on_done=lambda task, result, error: done.update({task['src']: (result, error)}),
+	)
+
+	assert len(done) == 8
+	assert done[3][0] == None
+	assert isinstance(done[3][1], ValueError)
+	assert all(error == None for result, error in (done[task_idx] for task_idx in range(8) if task_idx != 3))
+
+
+def test_on_done_never_concurrent():
+	busy = threading.Lock()
+	overlaps = []
+
+	def on_done(task, result, error):
+		if not busy.acquire(blocking=False):
+			overlaps.append(task)
+			return
+		try:
+			threading.Event().wait(0.001)
+		finally:
+			busy.release()
+
+	blvtf_run_tasks([{'src': task_idx} for task_idx in range(40)], lambda task: None, 8, on_done)
+
+	assert overlaps == []
+
+
+# Tasks writing the same VTF never run at the same time, the rest do
+def test_lanes():
+	lock = threading.Lock()
+	running = {}
+	peak = {}
+
+	def task_fn(task):
+		lane = blvtf_task_lane(task)
+		with lock:
+			running[lane] = running.get(lane, 0) + 1
+			peak[lane] = max(peak.get(lane, 0), running[lane])
+		threading.Event().wait(0.01)
+		with lock:
+			running[lane] -= 1
+
+	tasks = [
+		{'src': f'{name}{ext}', 'dest': f'out/{name}{ext}'}
+		for name in ('rock', 'grass', 'Sand')
+		for ext in ('.png', '.psd', '.tga', '.jpg')
+	]
+	# a.vtf and A.vtf are the same file on Windows
+	tasks.append({'src': 'sand.exr', 'dest': 'out/sand.exr'})
+
+	blvtf_run_tasks(tasks, task_fn, worker_count=8, lane_key=blvtf_task_lane)
+
+	assert peak == {'out/rock.vtf': 1, 'out/grass.vtf': 1, 'out/sand.vtf': 1}
+
+
+# A task holding several lanes (a group) blocks every task in any of them
+def test_lane_lists():
+	lock = threading.Lock()
+	running = set()
+	clashes = []
+
+	def task_fn(task):
+		with lock:
+			if running & set(task['lanes']):
+				clashes.append(task['src'])
+			running.update(task['lanes'])
+		threading.Event().wait(0.005)
+		with lock:
+			running.difference_update(task['lanes'])
+
+	tasks = [
+		{'src': task_idx, 'lanes': [f'lane{task_idx % 3}', f'lane{(task_idx + 1) % 3}', f'lane{task_idx % 3}']}
+		for task_idx in range(30)
+	]
+	blvtf_run_tasks(tasks, task_fn, worker_count=6, lane_key=lambda task: task['lanes'])
+
+	assert clashes == []
+
+
+# Workers start converting while the producer is still walking
+def test_streaming():
+	first_done = threading.Event()
+
+	def produce():
+		yield {'src': 0}
+		# The first task gets converted before the walk moves on
+		assert first_done.wait(5)
+		yield {'src': 1}
+
+	done = []
+	blvtf_run_tasks(produce(), lambda task: first_done.set(), 2, lambda task, result, error: done.append((task['src'], error)))
+
+	assert sorted(done) == [(0, None), (1, None)]
+
+
+# The producer never runs more than queue_size tasks ahead of the workers
+def test_bounded_queue():
+	release = threading.Event()
+	discovered = []
+
+	def task_fn(task):
+		assert release.wait(5)
+
+	run = threading.Thread(target=blvtf_run_tasks, kwargs={
+		'tasks': ({'src': task_idx} for task_idx in range(20)),
+		'task_fn': task_fn,
+		'worker_count': 1,
+		'on_discovered': lambda task: discovered.append(task['src']),
+		'queue_size': 3,
+	})
+	run.start()
+	threading.Event().wait(0.2)
+	# 1 task in the worker, 3 queued and 1 the producer is stuck putting
+	assert len(discovered) == 5
+
+	release.set()
+	run.join(5)
+	assert discovered == list(range(20))
+
+
+def mk_task(name, **params):
+	return dict({
+		'src': f'{name}.tga',
+		'enc': ('DXT1', 'DXT5'),
+		'resize': None,
+		'clamp_dims': None,
+		'mips': ('BOX', 'SHARPENSOFT'),
+		'comp_refl': True,
+		'srgb': False,
+		'flags': ['NORMAL', 'NOMIP'],
+	}, **params)
+
+
+def test_group_key():
+	assert blvtf_vtfcmd_group_key(mk_task('a')) == blvtf_vtfcmd_group_key(mk_task('b', flags=['NOMIP', 'NORMAL']))
+	assert blvtf_vtfcmd_group_key(mk_task('a')) != blvtf_vtfcmd_group_key(mk_task('a', srgb=True))
+	assert blvtf_vtfcmd_group_key(mk_task('a')) != blvtf_vtfcmd_group_key(mk_task('a', clamp_dims=(512, 512)))
+
+
+def test_group_tasks():
+	tasks = [
+		mk_task('a0'), mk_task('b0', enc=('BGR888', 'BGRA8888')),
+		mk_task('a1'), mk_task('a2'),
+		mk_task('b1', enc=('BGR888', 'BGRA8888')),
+		mk_task('a3'),
+	]
+	groups = [[task['src'] for task in group] for group in blvtf_group_tasks(iter(tasks), blvtf_vtfcmd_group_key, 3)]
+
+	# full groups as soon as they fill up, then whatever is left (in the order the keys first showed up)
+	assert groups == [['a0.tga', 'a1.tga', 'a2.tga'], ['b0.tga', 'b1.tga'], ['a3.tga']]
+
+
+def test_group_tasks_streams():
+	def produce():
+		yield mk_task('a0')
+		yield mk_task('a1')
+		raise AssertionError('walked too far')
+
+	assert [task['src'] for task in next(blvtf_group_tasks(produce(), blvtf_vtfcmd_group_key, 2))] == ['a0.tga', 'a1.tga']
+
+
+def test_no_grouping():
+	tasks = [mk_task('a0'), mk_task('a1')]
+	assert list(blvtf_group_tasks(tasks, blvtf_vtfcmd_group_key, 1)) == [[tasks[0]], [tasks[1]]]
+	assert list(blvtf_group_tasks(tasks, lambda task: None, 4)) == [[tasks[0]], [tasks[1]]]
+
+
+# VTFCmd names the output after the input: same names go into separate invocations
+def test_invocations():
+	inputs = [
+		(0, Path('props/rock.tga'), None),
+		(1, Path('walls/Rock.tga'), None),
+		(2, Path('props/grass.tga'), None),
+		(3, Path('walls/rock.psd'), None),
+		(4, Path('props/sand.tga'), None),
+	]
+	invocations = [[task_idx for task_idx, input_path, vtf_result in invocation] for invocation in blvtf_vtfcmd_invocations(inputs)]
+	assert invocations == [[0, 2, 4], [1], [3]]
+
+	invocations = [[task_idx for task_idx, input_path, vtf_result in invocation] for invocation in blvtf_vtfcmd_invocations(inputs, 2)]
+	assert invocations == [[0, 2], [1, 4], [3]]
+
+
+def test_invocations_cmd_len(monkeypatch):
+	monkeypatch.setattr(convert, 'blvtf_vtfcmd_max_cmd_len', 100)
+	inputs = [(task_idx, Path(f'{"x" * 30}_{task_idx}.tga'), None) for task_idx in range(6)]
+
+	invocations = blvtf_vtfcmd_invocations(inputs)
+	assert [len(invocation) for invocation in invocations] == [2, 2, 2]
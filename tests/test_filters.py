@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from blvtf_core import filters
+from blvtf_core.filters import blvtf_sharpen, blvtf_sharpen_filter_names
+
+
+filter_names = [filter_name for filter_name in blvtf_sharpen_filter_names if filter_name != 'NONE']
+
+
+def noise(height, width, seed=0):
+	return np.random.default_rng(seed).integers(0, 256, (height, width, 4), dtype=np.uint8)
+
+
+def test_none():
+	img = noise(4, 4)
+	assert blvtf_sharpen(img, 'NONE') is img
+	assert blvtf_sharpen(img, None) is img
+
+
+def test_unknown():
+	with pytest.raises(ValueError):
+		blvtf_sharpen(noise(4, 4), 'BOGUS')
+
+
+@pytest.mark.parametrize('filter_name', filter_names)
+def test_alpha_untouched(filter_name):
+	img = noise(20, 12)
+
+	out = blvtf_sharpen(img, filter_name)
+	assert out.shape == img.shape
+	assert out.dtype == np.uint8
+	assert np.array_equal(out[:, :, 3], img[:, :, 3])
+
+
+# Strips (and the context rows around them) don't show in the result
+@pytest.mark.parametrize('filter_name', filter_names)
+def test_strip_size(monkeypatch, filter_name):
+	img = noise(40, 24)
+	expected = blvtf_sharpen(img, filter_name)
+
+	monkeypatch.setattr(filters, 'blvtf_filter_strip', 3)
+	assert np.array_equal(blvtf_sharpen(img, filter_name), expected)
+
+
+# Flat areas: sharpening leaves them alone, edge filters find nothing
+def test_flat():
+	img = np.full((8, 8, 4), 100, dtype=np.uint8)
+
+	for filter_name in ('SMOOTHEN', 'SHARPENSOFT', 'SHARPENMEDIUM', 'SHARPENSTRONG', 'MEANREMOVAL', 'XSHARPEN', 'UNSHARP', 'WARPSHARP'):
+		assert np.array_equal(blvtf_sharpen(img, filter_name), img), filter_name
+
+	assert (blvtf_sharpen(img, 'FINDEDGES')[:, :, :3] == 0).all()
+	assert (blvtf_sharpen(img, 'EDGEDETECT')[:, :, :3] == 128).all()
+	assert (blvtf_sharpen(img, 'CONTOUR')[:, :, :3] == 255).all()
+	assert (blvtf_sharpen(img, 'NEGATIVE')[:, :, :3] == 155).all()
+
+
+# A step gets over- and undershoot, the more the stronger the filter
+def test_sharpen_step():
+	img = np.full((4, 8, 4), 64, dtype=np.uint8)
+	img[:, 4:] = 192
+
+	overshoot = []
+	for filter_name in ('SHARPENSOFT', 'SHARPENMEDIUM', 'SHARPENSTRONG'):
+		row = blvtf_sharpen(img, filter_name)[1, :, 0].astype(int)
+		assert row[3] < 64 and row[4] > 192
+		assert row[0] == 64 and row[7] == 192
+		overshoot.append(row[4] - 192)
+
+	assert overshoot == sorted(overshoot)
+
+
+def test_float():
+	img = np.random.default_rng(0).random((10, 10, 4), dtype=np.float32) * 4
+
+	out = blvtf_sharpen(img, 'DARKER')
+	assert out.dtype == np.float32
+	assert np.allclose(out[:, :, :3], img[:, :, :3] * 0.85)
+	assert np.array_equal(out[:, :, 3], img[:, :, 3])
@@ -0,0 +1,123 @@
+import json, pickle
+
+import numpy as np
+import pytest
+
+from blvtf_core.jobspec import blvtf_job, blvtf_save_job, blvtf_load_job, blvtf_run_job, blvtf_job_pixels_dir
+
+
+def mk_shared(tmp_path):
+	return {
+		'vtfcmd_ver': 'native',
+		'vtf_version': '7.4',
+		'vtf_dxt_quality': 'FAST',
+		'vtf_generate_thumb': False,
+		'vtf_scratch_folder': tmp_path / 'scratch',
+		'tmp_folder': None,
+	}
+
+
+def mk_task(tmp_path, name, src_pixels, **params):
+	return dict({
+		'enc': ('BGR888', 'BGRA8888'),
+		'mips': False,
+		'comp_refl': False,
+		'srgb': False,
+		'src': tmp_path / name,
+		'dest': tmp_path / 'out' / f'{name}.vtf',
+		'src_pixels': src_pixels,
+		'emb_alpha': False,
+		'channels': False,
+		'resize': False,
+		'clamp_dims': False,
+		'flags': ['NORMAL'],
+	}, **params)
+
+
+def mk_pixels(seed):
+	return np.random.default_rng(seed).integers(0, 256, (4, 8, 4), dtype=np.uint8)
+
+
+# Nothing in a job refers to anything but plain data
+def test_job_is_plain(tmp_path):
+	job = blvtf_job([mk_task(tmp_path, 'rock', None)], mk_shared(tmp_path), 16)
+
+	assert job['blvtf_job'] == 1
+	assert job['group_size'] == 16
+	assert job['shared']['vtf_scratch_folder'] == str(tmp_path / 'scratch')
+	assert job['tasks'][0]['dest'] == str(tmp_path / 'out' / 'rock.vtf')
+	assert job['tasks'][0]['flags'] == ('NORMAL',)
+	assert pickle.loads(pickle.dumps(job)) == job
+
+
+def test_save_load(tmp_path):
+	pixels = mk_pixels(0)
+	mask = mk_pixels(1)
+	tasks = [
+		mk_task(tmp_path, 'rock', pixels, channels={'A': (mask, 'L')}),
+		# the same mask embedded into another texture is saved once
+		mk_task(tmp_path, 'dirt', None, channels={'A': (mask, 'L')}),
+	]
+	job = blvtf_job(tasks, mk_shared(tmp_path), 4)
+
+	job_path = blvtf_save_job(job, tmp_path / 'marked_export.json')
+	assert job_path == tmp_path / 'marked_export.json'
+	assert not job_path.with_suffix('.tmp').exists()
+	assert sorted(npy.name for npy in blvtf_job_pixels_dir(job_path).iterdir()) == ['pixels_0.npy', 'pixels_1.npy']
+	assert json.loads(job_path.read_text())['tasks'][1]['channels'] == {'A': [{'npy': 'pixels_1.npy'}, 'L']}
+
+	loaded = blvtf_load_job(job_path)
+	assert isinstance(loaded['tasks'][0]['src_pixels'], np.memmap)
+	assert np.array_equal(loaded['tasks'][0]['src_pixels'], pixels)
+	assert np.array_equal(loaded['tasks'][1]['channels']['A'][0], mask)
+
+	# everything else comes back as it was
+	def drop_arrays(task):
+		return dict(task, src_pixels=None, channels=None)
+	assert [drop_arrays(task) for task in loaded['tasks']] == [drop_arrays(task) for task in job['tasks']]
+	assert loaded['shared'] == job['shared']
+	assert loaded['group_size'] == 4
+
+
+def test_load_wrong_version(tmp_path):
+	job_path = tmp_path / 'job.json'
+	job_path.write_text(json.dumps({'blvtf_job': 99, 'tasks': []}))
+	with pytest.raises(ValueError):
+		blvtf_load_job(job_path)
+
+	job_path.write_text(json.dumps({'format': 'DXT1'}))
+	with pytest.raises(ValueError):
+		blvtf_load_job(job_path)
+
+
+# A saved and loaded job converts to the same VTFs as the tasks themselves
+def test_run_saved_job(tmp_path):
+	tasks = [mk_task(tmp_path, name, mk_pixels(seed)) for seed, name in enumerate(('rock', 'dirt', 'grass'))]
+	(tmp_path / 'out').mkdir()
+
+	direct = blvtf_run_job(blvtf_job(tasks, mk_shared(tmp_path), 16))
+	assert direct == {'converted': 3, 'failed': 0, 'failures': []}
+	expected = {name: (tmp_path / 'out' / f'{name}.vtf').read_bytes() for name in ('rock', 'dirt', 'grass')}
+
+	job_path = blvtf_save_job(blvtf_job(tasks, mk_shared(tmp_path), 16), tmp_path / 'job.json')
+	for vtf_path in (tmp_path / 'out').iterdir():
+		vtf_path.unlink()
+
+	assert blvtf_run_job(blvtf_load_job(job_path), worker_count=2) == direct
+	assert {name: (tmp_path / 'out' / f'{name}.vtf').read_bytes() for name in ('rock', 'dirt', 'grass')} == expected
+
+
+# A task which fails doesn't take the rest of the job down
+def test_run_job_failures(tmp_path, standin_shared, mk_tga):
+	tasks = [
+		mk_task(tmp_path, 'rock.tga', None),
+		# the source is gone
+		mk_task(tmp_path, 'dirt.tga', None),
+		mk_task(tmp_path, 'grass.tga', None),
+	]
+	(tmp_path / 'out').mkdir()
+	mk_tga(tmp_path / 'rock.tga')
+	mk_tga(tmp_path / 'grass.tga')
+
+	stats = blvtf_run_job(blvtf_job(tasks, standin_shared, 16), worker_count=2)
+	assert stats == {'converted': 2, 'failed': 1, 'failures': [str(tmp_path / 'dirt.tga')]}
@@ -0,0 +1,162 @@
+import json, os
+
+from blvtf_core.manifest import blvtf_build_manifest, blvtf_task_params_hash, blvtf_manifest_name
+
+
+def mk_task(tmp_path, name='rock'):
+	src = tmp_path / 'src' / f'{name}.tga'
+	src.parent.mkdir(exist_ok=True)
+	if not src.exists():
+		src.write_bytes(b'source pixels')
+	return {
+		'src': src,
+		'dest': tmp_path / 'out' / f'{name}.tga',
+		'enc': ('DXT1', 'DXT5'),
+		'flags': ('NORMAL', 'NOMIP'),
+	}
+
+
+# What a conversion does: write the VTF
+def convert(task, content=b'vtf'):
+	vtf_dest = task['dest'].with_suffix('.vtf')
+	vtf_dest.parent.mkdir(exist_ok=True)
+	vtf_dest.write_bytes(content)
+
+
+def build(manifest, task, params_hash='params'):
+	src_state = manifest.src_state(task)
+	convert(task)
+	manifest.record(task, params_hash, src_state)
+
+
+def up_to_date(manifest, task, params_hash='params'):
+	return manifest.is_up_to_date(task, params_hash, manifest.src_state(task))
+
+
+# Bump the mtime, so that the change shows up no matter the file system's resolution
+def touch(filepath, content=None):
+	if content != None:
+		filepath.write_bytes(content)
+	file_stat = os.stat(filepath)
+	os.utime(filepath, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 10**9))
+
+
+def test_up_to_date(tmp_path):
+	task = mk_task(tmp_path)
+	manifest = blvtf_build_manifest(tmp_path / 'out')
+	assert not up_to_date(manifest, task)
+
+	build(manifest, task)
+	assert up_to_date(manifest, task)
+	# from the journal, in the next run
+	assert up_to_date(blvtf_build_manifest(tmp_path / 'out'), task)
+
+	assert json.loads((tmp_path / 'out' / blvtf_manifest_name).read_text())['dest'] == 'rock.vtf'
+
+
+def test_changes(tmp_path):
+	task = mk_task(tmp_path)
+	manifest = blvtf_build_manifest(tmp_path / 'out')
+	build(manifest, task)
+
+	assert not up_to_date(manifest, task, 'other params')
+
+	touch(task['dest'].with_suffix('.vtf'), b'edited vtf')
+	assert not up_to_date(manifest, task)
+
+	build(manifest, task)
+	touch(task['src'], b'edited source')
+	assert not up_to_date(manifest, task)
+
+	build(manifest, task)
+	task['dest'].with_suffix('.vtf').unlink()
+	assert not up_to_date(manifest, task)
+
+	task['src'].unlink()
+	assert manifest.src_state(task) == None
+	assert not up_to_date(manifest, task)
+
+
+# A source edited while converting still counts as changed next time
+def test_source_edited_mid_conversion(tmp_path):
+	task = mk_task(tmp_path)
+	manifest = blvtf_build_manifest(tmp_path / 'out')
+
+	src_state = manifest.src_state(task)
+	convert(task)
+	touch(task['src'], b'edited while converting')
+	manifest.record(task, 'params', src_state)
+
+	assert not up_to_date(blvtf_build_manifest(tmp_path / 'out'), task)
+
+
+# Touched, but the same content: still up to date, and the new stats are remembered
+def test_touched(tmp_path):
+	task = mk_task(tmp_path)
+	manifest = blvtf_build_manifest(tmp_path / 'out')
+	build(manifest, task)
+
+	touch(task['src'])
+	assert up_to_date(manifest, task)
+	assert manifest.entries['rock.vtf']['src_mtime_ns'] == os.stat(task['src']).st_mtime_ns
+
+
+def test_journal(tmp_path):
+	manifest = blvtf_build_manifest(tmp_path / 'out')
+	rock = mk_task(tmp_path, 'rock')
+	build(manifest, rock)
+	build(manifest, rock)
+	build(manifest, mk_task(tmp_path, 'dirt'))
+
+	# cut off by a killed batch
+	manifest_path = tmp_path / 'out' / blvtf_manifest_name
+	with open(manifest_path, 'a') as f:
+		f.write('{"dest": "gra')
+
+	manifest = blvtf_build_manifest(tmp_path / 'out')
+	assert sorted(manifest.entries) == ['dirt.vtf', 'rock.vtf']
+	assert manifest.journal_lines == 4
+
+	manifest.compact()
+	assert len(manifest_path.read_text().splitlines()) == 2
+	assert up_to_date(blvtf_build_manifest(tmp_path / 'out'), rock)
+
+
+def test_params_hash(tmp_path):
+	task = mk_task(tmp_path)
+	shared = {'vtf_version': '7.4'}
+	params_hash = blvtf_task_params_hash(task, shared)
+
+	assert blvtf_task_params_hash(dict(task, flags=('NOMIP', 'NORMAL')), shared) == params_hash
+	assert blvtf_task_params_hash(dict(task, src='elsewhere.tga', dest='elsewhere.tga'), shared) == params_hash
+	assert blvtf_task_params_hash(dict(task, enc=('DXT5', 'DXT5')), shared) != params_hash
+	assert blvtf_task_params_hash(task, {'vtf_version': '7.5'}) != params_hash
+
+	# the embedded alpha file changing changes the hash
+	alpha = tmp_path / 'src' / 'rock_alpha.tga'
+	alpha.write_bytes(b'alpha')
+	alpha_hash = blvtf_task_params_hash(dict(task, emb_alpha=alpha), shared)
+	touch(alpha, b'other alpha')
+	assert blvtf_task_params_hash(dict(task, emb_alpha=alpha), shared) != alpha_hash
+
+
+# The whole batch: unchanged sources are skipped next time, edited ones converted again
+def test_batch_skips_unchanged(tmp_path, standin_shared, mk_tga):
+	from blvtf_core.batch import blvtf_run_batch
+
+	src_dir = tmp_path / 'src'
+	out_dir = tmp_path / 'out'
+	out_dir.mkdir()
+	for name in ('rock', 'dirt', 'grass'):
+		mk_tga(src_dir / f'{name}.tga')
+
+	def run():
+		tasks = [dict(mk_task(tmp_path, name), mips=False, resize=False, emb_alpha=False, channels=False) for name in ('rock', 'dirt', 'grass')]
+		return blvtf_run_batch(iter(tasks), out_dir, standin_shared, manifest_shared={'test': True})
+
+	assert run()['converted'] == 3
+	assert run()['skipped'] == 3
+
+	touch(mk_tga(src_dir / 'dirt.tga', value=64))
+	stats = run()
+	assert (stats['converted'], stats['skipped']) == (1, 2)
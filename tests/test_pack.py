@@ -0,0 +1,120 @@
+import struct
+
+import numpy as np
+import pytest
+
+from blvtf_core.pack import blvtf_pack_channels, blvtf_pack_plane, blvtf_write_tga, blvtf_read_tga, blvtf_tga_header
+
+
+def noise(height, width, seed=0):
+	return np.random.default_rng(seed).integers(0, 256, (height, width, 4), dtype=np.uint8)
+
+
+def test_pack_plane():
+	src = np.array([[[255, 0, 0, 10], [0, 255, 0, 20], [0, 0, 255, 30], [255, 255, 255, 0]]], dtype=np.uint8)
+
+	assert np.allclose(blvtf_pack_plane(src, 'G'), [[0, 1, 0, 1]])
+	assert np.allclose(blvtf_pack_plane(src, 'A'), np.array([[10, 20, 30, 0]]) / 255)
+	# luminance, whatever alpha the image has
+	assert np.allclose(blvtf_pack_plane(src, 'L'), [[0.299, 0.587, 0.114, 1.0]])
+	assert np.allclose(blvtf_pack_plane(src, 'AUTO', True), blvtf_pack_plane(src, 'A'))
+	assert np.allclose(blvtf_pack_plane(src, 'AUTO', False), blvtf_pack_plane(src, 'L'))
+
+	with pytest.raises(ValueError):
+		blvtf_pack_plane(src, 'X')
+
+
+def test_pack_channels():
+	base = noise(8, 8, 0)
+	ao = noise(8, 8, 1)
+	rough = noise(8, 8, 2)
+
+	out = blvtf_pack_channels(base, {'R': (ao, 'R', True), 'A': (rough, 'G', True)})
+
+	assert np.array_equal(out[:, :, 0], ao[:, :, 0])
+	assert np.array_equal(out[:, :, 1:3], base[:, :, 1:3])
+	assert np.array_equal(out[:, :, 3], rough[:, :, 1])
+	# base is left intact
+	assert not np.array_equal(out, base)
+	assert np.array_equal(base, noise(8, 8, 0))
+
+	with pytest.raises(ValueError):
+		blvtf_pack_channels(base, {'L': (ao, 'R', True)})
+
+
+# Embedding alpha: the mask's luminance goes into A, the mask's own alpha doesn't matter
+def test_embed_alpha():
+	base = noise(4, 4, 0)
+	mask = np.zeros((4, 4, 4), dtype=np.uint8)
+	mask[:, 2:, :3] = 255
+
+	out = blvtf_pack_channels(base, {'A': (mask, 'L', True)})
+
+	assert np.array_equal(out[:, :, :3], base[:, :, :3])
+	assert out[:, :, 3].tolist() == [[0, 0, 255, 255]] * 4
+
+
+# A layer of a different size is resampled to fit the base
+def test_pack_resamples():
+	base = noise(8, 16)
+	mask = np.full((2, 4, 4), 200, dtype=np.uint8)
+
+	out = blvtf_pack_channels(base, {'B': (mask, 'R', True)}, 'BOX')
+	assert out.shape == base.shape
+	assert (out[:, :, 2] == 200).all()
+
+	out = blvtf_pack_channels(np.zeros((4, 4, 4), dtype=np.uint16), {'R': (mask, 'R', True)})
+	assert out.dtype == np.uint16
+	assert (out[:, :, 0] == round(200 / 255 * 65535)).all()
+
+
+def test_tga_round_trip(tmp_path):
+	img = noise(5, 7)
+
+	tga_path = blvtf_write_tga(tmp_path / 'img.tga', img)
+	assert tga_path == tmp_path / 'img.tga'
+	assert tga_path.stat().st_size == 18 + 5 * 7 * 4
+	assert blvtf_tga_header(tga_path) == (7, 5, 32, 0x28, 18)
+	assert np.array_equal(blvtf_read_tga(tga_path), img)
+
+
+def test_write_tga_float(tmp_path):
+	img = np.full((2, 2, 4), 0.5, dtype=np.float32)
+	assert (blvtf_read_tga(blvtf_write_tga(tmp_path / 'img.tga', img)) == 128).all()
+
+
+def write_raw_tga(tga_path, pixels, img_type, descriptor, image_id=b''):
+	height, width = pixels.shape[:2]
+	depth = 8 * (pixels.shape[2] if pixels.ndim == 3 else 1)
+	tga_path.write_bytes(struct.pack('<BBBHHBHHHHBB', len(image_id), 0, img_type, 0, 0, 0, 0, 0, width, height, depth, descriptor) + image_id + pixels.tobytes())
+	return tga_path
+
+
+# Bottom-left origin (the TGA default), right-to-left, 24 bit and greyscale
+def test_read_tga_layouts(tmp_path):
+	img = noise(3, 4)
+	bgr = img[:, :, 2::-1]
+
+	assert np.array_equal(blvtf_read_tga(write_raw_tga(tmp_path / 'a.tga', img[::-1, :, (2, 1, 0, 3)].copy(), 2, 0x08)), img)
+	assert np.array_equal(blvtf_read_tga(write_raw_tga(tmp_path / 'b.tga', img[:, ::-1, (2, 1, 0, 3)].copy(), 2, 0x38)), img)
+
+	rgb = blvtf_read_tga(write_raw_tga(tmp_path / 'c.tga', bgr.copy(), 2, 0x20, b'image id'))
+	assert np.array_equal(rgb[:, :, :3], img[:, :, :3])
+	assert (rgb[:, :, 3] == 255).all()
+
+	grey = blvtf_read_tga(write_raw_tga(tmp_path / 'd.tga', img[:, :, 0].copy(), 3, 0x20))
+	assert np.array_equal(grey[:, :, :3], np.repeat(img[:, :, :1], 3, axis=2))
+
+
+# What blvtf_read_tga doesn't read is left to magick
+def test_read_tga_unsupported(tmp_path):
+	# RLE
+	assert blvtf_read_tga(write_raw_tga(tmp_path / 'rle.tga', noise(2, 2), 10, 0x28)) == None
+	assert blvtf_read_tga(tmp_path / 'missing.tga') == None
+	(tmp_path / 'short.tga').write_bytes(b'\0' * 10)
+	assert blvtf_read_tga(tmp_path / 'short.tga') == None
+
+	truncated = tmp_path / 'truncated.tga'
+	truncated.write_bytes(blvtf_write_tga(tmp_path / 'full.tga', noise(4, 4)).read_bytes()[:-5])
+	with pytest.raises(ValueError):
+		blvtf_read_tga(truncated)
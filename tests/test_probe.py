@@ -0,0 +1,241 @@
+import struct, zlib
+
+import pytest
+
+from blvtf_core.probe import blvtf_probe_img
+
+
+def info(width, height, channels, alpha):
+	return {'width': width, 'height': height, 'channels': channels, 'alpha': alpha}
+
+
+def write(tmp_path, name, data):
+	imgpath = tmp_path / name
+	imgpath.write_bytes(data)
+	return imgpath
+
+
+# =========================================================
+#                      Synthetic headers
+# =========================================================
+
+# Only as much of each file as the probes read, followed by junk where the pixel data would be
+
+def png_chunk(chunk_type, data):
+	return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+def mk_png(width, height, color_type, extra_chunks=()):
+	return (
+		b'\x89PNG\r\n\x1a\n'
+		+ png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0))
+		+ b''.join(png_chunk(chunk_type, data) for chunk_type, data in extra_chunks)
+		+ png_chunk(b'IDAT', b'\x00' * 16)
+		+ png_chunk(b'IEND', b'')
+	)
+
+
+def mk_jpeg(width, height, components, sof=0xc0):
+	return (
+		b'\xff\xd8'
+		# APP0, then a DHT, which looks like a SOF but isn't
+		+ b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00' + b'\x00' * 9
+		+ b'\xff\xc4' + struct.pack('>H', 5) + b'\x00' * 3
+		# fill bytes before the marker
+		+ b'\xff\xff' + bytes((sof,)) + struct.pack('>HBHHB', 8 + 3 * components, 8, height, width, components) + b'\x00' * 3 * components
+		+ b'\xff\xda'
+	)
+
+
+def mk_bmp(width, height, bpp, dib_size=40, compression=0, a_mask=0):
+	dib = struct.pack('<IiiHHI', dib_size, width, height, 1, bpp, compression).ljust(dib_size, b'\x00')
+	if dib_size >= 56:
+		dib = dib[:52] + struct.pack('<I', a_mask) + dib[56:]
+	return b'BM' + b'\x00' * 12 + dib + b'\x00' * 64
+
+
+def mk_gif(width, height, transparent, global_table=True):
+	return (
+		b'GIF89a'
+		+ struct.pack('<HHBBB', width, height, 0x81 if global_table else 0, 0, 0)
+		+ (b'\x00' * 3 * 4 if global_table else b'')
+		# application extension, skipped sub-block by sub-block
+		+ b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00'
+		+ b'\x21\xf9\x04' + bytes((0x01 if transparent else 0x00,)) + b'\x00\x00\x00\x00'
+		+ b'\x2c' + b'\x00' * 9
+	)
+
+
+def mk_dds(width, height, pf_flags, fourcc=b'\x00' * 4, a_mask=0, dxgi_format=None):
+	head = bytearray(128)
+	head[:4] = b'DDS '
+	head[4:8] = struct.pack('<I', 124)
+	head[12:20] = struct.pack('<II', height, width)
+	head[80:92] = struct.pack('<I4sI', pf_flags, fourcc, 32)
+	head[104:108] = struct.pack('<I', a_mask)
+	return bytes(head) + (struct.pack('<I', dxgi_format) + b'\x00' * 16 if dxgi_format != None else b'') + b'\x00' * 64
+
+
+def mk_psd(width, height, channels, mode, version=1):
+	return b'8BPS' + struct.pack('>H6xHIIHH', version, channels, height, width, 8, mode) + b'\x00' * 32
+
+
+def mk_tiff(width, height, bo, samples, photometric=2, extra_samples=0, long_dims=False):
+	entries = [
+		(256, 4 if long_dims else 3, 1, width),
+		(257, 4 if long_dims else 3, 1, height),
+		(262, 3, 1, photometric),
+		(277, 3, 1, samples),
+	]
+	if extra_samples:
+		entries.append((338, 3, extra_samples, 2))
+
+	def value(tag_type, val):
+		return struct.pack(bo + 'I', val) if tag_type == 4 else struct.pack(bo + 'H2x', val)
+
+	magic = b'II*\x00' if bo == '<' else b'MM\x00*'
+	return (
+		magic + struct.pack(bo + 'I', 8)
+		+ struct.pack(bo + 'H', len(entries))
+		+ b''.join(struct.pack(bo + 'HHI', tag, tag_type, count) + value(tag_type, val) for tag, tag_type, count, val in entries)
+		+ struct.pack(bo + 'I', 0)
+	)
+
+
+def mk_exr(data_window, channel_names):
+	def attr(name, attr_type, data):
+		return name + b'\x00' + attr_type + b'\x00' + struct.pack('<i', len(data)) + data
+
+	chlist = b''.join(name.encode() + b'\x00' + struct.pack('<iB3xii', 1, 0, 1, 1) for name in channel_names) + b'\x00'
+	return (
+		b'\x76\x2f\x31\x01' + struct.pack('<I', 2)
+		+ attr(b'compression', b'compression', b'\x00')
+		+ attr(b'channels', b'chlist', chlist)
+		+ attr(b'dataWindow', b'box2i', struct.pack('<iiii', *data_window))
+		+ b'\x00'
+	)
+
+
+def mk_hdr(res_line):
+	return b'#?RADIANCE\n# made by hand\nFORMAT=32-bit_rle_rgbe\n\n' + res_line + b'\n' + b'\x00' * 16
+
+
+def mk_tga(width, height, img_type, pixel_depth, descriptor=0, cmap_type=0, cmap_entry_size=0):
+	return struct.pack('<BBBHHBHHHHBB', 0, cmap_type, img_type, 0, 0, cmap_entry_size, 0, 0, width, height, pixel_depth, descriptor) + b'\x00' * 16
+
+
+
+
+# =========================================================
+#                          Probes
+# =========================================================
+
+@pytest.mark.parametrize('name, data, expected', (
+	# PNG
+	('gray.png', mk_png(7, 3, 0), info(7, 3, 1, False)),
+	('rgb.png', mk_png(640, 480, 2), info(640, 480, 3, False)),
+	('pal.png', mk_png(16, 16, 3, ((b'PLTE', b'\x00' * 6),)), info(16, 16, 3, False)),
+	('pal_trns.png', mk_png(16, 16, 3, ((b'PLTE', b'\x00' * 6), (b'tRNS', b'\x00\xff'))), info(16, 16, 4, True)),
+	('gray_trns.png', mk_png(16, 16, 0, ((b'tRNS', b'\x00\x00'),)), info(16, 16, 2, True)),
+	('gray_alpha.png', mk_png(5, 5, 4), info(5, 5, 2, True)),
+	('rgba.png', mk_png(4096, 2048, 6), info(4096, 2048, 4, True)),
+	# tRNS after IDAT doesn't count
+	('late_trns.png', mk_png(8, 8, 2)[:-12] + png_chunk(b'tRNS', b'\x00' * 6) + png_chunk(b'IEND', b''), info(8, 8, 3, False)),
+
+	# JPEG
+	('rgb.jpg', mk_jpeg(1920, 1080, 3), info(1920, 1080, 3, False)),
+	('gray.jpg', mk_jpeg(33, 17, 1), info(33, 17, 1, False)),
+	('progressive.jpg', mk_jpeg(300, 200, 3, sof=0xc2), info(300, 200, 3, False)),
+	('cmyk.jpg', mk_jpeg(10, 20, 4), info(10, 20, 4, False)),
+
+	# BMP
+	('rgb.bmp', mk_bmp(100, 50, 24), info(100, 50, 3, False)),
+	('top_down.bmp', mk_bmp(100, -50, 24), info(100, 50, 3, False)),
+	('pal.bmp', mk_bmp(9, 9, 8), info(9, 9, 3, False)),
+	('x8.bmp', mk_bmp(64, 64, 32, dib_size=108, compression=3), info(64, 64, 3, False)),
+	('v4_alpha.bmp', mk_bmp(64, 64, 32, dib_size=108, compression=3, a_mask=0xff000000), info(64, 64, 4, True)),
+	('v5_alpha.bmp', mk_bmp(64, 32, 32, dib_size=124, compression=3, a_mask=0xff000000), info(64, 32, 4, True)),
+	('alphabitfields.bmp', mk_bmp(12, 12, 32, compression=6), info(12, 12, 4, True)),
+	('os2.bmp', b'BM' + b'\x00' * 12 + struct.pack('<IHHHH', 12, 31, 17, 1, 24) + b'\x00' * 32, info(31, 17, 3, False)),
+
+	# GIF
+	('opaque.gif', mk_gif(320, 240, False), info(320, 240, 3, False)),
+	('transparent.gif', mk_gif(320, 240, True), info(320, 240, 4, True)),
+	('no_table.gif', mk_gif(2, 3, True, global_table=False), info(2, 3, 4, True)),
+
+	# DDS
+	('dxt1.dds', mk_dds(256, 128, 0x4, b'DXT1'), info(256, 128, 3, False)),
+	('dxt5.dds', mk_dds(256, 128, 0x4, b'DXT5'), info(256, 128, 4, True)),
+	('bc7.dds', mk_dds(512, 512, 0x4, b'DX10', dxgi_format=98), info(512, 512, 4, True)),
+	('bc1.dds', mk_dds(512, 512, 0x4, b'DX10', dxgi_format=71), info(512, 512, 4, True)),
+	('bc5.dds', mk_dds(512, 512, 0x4, b'DX10', dxgi_format=83), info(512, 512, 3, False)),
+	('bgra.dds', mk_dds(64, 64, 0x41, a_mask=0xff000000), info(64, 64, 4, True)),
+	('bgrx.dds', mk_dds(64, 64, 0x40), info(64, 64, 3, False)),
+	('lum_alpha.dds', mk_dds(64, 64, 0x20001, a_mask=0xff00), info(64, 64, 2, True)),
+	('alpha_only.dds', mk_dds(64, 64, 0x2, a_mask=0xff), info(64, 64, 1, True)),
+
+	# PSD / PSB
+	('rgb.psd', mk_psd(1024, 768, 3, 3), info(1024, 768, 3, False)),
+	('rgba.psd', mk_psd(1024, 768, 4, 3), info(1024, 768, 4, True)),
+	('gray.psd', mk_psd(10, 20, 1, 1), info(10, 20, 1, False)),
+	('gray_alpha.psd', mk_psd(10, 20, 2, 1), info(10, 20, 2, True)),
+	('cmyk.psd', mk_psd(10, 20, 4, 4), info(10, 20, 3, False)),
+	('cmyk_alpha.psd', mk_psd(10, 20, 5, 4), info(10, 20, 4, True)),
+	('big.psb', mk_psd(40000, 30000, 3, 3, version=2), info(40000, 30000, 3, False)),
+
+	# TIFF
+	('le.tif', mk_tiff(300, 200, '<', 3), info(300, 200, 3, False)),
+	('be.tif', mk_tiff(300, 200, '>', 3), info(300, 200, 3, False)),
+	('rgba.tif', mk_tiff(70000, 5, '<', 4, extra_samples=1, long_dims=True), info(70000, 5, 4, True)),
+	('rgba_be.tif', mk_tiff(64, 32, '>', 4, extra_samples=1), info(64, 32, 4, True)),
+	('gray.tif', mk_tiff(8, 8, '<', 1, photometric=1), info(8, 8, 1, False)),
+	('pal.tif', mk_tiff(8, 8, '>', 1, photometric=3), info(8, 8, 3, False)),
+
+	# EXR
+	('rgb.exr', mk_exr((0, 0, 1919, 1079), ('B', 'G', 'R')), info(1920, 1080, 3, False)),
+	('rgba.exr', mk_exr((0, 0, 63, 31), ('A', 'B', 'G', 'R')), info(64, 32, 4, True)),
+	('offset.exr', mk_exr((-10, 5, 9, 14), ('Y',)), info(20, 10, 1, False)),
+	('layers.exr', mk_exr((0, 0, 15, 15), ('diffuse.A', 'diffuse.B', 'diffuse.G', 'diffuse.R', 'depth.Z')), info(16, 16, 4, True)),
+
+	# Radiance HDR
+	('sky.hdr', mk_hdr(b'-Y 512 +X 1024'), info(1024, 512, 3, False)),
+	('rotated.hdr', mk_hdr(b'+X 256 -Y 128'), info(256, 128, 3, False)),
+
+	# TGA, only recognized by the extension
+	('rgb.tga', mk_tga(64, 32, 2, 24), info(64, 32, 3, False)),
+	('rgba.tga', mk_tga(64, 32, 2, 32, descriptor=0x28), info(64, 32, 4, True)),
+	('rle_rgba.tga', mk_tga(64, 32, 10, 32, descriptor=0x08), info(64, 32, 4, True)),
+	('gray.tga', mk_tga(16, 16, 3, 8), info(16, 16, 1, False)),
+	('gray_alpha.tga', mk_tga(16, 16, 11, 16, descriptor=0x08), info(16, 16, 2, True)),
+	('cmap.tga', mk_tga(16, 16, 1, 8, cmap_type=1, cmap_entry_size=24), info(16, 16, 3, False)),
+	('cmap_alpha.tga', mk_tga(16, 16, 1, 8, cmap_type=1, cmap_entry_size=32), info(16, 16, 4, True)),
+	('rgb555.vst', mk_tga(16, 16, 2, 16), info(16, 16, 3, False)),
+))
+def test_probe(tmp_path, name, data, expected):
+	assert blvtf_probe_img(write(tmp_path, name, data)) == expected
+
+
+@pytest.mark.parametrize('name, data', (
+	# unknown format
+	('notes.txt', b'hello there'),
+	('unknown.png', b'\x00' * 64),
+	# recognized, but broken
+	('truncated.png', mk_png(8, 8, 6)[:20]),
+	('bad_ihdr.png', mk_png(8, 8, 6).replace(b'IHDR', b'IHDX')),
+	('no_sof.jpg', b'\xff\xd8\xff\xda\x00\x02'),
+	('zero_width.bmp', mk_bmp(0, 16, 24)),
+	('truncated.dds', mk_dds(8, 8, 0x4, b'DXT1')[:100]),
+	('bad_version.psd', mk_psd(8, 8, 3, 3, version=3)),
+	('no_dims.tif', b'II*\x00' + struct.pack('<IH', 8, 0)),
+	('no_window.exr', b'\x76\x2f\x31\x01' + struct.pack('<I', 2) + b'\x00'),
+	('no_res.hdr', b'#?RADIANCE\n\n'),
+	# not a TGA at all, despite the extension
+	('bad_type.tga', mk_tga(8, 8, 5, 24)),
+	('bad_depth.tga', mk_tga(8, 8, 2, 12)),
+	('short.tga', b'\x00' * 10),
+))
+def test_probe_rejects(tmp_path, name, data):
+	assert blvtf_probe_img(write(tmp_path, name, data)) == None
+
+
+def test_probe_missing(tmp_path):
+	assert blvtf_probe_img(tmp_path / 'missing.png') == None
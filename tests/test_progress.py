@@ -0,0 +1,164 @@
+import threading, time
+
+import numpy as np
+import pytest
+
+from blvtf_core.progress import blvtf_progress_channel, blvtf_format_eta, blvtf_task_bytes
+
+
+# time.perf_counter, moved by hand
+@pytest.fixture
+def clock(monkeypatch):
+	now = [1000.0]
+	monkeypatch.setattr(time, 'perf_counter', lambda: now[0])
+	return now
+
+
+def test_counts(clock):
+	progress = blvtf_progress_channel()
+	progress.discover(3)
+	progress.discover()
+	snapshot = progress.drain()
+	assert (snapshot['total'], snapshot['done'], snapshot['scanning']) == (4, 0, True)
+
+	progress.update(2, skipped=1)
+	progress.update(1, failed=1)
+	snapshot = progress.drain()
+	assert (snapshot['done'], snapshot['skipped'], snapshot['failed']) == (3, 1, 1)
+	assert not snapshot['finished']
+
+	# known total up front
+	assert not blvtf_progress_channel(10).drain()['scanning']
+
+
+# No ETA while the walk could still find more, or before anything got done
+def test_eta(clock):
+	progress = blvtf_progress_channel()
+	progress.discover(10)
+	clock[0] += 2
+	progress.update(2, nbytes=2 * 1024 * 1024)
+	snapshot = progress.drain()
+	assert snapshot['tasks_per_sec'] == pytest.approx(1.0)
+	assert snapshot['mb_per_sec'] == pytest.approx(1.0)
+	assert snapshot['eta'] == None
+
+	progress.discovery_done()
+	snapshot = progress.drain()
+	assert snapshot['eta'] == pytest.approx(8.0)
+	assert snapshot['elapsed'] == pytest.approx(2.0)
+
+	assert blvtf_progress_channel(5).drain()['eta'] == None
+
+
+# Rates only look at the last window seconds
+def test_window(clock):
+	progress = blvtf_progress_channel(100, window=10)
+	clock[0] += 1
+	progress.update(50)
+	clock[0] += 29
+	progress.update(1)
+	clock[0] += 1
+
+	# 1 task over the 30s since the last sample older than the window
+	snapshot = progress.drain()
+	assert snapshot['tasks_per_sec'] == pytest.approx(1 / 30)
+
+	clock[0] += 5
+	progress.update(5)
+	snapshot = progress.drain()
+	assert snapshot['tasks_per_sec'] == pytest.approx(6 / 35)
+
+	# nothing got done in the last 10s
+	clock[0] += 11
+	snapshot = progress.drain()
+	assert snapshot['tasks_per_sec'] == 0
+	assert snapshot['eta'] == None
+
+
+def test_slowest(clock):
+	progress = blvtf_progress_channel(3)
+	first = [{'src': 'W:/src/rock.psd'}, {'src': 'W:/src/dirt.psd'}]
+	second = [{'src': 'W:/src/grass.tga'}]
+
+	progress.begin(first)
+	clock[0] += 1
+	progress.begin(second)
+	clock[0] += 2
+	assert progress.drain()['slowest'] == ('rock.psd +1', 3.0)
+
+	progress.update(2, first)
+	assert progress.drain()['slowest'] == ('grass.tga', 2.0)
+
+	progress.update(1, second)
+	assert progress.drain()['slowest'] == None
+
+
+def test_finish(clock):
+	progress = blvtf_progress_channel(3)
+	progress.begin([{'src': 'rock.psd'}])
+	progress.update(1, failed=1)
+	progress.finish()
+	snapshot = progress.drain()
+	assert snapshot['finished']
+	assert snapshot['failed'] == 1
+	assert snapshot['slowest'] == None
+
+	# the caller knows better
+	progress.finish(failed=2)
+	assert progress.drain()['failed'] == 2
+
+
+# Workers push from any thread, nothing gets lost
+def test_threads():
+	progress = blvtf_progress_channel()
+
+	def worker():
+		for task_idx in range(500):
+			progress.discover()
+			progress.update(1, skipped=task_idx % 2)
+
+	workers = [threading.Thread(target=worker) for worker_idx in range(8)]
+	for worker_thread in workers:
+		worker_thread.start()
+	while any(worker_thread.is_alive() for worker_thread in workers):
+		progress.drain()
+	for worker_thread in workers:
+		worker_thread.join()
+
+	snapshot = progress.drain()
+	assert (snapshot['total'], snapshot['done'], snapshot['skipped']) == (4000, 4000, 2000)
+
+
+def test_format_eta():
+	assert [blvtf_format_eta(seconds) for seconds in (None, 0, 12.5, 59.6, 125, 3600, 7384)] == ['?', '0s', '12s', '1m 00s', '2m 05s', '1h 00m', '2h 03m']
+
+
+def test_task_bytes(tmp_path):
+	(tmp_path / 'rock.tga').write_bytes(b'x' * 123)
+
+	assert blvtf_task_bytes({'src': tmp_path / 'rock.tga'}) == 123
+	assert blvtf_task_bytes({'src': tmp_path / 'rock.tga', 'src_pixels': np.zeros((4, 4, 4), dtype=np.uint8)}) == 64
+	assert blvtf_task_bytes({'src': tmp_path / 'missing.tga'}) == 0
+	assert blvtf_task_bytes({}) == 0
+
+
+# A batch reports everything it found and did
+def test_batch_progress(tmp_path, standin_shared, mk_tga):
+	from blvtf_core.batch import blvtf_iter_batch_tasks, blvtf_run_batch
+
+	for name in ('rock', 'dirt', 'grass'):
+		mk_tga(tmp_path / 'src' / f'{name}.tga')
+	(tmp_path / 'out').mkdir()
+	template = {
+		'enc': ('BGR888', 'BGRA8888'), 'mips': False, 'comp_refl': False, 'srgb': False, 'emb_alpha': False,
+		'channels': False, 'resize': False, 'clamp_dims': False, 'flags': (),
+	}
+
+	progress = blvtf_progress_channel()
+	tasks = blvtf_iter_batch_tasks(tmp_path / 'src', tmp_path / 'out', False, '*.tga', template)
+	stats = blvtf_run_batch(tasks, tmp_path / 'out', standin_shared, 2, progress=progress)
+	progress.finish(stats['failed'])
+
+	snapshot = progress.drain()
+	assert (snapshot['total'], snapshot['done'], snapshot['failed'], snapshot['scanning'], snapshot['finished']) == (3, 3, 0, False, True)
+	assert progress.bytes_done == 3 * (18 + 4 * 4 * 4)
@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from blvtf_core import resample
+from blvtf_core.resample import blvtf_resample, blvtf_mip_chain, blvtf_pow2, blvtf_pow2_dims, blvtf_resize_pow2, blvtf_resample_kernels, blvtf_resample_weights, blvtf_bessel_j1
+
+
+def noise(height, width, dtype=np.uint8, seed=0):
+	rng = np.random.default_rng(seed)
+	if dtype == np.uint8:
+		return rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+	return rng.random((height, width, 4), dtype=np.float32)
+
+
+# Weights of every kernel add up to 1: a flat image stays flat, both ways
+@pytest.mark.parametrize('filter_name', sorted(blvtf_resample_kernels))
+def test_flat_stays_flat(filter_name):
+	img = np.full((12, 20, 4), 77, dtype=np.uint8)
+
+	for out_w, out_h in ((5, 3), (20, 6), (64, 33)):
+		out = blvtf_resample(img, out_w, out_h, filter_name)
+		assert out.shape == (out_h, out_w, 4)
+		assert out.dtype == np.uint8
+		assert np.abs(out.astype(int) - 77).max() <= 1, (out_w, out_h)
+
+
+@pytest.mark.parametrize('filter_name', sorted(blvtf_resample_kernels))
+def test_weights_normalized(filter_name):
+	for in_size, out_size in ((64, 16), (16, 64), (7, 3)):
+		indices, weights = blvtf_resample_weights(in_size, out_size, filter_name)
+		assert indices.shape == weights.shape
+		assert indices.min() >= 0 and indices.max() < in_size
+		assert np.allclose(weights.sum(axis=1), 1.0, atol=1e-5)
+
+
+# Every kernel peaks at the center
+def test_kernels_peak():
+	x = np.linspace(-4, 4, 161)
+	for filter_name, (kernel, support) in blvtf_resample_kernels.items():
+		if kernel:
+			assert np.isclose(kernel(x).max(), kernel(np.zeros(1))[0]), filter_name
+
+
+def test_bessel_j1():
+	# reference values of J1
+	assert np.allclose(blvtf_bessel_j1([0.0, 1.0, -1.0, 5.0, 10.0]), [0.0, 0.4400505857, -0.4400505857, -0.3275791376, 0.0434727462], atol=1e-7)
+
+
+def test_box_halves():
+	img = np.array([[[0, 10, 20, 30], [100, 110, 120, 130]], [[40, 50, 60, 70], [200, 210, 220, 230]]], dtype=np.uint8)
+
+	assert blvtf_resample(img, 1, 1, 'BOX').tolist() == [[[85, 95, 105, 115]]]
+
+
+def test_point():
+	img = noise(8, 8)
+	assert np.array_equal(blvtf_resample(img, 4, 4, 'POINT'), img[1::2, 1::2])
+	assert np.array_equal(blvtf_resample(img, 16, 16, 'POINT'), img.repeat(2, axis=0).repeat(2, axis=1))
+
+
+def test_same_size_untouched():
+	img = noise(8, 8)
+	assert blvtf_resample(img, 8, 8, 'CUBIC') is img
+
+
+# Averaging happens in linear light, alpha stays linear
+def test_srgb():
+	img = np.zeros((1, 2, 4), dtype=np.uint8)
+	img[0, 1] = 255
+
+	assert blvtf_resample(img, 1, 1, 'BOX').tolist() == [[[128, 128, 128, 128]]]
+	assert blvtf_resample(img, 1, 1, 'BOX', srgb=True).tolist() == [[[188, 188, 188, 128]]]
+
+
+# Strips only bound the memory, the result is the same
+def test_strip_size(monkeypatch):
+	img = noise(50, 30)
+	expected = blvtf_resample(img, 17, 23, 'CATROM')
+
+	monkeypatch.setattr(resample, 'blvtf_resample_strip', 4)
+	assert np.array_equal(blvtf_resample(img, 17, 23, 'CATROM'), expected)
+
+
+@pytest.mark.parametrize('dtype', (np.uint8, np.uint16, np.float32))
+def test_dtypes(dtype):
+	img = (noise(8, 8, np.float32) * (65535 if dtype == np.uint16 else 1)).astype(dtype)
+
+	out = blvtf_resample(img, 4, 4, 'BOX')
+	assert out.dtype == dtype
+	if dtype == np.float32:
+		assert np.allclose(out, img.reshape(4, 2, 4, 2, 4).mean(axis=(1, 3)), atol=1e-6)
+
+
+def test_mip_chain():
+	img = noise(16, 64)
+	mips = blvtf_mip_chain(img, 'KAISER')
+
+	assert [mip.shape[:2] for mip in mips] == [(16, 64), (8, 32), (4, 16), (2, 8), (1, 4), (1, 2), (1, 1)]
+	assert mips[0] is img
+	assert all(mip.dtype == np.uint8 for mip in mips)
+
+	# BOX of BOX is the mean
+	mips = blvtf_mip_chain(noise(8, 8, np.float32), 'BOX')
+	assert np.allclose(mips[-1], mips[0].mean(axis=(0, 1)), atol=1e-6)
+
+
+def test_pow2():
+	assert [blvtf_pow2(size) for size in (1, 2, 3, 5, 6, 7, 12, 96, 100, 1024)] == [1, 2, 4, 4, 8, 8, 16, 128, 128, 1024]
+	assert [blvtf_pow2(size, 'BIGGEST') for size in (1, 3, 5, 64, 65)] == [1, 4, 8, 64, 128]
+	assert [blvtf_pow2(size, 'SMALLEST') for size in (1, 3, 7, 64, 127)] == [1, 2, 4, 64, 64]
+
+
+# Clamps halve, so the result stays a power of 2 even with clamps which aren't
+def test_pow2_dims():
+	assert blvtf_pow2_dims(1000, 300) == (1024, 256)
+	assert blvtf_pow2_dims(1000, 300, 'SMALLEST') == (512, 256)
+	assert blvtf_pow2_dims(4096, 2048, 'NEAREST', (1024, 1024)) == (1024, 1024)
+	assert blvtf_pow2_dims(4096, 2048, 'NEAREST', (1000, 300)) == (512, 256)
+	assert blvtf_pow2_dims(4, 4, 'NEAREST', (0, 0)) == (1, 1)
+
+
+def test_resize_pow2():
+	img = noise(48, 100)
+
+	out = blvtf_resize_pow2(img, 'NEAREST', 'CUBIC')
+	assert out.shape == (64, 128, 4)
+	assert out.dtype == np.uint8
+
+	assert blvtf_resize_pow2(img, 'SMALLEST', 'CUBIC', (32, 32)).shape == (32, 32, 4)
+	assert blvtf_resize_pow2(img, 'BIGGEST', 'CUBIC', (64, 64)).shape == (64, 64, 4)
+
+	# already a power of 2 within the clamps
+	img = noise(32, 64)
+	assert blvtf_resize_pow2(img, 'NEAREST', 'CUBIC', (64, 64)) is img
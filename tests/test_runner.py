@@ -0,0 +1,103 @@
+import sys
+import time
+
+import pytest
+
+from blvtf_core import runner
+from blvtf_core.runner import blvtf_run, blvtf_run_error, blvtf_ring_buffer
+
+
+def py(code):
+	return [sys.executable, '-c', code]
+
+
+@pytest.fixture
+def quick_stage(monkeypatch):
+	monkeypatch.setitem(runner.blvtf_run_timeouts, 'test', 1)
+	monkeypatch.setitem(runner.blvtf_run_retries, 'test', 0)
+	return 'test'
+
+
+def test_ring_buffer_keeps_tail():
+	ring = blvtf_ring_buffer(8)
+	ring.write(b'0123')
+	ring.write(b'456789abcdef')
+
+	assert bytes(ring.buf) == b'89abcdef'
+	assert ring.total == 16
+	assert ring.text() == '[8 bytes skipped] ...89abcdef'
+
+
+def test_output_and_exit_code(quick_stage):
+	result = blvtf_run(py('import sys; print("out"); print("err", file=sys.stderr)'), quick_stage)
+
+	assert result.returncode == 0
+	assert result.attempts == 1
+	assert result.out == None
+	assert result.echo() == 'out\nerr'
+
+
+def test_nonzero_exit_raises(quick_stage):
+	with pytest.raises(blvtf_run_error) as e:
+		blvtf_run(py('import sys; print("broken", file=sys.stderr); sys.exit(3)'), quick_stage)
+
+	assert not e.value.transient
+	assert e.value.result.returncode == 3
+	assert 'exited with 3: broken' in str(e.value)
+
+	result = blvtf_run(py('import sys; sys.exit(3)'), quick_stage, check=False)
+	assert result.returncode == 3
+
+
+def test_stdin_and_read_stdout(quick_stage):
+	data = bytes(range(256)) * 4096
+
+	result = blvtf_run(
+		py('import sys; sys.stdout.buffer.write(sys.stdin.buffer.read()[::-1])'),
+		quick_stage,
+		stdin_data=data,
+		read_stdout=lambda pipe: pipe.read(),
+	)
+
+	assert result.out == data[::-1]
+	assert result.out_ring == None
+
+
+def test_missing_executable_is_not_retried(quick_stage, tmp_path):
+	with pytest.raises(blvtf_run_error) as e:
+		blvtf_run([tmp_path / 'nothing_here'], quick_stage, retries=3)
+
+	assert not e.value.transient
+	assert 'could not start' in str(e.value)
+
+
+def test_timeout_is_retried(monkeypatch, quick_stage, capsys):
+	monkeypatch.setitem(runner.blvtf_run_timeouts, 'test', 0.3)
+
+	with pytest.raises(blvtf_run_error) as e:
+		blvtf_run(py('import time; time.sleep(30)'), quick_stage, retries=1)
+
+	assert e.value.transient
+	assert 'did not finish in 0.3s' in str(e.value)
+	assert 'retrying (1/1)' in capsys.readouterr().out
+
+
+def test_timeout_scale(monkeypatch, quick_stage):
+	monkeypatch.setitem(runner.blvtf_run_timeouts, 'test', 0.2)
+
+	result = blvtf_run(py('import time; time.sleep(0.5)'), quick_stage, timeout_scale=10)
+	assert result.returncode == 0
+
+
+# Wine runs the tool as a grandchild which inherits the pipes.
+# Killing only the direct child would leave the run waiting for the grandchild
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs sh')
+def test_timeout_kills_grandchildren(monkeypatch, quick_stage):
+	monkeypatch.setitem(runner.blvtf_run_timeouts, 'test', 0.3)
+
+	started = time.perf_counter()
+	with pytest.raises(blvtf_run_error) as e:
+		blvtf_run(['sh', '-c', 'sleep 30 & wait'], quick_stage)
+
+	assert e.value.transient
+	assert time.perf_counter() - started < 10
@@ -0,0 +1,144 @@
+import os, sys
+
+import pytest
+
+from blvtf_core.scan import blvtf_walk_files, blvtf_glob_to_re, blvtf_glob_literal_ext, blvtf_glob_matcher, blvtf_walk_depth
+from blvtf_core.txtmax import blvtf_compile_txtmax
+from blvtf_core.batch import blvtf_iter_batch_tasks
+from blvtf_core.manifest import blvtf_manifest_name
+
+
+def mk_tree(root, *rel_paths):
+	for rel_path in rel_paths:
+		filepath = root / rel_path
+		filepath.parent.mkdir(parents=True, exist_ok=True)
+		filepath.write_bytes(b'')
+	return root
+
+
+def walk(root, max_depth=None):
+	return sorted('/'.join(rel_parts) for rel_parts, filepath in blvtf_walk_files(root, max_depth))
+
+
+def test_walk(tmp_path):
+	mk_tree(tmp_path, 'rock.tga', 'props/crate.psd', 'props/wood/plank.png', 'props/wood/old/nail.tga')
+	(tmp_path / 'empty').mkdir()
+
+	assert walk(tmp_path) == ['props/crate.psd', 'props/wood/old/nail.tga', 'props/wood/plank.png', 'rock.tga']
+	assert walk(tmp_path, 0) == ['rock.tga']
+	assert walk(tmp_path, 1) == ['props/crate.psd', 'rock.tga']
+
+	for rel_parts, filepath in blvtf_walk_files(tmp_path):
+		assert filepath == str(tmp_path.joinpath(*rel_parts))
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='symlinks need privileges')
+def test_walk_skips_symlinked_folders(tmp_path):
+	mk_tree(tmp_path, 'props/crate.psd')
+	# would loop forever if followed
+	os.symlink(tmp_path, tmp_path / 'props' / 'loop')
+
+	assert walk(tmp_path) == ['props/crate.psd']
+
+
+def test_walk_missing_folder(tmp_path):
+	assert walk(tmp_path / 'nothing') == []
+
+
+def matches(pattern, rel_path, recursive=False):
+	return blvtf_glob_matcher([pattern], recursive).match(tuple(rel_path.split('/'))) == 0
+
+
+# Same as Path.glob / Path.rglob
+def test_glob_semantics():
+	assert matches('*.tga', 'rock.tga')
+	assert not matches('*.tga', 'props/rock.tga')
+	assert matches('*.tga', 'props/rock.tga', True)
+
+	assert matches('props/*.tga', 'props/rock.tga')
+	assert not matches('props/*.tga', 'world/props/rock.tga')
+	assert matches('props/*.tga', 'world/props/rock.tga', True)
+
+	# wildcards never cross folders
+	assert not matches('props*.tga', 'props/rock.tga')
+	assert not matches('props?rock.tga', 'props/rock.tga')
+
+	assert matches('rock_[0-9].tga', 'rock_3.tga')
+	assert not matches('rock_[!0-9].tga', 'rock_3.tga')
+	assert matches('rock_[!0-9].tga', 'rock_a.tga')
+	assert matches('rock[.tga', 'rock[.tga')
+
+
+def test_double_star():
+	assert blvtf_glob_to_re('props/**/*.psd', False) == 'props/(?:[^/]*/)*[^/]*\\.psd'
+
+	assert matches('props/**/*.psd', 'props/crate.psd')
+	assert matches('props/**/*.psd', 'props/wood/old/crate.psd')
+	assert not matches('props/**/*.psd', 'world/props/crate.psd')
+	assert not matches('props/**/*.psd', 'world/props/crate.psd', True)
+
+	assert matches('props/**', 'props/wood/crate.psd')
+	assert matches('**/*.psd', 'crate.psd')
+
+
+def test_literal_ext():
+	assert blvtf_glob_literal_ext('rock_*.PSD') == 'psd'
+	assert blvtf_glob_literal_ext('props/**/*.tga') == 'tga'
+	assert blvtf_glob_literal_ext('*.*') == None
+	assert blvtf_glob_literal_ext('*.t?a') == None
+	assert blvtf_glob_literal_ext('rock*') == None
+	assert blvtf_glob_literal_ext('props/**') == None
+
+
+# Rules of different extensions and any extension mix in a single matcher, the last one wins
+def test_matcher_last_rule_wins():
+	matcher = blvtf_glob_matcher(['*.tga', '*_n.*', 'rock*.tga', '*.png'], False)
+
+	assert matcher.match(('grass.tga',)) == 0
+	assert matcher.match(('grass_n.tga',)) == 1
+	assert matcher.match(('rock_n.tga',)) == 2
+	assert matcher.match(('rock_n.png',)) == 3
+	assert matcher.match(('rock_n.psd',)) == 1
+	assert matcher.match(('rock',)) == None
+	assert matcher.match(('sub', 'rock.tga')) == None
+
+
+def test_walk_depth():
+	assert blvtf_walk_depth() == 0
+	assert blvtf_walk_depth(blvtf_glob_matcher(['*.tga'], False)) == 0
+	assert blvtf_walk_depth(blvtf_glob_matcher(['*.tga', 'a/b/*.tga'], False), blvtf_glob_matcher(['a/*.png'], False)) == 2
+	assert blvtf_walk_depth(blvtf_glob_matcher(['*.tga'], False), blvtf_glob_matcher(['a/**/*.png'], False)) == None
+	assert blvtf_walk_depth(blvtf_glob_matcher(['*.tga'], True)) == None
+
+
+def iter_tasks(tmp_path, recursive, batch_pattern, txtmax_text=None):
+	txtmax = blvtf_compile_txtmax(txtmax_text, ('NORMAL',), recursive) if txtmax_text else None
+	txtmax_templates = {rule['pattern']: {'enc': rule['format']} for rule in txtmax.rules} if txtmax else None
+
+	return {
+		task['src'].relative_to(tmp_path / 'src').as_posix(): (task['enc'], task['dest'].relative_to(tmp_path / 'out').as_posix())
+		for task in blvtf_iter_batch_tasks(tmp_path / 'src', tmp_path / 'out', recursive, batch_pattern, {'enc': 'batch'} if batch_pattern else None, txtmax, txtmax_templates)
+	}
+
+
+# A single walk serves TxtMax and the fallback: TxtMax takes what it matches, the main batch the rest
+def test_batch_tasks(tmp_path):
+	mk_tree(tmp_path / 'src', 'rock.tga', 'rock.psd', 'rock_n.psd', 'props/crate.psd', 'props/crate.tga', blvtf_manifest_name)
+
+	assert iter_tasks(tmp_path, False, '*.psd', '*_n.psd DXT5\nprops/*.tga DXT1\n') == {
+		'rock_n.psd': ('DXT5', 'rock_n.vtf'),
+		'rock.psd': ('batch', 'rock.vtf'),
+		# the walk went one folder deep for the TxtMax rule
+		'props/crate.tga': ('DXT1', 'props/crate.vtf'),
+	}
+
+	assert iter_tasks(tmp_path, True, '*.psd') == {
+		'rock.psd': ('batch', 'rock.vtf'),
+		'rock_n.psd': ('batch', 'rock_n.vtf'),
+		'props/crate.psd': ('batch', 'props/crate.vtf'),
+	}
+
+	# the build manifest is never a task
+	assert not blvtf_manifest_name in iter_tasks(tmp_path, False, '*')
+	# main batch disabled
+	assert iter_tasks(tmp_path, False, None, '*.tga BGR888\n') == {'rock.tga': ('BGR888', 'rock.vtf')}
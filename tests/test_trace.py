@@ -0,0 +1,126 @@
+import io, json, sys
+
+import pytest
+
+from blvtf_core.trace import blvtf_trace, blvtf_trace_stage, blvtf_load_trace, blvtf_trace_summary, blvtf_print_trace_summary, main
+from blvtf_core.runner import blvtf_run
+
+
+def read_records(trace_path):
+	return [json.loads(line) for line in trace_path.read_text().splitlines()]
+
+
+def test_stage_record(tmp_path):
+	src = tmp_path / 'rock.tga'
+	src.write_bytes(b'x' * 100)
+	dest = tmp_path / 'rock.vtf'
+
+	with blvtf_trace(tmp_path / 'trace' / 'trace.jsonl') as tracer:
+		with tracer.stage('encode', src, 'DXT1') as stage:
+			stage.read_files(src, None, False)
+			dest.write_bytes(b'y' * 30)
+			stage.wrote_files(dest, tmp_path / 'missing.vtf')
+		with blvtf_trace_stage(tracer, 'vtfcmd', [src, dest], None, 2):
+			pass
+
+	encode, vtfcmd = read_records(tmp_path / 'trace' / 'trace.jsonl')
+	assert encode['run'] == tracer.run_id == vtfcmd['run']
+	assert (encode['stage'], encode['src'], encode['format'], encode['tasks']) == ('encode', str(src), 'DXT1', 1)
+	assert (encode['read'], encode['written'], encode['ok']) == (100, 30, True)
+	assert encode['wall'] >= 0 and encode['cpu'] >= 0 and encode['t'] >= 0
+	assert vtfcmd['src'] == [str(src), str(dest)]
+	assert vtfcmd['tasks'] == 2
+
+
+def test_failed_stages(tmp_path):
+	with blvtf_trace(tmp_path / 'trace.jsonl') as tracer:
+		with pytest.raises(ValueError):
+			with tracer.stage('decode', 'rock.psd'):
+				raise ValueError('broken')
+		with tracer.stage('to_tga', 'rock.psd') as stage:
+			stage.ok = False
+
+	assert [record['ok'] for record in read_records(tmp_path / 'trace.jsonl')] == [False, False]
+
+
+# Without a tracer the stages cost nothing and write nothing
+def test_no_tracer(tmp_path):
+	src = tmp_path / 'rock.tga'
+	src.write_bytes(b'x')
+	with blvtf_trace_stage(None, 'encode', src) as stage:
+		stage.read_files(src)
+
+	assert stage.read == 0
+	assert list(tmp_path.iterdir()) == [src]
+
+
+# CPU time of the external processes goes to the stage which started them
+@pytest.mark.skipif(sys.platform == 'win32', reason='CPU time of children comes from wait4')
+def test_child_usage(tmp_path):
+	with blvtf_trace(tmp_path / 'trace.jsonl') as tracer:
+		with tracer.stage('vtfcmd'):
+			blvtf_run([sys.executable, '-c', 'sum(range(3000000))'], 'test')
+		with tracer.stage('move'):
+			pass
+
+	vtfcmd, move = read_records(tmp_path / 'trace.jsonl')
+	assert vtfcmd['child_cpu'] > 0
+	assert vtfcmd['child_peak_rss'] > 0
+	assert (move['child_cpu'], move['child_peak_rss']) == (0, 0)
+
+
+def mk_record(run, stage, wall, vtf_format=None, tasks=1, ok=True):
+	return {
+		'run': run, 'stage': stage, 'src': None, 'tasks': tasks, 'format': vtf_format, 't': 0, 'wall': wall,
+		'cpu': 0.1, 'child_cpu': 0.2, 'read': 10, 'written': 5, 'peak_rss': 100, 'child_peak_rss': None, 'ok': ok,
+	}
+
+
+def write_trace(trace_path, records):
+	trace_path.write_text(''.join(json.dumps(record) + '\n' for record in records) + '{"run": "killed mid-wri')
+
+
+def test_load_runs(tmp_path):
+	write_trace(tmp_path / 'trace.jsonl', [mk_record('a', 'encode', 1), mk_record('b', 'encode', 2), mk_record('b', 'move', 3)])
+
+	assert [record['wall'] for record in blvtf_load_trace(tmp_path / 'trace.jsonl')] == [2, 3]
+	assert [record['wall'] for record in blvtf_load_trace(tmp_path / 'trace.jsonl', 'a')] == [1]
+	assert len(blvtf_load_trace(tmp_path / 'trace.jsonl', 'all')) == 3
+
+	(tmp_path / 'empty.jsonl').write_text('')
+	assert blvtf_load_trace(tmp_path / 'empty.jsonl') == []
+
+
+def test_summary():
+	records = [mk_record('a', 'encode', wall, 'DXT1') for wall in (0.1, 0.2, 0.3, 0.4)]
+	records.append(mk_record('a', 'encode', 0.5, 'BGR888', ok=False))
+	# a VTFCmd run of 4 tasks counts as 4 tasks of 1s each
+	records.append(mk_record('a', 'vtfcmd', 4.0, 'DXT1', tasks=4))
+
+	summary = blvtf_trace_summary(records)
+	encode = summary[('encode', None)]
+	assert (encode['count'], encode['tasks'], encode['failed']) == (5, 5, 1)
+	assert encode['wall'] == pytest.approx(1.5)
+	assert encode['cpu'] == pytest.approx(1.5)
+	assert (encode['read'], encode['written'], encode['peak_rss'], encode['child_peak_rss']) == (50, 25, 100, 0)
+	assert encode['percentiles'][50] == pytest.approx(0.3)
+	assert encode['max'] == pytest.approx(0.5)
+	assert summary[('vtfcmd', None)]['max'] == pytest.approx(1.0)
+
+	assert sorted(blvtf_trace_summary(records, by_format=True)) == [('encode', 'BGR888'), ('encode', 'DXT1'), ('vtfcmd', 'DXT1')]
+
+	out = io.StringIO()
+	blvtf_print_trace_summary(summary, out)
+	lines = out.getvalue().splitlines()
+	assert lines[0].split()[:4] == ['stage', 'format', 'tasks', 'failed']
+	# slowest first
+	assert [line.split()[0] for line in lines[1:]] == ['vtfcmd', 'encode']
+
+
+def test_main(tmp_path, capsys):
+	write_trace(tmp_path / 'trace.jsonl', [mk_record('a', 'encode', 1, 'DXT1')])
+	assert main([str(tmp_path / 'trace.jsonl')]) == 0
+	assert 'Per stage and format:' in capsys.readouterr().out
+
+	(tmp_path / 'empty.jsonl').write_text('')
+	assert main([str(tmp_path / 'empty.jsonl')]) == 1
@@ -0,0 +1,118 @@
+import pytest
+
+from blvtf_core.txtmax import blvtf_parse_txtmax, blvtf_compile_txtmax
+
+
+known_flags = ('NOMIP', 'NORMAL', 'CLAMPS', 'CLAMPT', 'POINTSAMPLE')
+
+
+def rule_format(txtmax, rel_path):
+	rule = txtmax.match(tuple(rel_path.split('/')))
+	return rule['format'] if rule else None
+
+
+def test_parse_rule():
+	rules = blvtf_parse_txtmax('# comment\n\n*_normal.psd  BGR888\t1024x*  @brick  -nomip,Normal,srgb,bogus\n', known_flags)
+
+	assert rules == [{
+		'pattern': '*_normal.psd',
+		'format': 'BGR888',
+		'sclamp': (1024, None),
+		'flags': ('NOMIP', 'NORMAL'),
+		'srgb': True,
+		'vmt_preset': 'brick',
+	}]
+
+
+def test_parse_wildcards():
+	rule = blvtf_parse_txtmax('*.tga * -*', known_flags)[0]
+
+	assert rule['format'] == None
+	assert rule['flags'] == None
+	assert rule['sclamp'] == False
+
+
+# A 2-token rule still gets its flags
+def test_parse_two_tokens():
+	rule = blvtf_parse_txtmax('*.tga -nomip,srgb', known_flags)[0]
+	assert rule['flags'] == ('NOMIP',)
+	assert rule['srgb'] == True
+
+	rule = blvtf_parse_txtmax('*.tga -*', known_flags)[0]
+	assert rule['flags'] == None
+
+	rule = blvtf_parse_txtmax('*.tga DXT5', known_flags)[0]
+	assert (rule['format'], rule['flags'], rule['srgb']) == ('DXT5', (), False)
+
+
+# A VMT preset after the size clamp is kept
+def test_parse_clamp_then_preset():
+	rule = blvtf_parse_txtmax('*.psd DXT1 512x* @brick', known_flags)[0]
+	assert (rule['sclamp'], rule['vmt_preset']) == ((512, None), 'brick')
+
+
+def test_duplicate_pattern_keeps_position():
+	rules = blvtf_parse_txtmax('*.tga DXT1\n*.psd DXT5\n*.tga BGR888\n', known_flags)
+
+	assert [(rule['pattern'], rule['format']) for rule in rules] == [('*.tga', 'BGR888'), ('*.psd', 'DXT5')]
+
+
+# The last rule which matches wins
+@pytest.mark.parametrize('recursive', (False, True))
+def test_last_rule_wins(recursive):
+	txtmax = blvtf_compile_txtmax('*.tga DXT1\n*_normal.tga BGR888\n', known_flags, recursive)
+	assert rule_format(txtmax, 'rock_normal.tga') == 'BGR888'
+	assert rule_format(txtmax, 'rock.tga') == 'DXT1'
+
+	txtmax = blvtf_compile_txtmax('*_normal.tga BGR888\n*.tga DXT1\n', known_flags, recursive)
+	assert rule_format(txtmax, 'rock_normal.tga') == 'DXT1'
+
+
+# Rules without a literal extension are matched against every file
+def test_last_rule_wins_any_ext():
+	txtmax = blvtf_compile_txtmax('*.tga DXT1\nrock* DXT5\n', known_flags, False)
+
+	assert rule_format(txtmax, 'rock.tga') == 'DXT5'
+	assert rule_format(txtmax, 'rock.png') == 'DXT5'
+	assert rule_format(txtmax, 'stone.tga') == 'DXT1'
+	assert rule_format(txtmax, 'stone.png') == None
+
+
+# ** is any amount of folders, none included
+def test_double_star():
+	txtmax = blvtf_compile_txtmax('props/**/*.psd DXT5\n', known_flags, False)
+
+	assert rule_format(txtmax, 'props/crate.psd') == 'DXT5'
+	assert rule_format(txtmax, 'props/wood/crate.psd') == 'DXT5'
+	assert rule_format(txtmax, 'props/wood/old/crate.psd') == 'DXT5'
+	assert rule_format(txtmax, 'props/crate.tga') == None
+	assert rule_format(txtmax, 'world/props/crate.psd') == None
+	assert txtmax.matcher.depth == None
+
+
+def test_double_star_last_rule_wins():
+	txtmax = blvtf_compile_txtmax('**/*.psd DXT1\nprops/**/*.psd DXT5\n', known_flags, False)
+
+	assert rule_format(txtmax, 'crate.psd') == 'DXT1'
+	assert rule_format(txtmax, 'world/crate.psd') == 'DXT1'
+	assert rule_format(txtmax, 'props/crate.psd') == 'DXT5'
+	assert rule_format(txtmax, 'props/wood/crate.psd') == 'DXT5'
+
+
+# Without recursion, patterns only reach as deep as their own folders
+def test_recursive():
+	txtmax = blvtf_compile_txtmax('*.tga DXT1\n', known_flags, False)
+	assert rule_format(txtmax, 'rock.tga') == 'DXT1'
+	assert rule_format(txtmax, 'sub/rock.tga') == None
+	assert txtmax.matcher.depth == 0
+
+	txtmax = blvtf_compile_txtmax('*.tga DXT1\n', known_flags, True)
+	assert rule_format(txtmax, 'sub/rock.tga') == 'DXT1'
+	assert txtmax.matcher.depth == None
+
+
+def test_compile_cache():
+	txtmax_text = '*.tga DXT1\n'
+
+	assert blvtf_compile_txtmax(txtmax_text, known_flags, False) is blvtf_compile_txtmax(txtmax_text, known_flags, False)
+	assert blvtf_compile_txtmax(txtmax_text, known_flags, False) is not blvtf_compile_txtmax(txtmax_text, known_flags, True)
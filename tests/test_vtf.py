@@ -0,0 +1,200 @@
+import struct
+
+import numpy as np
+import pytest
+
+from blvtf_core.vtf import blvtf_build_vtf, blvtf_vtf_image_size, blvtf_thumb_dims, blvtf_vtf_image_formats, blvtf_vtf_flag_bits, blvtf_reflectivity
+from blvtf_core.resample import blvtf_srgb_to_linear_lut
+
+
+def mk_rgba(width, height, alpha=255):
+	rgba = np.zeros((height, width, 4), dtype=np.uint8)
+	rgba[..., 0] = 200
+	rgba[..., 1] = 100
+	rgba[..., 2] = 50
+	rgba[..., 3] = alpha
+	return rgba
+
+
+# Fields every version shares, at the offsets VTFLib / the engine read them from
+def read_base_header(vtf):
+	return {
+		'signature': vtf[0:4],
+		'version': struct.unpack('<II', vtf[4:12]),
+		'header_size': struct.unpack('<I', vtf[12:16])[0],
+		'width': struct.unpack('<H', vtf[16:18])[0],
+		'height': struct.unpack('<H', vtf[18:20])[0],
+		'flags': struct.unpack('<I', vtf[20:24])[0],
+		'frames': struct.unpack('<H', vtf[24:26])[0],
+		'first_frame': struct.unpack('<H', vtf[26:28])[0],
+		'reflectivity': struct.unpack('<3f', vtf[32:44]),
+		'bumpscale': struct.unpack('<f', vtf[48:52])[0],
+		'format': struct.unpack('<i', vtf[52:56])[0],
+		'mip_count': vtf[56],
+		'thumb_format': struct.unpack('<i', vtf[57:61])[0],
+		'thumb_width': vtf[61],
+		'thumb_height': vtf[62],
+	}
+
+
+# (tag, flags, offset or inline data) of every 7.3+ resource entry
+def read_resources(vtf):
+	rsrc_count = struct.unpack('<I', vtf[68:72])[0]
+	return [struct.unpack('<3sBI', vtf[80 + idx * 8:88 + idx * 8]) for idx in range(rsrc_count)]
+
+
+@pytest.mark.parametrize('version, header_size', (
+	('7.1', 64),
+	('7.2', 80),
+	('7.3', 80 + 8 * 2),
+	('7.4', 80 + 8 * 2),
+	('7.5', 80 + 8 * 2),
+))
+def test_header_fields(version, header_size):
+	vtf = blvtf_build_vtf(mk_rgba(32, 16), 'DXT1', version=version, mips=False, reflectivity=False)
+	header = read_base_header(vtf)
+
+	assert header['signature'] == b'VTF\x00'
+	assert header['version'] == (7, int(version[-1]))
+	assert header['header_size'] == header_size
+	assert (header['width'], header['height']) == (32, 16)
+	assert header['flags'] == 0
+	assert (header['frames'], header['first_frame']) == (1, 0)
+	assert header['reflectivity'] == (0.0, 0.0, 0.0)
+	assert header['bumpscale'] == 1.0
+	assert header['format'] == blvtf_vtf_image_formats['DXT1'] == 13
+	assert header['mip_count'] == 1
+	assert header['thumb_format'] == 13
+	assert (header['thumb_width'], header['thumb_height']) == (16, 8)
+
+	# depth, 7.2+
+	if version != '7.1':
+		assert struct.unpack('<H', vtf[63:65])[0] == 1
+
+	# thumbnail (16x8 DXT1) + image (32x16 DXT1)
+	assert len(vtf) == header_size + 64 + 256
+
+
+@pytest.mark.parametrize('version', ('7.1', '7.2'))
+def test_old_versions_data_after_header(version):
+	rgba = mk_rgba(8, 8)
+	vtf = blvtf_build_vtf(rgba, 'RGBA8888', version=version, mips=False, thumbnail=False, reflectivity=False)
+	header_size = read_base_header(vtf)['header_size']
+
+	assert read_base_header(vtf)['thumb_format'] == -1
+	assert vtf[header_size:] == rgba.tobytes()
+
+
+def test_resource_order():
+	vtf = blvtf_build_vtf(
+		mk_rgba(16, 16),
+		'RGBA8888',
+		version='7.5',
+		mips=False,
+		reflectivity=False,
+		resources={
+			'kvd': 'key value',
+			'tso': 7,
+			'lod': (3, 4),
+			'crc': 0x12345678,
+		},
+	)
+
+	header_size = read_base_header(vtf)['header_size']
+	assert header_size == 80 + 8 * 6
+
+	resources = read_resources(vtf)
+	assert [tag for tag, rsrc_flags, rsrc_data in resources] == [b'CRC', b'KVD', b'LOD', b'TSO', b'\x01\x00\x00', b'\x30\x00\x00']
+
+	# CRC, LOD and TSO go inline
+	assert resources[0] == (b'CRC', 0x02, 0x12345678)
+	assert resources[2] == (b'LOD', 0x02, struct.unpack('<I', bytes((3, 4, 0, 0)))[0])
+	assert resources[3] == (b'TSO', 0x02, 7)
+
+	# KVD, thumbnail and image data follow the header, in that order
+	kvd_offset, thumb_offset, image_offset = (resources[idx][2] for idx in (1, 4, 5))
+	assert kvd_offset == header_size
+	assert vtf[kvd_offset:kvd_offset + 4 + 9] == struct.pack('<I', 9) + b'key value'
+	assert thumb_offset == kvd_offset + 4 + 9
+	assert image_offset == thumb_offset + 128
+	assert len(vtf) == image_offset + 16 * 16 * 4
+
+
+def test_no_thumbnail_resource():
+	vtf = blvtf_build_vtf(mk_rgba(4, 4), 'BGR888', version='7.4', mips=False, thumbnail=False)
+
+	assert read_base_header(vtf)['header_size'] == 88
+	assert [tag for tag, rsrc_flags, rsrc_data in read_resources(vtf)] == [b'\x30\x00\x00']
+
+
+def test_mips_smallest_first():
+	vtf = blvtf_build_vtf(mk_rgba(16, 8), 'RGBA8888', version='7.2', thumbnail=False, reflectivity=False)
+	header = read_base_header(vtf)
+
+	# 16x8, 8x4, 4x2, 2x1, 1x1
+	assert header['mip_count'] == 5
+	assert len(vtf) == 80 + 4 * (1 + 2 + 8 + 32 + 128)
+
+
+def test_alpha_flags():
+	assert read_base_header(blvtf_build_vtf(mk_rgba(4, 4), 'DXT5', mips=False))['flags'] == blvtf_vtf_flag_bits['EIGHTBITALPHA']
+	assert read_base_header(blvtf_build_vtf(mk_rgba(4, 4), 'DXT1_ONEBITALPHA', mips=False))['flags'] == blvtf_vtf_flag_bits['ONEBITALPHA']
+	assert read_base_header(blvtf_build_vtf(mk_rgba(4, 4), 'DXT1', mips=False, srgb=True))['flags'] == blvtf_vtf_flag_bits['SRGB']
+
+
+@pytest.mark.parametrize('version', ('7.0', '7.6'))
+def test_unsupported_version(version):
+	with pytest.raises(ValueError):
+		blvtf_build_vtf(mk_rgba(4, 4), 'DXT1', version=version)
+
+
+@pytest.mark.parametrize('width, height, img_format, size', (
+	(1, 1, 'DXT1', 8),
+	(5, 3, 'DXT1', 16),
+	(13, 7, 'DXT5', 128),
+	(2, 2, 'DXT3', 16),
+	(5, 3, 'RGBA8888', 60),
+	(5, 3, 'BGR888', 45),
+	(5, 3, 'RGBA16161616F', 120),
+))
+def test_image_size(width, height, img_format, size):
+	assert blvtf_vtf_image_size(width, height, img_format) == size
+
+
+@pytest.mark.parametrize('dims, thumb_dims', (
+	((16, 16), (16, 16)),
+	((64, 32), (16, 8)),
+	((1024, 4096), (4, 16)),
+	((8, 4), (8, 4)),
+))
+def test_thumb_dims(dims, thumb_dims):
+	assert blvtf_thumb_dims(*dims) == thumb_dims
+
+
+
+# Only sRGB colours get decoded, anything else is linear already
+def test_reflectivity():
+	rgba = mk_rgba(4, 4)
+
+	assert blvtf_reflectivity(rgba) == pytest.approx((200 / 255, 100 / 255, 50 / 255))
+	assert blvtf_reflectivity(rgba, srgb=True) == pytest.approx(tuple(blvtf_srgb_to_linear_lut[(200, 100, 50),]))
+
+	rgba_f32 = np.full((2, 2, 4), 0.25, dtype=np.float32)
+	assert blvtf_reflectivity(rgba_f32) == pytest.approx((0.25, 0.25, 0.25))
+	assert blvtf_reflectivity(rgba_f32, srgb=True) == pytest.approx((0.25, 0.25, 0.25))
+
+
+@pytest.mark.parametrize('srgb', (False, True))
+def test_reflectivity_header(srgb):
+	# left half black, right half white
+	rgba = np.zeros((256, 128, 4), dtype=np.uint8)
+	rgba[:, 64:] = 255
+
+	for mips in (True, False):
+		header = read_base_header(blvtf_build_vtf(rgba, 'RGBA8888', mips=mips, thumbnail=False, srgb=srgb))
+		assert header['reflectivity'] == pytest.approx((0.5, 0.5, 0.5), abs=0.01)
+
+	# the mip it's taken from is small: a single stray pixel barely counts, but still does
+	rgba[0, 0, :3] = 255
+	header = read_base_header(blvtf_build_vtf(rgba, 'RGBA8888', thumbnail=False, srgb=srgb))
+	assert 0.5 < header['reflectivity'][0] < 0.51